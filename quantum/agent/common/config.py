@@ -31,6 +31,15 @@ ROOT_HELPER_OPTS = [
                help=_('Root helper application.')),
 ]
 
+ROOT_HELPER_DAEMON_OPTS = [
+    cfg.StrOpt('root_helper_daemon',
+               help=_('Command starting a root helper daemon, e.g. '
+                      '"sudo quantum-rootwrap-daemon '
+                      '/etc/quantum/rootwrap.conf". When set, commands are '
+                      'run as root by the daemon instead of starting '
+                      'root_helper for each of them.')),
+]
+
 AGENT_STATE_OPTS = [
     cfg.IntOpt('report_interval', default=4,
                help=_('Seconds between nodes reporting state to server')),
@@ -62,6 +71,7 @@ def register_root_helper(conf):
     # The first call is to ensure backward compatibility
     conf.register_opts(ROOT_HELPER_OPTS)
     conf.register_opts(ROOT_HELPER_OPTS, 'AGENT')
+    conf.register_opts(ROOT_HELPER_DAEMON_OPTS, 'AGENT')
 
 
 def register_agent_state_opts_helper(conf):
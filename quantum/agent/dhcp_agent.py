@@ -55,6 +55,12 @@ class DhcpAgent(manager.Manager):
     OPTS = [
         cfg.IntOpt('resync_interval', default=5,
                    help=_("Interval to resync.")),
+        cfg.IntOpt('num_sync_threads', default=4,
+                   help=_("Number of networks synchronized in parallel.")),
+        cfg.FloatOpt('reload_allocations_delay', default=0.5,
+                     help=_("Seconds to wait for more port changes before "
+                            "reloading the allocations of a network, 0 "
+                            "reloads them on every change.")),
         cfg.StrOpt('dhcp_driver',
                    default='quantum.agent.linux.dhcp.Dnsmasq',
                    help=_("The driver used to manage the DHCP server.")),
@@ -73,6 +79,7 @@ class DhcpAgent(manager.Manager):
         self.needs_resync = False
         self.conf = cfg.CONF
         self.cache = NetworkCache()
+        self._pending_reloads = set()
         self.root_helper = config.get_root_helper(self.conf)
         self.dhcp_driver_cls = importutils.import_class(self.conf.dhcp_driver)
         ctx = context.get_admin_context_without_session()
@@ -133,6 +140,26 @@ class DhcpAgent(manager.Manager):
             self.needs_resync = True
             LOG.exception(_('Unable to %s dhcp.'), action)
 
+    def schedule_reload_allocations(self, network):
+        """Reload the allocations of a network once port changes settle.
+
+        The changes made to the ports of a network within
+        reload_allocations_delay are applied with a single reload.
+        """
+        delay = self.conf.reload_allocations_delay
+        if not delay:
+            self.call_driver('reload_allocations', network)
+        elif network.id not in self._pending_reloads:
+            self._pending_reloads.add(network.id)
+            eventlet.spawn_after(delay, self._reload_allocations, network.id)
+
+    @lockutils.synchronized('agent', 'dhcp-')
+    def _reload_allocations(self, network_id):
+        self._pending_reloads.discard(network_id)
+        network = self.cache.get_network_by_id(network_id)
+        if network:
+            self.call_driver('reload_allocations', network)
+
     def update_lease(self, network_id, ip_address, time_remaining):
         try:
             self.plugin_rpc.update_lease_expiration(network_id, ip_address,
@@ -151,8 +178,17 @@ class DhcpAgent(manager.Manager):
             for deleted_id in known_networks - active_networks:
                 self.disable_dhcp_helper(deleted_id)
 
-            for network_id in active_networks:
-                self.refresh_dhcp_helper(network_id)
+            # Fetch all the networks at once, then wait on the driver for
+            # several of them at a time
+            networks = self.plugin_rpc.get_networks_info(
+                list(active_networks))
+            # Networks deleted since they were listed are not returned
+            for deleted_id in active_networks - set(n.id for n in networks):
+                self.disable_dhcp_helper(deleted_id)
+            pool = eventlet.GreenPool(self.conf.num_sync_threads)
+            for network in networks:
+                pool.spawn_n(self.refresh_dhcp_helper, network.id, network)
+            pool.waitall()
         except:
             self.needs_resync = True
             LOG.exception(_('Unable to sync network state.'))
@@ -169,14 +205,19 @@ class DhcpAgent(manager.Manager):
         """Spawn a thread to periodically resync the dhcp state."""
         eventlet.spawn(self._periodic_resync_helper)
 
-    def enable_dhcp_helper(self, network_id):
-        """Enable DHCP for a network that meets enabling criteria."""
-        try:
-            network = self.plugin_rpc.get_network_info(network_id)
-        except:
-            self.needs_resync = True
-            LOG.exception(_('Network %s RPC info call failed.'), network_id)
-            return
+    def enable_dhcp_helper(self, network_id, network=None):
+        """Enable DHCP for a network that meets enabling criteria.
+
+        The network info is retrieved unless it is given.
+        """
+        if network is None:
+            try:
+                network = self.plugin_rpc.get_network_info(network_id)
+            except:
+                self.needs_resync = True
+                LOG.exception(_('Network %s RPC info call failed.'),
+                              network_id)
+                return
 
         if not network.admin_state_up:
             return
@@ -198,22 +239,25 @@ class DhcpAgent(manager.Manager):
             if self.call_driver('disable', network):
                 self.cache.remove(network)
 
-    def refresh_dhcp_helper(self, network_id):
+    def refresh_dhcp_helper(self, network_id, network=None):
         """Refresh or disable DHCP for a network depending on the current state
         of the network.
 
+        The network info is retrieved unless it is given.
         """
         old_network = self.cache.get_network_by_id(network_id)
         if not old_network:
             # DHCP current not running for network.
-            return self.enable_dhcp_helper(network_id)
+            return self.enable_dhcp_helper(network_id, network)
 
-        try:
-            network = self.plugin_rpc.get_network_info(network_id)
-        except:
-            self.needs_resync = True
-            LOG.exception(_('Network %s RPC info call failed.'), network_id)
-            return
+        if network is None:
+            try:
+                network = self.plugin_rpc.get_network_info(network_id)
+            except:
+                self.needs_resync = True
+                LOG.exception(_('Network %s RPC info call failed.'),
+                              network_id)
+                return
 
         old_cidrs = set(s.cidr for s in old_network.subnets if s.enable_dhcp)
         new_cidrs = set(s.cidr for s in network.subnets if s.enable_dhcp)
@@ -271,7 +315,7 @@ class DhcpAgent(manager.Manager):
         network = self.cache.get_network_by_id(port.network_id)
         if network:
             self.cache.put_port(port)
-            self.call_driver('reload_allocations', network)
+            self.schedule_reload_allocations(network)
 
     # Use the update handler for the port create event.
     port_create_end = port_update_end
@@ -283,7 +327,7 @@ class DhcpAgent(manager.Manager):
         if port:
             network = self.cache.get_network_by_id(port.network_id)
             self.cache.remove_port(port)
-            self.call_driver('reload_allocations', network)
+            self.schedule_reload_allocations(network)
 
     def enable_isolated_metadata_proxy(self, network):
 
@@ -342,6 +386,7 @@ class DhcpPluginApi(proxy.RpcProxy):
 
     API version history:
         1.0 - Initial version.
+        1.2 - get_networks_info.
 
     """
 
@@ -352,6 +397,8 @@ class DhcpPluginApi(proxy.RpcProxy):
             topic=topic, default_version=self.BASE_RPC_API_VERSION)
         self.context = context
         self.host = cfg.CONF.host
+        # Cleared once the plugin turns out not to support get_networks_info
+        self.networks_info_call = True
 
     def get_active_networks(self):
         """Make a remote process call to retrieve the active networks."""
@@ -367,6 +414,29 @@ class DhcpPluginApi(proxy.RpcProxy):
                                                  host=self.host),
                                    topic=self.topic))
 
+    def get_networks_info(self, network_ids):
+        """Make a remote process call to retrieve info of many networks.
+
+        One call per network is made when the plugin does not support it.
+        """
+        def call():
+            networks = self.call(self.context,
+                                 self.make_msg('get_networks_info',
+                                               network_ids=network_ids,
+                                               host=self.host),
+                                 topic=self.topic, version='1.2')
+            return [DictModel(network) for network in networks]
+
+        def call_per_network():
+            return [self.get_network_info(network_id)
+                    for network_id in network_ids]
+
+        if not self.networks_info_call:
+            return call_per_network()
+        networks, self.networks_info_call = agent_rpc.call_with_fallback(
+            'get_networks_info', call, call_per_network)
+        return networks
+
     def get_dhcp_port(self, network_id, device_id):
         """Make a remote process call to create the dhcp port."""
         return DictModel(self.call(self.context,
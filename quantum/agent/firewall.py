@@ -50,10 +50,15 @@ class FirewallDriver(object):
       if direction is egress:
         remote_group_id will be a list of dest_ip_prefix
       remote_group_id will also remaining membership update management
+      Note: drivers setting handles_remote_groups get remote_group_id rules
+      which are not converted, and the member ips of each remote group
+      through update_security_group_members instead
     """
 
     __metaclass__ = abc.ABCMeta
 
+    handles_remote_groups = False
+
     def prepare_port_filter(self, port):
         """Prepare filters for the port.
 
@@ -84,6 +89,13 @@ class FirewallDriver(object):
         """Stop filtering port"""
         raise NotImplementedError()
 
+    def update_security_group_members(self, sg_id, member_ips):
+        """Update the member ips of a remote security group
+
+        Only called on drivers setting handles_remote_groups.
+        """
+        raise NotImplementedError()
+
     def filter_defer_apply_on(self):
         """Defer application of filtering rule"""
         pass
@@ -19,8 +19,11 @@
 #
 """
 
+import itertools
+import time
+
 import eventlet
-from eventlet import semaphore
+from eventlet import queue
 import netaddr
 from oslo.config import cfg
 
@@ -51,6 +54,10 @@ NS_PREFIX = 'qrouter-'
 INTERNAL_DEV_PREFIX = 'qr-'
 EXTERNAL_DEV_PREFIX = 'qg-'
 
+# Routers updated through RPC are processed before the full sync backlog
+PRIORITY_RPC = 0
+PRIORITY_SYNC = 1
+
 
 class L3PluginApi(proxy.RpcProxy):
     """Agent side of the l3 agent RPC API.
@@ -67,13 +74,20 @@ class L3PluginApi(proxy.RpcProxy):
             topic=topic, default_version=self.BASE_RPC_API_VERSION)
         self.host = host
 
-    def get_routers(self, context, fullsync=True, router_id=None):
-        """Make a remote process call to retrieve the sync data for routers."""
+    def get_routers(self, context, fullsync=True, router_id=None,
+                    generations=None):
+        """Make a remote process call to retrieve the sync data for routers.
+
+        generations maps router ids to the generation of the data the
+        agent has for them, these routers are only returned in full if
+        their generation changed.
+        """
         router_ids = [router_id] if router_id else None
         return self.call(context,
                          self.make_msg('sync_routers', host=self.host,
                                        fullsync=fullsync,
-                                       router_ids=router_ids),
+                                       router_ids=router_ids,
+                                       generations=generations),
                          topic=self.topic)
 
     def get_external_network_id(self, context):
@@ -99,6 +113,8 @@ class RouterInfo(object):
         self.root_helper = root_helper
         self.use_namespaces = use_namespaces
         self.router = router
+        # Generation of the router data last processed successfully
+        self.generation = None
         self.iptables_manager = iptables_manager.IptablesManager(
             root_helper=root_helper,
             #FIXME(danwent): use_ipv6=True,
@@ -111,6 +127,84 @@ class RouterInfo(object):
             return NS_PREFIX + self.router_id
 
 
+class RouterUpdate(object):
+    """Pending processing of a router, deleting it when router is None."""
+
+    def __init__(self, router_id, priority, router=None, timestamp=None):
+        self.router_id = router_id
+        self.priority = priority
+        self.router = router
+        self.timestamp = timestamp or time.time()
+        # Sequence number of the queue entry scheduling this update
+        self.seq = None
+
+
+class RouterProcessingQueue(object):
+    """Routers waiting to be processed, by priority and then age.
+
+    Updates queued for a router which already has a pending update are
+    merged into it, keeping the most recent router data and the highest
+    priority. A router handed out by get() is not handed out again until
+    done() is called for it, its later updates wait until then.
+    """
+
+    def __init__(self):
+        self._queue = queue.PriorityQueue()
+        self._counter = itertools.count()
+        # Pending update of each router
+        self._pending = {}
+        # Routers being processed
+        self._busy = set()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def __contains__(self, router_id):
+        return router_id in self._pending or router_id in self._busy
+
+    def _schedule(self, update):
+        update.seq = self._counter.next()
+        self._queue.put((update.priority, update.seq, update.router_id))
+
+    def add(self, update):
+        pending = self._pending.get(update.router_id)
+        if not pending:
+            self._pending[update.router_id] = update
+            if update.router_id not in self._busy:
+                self._schedule(update)
+            return
+        if update.timestamp >= pending.timestamp:
+            pending.router = update.router
+            pending.timestamp = update.timestamp
+        if update.priority < pending.priority:
+            pending.priority = update.priority
+            if pending.seq is not None:
+                # The entry already queued is skipped when it comes out
+                self._schedule(pending)
+
+    def get(self):
+        """Wait for the next router update to process."""
+        while True:
+            priority, seq, router_id = self._queue.get()
+            update = self._pending.get(router_id)
+            if not update or update.seq != seq:
+                continue
+            if router_id in self._busy:
+                # Scheduled again by done()
+                update.seq = None
+                continue
+            del self._pending[router_id]
+            self._busy.add(router_id)
+            return update
+
+    def done(self, router_id):
+        """Mark the update of router_id returned by get() as processed."""
+        self._busy.discard(router_id)
+        update = self._pending.get(router_id)
+        if update and update.seq is None:
+            self._schedule(update)
+
+
 class L3NATAgent(manager.Manager):
 
     OPTS = [
@@ -141,6 +235,8 @@ class L3NATAgent(manager.Manager):
         cfg.StrOpt('gateway_external_network_id', default='',
                    help=_("UUID of external network for routers implemented "
                           "by the agents.")),
+        cfg.IntOpt('router_workers', default=8,
+                   help=_("Number of routers processed concurrently.")),
     ]
 
     def __init__(self, host, conf=None):
@@ -164,7 +260,7 @@ class L3NATAgent(manager.Manager):
         self.context = context.get_admin_context_without_session()
         self.plugin_rpc = L3PluginApi(topics.PLUGIN, host)
         self.fullsync = True
-        self.sync_sem = semaphore.Semaphore(1)
+        self._queue = RouterProcessingQueue()
         if self.conf.use_namespaces:
             self._destroy_router_namespaces(self.conf.router_id)
         super(L3NATAgent, self).__init__(host=self.conf.host)
@@ -551,27 +647,18 @@ class L3NATAgent(manager.Manager):
 
     def router_deleted(self, context, router_id):
         """Deal with router deletion RPC message."""
-        with self.sync_sem:
-            if router_id in self.router_info:
-                try:
-                    self._router_removed(router_id)
-                except Exception:
-                    msg = _("Failed dealing with router "
-                            "'%s' deletion RPC message")
-                    LOG.debug(msg, router_id)
-                    self.fullsync = True
+        self._queue.add(RouterUpdate(router_id, PRIORITY_RPC))
 
     def routers_updated(self, context, routers):
         """Deal with routers modification and creation RPC message."""
         if not routers:
             return
-        with self.sync_sem:
-            try:
-                self._process_routers(routers)
-            except Exception:
-                msg = _("Failed dealing with routers update RPC message")
-                LOG.debug(msg)
-                self.fullsync = True
+        try:
+            self._process_routers(routers)
+        except Exception:
+            msg = _("Failed dealing with routers update RPC message")
+            LOG.debug(msg)
+            self.fullsync = True
 
     def router_removed_from_agent(self, context, payload):
         self.router_deleted(context, payload['router_id'])
@@ -579,7 +666,14 @@ class L3NATAgent(manager.Manager):
     def router_added_to_agent(self, context, payload):
         self.routers_updated(context, payload)
 
-    def _process_routers(self, routers, all_routers=False):
+    def _process_routers(self, routers, all_routers=False,
+                         priority=PRIORITY_RPC, timestamp=None):
+        """Queue the processing of routers.
+
+        The routers which should not be implemented by this agent are
+        queued for removal, as are the ones missing from routers when they
+        are all the routers of the agent.
+        """
         if (self.conf.external_network_bridge and
             not ip_lib.device_exists(self.conf.external_network_bridge)):
             LOG.error(_("The external network bridge '%s' does not exist"),
@@ -595,10 +689,18 @@ class L3NATAgent(manager.Manager):
         if all_routers:
             prev_router_ids = set(self.router_info)
         else:
-            prev_router_ids = set(self.router_info) & set(
-                [router['id'] for router in routers])
+            prev_router_ids = set(
+                [router['id'] for router in routers
+                 if router['id'] in self.router_info or
+                 router['id'] in self._queue])
         cur_router_ids = set()
         for r in routers:
+            if r.get(l3_constants.ROUTER_UNCHANGED_KEY):
+                # The server only sends these for routers we have
+                if r['id'] in self.router_info:
+                    cur_router_ids.add(r['id'])
+                continue
+
             if not r['admin_state_up']:
                 continue
 
@@ -615,34 +717,71 @@ class L3NATAgent(manager.Manager):
             if ex_net_id and ex_net_id != target_ex_net_id:
                 continue
             cur_router_ids.add(r['id'])
-            if r['id'] not in self.router_info:
-                self._router_added(r['id'], r)
-            ri = self.router_info[r['id']]
-            ri.router = r
-            self.process_router(ri)
+            self._queue.add(RouterUpdate(r['id'], priority, router=r,
+                                         timestamp=timestamp))
         # identify and remove routers that no longer exist
         for router_id in prev_router_ids - cur_router_ids:
-            self._router_removed(router_id)
+            self._queue.add(RouterUpdate(router_id, priority,
+                                         timestamp=timestamp))
+
+    def _process_router_update(self, update):
+        try:
+            if update.router is None:
+                if update.router_id in self.router_info:
+                    self._router_removed(update.router_id)
+            else:
+                if update.router_id not in self.router_info:
+                    self._router_added(update.router_id, update.router)
+                ri = self.router_info[update.router_id]
+                generation = update.router.get('generation')
+                if (generation is not None and ri.generation is not None and
+                        generation <= ri.generation):
+                    # Also skips the older data of a full sync which
+                    # raced with the notification of a newer one
+                    LOG.debug(_("Router %s is up to date"), update.router_id)
+                    return
+                ri.generation = None
+                ri.router = update.router
+                self.process_router(ri)
+                ri.generation = generation
+        except Exception:
+            LOG.exception(_("Failed processing router %s"), update.router_id)
+            self.fullsync = True
+        finally:
+            self._queue.done(update.router_id)
+
+    def _process_routers_loop(self):
+        while True:
+            self._process_router_update(self._queue.get())
 
     @periodic_task.periodic_task
     def _sync_routers_task(self, context):
-        # we need to sync with router deletion RPC message
-        with self.sync_sem:
-            if self.fullsync:
-                try:
-                    if not self.conf.use_namespaces:
-                        router_id = self.conf.router_id
-                    else:
-                        router_id = None
-                    routers = self.plugin_rpc.get_routers(
-                        context, router_id)
-                    self._process_routers(routers, all_routers=True)
-                    self.fullsync = False
-                except Exception:
-                    LOG.exception(_("Failed synchronizing routers"))
-                    self.fullsync = True
+        if self.fullsync:
+            try:
+                if not self.conf.use_namespaces:
+                    router_id = self.conf.router_id
+                else:
+                    router_id = None
+                # Only the routers whose generation changed are sent
+                generations = dict((ri.router_id, ri.generation)
+                                   for ri in self.router_info.values()
+                                   if ri.generation is not None)
+                # Updates received while fetching the routers are newer
+                timestamp = time.time()
+                routers = self.plugin_rpc.get_routers(
+                    context, router_id=router_id, generations=generations)
+                self._process_routers(routers, all_routers=True,
+                                      priority=PRIORITY_SYNC,
+                                      timestamp=timestamp)
+                self.fullsync = False
+            except Exception:
+                LOG.exception(_("Failed synchronizing routers"))
+                self.fullsync = True
 
     def after_start(self):
+        self._pool = eventlet.GreenPool(self.conf.router_workers)
+        for i in range(self.conf.router_workers):
+            self._pool.spawn_n(self._process_routers_loop)
         LOG.info(_("L3 agent started"))
 
     def _update_routing_table(self, ri, operation, route):
@@ -20,8 +20,8 @@ import os
 import re
 import shutil
 import socket
-import StringIO
 import sys
+import weakref
 
 import netaddr
 from oslo.config import cfg
@@ -61,6 +61,8 @@ DHCPV4_PORT = 67
 DHCPV6_PORT = 467
 METADATA_DEFAULT_IP = '169.254.169.254'
 
+_HOSTNAME_SEPARATORS = re.compile('[:.]')
+
 
 class DhcpBase(object):
     __metaclass__ = abc.ABCMeta
@@ -216,6 +218,11 @@ class Dnsmasq(DhcpLocalProcess):
     QUANTUM_NETWORK_ID_KEY = 'QUANTUM_NETWORK_ID'
     QUANTUM_RELAY_SOCKET_PATH_KEY = 'QUANTUM_RELAY_SOCKET_PATH'
 
+    # Host entries rendered for each port object. The agent network cache
+    # replaces the object of a port when it changes, so only the entries of
+    # new or changed ports are rendered again.
+    _port_host_entries = weakref.WeakKeyDictionary()
+
     @classmethod
     def existing_dhcp_networks(cls, conf, root_helper):
         """Return a list of existing networks ids (ones we have configs for)"""
@@ -299,31 +306,62 @@ class Dnsmasq(DhcpLocalProcess):
                         'turned off DHCP: %s'), self.network.id)
             return
 
-        self._output_hosts_file()
-        self._output_opts_file()
+        hosts_changed = self._replace_conf_file('host', self._hosts_data())
+        opts_changed = self._replace_conf_file('opts', self._opts_data())
+        if not (hosts_changed or opts_changed):
+            LOG.debug(_('Allocations unchanged for network: %s'),
+                      self.network.id)
+            return
+
         cmd = ['kill', '-HUP', self.pid]
         utils.execute(cmd, self.root_helper)
         LOG.debug(_('Reloading allocations for network: %s'), self.network.id)
 
-    def _output_hosts_file(self):
-        """Writes a dnsmasq compatible hosts file."""
-        r = re.compile('[:.]')
-        buf = StringIO.StringIO()
+    def _replace_conf_file(self, kind, data):
+        """Write a config file unless it already holds data.
 
-        for port in self.network.ports:
-            for alloc in port.fixed_ips:
-                name = '%s.%s' % (r.sub('-', alloc.ip_address),
-                                  self.conf.dhcp_domain)
-                buf.write('%s,%s,%s\n' %
-                          (port.mac_address, name, alloc.ip_address))
+        Returns whether the file was written.
+        """
+        name = self.get_conf_file_name(kind)
+        try:
+            with open(name, 'r') as f:
+                if f.read() == data:
+                    return False
+        except IOError:
+            pass
+        utils.replace_file(name, data)
+        return True
+
+    def _host_entries(self, port):
+        """Return the hosts file lines of a port."""
+        domain = self.conf.dhcp_domain
+        cached = self._port_host_entries.get(port)
+        if cached and cached[0] == domain:
+            return cached[1]
+
+        entries = ''.join('%s,%s.%s,%s\n' %
+                          (port.mac_address,
+                           _HOSTNAME_SEPARATORS.sub('-', alloc.ip_address),
+                           domain, alloc.ip_address)
+                          for alloc in port.fixed_ips)
+        self._port_host_entries[port] = (domain, entries)
+        return entries
+
+    def _hosts_data(self):
+        return ''.join(self._host_entries(port)
+                       for port in self.network.ports)
 
-        name = self.get_conf_file_name('host')
-        utils.replace_file(name, buf.getvalue())
-        return name
+    def _output_hosts_file(self):
+        """Writes a dnsmasq compatible hosts file."""
+        self._replace_conf_file('host', self._hosts_data())
+        return self.get_conf_file_name('host')
 
     def _output_opts_file(self):
         """Write a dnsmasq compatible options file."""
+        self._replace_conf_file('opts', self._opts_data())
+        return self.get_conf_file_name('opts')
 
+    def _opts_data(self):
         if self.conf.enable_isolated_metadata:
             subnet_to_interface_ip = self._make_subnet_interface_ip_map()
 
@@ -363,9 +401,7 @@ class Dnsmasq(DhcpLocalProcess):
                 else:
                     options.append(self._format_option(i, 'router'))
 
-        name = self.get_conf_file_name('opts')
-        utils.replace_file(name, '\n'.join(options))
-        return name
+        return '\n'.join(options)
 
     def _make_subnet_interface_ip_map(self):
         ip_dev = ip_lib.IPDevice(
@@ -0,0 +1,88 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Keep ipset IP sets in sync with lists of member IPs."""
+
+from quantum.agent.linux import utils as linux_utils
+from quantum.common import constants
+from quantum.openstack.common import log as logging
+
+
+LOG = logging.getLogger(__name__)
+
+# ipset refuses set names longer than this
+MAX_SET_NAME_LENGTH = 31
+
+SET_FAMILY = {constants.IPv4: 'inet',
+              constants.IPv6: 'inet6'}
+
+
+def get_set_name(ethertype, name):
+    """Return the name of the ethertype set for name, e.g. a group id."""
+    return ('%s%s' % (ethertype, name))[:MAX_SET_NAME_LENGTH]
+
+
+class IpsetManager(object):
+    """Wrapper for ipset.
+
+    The members of the sets are kept in memory, so updating a set only
+    adds and deletes the IPs which changed, all in one ipset restore run.
+    """
+
+    def __init__(self, _execute=None, root_helper=None):
+        if _execute:
+            self.execute = _execute
+        else:
+            self.execute = linux_utils.execute
+        self.root_helper = root_helper
+        # Members of the sets by set name
+        self.sets = {}
+
+    def set_members(self, set_name, ethertype, member_ips):
+        """Create the set if needed and make member_ips its members."""
+        members = set(member_ips)
+        commands = []
+        old_members = self.sets.get(set_name)
+        if old_members is None:
+            # The set may be left over by a previous run of the agent
+            commands.append('create %s hash:ip family %s' %
+                            (set_name, SET_FAMILY[ethertype]))
+            commands.append('flush %s' % set_name)
+            old_members = set()
+        commands.extend('add %s %s' % (set_name, ip)
+                        for ip in sorted(members - old_members))
+        commands.extend('del %s %s' % (set_name, ip)
+                        for ip in sorted(old_members - members))
+        if commands:
+            self._restore(commands)
+        self.sets[set_name] = members
+
+    def destroy(self, set_name):
+        """Destroy a set, which no iptables rule may reference anymore."""
+        if self.sets.pop(set_name, None) is None:
+            return
+        try:
+            self.execute(['ipset', 'destroy', set_name],
+                         root_helper=self.root_helper)
+        except RuntimeError:
+            LOG.exception(_("Unable to destroy ipset %s"), set_name)
+
+    def _restore(self, commands):
+        LOG.debug(_("Updating ipsets: %s"), commands)
+        self.execute(['ipset', '-exist', 'restore'],
+                     process_input='\n'.join(commands) + '\n',
+                     root_helper=self.root_helper)
@@ -19,11 +19,16 @@ import netaddr
 from oslo.config import cfg
 
 from quantum.agent import firewall
+from quantum.agent.linux import ipset_manager
 from quantum.agent.linux import iptables_manager
 from quantum.common import constants
 from quantum.openstack.common import log as logging
 
 
+cfg.CONF.import_opt('iptables_incremental_apply',
+                    'quantum.agent.securitygroups_rpc', group='SECURITYGROUP')
+cfg.CONF.import_opt('enable_ipset',
+                    'quantum.agent.securitygroups_rpc', group='SECURITYGROUP')
 LOG = logging.getLogger(__name__)
 SG_CHAIN = 'sg-chain'
 INGRESS_DIRECTION = 'ingress'
@@ -31,6 +36,8 @@ EGRESS_DIRECTION = 'egress'
 CHAIN_NAME_PREFIX = {INGRESS_DIRECTION: 'i',
                      EGRESS_DIRECTION: 'o'}
 LINUX_DEV_LEN = 14
+IPSET_DIRECTION = {INGRESS_DIRECTION: 'src',
+                   EGRESS_DIRECTION: 'dst'}
 
 
 class IptablesFirewallDriver(firewall.FirewallDriver):
@@ -41,10 +48,17 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
     def __init__(self):
         self.iptables = iptables_manager.IptablesManager(
             root_helper=cfg.CONF.AGENT.root_helper,
-            use_ipv6=True)
+            use_ipv6=True,
+            incremental=cfg.CONF.SECURITYGROUP.iptables_incremental_apply)
         # list of port which has security group
         self.filtered_ports = {}
         self._add_fallback_chain_v4v6()
+        self.handles_remote_groups = cfg.CONF.SECURITYGROUP.enable_ipset
+        if self.handles_remote_groups:
+            self.ipset = ipset_manager.IpsetManager(
+                root_helper=cfg.CONF.AGENT.root_helper)
+        # member ips of the remote security groups by group id
+        self.sg_members = {}
 
     @property
     def ports(self):
@@ -80,6 +94,30 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
         self._setup_chains()
         self.iptables.apply()
 
+    def update_security_group_members(self, sg_id, member_ips):
+        LOG.debug(_("Updating members of security group %s"), sg_id)
+        ips = {constants.IPv4: [], constants.IPv6: []}
+        for ip in member_ips:
+            ips['IPv%s' % netaddr.IPAddress(ip).version].append(ip)
+        for ethertype, ethertype_ips in ips.items():
+            self.ipset.set_members(
+                ipset_manager.get_set_name(ethertype, sg_id),
+                ethertype, ethertype_ips)
+        self.sg_members[sg_id] = member_ips
+
+    def _remove_unused_security_group_members(self):
+        """Destroy the sets no port filter references anymore."""
+        used_sg_ids = set()
+        for port in self.filtered_ports.values():
+            used_sg_ids.update(
+                rule.get('remote_group_id')
+                for rule in port.get('security_group_rules', []))
+        for sg_id in set(self.sg_members) - used_sg_ids:
+            for ethertype in (constants.IPv4, constants.IPv6):
+                self.ipset.destroy(
+                    ipset_manager.get_set_name(ethertype, sg_id))
+            del self.sg_members[sg_id]
+
     def _setup_chains(self):
         """Setup ingress and egress chain for a port. """
         self._add_chain_by_name_v4v6(SG_CHAIN)
@@ -208,19 +246,29 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
                                    ipv6_iptables_rule)
             ipv4_iptables_rule += self._drop_dhcp_rule()
         ipv4_iptables_rule += self._convert_sgr_to_iptables_rules(
-            ipv4_sg_rules)
+            ipv4_sg_rules, constants.IPv4)
         ipv6_iptables_rule += self._convert_sgr_to_iptables_rules(
-            ipv6_sg_rules)
+            ipv6_sg_rules, constants.IPv6)
         self._add_rule_to_chain_v4v6(chain_name,
                                      ipv4_iptables_rule,
                                      ipv6_iptables_rule)
 
-    def _convert_sgr_to_iptables_rules(self, security_group_rules):
+    def _convert_sgr_to_iptables_rules(self, security_group_rules,
+                                       ethertype=None):
         iptables_rules = []
         self._drop_invalid_packets(iptables_rules)
         self._allow_established(iptables_rules)
         for rule in security_group_rules:
             args = ['-j RETURN']
+            remote_group_id = rule.get('remote_group_id')
+            if (remote_group_id and self.handles_remote_groups and
+                    not rule.get('source_ip_prefix') and
+                    not rule.get('dest_ip_prefix')):
+                if remote_group_id not in self.sg_members:
+                    # Like an empty group, an unknown one matches nothing
+                    continue
+                args += self._remote_group_arg(rule['direction'], ethertype,
+                                               remote_group_id)
             args += self._protocol_arg(rule.get('protocol'))
             args += self._port_arg('dport',
                                    rule.get('protocol'),
@@ -273,6 +321,13 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
             return ['-%s' % direction, ip_prefix]
         return []
 
+    def _remote_group_arg(self, direction, ethertype, remote_group_id):
+        #NOTE: the members of remote_group_id are matched by the ipset
+        # updated from update_security_group_members
+        return ['-m', 'set', '--match-set',
+                ipset_manager.get_set_name(ethertype, remote_group_id),
+                IPSET_DIRECTION[direction]]
+
     def _port_chain_name(self, port, direction):
         return iptables_manager.get_chain_name(
             '%s%s' % (CHAIN_NAME_PREFIX[direction], port['device'][3:]))
@@ -282,6 +337,9 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
 
     def filter_defer_apply_off(self):
         self.iptables.defer_apply_off()
+        if self.handles_remote_groups:
+            # the rules referencing the sets are gone once applied
+            self._remove_unused_security_group_members()
 
 
 class OVSHybridIptablesFirewallDriver(IptablesFirewallDriver):
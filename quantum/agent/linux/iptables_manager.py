@@ -85,6 +85,44 @@ class IptablesTable(object):
         self.rules = []
         self.chains = set()
         self.unwrapped_chains = set()
+        # Changes since the last apply, used by the incremental apply
+        self.dirty_chains = set()
+        self.removed_chains = set()
+        self.unwrapped_dirty = False
+
+    def _mark_dirty(self, chain, wrap):
+        if wrap:
+            self.dirty_chains.add(chain)
+        else:
+            self.unwrapped_dirty = True
+
+    def clear_dirty(self):
+        """Forget the changes made since the last apply."""
+        self.dirty_chains = set()
+        self.removed_chains = set()
+        self.unwrapped_dirty = False
+
+    def get_chain_rules(self, chains):
+        """Return the rules of the given wrapped chains as iptables lines.
+
+        Duplicated rules are weeded out, letting the last occurrence take
+        precedence like the full apply does.
+        """
+        chain_rules = dict((chain, []) for chain in chains)
+        for rule in self.rules:
+            if rule.wrap and rule.chain in chain_rules:
+                chain_rules[rule.chain].append(str(rule))
+        for chain, lines in chain_rules.iteritems():
+            if len(set(lines)) != len(lines):
+                seen_lines = set()
+                unique_lines = []
+                for line in reversed(lines):
+                    if line not in seen_lines:
+                        seen_lines.add(line)
+                        unique_lines.append(line)
+                unique_lines.reverse()
+                chain_rules[chain] = unique_lines
+        return chain_rules
 
     def add_chain(self, name, wrap=True):
         """Adds a named chain to the table.
@@ -103,6 +141,7 @@ class IptablesTable(object):
             self.chains.add(name)
         else:
             self.unwrapped_chains.add(name)
+        self._mark_dirty(name, wrap)
 
     def _select_chain_set(self, wrap):
         if wrap:
@@ -141,13 +180,24 @@ class IptablesTable(object):
             return
 
         chain_set.remove(name)
+        if wrap:
+            self.dirty_chains.discard(name)
+            self.removed_chains.add(name)
+        else:
+            self.unwrapped_dirty = True
         self.rules = filter(lambda r: r.chain != name, self.rules)
         if wrap:
             jump_snippet = '-j %s-%s' % (binary_name, name)
         else:
             jump_snippet = '-j %s' % (name,)
 
-        self.rules = filter(lambda r: jump_snippet not in r.rule, self.rules)
+        rules = []
+        for rule in self.rules:
+            if jump_snippet in rule.rule:
+                self._mark_dirty(rule.chain, rule.wrap)
+            else:
+                rules.append(rule)
+        self.rules = rules
 
     def add_rule(self, chain, rule, wrap=True, top=False):
         """Add a rule to the table.
@@ -168,6 +218,7 @@ class IptablesTable(object):
             rule = ' '.join(map(self._wrap_target_chain, rule.split(' ')))
 
         self.rules.append(IptablesRule(chain, rule, wrap, top))
+        self._mark_dirty(chain, wrap)
 
     def _wrap_target_chain(self, s):
         if s.startswith('$'):
@@ -185,6 +236,7 @@ class IptablesTable(object):
         chain = get_chain_name(chain, wrap)
         try:
             self.rules.remove(IptablesRule(chain, rule, wrap, top))
+            self._mark_dirty(chain, wrap)
         except ValueError:
             LOG.warn(_('Tried to remove rule that was not there:'
                        ' %(chain)r %(rule)r %(wrap)r %(top)r'),
@@ -194,10 +246,9 @@ class IptablesTable(object):
     def empty_chain(self, chain, wrap=True):
         """Remove all rules from a chain."""
         chain = get_chain_name(chain, wrap)
-        chained_rules = [rule for rule in self.rules
-                         if rule.chain == chain and rule.wrap == wrap]
-        for rule in chained_rules:
-            self.rules.remove(rule)
+        self.rules = [rule for rule in self.rules
+                      if rule.chain != chain or rule.wrap != wrap]
+        self._mark_dirty(chain, wrap)
 
 
 class IptablesManager(object):
@@ -221,10 +272,17 @@ class IptablesManager(object):
     wrapped in the same was as the built-in filter chains. Additionally,
     there's a snat chain that is applied after the POSTROUTING chain.
 
+    In incremental mode, only the wrapped chains changed since the previous
+    apply are restored, with iptables-restore --noflush, and without reading
+    the tables back with iptables-save. Changes to unwrapped chains, the
+    first apply and a failed incremental restore fall back to the full
+    apply.
+
     """
 
     def __init__(self, _execute=None, state_less=False,
-                 root_helper=None, use_ipv6=False, namespace=None):
+                 root_helper=None, use_ipv6=False, namespace=None,
+                 incremental=False):
         if _execute:
             self.execute = _execute
         else:
@@ -233,7 +291,10 @@ class IptablesManager(object):
         self.use_ipv6 = use_ipv6
         self.root_helper = root_helper
         self.namespace = namespace
+        self.incremental = incremental
         self.iptables_apply_deferred = False
+        # Rules of the wrapped chains as last applied, per (cmd, table)
+        self.applied_chains = {}
 
         self.ipv4 = {'filter': IptablesTable()}
         self.ipv6 = {'filter': IptablesTable()}
@@ -322,22 +383,71 @@ class IptablesManager(object):
 
         for cmd, tables in s:
             for table in tables:
-                args = ['%s-save' % cmd, '-t', table]
-                if self.namespace:
-                    args = ['ip', 'netns', 'exec', self.namespace] + args
-                current_table = (self.execute(args,
-                                 root_helper=self.root_helper))
-                current_lines = current_table.split('\n')
-                new_filter = self._modify_rules(current_lines,
-                                                tables[table])
-                args = ['%s-restore' % (cmd)]
-                if self.namespace:
-                    args = ['ip', 'netns', 'exec', self.namespace] + args
-                self.execute(args,
-                             process_input='\n'.join(new_filter),
-                             root_helper=self.root_helper)
+                if (self.incremental and not tables[table].unwrapped_dirty and
+                        (cmd, table) in self.applied_chains):
+                    try:
+                        self._apply_incremental(cmd, table, tables[table])
+                        continue
+                    except RuntimeError:
+                        LOG.warn(_("Incremental apply of %(cmd)s table "
+                                   "%(table)s failed, applying the full "
+                                   "table"), {'cmd': cmd, 'table': table})
+                self._apply_full(cmd, table, tables[table])
         LOG.debug(_("IPTablesManager.apply completed with success"))
 
+    def _run_restore(self, cmd, lines, noflush=False):
+        args = ['%s-restore' % (cmd)]
+        if noflush:
+            args.append('--noflush')
+        if self.namespace:
+            args = ['ip', 'netns', 'exec', self.namespace] + args
+        self.execute(args,
+                     process_input='\n'.join(lines),
+                     root_helper=self.root_helper)
+
+    def _apply_full(self, cmd, table_name, table):
+        args = ['%s-save' % cmd, '-t', table_name]
+        if self.namespace:
+            args = ['ip', 'netns', 'exec', self.namespace] + args
+        current_table = (self.execute(args,
+                         root_helper=self.root_helper))
+        current_lines = current_table.split('\n')
+        new_filter = self._modify_rules(current_lines, table)
+        self._run_restore(cmd, new_filter)
+        table.clear_dirty()
+        if self.incremental:
+            self.applied_chains[(cmd, table_name)] = table.get_chain_rules(
+                table.chains)
+
+    def _apply_incremental(self, cmd, table_name, table):
+        applied = self.applied_chains[(cmd, table_name)]
+        chain_rules = table.get_chain_rules(table.dirty_chains &
+                                            table.chains)
+        changed = sorted(chain for chain, lines in chain_rules.iteritems()
+                         if applied.get(chain) != lines)
+        removed = sorted(chain for chain in table.removed_chains
+                         if chain in applied and chain not in table.chains)
+        if changed or removed:
+            # Declaring an existing chain with --noflush flushes it, so
+            # removed chains are emptied before being deleted
+            lines = ['*%s' % table_name]
+            lines += [':%s-%s - [0:0]' % (binary_name, chain)
+                      for chain in changed + removed]
+            for chain in changed:
+                lines += chain_rules[chain]
+            lines += ['-X %s-%s' % (binary_name, chain) for chain in removed]
+            lines += ['COMMIT', '']
+            self._run_restore(cmd, lines, noflush=True)
+            LOG.debug(_("Restored %(changed)s changed and removed %(removed)s "
+                        "chains of %(cmd)s table %(table)s"),
+                      {'changed': len(changed), 'removed': len(removed),
+                       'cmd': cmd, 'table': table_name})
+        for chain in changed:
+            applied[chain] = chain_rules[chain]
+        for chain in removed:
+            del applied[chain]
+        table.clear_dirty()
+
     def _modify_rules(self, current_lines, table, binary=None):
         unwrapped_chains = table.unwrapped_chains
         chains = table.chains
@@ -358,15 +468,18 @@ class IptablesManager(object):
                     break
 
         our_rules = []
+        top_rules = set()
         for rule in rules:
             rule_str = str(rule)
             if rule.top:
-                # rule.top == True means we want this rule to be at the top.
-                # Further down, we weed out duplicates from the bottom of the
-                # list, so here we remove the dupes ahead of time.
-                new_filter = filter(lambda s: s.strip() != rule_str.strip(),
-                                    new_filter)
+                top_rules.add(rule_str.strip())
             our_rules += [rule_str]
+        if top_rules:
+            # rule.top == True means we want this rule to be at the top.
+            # Further down, we weed out duplicates from the bottom of the
+            # list, so here we remove the dupes ahead of time.
+            new_filter = [line for line in new_filter
+                          if line.strip() not in top_rules]
 
         new_filter[rules_index:rules_index] = our_rules
 
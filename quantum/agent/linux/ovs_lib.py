@@ -18,6 +18,7 @@
 # @author: Dan Wendlandt, Nicira Networks, Inc.
 # @author: Dave Lapsley, Nicira Networks, Inc.
 
+import itertools
 import re
 
 from quantum.agent.linux import utils
@@ -46,6 +47,10 @@ class OVSBridge:
         self.br_name = br_name
         self.root_helper = root_helper
         self.re_id = self.re_compile_id()
+        # Changes held back by defer_apply_on(), see defer_apply_off()
+        self.defer_apply_depth = 0
+        self.deferred_vsctl = []
+        self.deferred_flows = []
 
     def re_compile_id(self):
         external = 'external_ids\s*'
@@ -80,11 +85,17 @@ class OVSBridge:
 
     def set_db_attribute(self, table_name, record, column, value):
         args = ["set", table_name, record, "%s=%s" % (column, value)]
-        self.run_vsctl(args)
+        self._run_or_defer_vsctl(args)
 
     def clear_db_attribute(self, table_name, record, column):
         args = ["clear", table_name, record, column]
-        self.run_vsctl(args)
+        self._run_or_defer_vsctl(args)
+
+    def _run_or_defer_vsctl(self, args):
+        if self.defer_apply_depth:
+            self.deferred_vsctl.append(args)
+        else:
+            self.run_vsctl(args)
 
     def run_ofctl(self, cmd, args):
         full_args = ["ovs-ofctl", cmd, self.br_name] + args
@@ -94,6 +105,16 @@ class OVSBridge:
             LOG.error(_("Unable to execute %(cmd)s. Exception: %(exception)s"),
                       {'cmd': full_args, 'exception': e})
 
+    def run_ofctl_flows(self, cmd, flow_strs):
+        """Run an ovs-ofctl flow command on flows read from stdin."""
+        full_args = ["ovs-ofctl", cmd, self.br_name, "-"]
+        try:
+            return utils.execute(full_args, root_helper=self.root_helper,
+                                 process_input="\n".join(flow_strs) + "\n")
+        except Exception, e:
+            LOG.error(_("Unable to execute %(cmd)s. Exception: %(exception)s"),
+                      {'cmd': full_args, 'exception': e})
+
     def count_flows(self):
         flow_list = self.run_ofctl("dump-flows", []).split("\n")[1:]
         return len(flow_list) - 1
@@ -149,7 +170,10 @@ class OVSBridge:
         flow_expr_arr = self._build_flow_expr_arr(**kwargs)
         flow_expr_arr.append("actions=%s" % (kwargs["actions"]))
         flow_str = ",".join(flow_expr_arr)
-        self.run_ofctl("add-flow", [flow_str])
+        if self.defer_apply_depth:
+            self.deferred_flows.append(('add', flow_str))
+        else:
+            self.run_ofctl("add-flow", [flow_str])
 
     def delete_flows(self, **kwargs):
         kwargs['delete'] = True
@@ -157,7 +181,44 @@ class OVSBridge:
         if "actions" in kwargs:
             flow_expr_arr.append("actions=%s" % (kwargs["actions"]))
         flow_str = ",".join(flow_expr_arr)
-        self.run_ofctl("del-flows", [flow_str])
+        # An empty match deletes every flow, which cannot be expressed as
+        # a line of a flow file
+        if self.defer_apply_depth and flow_str:
+            self.deferred_flows.append(('del', flow_str))
+        else:
+            self.run_ofctl("del-flows", [flow_str])
+
+    def defer_apply_on(self):
+        """Hold back the changes made to the bridge.
+
+        Until the matching defer_apply_off() call, set_db_attribute,
+        clear_db_attribute, add_flow and delete_flows are only recorded.
+        Calls may be nested, the changes are applied by the outermost
+        defer_apply_off().
+        """
+        self.defer_apply_depth += 1
+
+    def defer_apply_off(self):
+        """Apply the changes held back since defer_apply_on().
+
+        The database changes are made by a single ovs-vsctl transaction,
+        then the flows are fed to ovs-ofctl add-flows/del-flows from stdin,
+        one command per run of consecutive additions or deletions so that
+        the flow changes keep their order.
+        """
+        self.defer_apply_depth -= 1
+        if self.defer_apply_depth:
+            return
+        vsctl_cmds, self.deferred_vsctl = self.deferred_vsctl, []
+        flows, self.deferred_flows = self.deferred_flows, []
+        if vsctl_cmds:
+            args = []
+            for cmd in vsctl_cmds:
+                args += ["--"] + cmd
+            self.run_vsctl(args)
+        for action, group in itertools.groupby(flows, lambda flow: flow[0]):
+            flow_strs = [flow_str for _action, flow_str in group]
+            self.run_ofctl_flows("%s-flows" % action, flow_strs)
 
     def add_tunnel_port(self, port_name, remote_ip):
         self.run_vsctl(["add-port", self.br_name, port_name])
@@ -238,18 +299,26 @@ class OVSBridge:
 
         return edge_ports
 
+    def get_iface_id(self, external_ids):
+        """Return the port id of a VIF from its interface external_ids.
+
+        None is returned for interfaces which are not VIFs.
+        """
+        if "iface-id" in external_ids and "attached-mac" in external_ids:
+            return external_ids['iface-id']
+        elif ("xs-vif-uuid" in external_ids and
+              "attached-mac" in external_ids):
+            # if this is a xenserver and iface-id is not automatically
+            # synced to OVS from XAPI, we grab it from XAPI directly
+            return self.get_xapi_iface_id(external_ids["xs-vif-uuid"])
+
     def get_vif_port_set(self):
         edge_ports = set()
         port_names = self.get_port_name_list()
         for name in port_names:
             external_ids = self.db_get_map("Interface", name, "external_ids")
-            if "iface-id" in external_ids and "attached-mac" in external_ids:
-                edge_ports.add(external_ids['iface-id'])
-            elif ("xs-vif-uuid" in external_ids and
-                  "attached-mac" in external_ids):
-                # if this is a xenserver and iface-id is not automatically
-                # synced to OVS from XAPI, we grab it from XAPI directly
-                iface_id = self.get_xapi_iface_id(external_ids["xs-vif-uuid"])
+            iface_id = self.get_iface_id(external_ids)
+            if iface_id:
                 edge_ports.add(iface_id)
         return edge_ports
 
@@ -0,0 +1,140 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Follow the Open vSwitch Interface table with ovsdb-client monitor."""
+
+import shlex
+
+import eventlet
+from eventlet.green import subprocess
+from eventlet.green import threading
+
+from quantum.common import utils
+from quantum.openstack.common import jsonutils
+from quantum.openstack.common import log as logging
+
+
+LOG = logging.getLogger(__name__)
+
+INTERFACE_COLUMNS = ['name', 'external_ids', 'ofport']
+
+
+def _decode(value):
+    """Convert an OVSDB JSON value to the matching python type."""
+    if isinstance(value, list) and len(value) == 2:
+        kind, data = value
+        if kind == 'map':
+            return dict(data)
+        if kind == 'set':
+            return [_decode(item) for item in data]
+        if kind == 'uuid':
+            return data
+    return value
+
+
+class OvsdbMonitor(object):
+    """Keeps a view of the Interface table up to date.
+
+    ovsdb-client monitor prints every row of the table once, then each
+    change made to them, one JSON update per line. The updates are read by
+    a green thread, so the caller only needs to check has_updates() or
+    wait_for_update() to learn that interfaces were added or removed.
+    """
+
+    def __init__(self, root_helper=None, _popen=None):
+        self.root_helper = root_helper
+        if _popen:
+            self.popen = _popen
+        else:
+            self.popen = utils.subprocess_popen
+        # Interface rows by uuid, holding the INTERFACE_COLUMNS
+        self.interfaces = {}
+        self._changed = threading.Event()
+        self._process = None
+        self._reader = None
+
+    def start(self):
+        """Spawn ovsdb-client, returning False when it cannot be run."""
+        cmd = ['ovsdb-client', 'monitor', 'Interface',
+               ','.join(INTERFACE_COLUMNS), '--format=json']
+        if self.root_helper:
+            cmd = shlex.split(self.root_helper) + cmd
+        LOG.debug(_("Running command: %s"), cmd)
+        try:
+            self._process = self.popen(cmd, shell=False,
+                                       stdout=subprocess.PIPE)
+        except OSError:
+            LOG.exception(_("Unable to run ovsdb-client monitor"))
+            return False
+        self._reader = eventlet.spawn(self._read_updates)
+        return True
+
+    def stop(self):
+        if self._reader:
+            self._reader.kill()
+        if self._process and self._process.returncode is None:
+            try:
+                self._process.kill()
+            except OSError:
+                pass
+
+    def is_active(self):
+        return self._reader is not None and not self._reader.dead
+
+    def _read_updates(self):
+        for line in iter(self._process.stdout.readline, ''):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                self.process_update(line)
+            except (ValueError, KeyError):
+                LOG.warn(_("Ignoring unexpected ovsdb-client output: %s"),
+                         line)
+        LOG.error(_("ovsdb-client monitor exited"))
+
+    def process_update(self, line):
+        """Apply one line of ovsdb-client monitor output to the view."""
+        update = jsonutils.loads(line)
+        headings = update['headings']
+        for values in update['data']:
+            row = dict(zip(headings, values))
+            action = row['action']
+            if action == 'delete':
+                self.interfaces.pop(row['row'], None)
+            elif action in ('initial', 'insert', 'new'):
+                # 'old' rows only carry the previous value of the modified
+                # columns and are followed by the complete 'new' row
+                self.interfaces[row['row']] = dict(
+                    (column, _decode(row[column]))
+                    for column in INTERFACE_COLUMNS)
+        self._changed.set()
+
+    def has_updates(self):
+        """Return whether the table changed since the previous call."""
+        changed = self._changed.is_set()
+        self._changed.clear()
+        return changed
+
+    def wait_for_update(self, timeout):
+        """Wait at most timeout seconds for the table to change."""
+        self._changed.wait(timeout)
+
+    def get_interfaces(self):
+        """Return the external_ids of the interfaces by name."""
+        return dict((interface['name'], interface['external_ids'])
+                    for interface in self.interfaces.values())
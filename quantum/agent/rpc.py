@@ -19,6 +19,7 @@ from quantum.common import topics
 
 from quantum.openstack.common import log as logging
 from quantum.openstack.common import rpc
+from quantum.openstack.common.rpc import common as rpc_common
 from quantum.openstack.common.rpc import proxy
 from quantum.openstack.common import timeutils
 
@@ -45,6 +46,27 @@ def create_consumers(dispatcher, prefix, topic_details):
     return connection
 
 
+def call_with_fallback(method, call, fallback):
+    """Issue a newer RPC call, falling back when the plugin lacks it.
+
+    Only an UnsupportedRpcVersion raised by the plugin triggers the
+    fallback; any other error is propagated.
+
+    :param method: The name of the newer call, for logging.
+    :param call: Callable issuing the newer call.
+    :param fallback: Callable returning the same result without it.
+
+    :returns: The result and whether the newer call is supported.
+    """
+    try:
+        return call(), True
+    except rpc_common.RemoteError as e:
+        if e.exc_type != 'UnsupportedRpcVersion':
+            raise
+    LOG.info(_("Plugin does not support %s, falling back"), method)
+    return fallback(), False
+
+
 class PluginReportStateAPI(proxy.RpcProxy):
     BASE_RPC_API_VERSION = '1.0'
 
@@ -66,6 +88,9 @@ class PluginApi(proxy.RpcProxy):
 
     API version history:
         1.0 - Initial version.
+        1.1 - Security group RPC, see SecurityGroupServerRpcApiMixin.
+        1.2 - get_devices_details_list, update_devices_down and
+              security_group_info_for_devices.
 
     '''
 
@@ -74,6 +99,41 @@ class PluginApi(proxy.RpcProxy):
     def __init__(self, topic):
         super(PluginApi, self).__init__(
             topic=topic, default_version=self.BASE_RPC_API_VERSION)
+        # Cleared once the plugin turns out not to support the 1.2 calls
+        self.batched_calls = True
+
+    def _call_batched(self, context, method, devices, agent_id, fallback):
+        def call():
+            return self.call(context,
+                             self.make_msg(method, devices=devices,
+                                           agent_id=agent_id),
+                             topic=self.topic, version='1.2')
+
+        def call_per_device():
+            return [fallback(context, device, agent_id)
+                    for device in devices]
+
+        if not self.batched_calls:
+            return call_per_device()
+        result, self.batched_calls = call_with_fallback(method, call,
+                                                        call_per_device)
+        return result
+
+    def get_devices_details_list(self, context, devices, agent_id):
+        """Return the details of several devices in a single call.
+
+        One call per device is made when the plugin does not support it.
+        """
+        return self._call_batched(context, 'get_devices_details_list',
+                                  devices, agent_id, self.get_device_details)
+
+    def update_devices_down(self, context, devices, agent_id):
+        """Report several devices as no longer existing in a single call.
+
+        One call per device is made when the plugin does not support it.
+        """
+        return self._call_batched(context, 'update_devices_down',
+                                  devices, agent_id, self.update_device_down)
 
     def get_device_details(self, context, device, agent_id):
         return self.call(context,
@@ -18,17 +18,28 @@
 
 from oslo.config import cfg
 
+from quantum.agent import rpc as agent_rpc
 from quantum.common import topics
 from quantum.openstack.common import importutils
 from quantum.openstack.common import log as logging
 
 LOG = logging.getLogger(__name__)
 SG_RPC_VERSION = "1.1"
+# security_group_info_for_devices
+SG_INFO_RPC_VERSION = "1.2"
 
 security_group_opts = [
     cfg.StrOpt(
         'firewall_driver',
-        default='quantum.agent.firewall.NoopFirewallDriver')
+        default='quantum.agent.firewall.NoopFirewallDriver'),
+    cfg.BoolOpt(
+        'iptables_incremental_apply', default=False,
+        help=_("Restore only the iptables chains changed since the last "
+               "apply instead of the whole tables")),
+    cfg.BoolOpt(
+        'enable_ipset', default=False,
+        help=_("Match the members of remote security groups with one "
+               "ipset per group instead of one iptables rule per member"))
 ]
 cfg.CONF.register_opts(security_group_opts, 'SECURITYGROUP')
 
@@ -57,6 +68,15 @@ class SecurityGroupServerRpcApiMixin(object):
                          version=SG_RPC_VERSION,
                          topic=self.topic)
 
+    def security_group_info_for_devices(self, context, devices):
+        LOG.debug(_("Get security group information "
+                    "for devices via rpc %r"), devices)
+        return self.call(context,
+                         self.make_msg('security_group_info_for_devices',
+                                       devices=devices),
+                         version=SG_INFO_RPC_VERSION,
+                         topic=self.topic)
+
 
 class SecurityGroupAgentRpcCallbackMixin(object):
     """A mix-in that enable SecurityGroup agent
@@ -102,13 +122,34 @@ class SecurityGroupAgentRpcMixin(object):
         firewall_driver = cfg.CONF.SECURITYGROUP.firewall_driver
         LOG.debug(_("Init firewall settings (driver=%s)"), firewall_driver)
         self.firewall = importutils.import_object(firewall_driver)
+        # Cleared once the plugin turns out not to support it
+        self.sg_info_rpc = self.firewall.handles_remote_groups
+
+    def _get_devices_info(self, device_ids):
+        """Return the devices to filter, updating remote group members.
+
+        Drivers matching the remote groups themselves get the member ips
+        of each group once instead of one rule per member ip.
+        """
+        if self.sg_info_rpc:
+            info, self.sg_info_rpc = agent_rpc.call_with_fallback(
+                'security_group_info_for_devices',
+                lambda: self.plugin_rpc.security_group_info_for_devices(
+                    self.context, list(device_ids)),
+                lambda: None)
+            if info is not None:
+                for sg_id, member_ips in info['sg_member_ips'].items():
+                    self.firewall.update_security_group_members(sg_id,
+                                                                member_ips)
+                return info['devices']
+        return self.plugin_rpc.security_group_rules_for_devices(
+            self.context, list(device_ids))
 
     def prepare_devices_filter(self, device_ids):
         if not device_ids:
             return
         LOG.info(_("Preparing filters for devices %s"), device_ids)
-        devices = self.plugin_rpc.security_group_rules_for_devices(
-            self.context, list(device_ids))
+        devices = self._get_devices_info(device_ids)
         with self.firewall.defer_apply():
             for device in devices.values():
                 self.firewall.prepare_port_filter(device)
@@ -123,17 +164,23 @@ class SecurityGroupAgentRpcMixin(object):
     def security_groups_member_updated(self, security_groups):
         LOG.info(_("Security group "
                    "member updated %r"), security_groups)
+        if self.sg_info_rpc:
+            refresh = self.refresh_security_group_members
+        else:
+            refresh = self.refresh_firewall
         self._security_group_updated(
             security_groups,
-            'security_group_source_groups')
+            'security_group_source_groups',
+            refresh)
 
-    def _security_group_updated(self, security_groups, attribute):
+    def _security_group_updated(self, security_groups, attribute,
+                                refresh=None):
         #check need update or not
         for device in self.firewall.ports.values():
             if set(device.get(attribute,
                               [])).intersection(
                     set(security_groups)):
-                    self.refresh_firewall()
+                    (refresh or self.refresh_firewall)()
                     return
 
     def security_groups_provider_updated(self):
@@ -156,8 +203,21 @@ class SecurityGroupAgentRpcMixin(object):
         device_ids = self.firewall.ports.keys()
         if not device_ids:
             return
-        devices = self.plugin_rpc.security_group_rules_for_devices(
-            self.context, device_ids)
+        devices = self._get_devices_info(device_ids)
+        self._update_port_filters(devices)
+
+    def refresh_security_group_members(self):
+        """Update the remote group members, keeping the port filters."""
+        LOG.info(_("Refresh security group members"))
+        device_ids = self.firewall.ports.keys()
+        if not device_ids:
+            return
+        devices = self._get_devices_info(device_ids)
+        if not self.sg_info_rpc:
+            # The plugin sent one rule per remote group member instead
+            self._update_port_filters(devices)
+
+    def _update_port_filters(self, devices):
         with self.firewall.defer_apply():
             for device in devices.values():
                 LOG.debug(_("Update port filter for %s"), device)
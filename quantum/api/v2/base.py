@@ -210,11 +210,10 @@ class Controller(object):
             # FIXME(salvatore-orlando): obj_getter might return references to
             # other resources. Must check authZ on them too.
             # Omit items from list that should not be visible
-            obj_list = [obj for obj in obj_list
-                        if policy.check(request.context,
-                                        self._plugin_handlers[self.SHOW],
-                                        obj,
-                                        plugin=self._plugin)]
+            obj_list = policy.filter_allowed(request.context,
+                                             self._plugin_handlers[self.SHOW],
+                                             obj_list,
+                                             plugin=self._plugin)
         collection = {self._collection:
                       [self._view(obj,
                                   fields_to_strip=fields_to_add)
@@ -319,11 +318,9 @@ class Controller(object):
         if self._collection in body:
             # Have to account for bulk create
             items = body[self._collection]
-            deltas = {}
-            bulk = True
         else:
             items = [body]
-            bulk = False
+        deltas = {}
         for item in items:
             self._validate_network_tenant_ownership(request,
                                                     item[self._resource])
@@ -331,24 +328,20 @@ class Controller(object):
                            action,
                            item[self._resource],
                            plugin=self._plugin)
+            tenant_id = item[self._resource]['tenant_id']
+            deltas[tenant_id] = deltas.get(tenant_id, 0) + 1
+        # Count the resources and check the limits once per tenant
+        for tenant_id, delta in deltas.iteritems():
             try:
-                tenant_id = item[self._resource]['tenant_id']
                 count = quota.QUOTAS.count(request.context, self._resource,
                                            self._plugin, self._collection,
                                            tenant_id)
-                if bulk:
-                    delta = deltas.get(tenant_id, 0) + 1
-                    deltas[tenant_id] = delta
-                else:
-                    delta = 1
-                kwargs = {self._resource: count + delta}
             except exceptions.QuotaResourceUnknown as e:
                 # We don't want to quota this resource
                 LOG.debug(e)
-            else:
-                quota.QUOTAS.limit_check(request.context,
-                                         item[self._resource]['tenant_id'],
-                                         **kwargs)
+                break
+            quota.QUOTAS.limit_check(request.context, tenant_id,
+                                     **{self._resource: count + delta})
 
         def notify(create_result):
             notifier_method = self._resource + '.create.end'
@@ -38,6 +38,9 @@ core_opts = [
                help=_("The host IP to bind to")),
     cfg.IntOpt('bind_port', default=9696,
                help=_("The port to bind to")),
+    cfg.IntOpt('api_workers', default=0,
+               help=_("Number of separate worker processes serving the "
+                      "API, 0 serves it from the server process")),
     cfg.StrOpt('api_paste_config', default="api-paste.ini",
                help=_("The API paste config file to use")),
     cfg.StrOpt('api_extensions_path', default="",
@@ -81,6 +84,24 @@ core_opts = [
                help=_("The hostname Quantum is running on")),
     cfg.BoolOpt('force_gateway_on_subnet', default=False,
                 help=_("Ensure that configured gateway is on subnet")),
+    cfg.StrOpt('ipam_driver',
+               default='quantum.db.ipam_db.AvailabilityRangeIpamDriver',
+               help=_("The driver used for tracking available IP addresses "
+                      "in subnet allocation pools")),
+    cfg.IntOpt('ip_recycle_interval', default=0,
+               help=_("Seconds between runs of the job returning expired "
+                      "IP allocations to their pools. 0 reclaims them on "
+                      "every port create and update instead")),
+    cfg.IntOpt('ip_recycle_batch_size', default=500,
+               help=_("Maximum number of expired IP allocations reclaimed "
+                      "in a single transaction")),
+    cfg.IntOpt('ipam_update_retries', default=10,
+               help=_("How many times the IPAM driver retries an "
+                      "availability update which lost a concurrent race")),
+    cfg.IntOpt('security_group_cache_ttl', default=0,
+               help=_("Seconds the security group rules and members sent to "
+                      "the agents are cached for. 0 disables the cache, "
+                      "which is always disabled with api_workers")),
 ]
 
 core_cli_opts = [
@@ -30,6 +30,7 @@ DEVICE_OWNER_DHCP = "network:dhcp"
 
 FLOATINGIP_KEY = '_floatingips'
 INTERFACE_KEY = '_interfaces'
+ROUTER_UNCHANGED_KEY = '_unchanged'
 
 IPv4 = 'IPv4'
 IPv6 = 'IPv6'
@@ -208,6 +208,11 @@ class IpAddressGenerationFailure(Conflict):
     message = _("No more IP addresses available on network %(net_id)s.")
 
 
+class IpAvailabilityUpdateConflict(Conflict):
+    message = _("Unable to update IP availability for allocation pool "
+                "%(pool_id)s because of concurrent updates.")
+
+
 class BridgeDoesNotExist(QuantumException):
     message = _("Bridge %(bridge)s does not exist.")
 
@@ -19,6 +19,7 @@ from oslo.config import cfg
 import sqlalchemy as sa
 from sqlalchemy.orm import exc
 
+from quantum.db import db_base_plugin_v2
 from quantum.db import model_base
 from quantum.db import models_v2
 from quantum.extensions import agent as ext_agent
@@ -83,6 +84,10 @@ class AgentDbMixin(ext_agent.AgentPluginBase):
             conf = {}
         return conf
 
+    @db_base_plugin_v2.column_fields('id', 'agent_type', 'binary', 'topic',
+                                     'host', 'admin_state_up', 'created_at',
+                                     'started_at', 'heartbeat_timestamp',
+                                     'description')
     def _make_agent_dict(self, agent, fields=None):
         attr = ext_agent.RESOURCE_ATTRIBUTE_MAP.get(
             ext_agent.RESOURCE_NAME + 's')
@@ -109,10 +114,17 @@ class AgentDbMixin(ext_agent.AgentPluginBase):
         query = self._get_collection_query(context, Agent, filters=filters)
         return query.all()
 
-    def get_agents(self, context, filters=None, fields=None):
+    def get_agents(self, context, filters=None, fields=None,
+                   sorts=None, limit=None, marker=None,
+                   page_reverse=False):
+        marker_obj = self._get_marker_obj(context, 'agent', limit, marker)
         return self._get_collection(context, Agent,
                                     self._make_agent_dict,
-                                    filters=filters, fields=fields)
+                                    filters=filters, fields=fields,
+                                    sorts=sorts,
+                                    limit=limit,
+                                    marker_obj=marker_obj,
+                                    page_reverse=page_reverse)
 
     def _get_agent_by_type_and_host(self, context, agent_type, host):
         query = self._model_query(context, Agent)
@@ -223,7 +223,7 @@ class AgentSchedulerDbMixin(agentscheduler.AgentSchedulerPluginBase,
             return {'routers': []}
 
     def list_active_sync_routers_on_active_l3_agent(
-            self, context, host, router_id):
+            self, context, host, router_ids, generations=None):
         agent = self._get_agent_by_type_and_host(
             context, constants.AGENT_TYPE_L3, host)
         if not agent.admin_state_up:
@@ -231,13 +231,15 @@ class AgentSchedulerDbMixin(agentscheduler.AgentSchedulerPluginBase,
         query = context.session.query(RouterL3AgentBinding.router_id)
         query = query.filter(
             RouterL3AgentBinding.l3_agent_id == agent.id)
-        if router_id:
-            query = query.filter(RouterL3AgentBinding.router_id == router_id)
+        if router_ids:
+            query = query.filter(
+                RouterL3AgentBinding.router_id.in_(router_ids))
         router_ids = query.all()
         if router_ids:
             _ids = [item[0] for item in router_ids]
             routers = self.get_sync_data(context, router_ids=_ids,
-                                         active=True)
+                                         active=True,
+                                         generations=generations)
             return routers
         return []
 
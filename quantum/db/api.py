@@ -172,6 +172,16 @@ def configure_db():
                 retry_registration(remaining, reconnect_interval)
 
 
+def dispose():
+    """Close the connections of the engine pool.
+
+    The connections are opened again on demand. Processes forked once the
+    engine was used must not share its connections with their parent.
+    """
+    if _ENGINE:
+        _ENGINE.dispose()
+
+
 def clear_db(base=BASE):
     global _ENGINE, _MAKER
     assert _ENGINE
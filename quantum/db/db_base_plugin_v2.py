@@ -27,6 +27,7 @@ from quantum.api.v2 import attributes
 from quantum.common import constants
 from quantum.common import exceptions as q_exc
 from quantum.db import api as db
+from quantum.db import ipam_db
 from quantum.db import models_v2
 from quantum.db import sqlalchemyutils
 from quantum.openstack.common import log as logging
@@ -49,6 +50,46 @@ AGENT_OWNER_PREFIX = 'network:'
 AUTO_DELETE_PORT_OWNERS = ['network:dhcp']
 
 
+def column_fields(*fields):
+    """Declare the fields a _make_*_dict method copies from model columns.
+
+    The fields must be columns of the model with the same name, copied
+    without any change. Collections restricted to some of these fields are
+    then read from the columns only, without loading the models.
+    """
+    def decorator(func):
+        func.column_fields = frozenset(fields)
+        return func
+    return decorator
+
+
+def eager_loads(*relationships):
+    """Declare the relationships a _make_*_dict method reads.
+
+    Collections built with the method load these relationships for all the
+    models with one query each, instead of one query per model.
+    """
+    def decorator(func):
+        func.eager_loads = relationships
+        return func
+    return decorator
+
+
+def make_collection_dicts(query, model, dict_func, fields=None):
+    """Return the dicts dict_func makes from the models query returns."""
+    declared_fields = getattr(dict_func, 'column_fields', None)
+    if fields and declared_fields and declared_fields.issuperset(fields):
+        fields = list(set(fields))
+        columns = [getattr(model, field) for field in fields]
+        return [dict(zip(fields, row))
+                for row in query.with_entities(*columns)]
+    relationships = getattr(dict_func, 'eager_loads', ())
+    if relationships:
+        query = query.options(*[orm.subqueryload(relationship)
+                                for relationship in relationships])
+    return [dict_func(c, fields) for c in query.all()]
+
+
 class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
     """ A class that implements the v2 Quantum plugin interface
         using SQLAlchemy models.  Whenever a non-read call happens
@@ -237,7 +278,7 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
                                            limit=limit,
                                            marker_obj=marker_obj,
                                            page_reverse=page_reverse)
-        items = [dict_func(c, fields) for c in query.all()]
+        items = make_collection_dicts(query, model, dict_func, fields)
         if limit and page_reverse:
             items.reverse()
         return items
@@ -246,16 +287,20 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
         return self._get_collection_query(context, model, filters).count()
 
     @staticmethod
-    def _generate_mac(context, network_id):
+    def _random_mac():
         base_mac = cfg.CONF.base_mac.split(':')
+        mac = [int(base_mac[0], 16), int(base_mac[1], 16),
+               int(base_mac[2], 16), random.randint(0x00, 0xff),
+               random.randint(0x00, 0xff), random.randint(0x00, 0xff)]
+        if base_mac[3] != '00':
+            mac[3] = int(base_mac[3], 16)
+        return ':'.join(map(lambda x: "%02x" % x, mac))
+
+    @staticmethod
+    def _generate_mac(context, network_id):
         max_retries = cfg.CONF.mac_generation_retries
         for i in range(max_retries):
-            mac = [int(base_mac[0], 16), int(base_mac[1], 16),
-                   int(base_mac[2], 16), random.randint(0x00, 0xff),
-                   random.randint(0x00, 0xff), random.randint(0x00, 0xff)]
-            if base_mac[3] != '00':
-                mac[3] = int(base_mac[3], 16)
-            mac_address = ':'.join(map(lambda x: "%02x" % x, mac))
+            mac_address = QuantumDbPluginV2._random_mac()
             if QuantumDbPluginV2._check_unique_mac(context, network_id,
                                                    mac_address):
                 LOG.debug(_("Generated mac for network %(network_id)s "
@@ -280,6 +325,46 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
             return True
         return False
 
+    @staticmethod
+    def _get_used_macs(context, network_id, mac_addresses):
+        """Return which of the MAC addresses are in use on the network."""
+        mac_qry = context.session.query(models_v2.Port.mac_address)
+        mac_qry = mac_qry.filter(
+            models_v2.Port.network_id == network_id,
+            models_v2.Port.mac_address.in_(mac_addresses))
+        return set(mac for (mac,) in mac_qry)
+
+    @staticmethod
+    def _generate_macs(context, network_id, count, reserved=None):
+        """Generate count unique MAC addresses with one query per attempt.
+
+        Addresses in reserved are never returned.
+        """
+        mac_addresses = set()
+        reserved = reserved or set()
+        max_retries = cfg.CONF.mac_generation_retries
+        for i in range(max_retries):
+            candidates = set()
+            while len(candidates) < count - len(mac_addresses):
+                mac_address = QuantumDbPluginV2._random_mac()
+                if (mac_address not in mac_addresses and
+                        mac_address not in reserved):
+                    candidates.add(mac_address)
+            candidates -= QuantumDbPluginV2._get_used_macs(
+                context, network_id, candidates)
+            mac_addresses |= candidates
+            if len(mac_addresses) == count:
+                LOG.debug(_("Generated %(count)s macs for network "
+                            "%(network_id)s"), locals())
+                return list(mac_addresses)
+            LOG.debug(_("Generated %(collisions)s existing macs. Remaining "
+                        "attempts %(max_retries)s."),
+                      {'collisions': count - len(mac_addresses),
+                       'max_retries': max_retries - (i + 1)})
+        LOG.error(_("Unable to generate mac address after %s attempts"),
+                  max_retries)
+        raise q_exc.MacAddressGenerationFailure(net_id=network_id)
+
     @staticmethod
     def _hold_ip(context, network_id, subnet_id, port_id, ip_address):
         alloc_qry = context.session.query(
@@ -303,7 +388,13 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
 
     @staticmethod
     def _recycle_expired_ip_allocations(context, network_id):
-        """Return held ip allocations with expired leases back to the pool."""
+        """Return held ip allocations with expired leases back to the pool.
+
+        Nothing is done here when the periodic recycler is enabled, see
+        recycle_expired_ip_allocations.
+        """
+        if cfg.CONF.ip_recycle_interval > 0:
+            return
         if network_id in getattr(context, '_recycled_networks', set()):
             return
 
@@ -325,86 +416,59 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
         else:
             context._recycled_networks = set([network_id])
 
+    @staticmethod
+    def _reclaim_expired_ip_allocations(context, network_id=None):
+        """Return expired held ip allocations to the pools in batches.
+
+        Each batch of at most ip_recycle_batch_size allocations is released
+        with one availability update per subnet and deleted with one
+        statement, in its own transaction. Returns the number of
+        allocations reclaimed.
+        """
+        batch_size = cfg.CONF.ip_recycle_batch_size
+        driver = ipam_db.get_driver()
+        reclaimed = 0
+        while True:
+            with context.session.begin(subtransactions=True):
+                expired_qry = context.session.query(
+                    models_v2.IPAllocation.subnet_id,
+                    models_v2.IPAllocation.ip_address).with_lockmode('update')
+                expired_qry = expired_qry.filter(
+                    models_v2.IPAllocation.port_id == None,
+                    models_v2.IPAllocation.expiration <= timeutils.utcnow())
+                if network_id:
+                    expired_qry = expired_qry.filter(
+                        models_v2.IPAllocation.network_id == network_id)
+                expired = expired_qry.limit(batch_size).all()
+
+                subnet_ips = {}
+                for subnet_id, ip_address in expired:
+                    subnet_ips.setdefault(subnet_id, []).append(ip_address)
+                for subnet_id, ip_addresses in subnet_ips.iteritems():
+                    driver.release_ips(context, subnet_id, ip_addresses)
+                    alloc_qry = context.session.query(models_v2.IPAllocation)
+                    alloc_qry = alloc_qry.filter(
+                        models_v2.IPAllocation.subnet_id == subnet_id,
+                        models_v2.IPAllocation.ip_address.in_(ip_addresses))
+                    alloc_qry.delete(synchronize_session=False)
+            reclaimed += len(expired)
+            if len(expired) < batch_size:
+                return reclaimed
+
+    def recycle_expired_ip_allocations(self, context):
+        """Return held ip allocations with expired leases on all networks
+        back to the pools.
+
+        Returns the number of allocations reclaimed.
+        """
+        return self._reclaim_expired_ip_allocations(context)
+
     @staticmethod
     def _recycle_ip(context, network_id, subnet_id, ip_address):
         """Return an IP address to the pool of free IP's on the network
         subnet.
         """
-        # Grab all allocation pools for the subnet
-        pool_qry = context.session.query(
-            models_v2.IPAllocationPool).with_lockmode('update')
-        allocation_pools = pool_qry.filter_by(subnet_id=subnet_id).all()
-        # Find the allocation pool for the IP to recycle
-        pool_id = None
-        for allocation_pool in allocation_pools:
-            allocation_pool_range = netaddr.IPRange(
-                allocation_pool['first_ip'],
-                allocation_pool['last_ip'])
-            if netaddr.IPAddress(ip_address) in allocation_pool_range:
-                pool_id = allocation_pool['id']
-                break
-        if not pool_id:
-            error_message = _("No allocation pool found for "
-                              "ip address:%s") % ip_address
-            raise q_exc.InvalidInput(error_message=error_message)
-        # Two requests will be done on the database. The first will be to
-        # search if an entry starts with ip_address + 1 (r1). The second
-        # will be to see if an entry ends with ip_address -1 (r2).
-        # If 1 of the above holds true then the specific entry will be
-        # modified. If both hold true then the two ranges will be merged.
-        # If there are no entries then a single entry will be added.
-        range_qry = context.session.query(
-            models_v2.IPAvailabilityRange).with_lockmode('update')
-        ip_first = str(netaddr.IPAddress(ip_address) + 1)
-        ip_last = str(netaddr.IPAddress(ip_address) - 1)
-        LOG.debug(_("Recycle %s"), ip_address)
-        try:
-            r1 = range_qry.filter_by(allocation_pool_id=pool_id,
-                                     first_ip=ip_first).one()
-            LOG.debug(_("Recycle: first match for %(first_ip)s-%(last_ip)s"),
-                      {'first_ip': r1['first_ip'], 'last_ip': r1['last_ip']})
-        except exc.NoResultFound:
-            r1 = []
-        try:
-            r2 = range_qry.filter_by(allocation_pool_id=pool_id,
-                                     last_ip=ip_last).one()
-            LOG.debug(_("Recycle: last match for %(first_ip)s-%(last_ip)s"),
-                      {'first_ip': r2['first_ip'], 'last_ip': r2['last_ip']})
-        except exc.NoResultFound:
-            r2 = []
-
-        if r1 and r2:
-            # Merge the two ranges
-            ip_range = models_v2.IPAvailabilityRange(
-                allocation_pool_id=pool_id,
-                first_ip=r2['first_ip'],
-                last_ip=r1['last_ip'])
-            context.session.add(ip_range)
-            LOG.debug(_("Recycle: merged %(first_ip1)s-%(last_ip1)s and "
-                        "%(first_ip2)s-%(last_ip2)s"),
-                      {'first_ip1': r2['first_ip'], 'last_ip1': r2['last_ip'],
-                       'first_ip2': r1['first_ip'], 'last_ip2': r1['last_ip']})
-            context.session.delete(r1)
-            context.session.delete(r2)
-        elif r1:
-            # Update the range with matched first IP
-            r1['first_ip'] = ip_address
-            LOG.debug(_("Recycle: updated first %(first_ip)s-%(last_ip)s"),
-                      {'first_ip': r1['first_ip'], 'last_ip': r1['last_ip']})
-        elif r2:
-            # Update the range with matched last IP
-            r2['last_ip'] = ip_address
-            LOG.debug(_("Recycle: updated last %(first_ip)s-%(last_ip)s"),
-                      {'first_ip': r2['first_ip'], 'last_ip': r2['last_ip']})
-        else:
-            # Create a new range
-            ip_range = models_v2.IPAvailabilityRange(
-                allocation_pool_id=pool_id,
-                first_ip=ip_address,
-                last_ip=ip_address)
-            context.session.add(ip_range)
-            LOG.debug(_("Recycle: created new %(first_ip)s-%(last_ip)s"),
-                      {'first_ip': ip_address, 'last_ip': ip_address})
+        ipam_db.get_driver().release_ip(context, subnet_id, ip_address)
         QuantumDbPluginV2._delete_ip_allocation(context, network_id, subnet_id,
                                                 ip_address)
 
@@ -450,66 +514,34 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
         The IP address will be generated from one of the subnets defined on
         the network.
         """
-        range_qry = context.session.query(
-            models_v2.IPAvailabilityRange).join(
-                models_v2.IPAllocationPool).with_lockmode('update')
-        for subnet in subnets:
-            range = range_qry.filter_by(subnet_id=subnet['id']).first()
-            if not range:
-                LOG.debug(_("All IP's from subnet %(subnet_id)s (%(cidr)s) "
-                            "allocated"),
-                          {'subnet_id': subnet['id'], 'cidr': subnet['cidr']})
-                continue
-            ip_address = range['first_ip']
-            LOG.debug(_("Allocated IP - %(ip_address)s from %(first_ip)s "
-                        "to %(last_ip)s"),
-                      {'ip_address': ip_address,
-                       'first_ip': range['first_ip'],
-                       'last_ip': range['last_ip']})
-            if range['first_ip'] == range['last_ip']:
-                # No more free indices on subnet => delete
-                LOG.debug(_("No more free IP's in slice. Deleting allocation "
-                            "pool."))
-                context.session.delete(range)
-            else:
-                # increment the first free
-                range['first_ip'] = str(netaddr.IPAddress(ip_address) + 1)
-            return {'ip_address': ip_address, 'subnet_id': subnet['id']}
-        raise q_exc.IpAddressGenerationFailure(net_id=subnets[0]['network_id'])
+        return QuantumDbPluginV2._generate_ips(context, subnets, 1)[0]
+
+    @staticmethod
+    def _generate_ips(context, subnets, count):
+        """Generate count IP addresses in a single pass over the subnets.
+
+        The IP addresses will be generated from the subnets defined on the
+        network, in the order the subnets are given.
+        """
+        driver = ipam_db.get_driver()
+        ips = driver.generate_ips(context, subnets, count)
+        if len(ips) < count and cfg.CONF.ip_recycle_interval > 0:
+            # NOTE: expired allocations are normally reclaimed by the
+            # periodic recycler, do it now rather than fail the request
+            if QuantumDbPluginV2._reclaim_expired_ip_allocations(
+                    context, subnets[0]['network_id']):
+                ips.extend(driver.generate_ips(context, subnets,
+                                               count - len(ips)))
+        if len(ips) < count:
+            raise q_exc.IpAddressGenerationFailure(
+                net_id=subnets[0]['network_id'])
+        return ips
 
     @staticmethod
     def _allocate_specific_ip(context, subnet_id, ip_address):
         """Allocate a specific IP address on the subnet."""
-        ip = int(netaddr.IPAddress(ip_address))
-        range_qry = context.session.query(
-            models_v2.IPAvailabilityRange,
-            models_v2.IPAllocationPool).join(
-                models_v2.IPAllocationPool).with_lockmode('update')
-        results = range_qry.filter_by(subnet_id=subnet_id).all()
-        for (range, pool) in results:
-            first = int(netaddr.IPAddress(range['first_ip']))
-            last = int(netaddr.IPAddress(range['last_ip']))
-            if first <= ip <= last:
-                if first == last:
-                    context.session.delete(range)
-                    return
-                elif first == ip:
-                    range['first_ip'] = str(netaddr.IPAddress(ip_address) + 1)
-                    return
-                elif last == ip:
-                    range['last_ip'] = str(netaddr.IPAddress(ip_address) - 1)
-                    return
-                else:
-                    # Split into two ranges
-                    new_first = str(netaddr.IPAddress(ip_address) + 1)
-                    new_last = range['last_ip']
-                    range['last_ip'] = str(netaddr.IPAddress(ip_address) - 1)
-                    ip_range = models_v2.IPAvailabilityRange(
-                        allocation_pool_id=pool['id'],
-                        first_ip=new_first,
-                        last_ip=new_last)
-                    context.session.add(ip_range)
-                    return
+        ipam_db.get_driver().allocate_specific_ip(context, subnet_id,
+                                                  ip_address)
 
     @staticmethod
     def _check_unique_ip(context, network_id, subnet_id, ip_address):
@@ -723,11 +755,15 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
         CIDR if overlapping IPs are disabled.
 
         """
-        new_subnet_ipset = netaddr.IPSet([new_subnet_cidr])
         if cfg.CONF.allow_overlapping_ips:
             subnet_list = network.subnets
         else:
             subnet_list = self._get_all_subnets(context)
+        self._check_subnet_cidr_overlap(network, new_subnet_cidr, subnet_list)
+
+    def _check_subnet_cidr_overlap(self, network, new_subnet_cidr,
+                                   subnet_list):
+        new_subnet_ipset = netaddr.IPSet([new_subnet_cidr])
         for subnet in subnet_list:
             if (netaddr.IPSet([subnet.cidr]) & new_subnet_ipset):
                 # don't give out details of the overlapping subnet
@@ -874,6 +910,9 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
             tenant_ids.pop() != original.tenant_id):
             raise q_exc.InvalidSharedSetting(network=original.name)
 
+    @column_fields('id', 'name', 'tenant_id', 'admin_state_up', 'status',
+                   'shared')
+    @eager_loads('subnets')
     def _make_network_dict(self, network, fields=None):
         res = {'id': network['id'],
                'name': network['name'],
@@ -886,6 +925,7 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
 
         return self._fields(res, fields)
 
+    @eager_loads('allocation_pools', 'dns_nameservers', 'routes')
     def _make_subnet_dict(self, subnet, fields=None):
         res = {'id': subnet['id'],
                'name': subnet['name'],
@@ -907,7 +947,11 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
                }
         return self._fields(res, fields)
 
-    def _make_port_dict(self, port, fields=None):
+    def _make_port_dict(self, port, fields=None, fixed_ips=None):
+        # NOTE: fixed_ips can be passed in when they are already known, as
+        #       reading port["fixed_ips"] runs a query
+        if fixed_ips is None:
+            fixed_ips = port["fixed_ips"]
         res = {"id": port["id"],
                'name': port['name'],
                "network_id": port["network_id"],
@@ -917,28 +961,61 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
                "status": port["status"],
                "fixed_ips": [{'subnet_id': ip["subnet_id"],
                               'ip_address': ip["ip_address"]}
-                             for ip in port["fixed_ips"]],
+                             for ip in fixed_ips],
                "device_id": port["device_id"],
                "device_owner": port["device_owner"]}
         return self._fields(res, fields)
 
-    def _create_bulk(self, resource, context, request_items):
+    def _get_set_based_bulk_creator(self, resource):
+        """Return the set-based creator for resource if it can be used.
+
+        The set-based creators only replicate what this class does in
+        create_<resource>, so plugins overriding that method keep creating
+        bulk items one at a time, unless their create_<resource>_bulk gives
+        _create_bulk a creator adding their own processing to the set-based
+        one.
+        """
+        bulk_creator = getattr(self, '_create_%ss_bulk' % resource, None)
+        method_name = 'create_%s' % resource
+        method = getattr(getattr(self, method_name), 'im_func', None)
+        if (bulk_creator and
+                method is getattr(QuantumDbPluginV2, method_name).im_func):
+            return bulk_creator
+
+    def _create_bulk(self, resource, context, request_items,
+                     bulk_creator=None):
         objects = []
         collection = "%ss" % resource
         items = request_items[collection]
+        item = None
+        bulk_creator = (bulk_creator or
+                        self._get_set_based_bulk_creator(resource))
         context.session.begin(subtransactions=True)
         try:
-            for item in items:
-                obj_creator = getattr(self, 'create_%s' % resource)
-                objects.append(obj_creator(context, item))
+            if bulk_creator:
+                objects = bulk_creator(context, items)
+            else:
+                for item in items:
+                    obj_creator = getattr(self, 'create_%s' % resource)
+                    objects.append(obj_creator(context, item))
             context.session.commit()
         except Exception as e:
             LOG.exception(_("An exception occured while creating "
-                            "the %(resource)s:%(item)s"), locals())
+                            "the %(resource)s:%(item)s"),
+                          {'resource': resource, 'item': item or items})
             context.session.rollback()
             raise e
         return objects
 
+    def _get_networks_by_ids(self, context, network_ids):
+        query = self._model_query(context, models_v2.Network)
+        query = query.filter(models_v2.Network.id.in_(network_ids))
+        networks = dict((network.id, network) for network in query)
+        for network_id in network_ids:
+            if network_id not in networks:
+                raise q_exc.NetworkNotFound(net_id=network_id)
+        return networks
+
     def _get_marker_obj(self, context, resource, limit, marker):
         if limit and marker:
             return getattr(self, '_get_%s' % resource)(context, marker)
@@ -947,21 +1024,29 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
     def create_network_bulk(self, context, networks):
         return self._create_bulk('network', context, networks)
 
+    def _create_networks_bulk(self, context, networks):
+        network_objs = [self._make_network_model(context, network['network'])
+                        for network in networks]
+        context.session.add_all(network_objs)
+        return [self._make_network_dict(network) for network in network_objs]
+
+    def _make_network_model(self, context, n):
+        tenant_id = self._get_tenant_id_for_create(context, n)
+        args = {'tenant_id': tenant_id,
+                'id': n.get('id') or uuidutils.generate_uuid(),
+                'name': n['name'],
+                'admin_state_up': n['admin_state_up'],
+                'shared': n['shared'],
+                'status': constants.NET_STATUS_ACTIVE}
+        return models_v2.Network(**args)
+
     def create_network(self, context, network):
         """ handle creation of a single network """
         # single request processing
-        n = network['network']
         # NOTE(jkoelker) Get the tenant_id outside of the session to avoid
         #                unneeded db action if the operation raises
-        tenant_id = self._get_tenant_id_for_create(context, n)
+        network = self._make_network_model(context, network['network'])
         with context.session.begin(subtransactions=True):
-            args = {'tenant_id': tenant_id,
-                    'id': n.get('id') or uuidutils.generate_uuid(),
-                    'name': n['name'],
-                    'admin_state_up': n['admin_state_up'],
-                    'shared': n['shared'],
-                    'status': constants.NET_STATUS_ACTIVE}
-            network = models_v2.Network(**args)
             context.session.add(network)
         return self._make_network_dict(network)
 
@@ -997,9 +1082,10 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
             for port in ports:
                 self._delete_port(context, port['id'])
 
-            # clean up subnets
+            # clean up subnets, one by one for the session to see them
             subnets_qry = context.session.query(models_v2.Subnet)
-            subnets_qry.filter_by(network_id=id).delete()
+            for subnet in subnets_qry.filter_by(network_id=id):
+                context.session.delete(subnet)
             context.session.delete(network)
 
     def get_network(self, context, id, fields=None):
@@ -1025,6 +1111,34 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
     def create_subnet_bulk(self, context, subnets):
         return self._create_bulk('subnet', context, subnets)
 
+    def _create_subnets_bulk(self, context, subnets):
+        specs = []
+        for subnet in subnets:
+            s = subnet['subnet']
+            self._prepare_subnet_for_create(context, s)
+            specs.append((s, self._get_tenant_id_for_create(context, s)))
+        networks = self._get_networks_by_ids(
+            context, set(s['network_id'] for s, _tenant_id in specs))
+        # The new subnets are checked for overlaps against the existing
+        # ones as well as against each other
+        if cfg.CONF.allow_overlapping_ips:
+            subnet_lists = dict((network_id, list(network.subnets))
+                                for network_id, network in networks.items())
+        else:
+            all_subnets = self._get_all_subnets(context)
+            subnet_lists = dict((network_id, all_subnets)
+                                for network_id in networks)
+        subnet_objs = []
+        for s, tenant_id in specs:
+            network = networks[s['network_id']]
+            subnet_list = subnet_lists[network.id]
+            self._check_subnet_cidr_overlap(network, s['cidr'], subnet_list)
+            subnet = self._add_subnet_to_session(context, s, tenant_id,
+                                                 network)
+            subnet_list.append(subnet)
+            subnet_objs.append(subnet)
+        return [self._make_subnet_dict(subnet) for subnet in subnet_objs]
+
     def _validate_ip_version(self, ip_version, addr, name):
         """Check IP field of a subnet match specified ip version"""
         ip = netaddr.IPNetwork(addr)
@@ -1089,9 +1203,8 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
                     pool=pool_range,
                     ip_address=gateway_ip)
 
-    def create_subnet(self, context, subnet):
-
-        s = subnet['subnet']
+    def _prepare_subnet_for_create(self, context, s):
+        """Fill in the defaults of a subnet spec and validate it."""
         net = netaddr.IPNetwork(s['cidr'])
 
         if s['gateway_ip'] is attributes.ATTR_NOT_SPECIFIED:
@@ -1107,48 +1220,54 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
 
         self._validate_subnet(s)
 
+    def _add_subnet_to_session(self, context, s, tenant_id, network):
+        # The 'shared' attribute for subnets is for internal plugin
+        # use only. It is not exposed through the API
+        args = {'tenant_id': tenant_id,
+                'id': s.get('id') or uuidutils.generate_uuid(),
+                'name': s['name'],
+                'network_id': s['network_id'],
+                'ip_version': s['ip_version'],
+                'cidr': s['cidr'],
+                'enable_dhcp': s['enable_dhcp'],
+                'gateway_ip': s['gateway_ip'],
+                'shared': network.shared}
+        subnet = models_v2.Subnet(**args)
+
+        context.session.add(subnet)
+        if s['dns_nameservers'] is not attributes.ATTR_NOT_SPECIFIED:
+            for addr in s['dns_nameservers']:
+                ns = models_v2.DNSNameServer(address=addr,
+                                             subnet_id=subnet.id)
+                context.session.add(ns)
+
+        if s['host_routes'] is not attributes.ATTR_NOT_SPECIFIED:
+            for rt in s['host_routes']:
+                route = models_v2.SubnetRoute(
+                    subnet_id=subnet.id,
+                    destination=rt['destination'],
+                    nexthop=rt['nexthop'])
+                context.session.add(route)
+
+        for pool in s['allocation_pools']:
+            ip_pool = models_v2.IPAllocationPool(subnet=subnet,
+                                                 first_ip=pool['start'],
+                                                 last_ip=pool['end'])
+            context.session.add(ip_pool)
+            ipam_db.get_driver().create_pool(context, ip_pool)
+        return subnet
+
+    def create_subnet(self, context, subnet):
+
+        s = subnet['subnet']
+        self._prepare_subnet_for_create(context, s)
+
         tenant_id = self._get_tenant_id_for_create(context, s)
         with context.session.begin(subtransactions=True):
             network = self._get_network(context, s["network_id"])
             self._validate_subnet_cidr(context, network, s['cidr'])
-            # The 'shared' attribute for subnets is for internal plugin
-            # use only. It is not exposed through the API
-            args = {'tenant_id': tenant_id,
-                    'id': s.get('id') or uuidutils.generate_uuid(),
-                    'name': s['name'],
-                    'network_id': s['network_id'],
-                    'ip_version': s['ip_version'],
-                    'cidr': s['cidr'],
-                    'enable_dhcp': s['enable_dhcp'],
-                    'gateway_ip': s['gateway_ip'],
-                    'shared': network.shared}
-            subnet = models_v2.Subnet(**args)
-
-            context.session.add(subnet)
-            if s['dns_nameservers'] is not attributes.ATTR_NOT_SPECIFIED:
-                for addr in s['dns_nameservers']:
-                    ns = models_v2.DNSNameServer(address=addr,
-                                                 subnet_id=subnet.id)
-                    context.session.add(ns)
-
-            if s['host_routes'] is not attributes.ATTR_NOT_SPECIFIED:
-                for rt in s['host_routes']:
-                    route = models_v2.SubnetRoute(
-                        subnet_id=subnet.id,
-                        destination=rt['destination'],
-                        nexthop=rt['nexthop'])
-                    context.session.add(route)
-
-            for pool in s['allocation_pools']:
-                ip_pool = models_v2.IPAllocationPool(subnet=subnet,
-                                                     first_ip=pool['start'],
-                                                     last_ip=pool['end'])
-                context.session.add(ip_pool)
-                ip_range = models_v2.IPAvailabilityRange(
-                    ipallocationpool=ip_pool,
-                    first_ip=pool['start'],
-                    last_ip=pool['end'])
-                context.session.add(ip_range)
+            subnet = self._add_subnet_to_session(context, s, tenant_id,
+                                                 network)
 
         return self._make_subnet_dict(subnet)
 
@@ -1260,6 +1379,125 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
     def create_port_bulk(self, context, ports):
         return self._create_bulk('port', context, ports)
 
+    def _check_unique_macs_for_bulk(self, context, network_id, ports):
+        requested = set()
+        for p in ports:
+            mac_address = p['mac_address']
+            if mac_address is attributes.ATTR_NOT_SPECIFIED:
+                continue
+            if mac_address in requested:
+                raise q_exc.MacAddressInUse(net_id=network_id,
+                                            mac=mac_address)
+            requested.add(mac_address)
+        if requested:
+            used = QuantumDbPluginV2._get_used_macs(context, network_id,
+                                                    requested)
+            if used:
+                raise q_exc.MacAddressInUse(net_id=network_id,
+                                            mac=used.pop())
+        return requested
+
+    def _allocate_ips_for_bulk(self, context, network, ports):
+        """Allocate the IPs of ports on the same network.
+
+        Returns a list with the IPs of each port. Ports with explicit
+        fixed_ips are processed first, one by one, then the IPs of all
+        the other ports are generated together.
+        """
+        ips = [[] for p in ports]
+        requested = set()
+        auto_indexes = []
+        for index, p in enumerate(ports):
+            if p['fixed_ips'] is attributes.ATTR_NOT_SPECIFIED:
+                auto_indexes.append(index)
+                continue
+            ips[index] = self._allocate_ips_for_port(context, network,
+                                                     {'port': p})
+            for ip in ips[index]:
+                # The allocations of the previous ports are not in the
+                # database yet
+                key = (ip['subnet_id'], ip['ip_address'])
+                if key in requested:
+                    raise q_exc.IpAddressInUse(net_id=network['id'],
+                                               ip_address=ip['ip_address'])
+                requested.add(key)
+        if auto_indexes:
+            filter = {'network_id': [network['id']]}
+            subnets = self.get_subnets(context, filters=filter)
+            for ip_version in (4, 6):
+                version_subnets = [subnet for subnet in subnets
+                                   if subnet['ip_version'] == ip_version]
+                if not version_subnets:
+                    continue
+                generated = QuantumDbPluginV2._generate_ips(
+                    context, version_subnets, len(auto_indexes))
+                for index, ip in zip(auto_indexes, generated):
+                    ips[index].append(ip)
+        return ips
+
+    def _create_ports_bulk(self, context, ports):
+        """Create ports with a number of queries independent of their count.
+
+        Uniqueness of the MAC addresses is checked with one query per
+        network and the IP addresses of ports without fixed_ips are
+        generated in a single pass over the allocation pools. Plugins
+        overriding create_port extend it with their own processing of the
+        ports, see OVSQuantumPluginV2.create_port_bulk.
+        """
+        specs = [(port['port'],
+                  self._get_tenant_id_for_create(context, port['port']))
+                 for port in ports]
+        network_ids = set(p['network_id'] for p, _tenant_id in specs)
+        for network_id in network_ids:
+            self._recycle_expired_ip_allocations(context, network_id)
+        networks = self._get_networks_by_ids(context, network_ids)
+
+        macs = {}
+        ips = {}
+        for network_id, network in networks.iteritems():
+            net_ports = [p for p, _tenant_id in specs
+                         if p['network_id'] == network_id]
+            requested = self._check_unique_macs_for_bulk(context, network_id,
+                                                         net_ports)
+            to_generate = [p for p in net_ports if
+                           p['mac_address'] is attributes.ATTR_NOT_SPECIFIED]
+            if to_generate:
+                generated = QuantumDbPluginV2._generate_macs(
+                    context, network_id, len(to_generate), reserved=requested)
+                for p, mac_address in zip(to_generate, generated):
+                    macs[id(p)] = mac_address
+            net_ips = self._allocate_ips_for_bulk(context, network, net_ports)
+            for p, port_ips in zip(net_ports, net_ips):
+                ips[id(p)] = port_ips
+
+        expiration = self._default_allocation_expiration()
+        port_objs = []
+        allocations = []
+        for p, tenant_id in specs:
+            port = models_v2.Port(tenant_id=tenant_id,
+                                  name=p['name'],
+                                  id=p.get('id') or uuidutils.generate_uuid(),
+                                  network_id=p['network_id'],
+                                  mac_address=macs.get(id(p),
+                                                       p['mac_address']),
+                                  admin_state_up=p['admin_state_up'],
+                                  status=p.get('status',
+                                               constants.PORT_STATUS_ACTIVE),
+                                  device_id=p['device_id'],
+                                  device_owner=p['device_owner'])
+            port_objs.append(port)
+            allocations.extend(
+                models_v2.IPAllocation(network_id=port.network_id,
+                                       port_id=port.id,
+                                       ip_address=ip['ip_address'],
+                                       subnet_id=ip['subnet_id'],
+                                       expiration=expiration)
+                for ip in ips[id(p)])
+        context.session.add_all(port_objs)
+        context.session.add_all(allocations)
+        return [self._make_port_dict(port, fixed_ips=ips[id(p)])
+                for port, (p, _tenant_id) in zip(port_objs, specs)]
+
     def create_port(self, context, port):
         p = port['port']
         port_id = p.get('id') or uuidutils.generate_uuid()
@@ -1430,10 +1668,29 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
                                       sorts=sorts, limit=limit,
                                       marker_obj=marker_obj,
                                       page_reverse=page_reverse)
-        items = [self._make_port_dict(c, fields) for c in query.all()]
+        ports = query.all()
+        if not fields or 'fixed_ips' in fields:
+            fixed_ips = self._get_fixed_ips_by_port(
+                context, [port['id'] for port in ports])
+        else:
+            fixed_ips = dict((port['id'], []) for port in ports)
+        items = [self._make_port_dict(c, fields, fixed_ips[c['id']])
+                 for c in ports]
         if limit and page_reverse:
             items.reverse()
         return items
 
+    def _get_fixed_ips_by_port(self, context, port_ids):
+        # NOTE: Port.fixed_ips is a dynamic relationship, which can not be
+        #       eager loaded, so the allocations are read in one query here
+        fixed_ips = dict((port_id, []) for port_id in port_ids)
+        if port_ids:
+            query = context.session.query(models_v2.IPAllocation)
+            query = query.filter(
+                models_v2.IPAllocation.port_id.in_(port_ids))
+            for allocation in query:
+                fixed_ips[allocation['port_id']].append(allocation)
+        return fixed_ips
+
     def get_ports_count(self, context, filters=None):
         return self._get_ports_query(context, filters).count()
@@ -60,6 +60,34 @@ class DhcpRpcCallbackMixin(object):
         network['ports'] = plugin.get_ports(context, filters=filters)
         return network
 
+    def get_networks_info(self, context, **kwargs):
+        """Retrieve and return extended information about many networks.
+
+        The networks, their subnets and ports are each fetched with a single
+        query whatever the number of networks. Networks that do not exist
+        any more are left out.
+        """
+        network_ids = kwargs.get('network_ids')
+        host = kwargs.get('host')
+        LOG.debug(_('Networks %(network_ids)s requested from %(host)s'),
+                  {'network_ids': network_ids, 'host': host})
+        if not network_ids:
+            return []
+        plugin = manager.QuantumManager.get_plugin()
+        networks = plugin.get_networks(context, filters=dict(id=network_ids))
+        networks_by_id = {}
+        for network in networks:
+            network['subnets'] = []
+            network['ports'] = []
+            networks_by_id[network['id']] = network
+
+        filters = dict(network_id=network_ids)
+        for subnet in plugin.get_subnets(context, filters=filters):
+            networks_by_id[subnet['network_id']]['subnets'].append(subnet)
+        for port in plugin.get_ports(context, filters=filters):
+            networks_by_id[port['network_id']]['ports'].append(port)
+        return networks
+
     def get_dhcp_port(self, context, **kwargs):
         """Allocate a DHCP port for the host and return port information.
 
@@ -130,10 +130,21 @@ class ExtraRoute_db_mixin(l3_db.L3_NAT_db_mixin):
 
     def _get_extra_routes_by_router_id(self, context, id):
         query = context.session.query(RouterRoute)
-        query.filter(RouterRoute.router_id == id)
+        query = query.filter(RouterRoute.router_id == id)
         extra_routes = query.all()
         return self._make_extra_route_list(extra_routes)
 
+    def _get_extra_routes_by_router_ids(self, context, router_ids):
+        """Return the routes of each router of router_ids in one query."""
+        routes = dict((router_id, []) for router_id in router_ids)
+        if router_ids:
+            query = context.session.query(RouterRoute)
+            query = query.filter(RouterRoute.router_id.in_(router_ids))
+            for route in query:
+                routes[route['router_id']].append(route)
+        return dict((router_id, self._make_extra_route_list(extra_routes))
+                    for router_id, extra_routes in routes.iteritems())
+
     def get_router(self, context, id, fields=None):
         with context.session.begin(subtransactions=True):
             router = super(ExtraRoute_db_mixin, self).get_router(
@@ -149,9 +160,10 @@ class ExtraRoute_db_mixin(l3_db.L3_NAT_db_mixin):
             routers = super(ExtraRoute_db_mixin, self).get_routers(
                 context, filters, fields, sorts=sorts, limit=limit,
                 marker=marker, page_reverse=page_reverse)
+            routes = self._get_extra_routes_by_router_ids(
+                context, [router['id'] for router in routers])
             for router in routers:
-                router['routes'] = self._get_extra_routes_by_router_id(
-                    context, router['id'])
+                router['routes'] = routes[router['id']]
             return routers
 
     def _confirm_router_interface_not_in_use(self, context, router_id,
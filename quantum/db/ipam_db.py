@@ -0,0 +1,513 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Pluggable tracking of the free addresses in subnet allocation pools.
+
+The IPAM driver is only concerned with which addresses of an allocation
+pool are still available; IPAllocation rows are still managed by the
+plugin.  The driver is selected with the 'ipam_driver' option.
+"""
+
+import abc
+import bisect
+
+import netaddr
+from oslo.config import cfg
+import sqlalchemy as sa
+from sqlalchemy import orm
+from sqlalchemy.orm import exc
+
+from quantum.common import exceptions as q_exc
+from quantum.db import model_base
+from quantum.db import models_v2
+from quantum.openstack.common import importutils
+from quantum.openstack.common import log as logging
+
+
+LOG = logging.getLogger(__name__)
+
+
+class IPAvailabilitySet(model_base.BASEV2):
+    """Compact representation of the free addresses of an allocation pool.
+
+    The free addresses are stored as a serialized IntervalSet.  Updates are
+    guarded by the version column rather than by row locks: a writer only
+    succeeds if the version it read is still the current one.
+    """
+    allocation_pool_id = sa.Column(sa.String(36),
+                                   sa.ForeignKey('ipallocationpools.id',
+                                                 ondelete="CASCADE"),
+                                   primary_key=True)
+    ranges = sa.Column(sa.Text, nullable=False)
+    version = sa.Column(sa.Integer, nullable=False, default=0)
+    ipallocationpool = orm.relationship(
+        models_v2.IPAllocationPool,
+        backref=orm.backref('availability_set', uselist=False,
+                            cascade='delete'))
+
+
+class IntervalSet(object):
+    """A set of integers stored as sorted, disjoint, non adjacent intervals.
+
+    Membership tests, insertions and removals are O(log n) in the number
+    of intervals, which stays small for allocation pools as addresses are
+    handed out from the bottom of the free space.
+    """
+
+    def __init__(self, intervals=None):
+        self._firsts = []
+        self._lasts = []
+        for first, last in sorted(intervals or []):
+            self.add_range(first, last)
+
+    @classmethod
+    def from_string(cls, value):
+        intervals = []
+        for item in (value or '').split(','):
+            if item:
+                first, _sep, last = item.partition('-')
+                intervals.append((int(first), int(last or first)))
+        return cls(intervals)
+
+    def to_string(self):
+        return ','.join(first == last and '%d' % first or
+                        '%d-%d' % (first, last)
+                        for first, last in self)
+
+    def __iter__(self):
+        return iter(zip(self._firsts, self._lasts))
+
+    def size(self):
+        return sum(last - first + 1 for first, last in self)
+
+    def __nonzero__(self):
+        return bool(self._firsts)
+
+    def _find(self, value):
+        """Return the index of the interval containing value, or None."""
+        index = bisect.bisect_right(self._firsts, value) - 1
+        if index >= 0 and value <= self._lasts[index]:
+            return index
+
+    def __contains__(self, value):
+        return self._find(value) is not None
+
+    def add_range(self, first, last):
+        index = bisect.bisect_left(self._firsts, first)
+        # Merge with the previous interval if it overlaps or is adjacent
+        if index > 0 and self._lasts[index - 1] >= first - 1:
+            index -= 1
+            first = self._firsts[index]
+            last = max(last, self._lasts[index])
+            del self._firsts[index]
+            del self._lasts[index]
+        # Swallow the following intervals which overlap or are adjacent
+        while index < len(self._firsts) and self._firsts[index] <= last + 1:
+            last = max(last, self._lasts[index])
+            del self._firsts[index]
+            del self._lasts[index]
+        self._firsts.insert(index, first)
+        self._lasts.insert(index, last)
+
+    def add(self, value):
+        self.add_range(value, value)
+
+    def remove(self, value):
+        """Remove value from the set. Return False if it was not there."""
+        index = self._find(value)
+        if index is None:
+            return False
+        first, last = self._firsts[index], self._lasts[index]
+        if first == last:
+            del self._firsts[index]
+            del self._lasts[index]
+        elif value == first:
+            self._firsts[index] = value + 1
+        elif value == last:
+            self._lasts[index] = value - 1
+        else:
+            self._lasts[index] = value - 1
+            self._firsts.insert(index + 1, value + 1)
+            self._lasts.insert(index + 1, last)
+        return True
+
+    def pop(self, count=1):
+        """Remove and return up to count of the lowest values in the set."""
+        values = []
+        while self._firsts and len(values) < count:
+            first, last = self._firsts[0], self._lasts[0]
+            take = min(count - len(values), last - first + 1)
+            values.extend(range(first, first + take))
+            if first + take > last:
+                del self._firsts[0]
+                del self._lasts[0]
+            else:
+                self._firsts[0] = first + take
+        return values
+
+
+class IpamDriver(object):
+    """Base class for the drivers tracking available IPs in a subnet."""
+
+    __metaclass__ = abc.ABCMeta
+
+    @abc.abstractmethod
+    def create_pool(self, context, ip_pool):
+        """Mark the whole range of a new allocation pool as available."""
+
+    @abc.abstractmethod
+    def generate_ips(self, context, subnets, count=1):
+        """Allocate count addresses from the first subnets with free IPs.
+
+        Returns a list of dicts with 'ip_address' and 'subnet_id' keys,
+        which can be shorter than count if the subnets ran out of addresses.
+        """
+
+    @abc.abstractmethod
+    def allocate_specific_ip(self, context, subnet_id, ip_address):
+        """Remove a specific address from the available ones, if present."""
+
+    @abc.abstractmethod
+    def release_ip(self, context, subnet_id, ip_address):
+        """Return an address to the allocation pool it belongs to."""
+
+    def release_ips(self, context, subnet_id, ip_addresses):
+        """Return addresses of a subnet to their allocation pools.
+
+        Addresses which are not part of any allocation pool are skipped.
+        """
+        for ip_address in ip_addresses:
+            try:
+                self.release_ip(context, subnet_id, ip_address)
+            except q_exc.InvalidInput:
+                LOG.debug(_("%s is not in an allocation pool, not "
+                            "recycled"), ip_address)
+
+    @staticmethod
+    def _get_pool_id_for_ip(context, subnet_id, ip_address, lock=False):
+        pool_qry = context.session.query(models_v2.IPAllocationPool)
+        if lock:
+            pool_qry = pool_qry.with_lockmode('update')
+        ip = netaddr.IPAddress(ip_address)
+        for allocation_pool in pool_qry.filter_by(subnet_id=subnet_id):
+            allocation_pool_range = netaddr.IPRange(
+                allocation_pool['first_ip'],
+                allocation_pool['last_ip'])
+            if ip in allocation_pool_range:
+                return allocation_pool['id']
+        error_message = _("No allocation pool found for "
+                          "ip address:%s") % ip_address
+        raise q_exc.InvalidInput(error_message=error_message)
+
+
+class AvailabilityRangeIpamDriver(IpamDriver):
+    """Track available IPs as IPAvailabilityRange rows.
+
+    Every allocation and release locks the availability ranges of the
+    subnet with SELECT ... FOR UPDATE.
+    """
+
+    def create_pool(self, context, ip_pool):
+        ip_range = models_v2.IPAvailabilityRange(
+            ipallocationpool=ip_pool,
+            first_ip=ip_pool['first_ip'],
+            last_ip=ip_pool['last_ip'])
+        context.session.add(ip_range)
+
+    def generate_ips(self, context, subnets, count=1):
+        ips = []
+        range_qry = context.session.query(
+            models_v2.IPAvailabilityRange).join(
+                models_v2.IPAllocationPool).with_lockmode('update')
+        for subnet in subnets:
+            while len(ips) < count:
+                range = range_qry.filter_by(subnet_id=subnet['id']).first()
+                if not range:
+                    LOG.debug(_("All IP's from subnet %(subnet_id)s "
+                                "(%(cidr)s) allocated"),
+                              {'subnet_id': subnet['id'],
+                               'cidr': subnet['cidr']})
+                    break
+                ip_address = range['first_ip']
+                LOG.debug(_("Allocated IP - %(ip_address)s from %(first_ip)s "
+                            "to %(last_ip)s"),
+                          {'ip_address': ip_address,
+                           'first_ip': range['first_ip'],
+                           'last_ip': range['last_ip']})
+                if range['first_ip'] == range['last_ip']:
+                    # No more free indices on subnet => delete
+                    LOG.debug(_("No more free IP's in slice. Deleting "
+                                "allocation pool."))
+                    context.session.delete(range)
+                else:
+                    # increment the first free
+                    range['first_ip'] = str(netaddr.IPAddress(ip_address) + 1)
+                ips.append({'ip_address': ip_address,
+                            'subnet_id': subnet['id']})
+        return ips
+
+    def allocate_specific_ip(self, context, subnet_id, ip_address):
+        ip = int(netaddr.IPAddress(ip_address))
+        range_qry = context.session.query(
+            models_v2.IPAvailabilityRange,
+            models_v2.IPAllocationPool).join(
+                models_v2.IPAllocationPool).with_lockmode('update')
+        results = range_qry.filter_by(subnet_id=subnet_id).all()
+        for (range, pool) in results:
+            first = int(netaddr.IPAddress(range['first_ip']))
+            last = int(netaddr.IPAddress(range['last_ip']))
+            if first <= ip <= last:
+                if first == last:
+                    context.session.delete(range)
+                    return
+                elif first == ip:
+                    range['first_ip'] = str(netaddr.IPAddress(ip_address) + 1)
+                    return
+                elif last == ip:
+                    range['last_ip'] = str(netaddr.IPAddress(ip_address) - 1)
+                    return
+                else:
+                    # Split into two ranges
+                    new_first = str(netaddr.IPAddress(ip_address) + 1)
+                    new_last = range['last_ip']
+                    range['last_ip'] = str(netaddr.IPAddress(ip_address) - 1)
+                    ip_range = models_v2.IPAvailabilityRange(
+                        allocation_pool_id=pool['id'],
+                        first_ip=new_first,
+                        last_ip=new_last)
+                    context.session.add(ip_range)
+                    return
+
+    def release_ip(self, context, subnet_id, ip_address):
+        pool_id = self._get_pool_id_for_ip(context, subnet_id, ip_address,
+                                           lock=True)
+        # Two requests will be done on the database. The first will be to
+        # search if an entry starts with ip_address + 1 (r1). The second
+        # will be to see if an entry ends with ip_address -1 (r2).
+        # If 1 of the above holds true then the specific entry will be
+        # modified. If both hold true then the two ranges will be merged.
+        # If there are no entries then a single entry will be added.
+        range_qry = context.session.query(
+            models_v2.IPAvailabilityRange).with_lockmode('update')
+        ip_first = str(netaddr.IPAddress(ip_address) + 1)
+        ip_last = str(netaddr.IPAddress(ip_address) - 1)
+        LOG.debug(_("Recycle %s"), ip_address)
+        try:
+            r1 = range_qry.filter_by(allocation_pool_id=pool_id,
+                                     first_ip=ip_first).one()
+            LOG.debug(_("Recycle: first match for %(first_ip)s-%(last_ip)s"),
+                      {'first_ip': r1['first_ip'], 'last_ip': r1['last_ip']})
+        except exc.NoResultFound:
+            r1 = []
+        try:
+            r2 = range_qry.filter_by(allocation_pool_id=pool_id,
+                                     last_ip=ip_last).one()
+            LOG.debug(_("Recycle: last match for %(first_ip)s-%(last_ip)s"),
+                      {'first_ip': r2['first_ip'], 'last_ip': r2['last_ip']})
+        except exc.NoResultFound:
+            r2 = []
+
+        if r1 and r2:
+            # Merge the two ranges
+            ip_range = models_v2.IPAvailabilityRange(
+                allocation_pool_id=pool_id,
+                first_ip=r2['first_ip'],
+                last_ip=r1['last_ip'])
+            context.session.add(ip_range)
+            LOG.debug(_("Recycle: merged %(first_ip1)s-%(last_ip1)s and "
+                        "%(first_ip2)s-%(last_ip2)s"),
+                      {'first_ip1': r2['first_ip'], 'last_ip1': r2['last_ip'],
+                       'first_ip2': r1['first_ip'], 'last_ip2': r1['last_ip']})
+            context.session.delete(r1)
+            context.session.delete(r2)
+        elif r1:
+            # Update the range with matched first IP
+            r1['first_ip'] = ip_address
+            LOG.debug(_("Recycle: updated first %(first_ip)s-%(last_ip)s"),
+                      {'first_ip': r1['first_ip'], 'last_ip': r1['last_ip']})
+        elif r2:
+            # Update the range with matched last IP
+            r2['last_ip'] = ip_address
+            LOG.debug(_("Recycle: updated last %(first_ip)s-%(last_ip)s"),
+                      {'first_ip': r2['first_ip'], 'last_ip': r2['last_ip']})
+        else:
+            # Create a new range
+            ip_range = models_v2.IPAvailabilityRange(
+                allocation_pool_id=pool_id,
+                first_ip=ip_address,
+                last_ip=ip_address)
+            context.session.add(ip_range)
+            LOG.debug(_("Recycle: created new %(first_ip)s-%(last_ip)s"),
+                      {'first_ip': ip_address, 'last_ip': ip_address})
+
+
+class IntervalSetIpamDriver(IpamDriver):
+    """Track available IPs as one IPAvailabilitySet row per pool.
+
+    Each change is written with a compare-and-swap on the version column
+    and is retried on a fresh, locked copy of the row when a concurrent
+    writer got there first; rows are not locked otherwise. Pools created
+    while another driver was in use are converted from their
+    IPAvailabilityRange rows on first access; the conversion is one-way.
+    """
+
+    def create_pool(self, context, ip_pool):
+        ip_set = IntervalSet([(int(netaddr.IPAddress(ip_pool['first_ip'])),
+                               int(netaddr.IPAddress(ip_pool['last_ip'])))])
+        context.session.add(IPAvailabilitySet(ipallocationpool=ip_pool,
+                                              ranges=ip_set.to_string(),
+                                              version=0))
+
+    def _query_availability(self, context, pool_id, current_read=False):
+        query = context.session.query(IPAvailabilitySet).populate_existing()
+        if current_read:
+            # Locking the row makes the database return the latest committed
+            # row rather than the transaction's snapshot, which is needed
+            # to make progress after losing a race. The lock is exclusive
+            # as the row is updated next: two requests holding a shared
+            # lock on it would deadlock
+            query = query.with_lockmode('update')
+        return query.filter_by(allocation_pool_id=pool_id)
+
+    def _load(self, context, pool_id, current_read=False):
+        availability = self._query_availability(context, pool_id,
+                                                current_read).first()
+        if availability:
+            return availability
+        # Convert the availability ranges kept by AvailabilityRangeIpamDriver.
+        # Conversions of the pool are serialized by locking it, and the row
+        # is looked for again once the lock is held, so that a request
+        # waiting for a concurrent conversion reads its row instead of
+        # inserting a duplicate
+        pool_qry = context.session.query(models_v2.IPAllocationPool)
+        pool_qry.with_lockmode('update').filter_by(id=pool_id).one()
+        availability = self._query_availability(context, pool_id,
+                                                current_read=True).first()
+        if availability:
+            return availability
+        range_qry = context.session.query(models_v2.IPAvailabilityRange)
+        range_qry = range_qry.filter_by(allocation_pool_id=pool_id)
+        ip_set = IntervalSet([(int(netaddr.IPAddress(r['first_ip'])),
+                               int(netaddr.IPAddress(r['last_ip'])))
+                              for r in range_qry])
+        range_qry.delete(synchronize_session=False)
+        availability = IPAvailabilitySet(allocation_pool_id=pool_id,
+                                         ranges=ip_set.to_string(),
+                                         version=0)
+        context.session.add(availability)
+        context.session.flush()
+        return availability
+
+    def _update(self, context, pool_id, update_func):
+        """Apply update_func to the IntervalSet of a pool.
+
+        update_func modifies the set in place and returns a result, which
+        is passed back to the caller once the new set has been stored.
+        """
+        for i in range(cfg.CONF.ipam_update_retries):
+            with context.session.begin(subtransactions=True):
+                availability = self._load(context, pool_id,
+                                          current_read=i > 0)
+                ip_set = IntervalSet.from_string(availability['ranges'])
+                result = update_func(ip_set)
+                version = availability['version']
+                query = context.session.query(IPAvailabilitySet)
+                updated = query.filter_by(
+                    allocation_pool_id=pool_id, version=version).update(
+                        {'ranges': ip_set.to_string(),
+                         'version': version + 1},
+                        synchronize_session=False)
+            if updated:
+                context.session.expire(availability)
+                return result
+            LOG.debug(_("Availability of pool %(pool_id)s changed "
+                        "concurrently. Remaining attempts %(retries)s."),
+                      {'pool_id': pool_id,
+                       'retries': cfg.CONF.ipam_update_retries - (i + 1)})
+        raise q_exc.IpAvailabilityUpdateConflict(pool_id=pool_id)
+
+    def generate_ips(self, context, subnets, count=1):
+        ips = []
+        pool_qry = context.session.query(models_v2.IPAllocationPool)
+        for subnet in subnets:
+            for pool in pool_qry.filter_by(subnet_id=subnet['id']):
+                if len(ips) >= count:
+                    return ips
+                needed = count - len(ips)
+                values = self._update(context, pool['id'],
+                                      lambda ip_set: ip_set.pop(needed))
+                ips.extend({'ip_address': str(netaddr.IPAddress(value)),
+                            'subnet_id': subnet['id']} for value in values)
+            if len(ips) < count:
+                LOG.debug(_("All IP's from subnet %(subnet_id)s (%(cidr)s) "
+                            "allocated"),
+                          {'subnet_id': subnet['id'], 'cidr': subnet['cidr']})
+        return ips
+
+    def allocate_specific_ip(self, context, subnet_id, ip_address):
+        ip = int(netaddr.IPAddress(ip_address))
+        pool_qry = context.session.query(models_v2.IPAllocationPool)
+        for pool in pool_qry.filter_by(subnet_id=subnet_id):
+            if netaddr.IPAddress(ip_address) in netaddr.IPRange(
+                    pool['first_ip'], pool['last_ip']):
+                self._update(context, pool['id'],
+                             lambda ip_set: ip_set.remove(ip))
+                return
+
+    def release_ip(self, context, subnet_id, ip_address):
+        ip = int(netaddr.IPAddress(ip_address))
+        pool_id = self._get_pool_id_for_ip(context, subnet_id, ip_address)
+        LOG.debug(_("Recycle %s"), ip_address)
+        self._update(context, pool_id, lambda ip_set: ip_set.add(ip))
+
+    def release_ips(self, context, subnet_id, ip_addresses):
+        pool_qry = context.session.query(models_v2.IPAllocationPool)
+        pools = [(pool['id'], netaddr.IPRange(pool['first_ip'],
+                                              pool['last_ip']))
+                 for pool in pool_qry.filter_by(subnet_id=subnet_id)]
+        pool_ips = {}
+        for ip_address in ip_addresses:
+            ip = netaddr.IPAddress(ip_address)
+            for pool_id, pool_range in pools:
+                if ip in pool_range:
+                    pool_ips.setdefault(pool_id, []).append(int(ip))
+                    break
+            else:
+                LOG.debug(_("%s is not in an allocation pool, not "
+                            "recycled"), ip_address)
+
+        def add_all(ips):
+            def update_func(ip_set):
+                for ip in ips:
+                    ip_set.add(ip)
+            return update_func
+
+        for pool_id, ips in pool_ips.iteritems():
+            self._update(context, pool_id, add_all(ips))
+
+
+_DRIVER = None
+
+
+def get_driver():
+    """Return the IPAM driver selected by the 'ipam_driver' option."""
+    global _DRIVER
+    driver_class = cfg.CONF.ipam_driver
+    if _DRIVER is None or _DRIVER[0] != driver_class:
+        _DRIVER = (driver_class, importutils.import_object(driver_class))
+    return _DRIVER[1]
@@ -52,6 +52,9 @@ class Router(model_base.BASEV2, models_v2.HasId, models_v2.HasTenant):
     admin_state_up = sa.Column(sa.Boolean)
     gw_port_id = sa.Column(sa.String(36), sa.ForeignKey('ports.id'))
     gw_port = orm.relationship(models_v2.Port)
+    # Incremented whenever the data sent to the L3 agents changes
+    generation = sa.Column(sa.Integer, nullable=False, default=0,
+                           server_default='0')
 
 
 class ExternalNetwork(model_base.BASEV2):
@@ -120,6 +123,10 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
             raise l3.RouterNotFound(router_id=id)
         return router
 
+    @db_base_plugin_v2.column_fields('id', 'name', 'tenant_id',
+                                     'admin_state_up', 'status', 'gw_port_id',
+                                     'generation')
+    @db_base_plugin_v2.eager_loads('gw_port')
     def _make_router_dict(self, router, fields=None):
         res = {'id': router['id'],
                'name': router['name'],
@@ -127,7 +134,8 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
                'admin_state_up': router['admin_state_up'],
                'status': router['status'],
                'external_gateway_info': None,
-               'gw_port_id': router['gw_port_id']}
+               'gw_port_id': router['gw_port_id'],
+               'generation': router['generation']}
         if router['gw_port_id']:
             nw_id = router.gw_port['network_id']
             res['external_gateway_info'] = {'network_id': nw_id}
@@ -168,9 +176,7 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
             # Ensure we actually have something to update
             if r.keys():
                 router_db.update(r)
-        routers = self.get_sync_data(context.elevated(),
-                                     [router_db['id']])
-        l3_rpc_agent_api.L3AgentNotify.routers_updated(context, routers)
+        self._routers_updated(context, [router_db['id']])
         return self._make_router_dict(router_db)
 
     def _update_router_gw_info(self, context, router_id, info):
@@ -261,6 +267,18 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
             context.session.delete(router)
         l3_rpc_agent_api.L3AgentNotify.router_deleted(context, id)
 
+    def _routers_updated(self, context, router_ids, operation=None,
+                         data=None):
+        """Bump the generation of routers and notify their L3 agents."""
+        with context.session.begin(subtransactions=True):
+            query = context.session.query(Router)
+            query.filter(Router.id.in_(router_ids)).update(
+                {Router.generation: Router.generation + 1},
+                synchronize_session='fetch')
+        routers = self.get_sync_data(context.elevated(), router_ids)
+        l3_rpc_agent_api.L3AgentNotify.routers_updated(context, routers,
+                                                       operation, data)
+
     def get_router(self, context, id, fields=None):
         router = self._get_router(context, id)
         return self._make_router_dict(router, fields)
@@ -361,11 +379,9 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
                  'device_owner': DEVICE_OWNER_ROUTER_INTF,
                  'name': ''}})
 
-        routers = self.get_sync_data(context.elevated(), [router_id])
-        l3_rpc_agent_api.L3AgentNotify.routers_updated(
-            context, routers, 'add_router_interface',
-            {'network_id': port['network_id'],
-             'subnet_id': subnet_id})
+        self._routers_updated(context, [router_id], 'add_router_interface',
+                              {'network_id': port['network_id'],
+                               'subnet_id': subnet_id})
         info = {'id': router_id,
                 'tenant_id': subnet['tenant_id'],
                 'port_id': port['id'],
@@ -438,11 +454,9 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
             if not found:
                 raise l3.RouterInterfaceNotFoundForSubnet(router_id=router_id,
                                                           subnet_id=subnet_id)
-        routers = self.get_sync_data(context.elevated(), [router_id])
-        l3_rpc_agent_api.L3AgentNotify.routers_updated(
-            context, routers, 'remove_router_interface',
-            {'network_id': _network_id,
-             'subnet_id': subnet_id})
+        self._routers_updated(context, [router_id], 'remove_router_interface',
+                              {'network_id': _network_id,
+                               'subnet_id': subnet_id})
         info = {'id': router_id,
                 'tenant_id': subnet['tenant_id'],
                 'port_id': port_id,
@@ -463,6 +477,10 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
             raise l3.FloatingIPNotFound(floatingip_id=id)
         return floatingip
 
+    @db_base_plugin_v2.column_fields('id', 'tenant_id',
+                                     'floating_ip_address',
+                                     'floating_network_id', 'router_id',
+                                     'fixed_ip_address')
     def _make_floatingip_dict(self, floatingip, fields=None):
         res = {'id': floatingip['id'],
                'tenant_id': floatingip['tenant_id'],
@@ -654,9 +672,7 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
             raise
         router_id = floatingip_db['router_id']
         if router_id:
-            routers = self.get_sync_data(context.elevated(), [router_id])
-            l3_rpc_agent_api.L3AgentNotify.routers_updated(context, routers,
-                                                           'create_floatingip')
+            self._routers_updated(context, [router_id], 'create_floatingip')
         return self._make_floatingip_dict(floatingip_db)
 
     def update_floatingip(self, context, id, floatingip):
@@ -677,9 +693,7 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
         if router_id and router_id != before_router_id:
             router_ids.append(router_id)
         if router_ids:
-            routers = self.get_sync_data(context.elevated(), router_ids)
-            l3_rpc_agent_api.L3AgentNotify.routers_updated(context, routers,
-                                                           'update_floatingip')
+            self._routers_updated(context, router_ids, 'update_floatingip')
         return self._make_floatingip_dict(floatingip_db)
 
     def delete_floatingip(self, context, id):
@@ -691,9 +705,7 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
                              floatingip['floating_port_id'],
                              l3_port_check=False)
         if router_id:
-            routers = self.get_sync_data(context.elevated(), [router_id])
-            l3_rpc_agent_api.L3AgentNotify.routers_updated(context, routers,
-                                                           'delete_floatingip')
+            self._routers_updated(context, [router_id], 'delete_floatingip')
 
     def get_floatingip(self, context, id, fields=None):
         floatingip = self._get_floatingip(context, id)
@@ -756,8 +768,36 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
                 raise Exception(_('Multiple floating IPs found for port %s')
                                 % port_id)
         if router_id:
-            routers = self.get_sync_data(context.elevated(), [router_id])
-            l3_rpc_agent_api.L3AgentNotify.routers_updated(context, routers)
+            self._routers_updated(context, [router_id])
+
+    def update_routers_for_subnet(self, context, original_subnet, subnet):
+        """Update the routers with a port on a subnet whose gateway changed.
+
+        The gateway of the subnets is part of the router data synced to the
+        L3 agents, so this should be called by any plugin after updating a
+        subnet.
+        """
+        if original_subnet['gateway_ip'] == subnet['gateway_ip']:
+            return
+        query = context.session.query(models_v2.Port.device_id).join(
+            models_v2.IPAllocation).filter(
+                models_v2.IPAllocation.subnet_id == subnet['id'],
+                models_v2.Port.device_owner.in_([DEVICE_OWNER_ROUTER_INTF,
+                                                 DEVICE_OWNER_ROUTER_GW]))
+        router_ids = [port.device_id for port in query.distinct()]
+        if router_ids:
+            self._routers_updated(context, router_ids)
+
+    def update_router_for_port(self, context, original_port, port):
+        """Update the router of a router port whose fixed IPs changed.
+
+        This should be called by any plugin after updating a port.
+        """
+        if (port['device_owner'] in [DEVICE_OWNER_ROUTER_INTF,
+                                     DEVICE_OWNER_ROUTER_GW] and
+                port['device_id'] and
+                original_port['fixed_ips'] != port['fixed_ips']):
+            self._routers_updated(context, [port['device_id']])
 
     def _check_l3_view_auth(self, context, network):
         return policy.check(context,
@@ -782,6 +822,19 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
             network[l3.EXTERNAL] = self._network_is_external(
                 context, network['id'])
 
+    def _extend_networks_dict_l3(self, context, networks):
+        """Set the external flag of networks with a single query."""
+        networks = [network for network in networks
+                    if self._check_l3_view_auth(context, network)]
+        if not networks:
+            return
+        query = context.session.query(ExternalNetwork.network_id)
+        query = query.filter(ExternalNetwork.network_id.in_(
+            [network['id'] for network in networks]))
+        external_ids = set(row[0] for row in query)
+        for network in networks:
+            network[l3.EXTERNAL] = network['id'] in external_ids
+
     def _process_l3_create(self, context, net_data, net_id):
         external = net_data.get(l3.EXTERNAL)
         external_set = attributes.is_attr_set(external)
@@ -835,47 +888,49 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
             return [n for n in nets if n['id'] not in ext_nets]
 
     def _get_sync_routers(self, context, router_ids=None, active=None):
-        """Query routers and their gw ports for l3 agent.
+        """Query routers for l3 agent.
 
-        Query routers with the router_ids. The gateway ports, if any,
-        will be queried too.
         l3 agent has an option to deal with only one router id. In addition,
         when we need to notify the agent the data about only one router
         (when modification of router, its interfaces, gw_port and floatingips),
         we will have router_ids.
         @param router_ids: the list of router ids which we want to query.
                            if it is None, all of routers will be queried.
-        @return: a list of dicted routers with dicted gw_port populated if any
+        @return: a list of dicted routers
         """
         filters = {'id': router_ids} if router_ids else {}
         if active is not None:
             filters['admin_state_up'] = [active]
-        router_dicts = self.get_routers(context, filters=filters)
-        gw_port_ids = []
-        if not router_dicts:
-            return []
-        for router_dict in router_dicts:
-            gw_port_id = router_dict['gw_port_id']
-            if gw_port_id:
-                gw_port_ids.append(gw_port_id)
-        gw_ports = []
-        if gw_port_ids:
-            gw_ports = self.get_sync_gw_ports(context, gw_port_ids)
-        gw_port_id_gw_port_dict = {}
-        for gw_port in gw_ports:
-            gw_port_id_gw_port_dict[gw_port['id']] = gw_port
-        for router_dict in router_dicts:
-            gw_port_id = router_dict['gw_port_id']
-            if gw_port_id:
-                router_dict['gw_port'] = gw_port_id_gw_port_dict[gw_port_id]
-        return router_dicts
+        return self.get_routers(context, filters=filters)
 
     def _get_sync_floating_ips(self, context, router_ids):
-        """Query floating_ips that relate to list of router_ids."""
+        """Query floating_ips that relate to list of router_ids.
+
+        All the associated floating IPs are returned if router_ids is None.
+        """
+        if router_ids is None:
+            query = context.session.query(FloatingIP)
+            query = query.filter(FloatingIP.router_id != expr.null())
+            return [self._make_floatingip_dict(fip) for fip in query]
         if not router_ids:
             return []
         return self.get_floatingips(context, {'router_id': router_ids})
 
+    def _get_sync_ports(self, context, router_ids):
+        """Query the gateway ports and interfaces of router_ids.
+
+        The ports of all the routers are returned if router_ids is None.
+        """
+        if router_ids is not None and not router_ids:
+            return []
+        filters = {'device_owner': [DEVICE_OWNER_ROUTER_INTF,
+                                    DEVICE_OWNER_ROUTER_GW]}
+        if router_ids is not None:
+            filters['device_id'] = router_ids
+        ports = self.get_ports(context, filters)
+        self._populate_subnet_for_ports(context, ports)
+        return ports
+
     def get_sync_gw_ports(self, context, gw_port_ids):
         if not gw_port_ids:
             return []
@@ -923,22 +978,30 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
             subnet_id_ports_dict[fixed_ip['subnet_id']] = my_ports
         if not subnet_id_ports_dict:
             return
-        filters = {'id': subnet_id_ports_dict.keys()}
-        fields = ['id', 'cidr', 'gateway_ip']
-        subnet_dicts = self.get_subnets(context, filters, fields)
-        for subnet_dict in subnet_dicts:
-            ports = subnet_id_ports_dict.get(subnet_dict['id'], [])
+        # Only three columns are needed, skip loading whole subnets
+        query = context.session.query(models_v2.Subnet.id,
+                                      models_v2.Subnet.cidr,
+                                      models_v2.Subnet.gateway_ip)
+        query = query.filter(
+            models_v2.Subnet.id.in_(subnet_id_ports_dict.keys()))
+        for subnet_id, cidr, gateway_ip in query:
+            ports = subnet_id_ports_dict.get(subnet_id, [])
             for port in ports:
                 # TODO(gongysh) stash the subnet into fixed_ips
                 # to make the payload smaller.
-                port['subnet'] = {'id': subnet_dict['id'],
-                                  'cidr': subnet_dict['cidr'],
-                                  'gateway_ip': subnet_dict['gateway_ip']}
+                port['subnet'] = {'id': subnet_id,
+                                  'cidr': cidr,
+                                  'gateway_ip': gateway_ip}
 
-    def _process_sync_data(self, routers, interfaces, floating_ips):
+    def _process_sync_data(self, routers, interfaces, floating_ips,
+                           gw_ports=None):
         routers_dict = {}
         for router in routers:
             routers_dict[router['id']] = router
+        for gw_port in gw_ports or []:
+            router = routers_dict.get(gw_port['device_id'])
+            if router and router['gw_port_id'] == gw_port['id']:
+                router['gw_port'] = gw_port
         for floating_ip in floating_ips:
             router = routers_dict.get(floating_ip['router_id'])
             if router:
@@ -954,16 +1017,46 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
                 router[l3_constants.INTERFACE_KEY] = router_interfaces
         return routers_dict.values()
 
-    def get_sync_data(self, context, router_ids=None, active=None):
-        """Query routers and their related floating_ips, interfaces."""
+    def get_sync_data(self, context, router_ids=None, active=None,
+                      generations=None):
+        """Query routers and their related floating_ips, interfaces.
+
+        The number of queries made does not depend on the number of
+        routers. generations maps the ids of routers known by an agent to
+        the generation of their data it has, the routers which still have
+        that generation are returned as {'id': ..., 'generation': ...,
+        ROUTER_UNCHANGED_KEY: True}.
+        """
         with context.session.begin(subtransactions=True):
             routers = self._get_sync_routers(context,
                                              router_ids=router_ids,
                                              active=active)
-            router_ids = [router['id'] for router in routers]
-            floating_ips = self._get_sync_floating_ips(context, router_ids)
-            interfaces = self.get_sync_interfaces(context, router_ids)
-        return self._process_sync_data(routers, interfaces, floating_ips)
+            unchanged = []
+            if generations:
+                changed = []
+                for router in routers:
+                    if generations.get(router['id']) == router['generation']:
+                        unchanged.append(
+                            {'id': router['id'],
+                             'generation': router['generation'],
+                             l3_constants.ROUTER_UNCHANGED_KEY: True})
+                    else:
+                        changed.append(router)
+                routers = changed
+            if router_ids is None and not unchanged:
+                # Fetch everything rather than filter on every router id
+                sync_router_ids = None
+            else:
+                sync_router_ids = [router['id'] for router in routers]
+            floating_ips = self._get_sync_floating_ips(context,
+                                                       sync_router_ids)
+            ports = self._get_sync_ports(context, sync_router_ids)
+        interfaces = [port for port in ports
+                      if port['device_owner'] == DEVICE_OWNER_ROUTER_INTF]
+        gw_ports = [port for port in ports
+                    if port['device_owner'] == DEVICE_OWNER_ROUTER_GW]
+        return self._process_sync_data(routers, interfaces, floating_ips,
+                                       gw_ports) + unchanged
 
     def get_external_network_id(self, context):
         nets = self.get_networks(context, {'router:external': [True]})
@@ -33,22 +33,30 @@ class L3RpcCallbackMixin(object):
         """Sync routers according to filters to a specific agent.
 
         @param context: contain user information
-        @param kwargs: host, or router_id
+        @param kwargs: host, router_ids and generations, the generation of
+                       the data of each router the agent has
         @return: a list of routers
-                 with their interfaces and floating_ips
+                 with their interfaces and floating_ips, the routers
+                 whose generation did not change are only marked as
+                 unchanged
         """
-        router_id = kwargs.get('router_id')
+        router_ids = kwargs.get('router_ids')
+        if kwargs.get('router_id'):
+            router_ids = [kwargs['router_id']]
+        generations = kwargs.get('generations')
         host = kwargs.get('host')
         context = quantum_context.get_admin_context()
         plugin = manager.QuantumManager.get_plugin()
         if utils.is_extension_supported(
             plugin, constants.AGENT_SCHEDULER_EXT_ALIAS):
             if cfg.CONF.router_auto_schedule:
-                plugin.auto_schedule_routers(context, host, router_id)
+                for router_id in router_ids or [None]:
+                    plugin.auto_schedule_routers(context, host, router_id)
             routers = plugin.list_active_sync_routers_on_active_l3_agent(
-                context, host, router_id)
+                context, host, router_ids, generations)
         else:
-            routers = plugin.get_sync_data(context, router_id)
+            routers = plugin.get_sync_data(context, router_ids,
+                                           generations=generations)
         LOG.debug(_("Routers returned to l3 agent:\n %s"),
                   jsonutils.dumps(routers, indent=5))
         return routers
@@ -22,8 +22,10 @@ from sqlalchemy.orm import exc
 
 from quantum.api.v2 import attributes
 from quantum.common import exceptions as q_exc
+from quantum.db import db_base_plugin_v2
 from quantum.db import model_base
 from quantum.db import models_v2
+from quantum.db import sqlalchemyutils
 from quantum.extensions import loadbalancer
 from quantum.extensions.loadbalancer import LoadBalancerPluginBase
 from quantum import manager
@@ -183,16 +185,36 @@ class LoadBalancerPluginDb(LoadBalancerPluginBase):
                     query = query.filter(column.in_(value))
         return query
 
-    def _get_collection_query(self, context, model, filters=None):
+    def _get_collection_query(self, context, model, filters=None,
+                              sorts=None, limit=None, marker_obj=None,
+                              page_reverse=False):
         collection = self._model_query(context, model)
         collection = self._apply_filters_to_query(collection, model, filters)
+        if limit and page_reverse and sorts:
+            sorts = [(s[0], not s[1]) for s in sorts]
+        collection = sqlalchemyutils.paginate_query(collection, model, limit,
+                                                    sorts,
+                                                    marker_obj=marker_obj)
         return collection
 
     def _get_collection(self, context, model, dict_func, filters=None,
                         fields=None, sorts=None, limit=None, marker_obj=None,
                         page_reverse=False):
-        query = self._get_collection_query(context, model, filters)
-        return [dict_func(c, fields) for c in query.all()]
+        query = self._get_collection_query(context, model, filters=filters,
+                                           sorts=sorts,
+                                           limit=limit,
+                                           marker_obj=marker_obj,
+                                           page_reverse=page_reverse)
+        items = db_base_plugin_v2.make_collection_dicts(query, model,
+                                                        dict_func, fields)
+        if limit and page_reverse:
+            items.reverse()
+        return items
+
+    def _get_marker_obj(self, context, model, limit, marker):
+        if limit and marker:
+            return self._get_resource(context, model, marker)
+        return None
 
     def _get_collection_count(self, context, model, filters=None):
         return self._get_collection_query(context, model, filters).count()
@@ -244,6 +266,10 @@ class LoadBalancerPluginDb(LoadBalancerPluginBase):
 
     ########################################################
     # VIP DB access
+    @db_base_plugin_v2.column_fields('id', 'tenant_id', 'name', 'description',
+                                     'port_id', 'protocol_port', 'protocol',
+                                     'pool_id', 'connection_limit',
+                                     'admin_state_up', 'status')
     def _make_vip_dict(self, vip, fields=None):
         fixed_ip = (vip.port.fixed_ips or [{}])[0]
 
@@ -471,13 +497,23 @@ class LoadBalancerPluginDb(LoadBalancerPluginBase):
         vip = self._get_resource(context, Vip, id)
         return self._make_vip_dict(vip, fields)
 
-    def get_vips(self, context, filters=None, fields=None):
+    def get_vips(self, context, filters=None, fields=None,
+                 sorts=None, limit=None, marker=None,
+                 page_reverse=False):
+        marker_obj = self._get_marker_obj(context, Vip, limit, marker)
         return self._get_collection(context, Vip,
                                     self._make_vip_dict,
-                                    filters=filters, fields=fields)
+                                    filters=filters, fields=fields,
+                                    sorts=sorts,
+                                    limit=limit,
+                                    marker_obj=marker_obj,
+                                    page_reverse=page_reverse)
 
     ########################################################
     # Pool DB access
+    @db_base_plugin_v2.column_fields('id', 'tenant_id', 'name', 'description',
+                                     'subnet_id', 'protocol', 'vip_id',
+                                     'lb_method', 'admin_state_up', 'status')
     def _make_pool_dict(self, pool, fields=None):
         res = {'id': pool['id'],
                'tenant_id': pool['tenant_id'],
@@ -567,11 +603,17 @@ class LoadBalancerPluginDb(LoadBalancerPluginBase):
         pool = self._get_resource(context, Pool, id)
         return self._make_pool_dict(pool, fields)
 
-    def get_pools(self, context, filters=None, fields=None):
-        collection = self._model_query(context, Pool)
-        collection = self._apply_filters_to_query(collection, Pool, filters)
-        return [self._make_pool_dict(c, fields)
-                for c in collection.all()]
+    def get_pools(self, context, filters=None, fields=None,
+                  sorts=None, limit=None, marker=None,
+                  page_reverse=False):
+        marker_obj = self._get_marker_obj(context, Pool, limit, marker)
+        return self._get_collection(context, Pool,
+                                    self._make_pool_dict,
+                                    filters=filters, fields=fields,
+                                    sorts=sorts,
+                                    limit=limit,
+                                    marker_obj=marker_obj,
+                                    page_reverse=page_reverse)
 
     def stats(self, context, pool_id):
         with context.session.begin(subtransactions=True):
@@ -642,6 +684,9 @@ class LoadBalancerPluginDb(LoadBalancerPluginBase):
 
     ########################################################
     # Member DB access
+    @db_base_plugin_v2.column_fields('id', 'tenant_id', 'pool_id', 'address',
+                                     'protocol_port', 'weight',
+                                     'admin_state_up', 'status')
     def _make_member_dict(self, member, fields=None):
         res = {'id': member['id'],
                'tenant_id': member['tenant_id'],
@@ -694,13 +739,23 @@ class LoadBalancerPluginDb(LoadBalancerPluginBase):
         member = self._get_resource(context, Member, id)
         return self._make_member_dict(member, fields)
 
-    def get_members(self, context, filters=None, fields=None):
+    def get_members(self, context, filters=None, fields=None,
+                    sorts=None, limit=None, marker=None,
+                    page_reverse=False):
+        marker_obj = self._get_marker_obj(context, Member, limit, marker)
         return self._get_collection(context, Member,
                                     self._make_member_dict,
-                                    filters=filters, fields=fields)
+                                    filters=filters, fields=fields,
+                                    sorts=sorts,
+                                    limit=limit,
+                                    marker_obj=marker_obj,
+                                    page_reverse=page_reverse)
 
     ########################################################
     # HealthMonitor DB access
+    @db_base_plugin_v2.column_fields('id', 'tenant_id', 'type', 'delay',
+                                     'timeout', 'max_retries',
+                                     'admin_state_up', 'status')
     def _make_health_monitor_dict(self, health_monitor, fields=None):
         res = {'id': health_monitor['id'],
                'tenant_id': health_monitor['tenant_id'],
@@ -761,7 +816,15 @@ class LoadBalancerPluginDb(LoadBalancerPluginBase):
         healthmonitor = self._get_resource(context, HealthMonitor, id)
         return self._make_health_monitor_dict(healthmonitor, fields)
 
-    def get_health_monitors(self, context, filters=None, fields=None):
+    def get_health_monitors(self, context, filters=None, fields=None,
+                            sorts=None, limit=None, marker=None,
+                            page_reverse=False):
+        marker_obj = self._get_marker_obj(context, HealthMonitor,
+                                          limit, marker)
         return self._get_collection(context, HealthMonitor,
                                     self._make_health_monitor_dict,
-                                    filters=filters, fields=fields)
+                                    filters=filters, fields=fields,
+                                    sorts=sorts,
+                                    limit=limit,
+                                    marker_obj=marker_obj,
+                                    page_reverse=page_reverse)
@@ -0,0 +1,61 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""nvp port mapping lswitch
+
+Revision ID: 1d6ee1ae5da5
+Revises: 4f3c8b2a9d61
+Create Date: 2013-06-03 10:42:18.517362
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '1d6ee1ae5da5'
+down_revision = '4f3c8b2a9d61'
+
+# Change to ['*'] if this migration applies to all plugins
+
+migration_for_plugins = [
+    'quantum.plugins.nicira.nicira_nvp_plugin.QuantumPlugin.NvpPluginV2'
+]
+
+from alembic import op
+import sqlalchemy as sa
+
+from quantum.db import migration
+
+
+def upgrade(active_plugin=None, options=None):
+    if not migration.should_run(active_plugin, migration_for_plugins):
+        return
+
+    # The existing mappings are completed by the plugin the first time
+    # their port is used
+    op.add_column('quantum_nvp_port_mapping',
+                  sa.Column('nvp_switch_id', sa.String(length=36),
+                            nullable=True))
+    op.add_column('quantum_nvp_port_mapping',
+                  sa.Column('nvp_cluster', sa.String(length=255),
+                            nullable=True))
+
+
+def downgrade(active_plugin=None, options=None):
+    if not migration.should_run(active_plugin, migration_for_plugins):
+        return
+
+    op.drop_column('quantum_nvp_port_mapping', 'nvp_cluster')
+    op.drop_column('quantum_nvp_port_mapping', 'nvp_switch_id')
@@ -16,10 +16,17 @@
 #    under the License.
 
 import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy import exc as sql_exc
+from sqlalchemy import orm
 
 from quantum.common import exceptions
 from quantum.db import model_base
 from quantum.db import models_v2
+from quantum.openstack.common import log as logging
+
+
+LOG = logging.getLogger(__name__)
 
 
 class Quota(model_base.BASEV2, models_v2.HasId):
@@ -33,6 +40,64 @@ class Quota(model_base.BASEV2, models_v2.HasId):
     limit = sa.Column(sa.Integer)
 
 
+class QuotaUsage(model_base.BASEV2):
+    """Represent the number of resources of a kind a tenant is using.
+
+    The row is created the first time the usage is needed, by counting the
+    resources, and is kept up to date by the flushes adding and deleting
+    them. When there is no row, the usage is not known yet.
+    """
+    tenant_id = sa.Column(sa.String(255), primary_key=True)
+    resource = sa.Column(sa.String(255), primary_key=True)
+    in_use = sa.Column(sa.Integer, nullable=False, default=0)
+
+
+# Models whose rows are the resources counted against the quotas, by
+# resource name
+_TRACKED_RESOURCES = {}
+_TRACKED_MODELS = {}
+# Whether the flushes update the usages
+_USAGES_TRACKED = False
+
+
+def register_tracked_resource(resource, model):
+    """Let UsageTrackingQuotaDriver keep the usage of resource up to date.
+
+    :param resource: The name of the quota resource, i.e., "network".
+    :param model: The model of the resource, with a tenant_id column.
+    """
+    _TRACKED_RESOURCES[resource] = model
+    _TRACKED_MODELS[model] = resource
+
+
+register_tracked_resource('network', models_v2.Network)
+register_tracked_resource('subnet', models_v2.Subnet)
+register_tracked_resource('port', models_v2.Port)
+
+
+def _update_usages(session, flush_context):
+    """Apply the resources a flush added and deleted to the usages.
+
+    This runs once the flush statements succeeded, in their transaction,
+    so that the usages are committed or rolled back with the resources.
+    """
+    deltas = {}
+    for objs, step in ((session.new, 1), (session.deleted, -1)):
+        for obj in objs:
+            resource = _TRACKED_MODELS.get(type(obj))
+            if resource and obj.tenant_id:
+                key = (obj.tenant_id, resource)
+                deltas[key] = deltas.get(key, 0) + step
+    usages = QuotaUsage.__table__
+    for (tenant_id, resource), delta in deltas.iteritems():
+        if delta:
+            session.execute(
+                usages.update().
+                where(usages.c.tenant_id == tenant_id).
+                where(usages.c.resource == resource).
+                values(in_use=usages.c.in_use + delta))
+
+
 class DbQuotaDriver(object):
     """
     Driver to perform necessary checks to enforce quotas and obtain
@@ -143,7 +208,7 @@ class DbQuotaDriver(object):
 
         # Grab and return the quotas (without usages)
         quotas = DbQuotaDriver.get_tenant_quotas(
-            context, sub_resources, context.tenant_id)
+            context, sub_resources, tenant_id)
 
         return dict((k, v) for k, v in quotas.items())
 
@@ -184,3 +249,68 @@ class DbQuotaDriver(object):
                  if quotas[key] >= 0 and quotas[key] < val]
         if overs:
             raise exceptions.OverQuota(overs=sorted(overs))
+
+
+class UsageTrackingQuotaDriver(DbQuotaDriver):
+    """DbQuotaDriver reading the usages from per tenant counters.
+
+    Instead of counting the resources of the tenant for every create, the
+    usage is read from the QuotaUsage row of the tenant, which the flushes
+    creating and deleting the resources keep up to date. Resources which
+    are not registered with register_tracked_resource are counted by the
+    plugin. The API server recounts the counters every
+    quota_usage_resync_interval seconds, in case they drift from the
+    resources.
+    """
+
+    def __init__(self):
+        global _USAGES_TRACKED
+        if not _USAGES_TRACKED:
+            event.listen(orm.Session, 'after_flush', _update_usages)
+            _USAGES_TRACKED = True
+
+    def count(self, context, resource, plugin, collection, tenant_id):
+        """Return the number of resources the tenant is using."""
+        model = _TRACKED_RESOURCES.get(resource.name)
+        if model is None:
+            return resource.count(context, plugin, collection, tenant_id)
+        usage = context.session.query(QuotaUsage.in_use).filter_by(
+            tenant_id=tenant_id, resource=resource.name).first()
+        if usage:
+            return usage.in_use
+        try:
+            with context.session.begin(subtransactions=True):
+                in_use = context.session.query(model).filter_by(
+                    tenant_id=tenant_id).count()
+                context.session.add(QuotaUsage(tenant_id=tenant_id,
+                                               resource=resource.name,
+                                               in_use=in_use))
+        except sql_exc.IntegrityError:
+            # Another request counted the usage at the same time
+            LOG.debug(_('Usage of %(resource)s for tenant %(tenant_id)s '
+                        'already counted'),
+                      {'resource': resource.name, 'tenant_id': tenant_id})
+        return in_use
+
+    @staticmethod
+    def resync_usages(context):
+        """Recount the usages known for all the tenants."""
+        for resource, model in _TRACKED_RESOURCES.items():
+            with context.session.begin(subtransactions=True):
+                # Lock the counters before counting, the flushes updating
+                # them concurrently then wait for the recount to commit
+                usages = context.session.query(QuotaUsage).filter_by(
+                    resource=resource).with_lockmode('update').all()
+                counts = dict(context.session.query(
+                    model.tenant_id, sa.func.count(model.id)).group_by(
+                        model.tenant_id))
+                for usage in usages:
+                    in_use = counts.get(usage.tenant_id, 0)
+                    if usage.in_use != in_use:
+                        LOG.warn(_('Usage of %(resource)s for tenant '
+                                   '%(tenant_id)s was %(old)d instead of '
+                                   '%(new)d'),
+                                 {'resource': resource,
+                                  'tenant_id': usage.tenant_id,
+                                  'old': usage.in_use, 'new': in_use})
+                        usage.in_use = in_use
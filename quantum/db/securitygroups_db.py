@@ -22,6 +22,7 @@ from sqlalchemy.orm import exc
 from sqlalchemy.orm import scoped_session
 
 from quantum.api.v2 import attributes as attr
+from quantum.db import db_base_plugin_v2
 from quantum.db import model_base
 from quantum.db import models_v2
 from quantum.extensions import securitygroup as ext_sg
@@ -181,6 +182,9 @@ class SecurityGroupDbMixin(ext_sg.SecurityGroupPluginBase):
         with context.session.begin(subtransactions=True):
             context.session.delete(sg)
 
+    @db_base_plugin_v2.column_fields('id', 'name', 'tenant_id',
+                                     'description')
+    @db_base_plugin_v2.eager_loads('rules')
     def _make_security_group_dict(self, security_group, fields=None):
         res = {'id': security_group['id'],
                'name': security_group['name'],
@@ -301,6 +305,10 @@ class SecurityGroupDbMixin(ext_sg.SecurityGroupPluginBase):
                                     tenant_id=tenant_id)
         return security_group_id
 
+    @db_base_plugin_v2.column_fields('id', 'tenant_id', 'security_group_id',
+                                     'ethertype', 'direction', 'protocol',
+                                     'port_range_min', 'port_range_max',
+                                     'remote_ip_prefix', 'remote_group_id')
     def _make_security_group_rule_dict(self, security_group_rule, fields=None):
         res = {'id': security_group_rule['id'],
                'tenant_id': security_group_rule['tenant_id'],
@@ -391,6 +399,20 @@ class SecurityGroupDbMixin(ext_sg.SecurityGroupPluginBase):
                 security_group_id['security_group_id'])
         return port
 
+    def _extend_ports_dict_security_group(self, context, ports):
+        """Set the security groups of ports with a single query."""
+        for port in ports:
+            port[ext_sg.SECURITYGROUPS] = []
+        if not ports:
+            return ports
+        ports_by_id = dict((port['id'], port) for port in ports)
+        filters = {'port_id': ports_by_id.keys()}
+        bindings = self._get_port_security_group_bindings(context, filters)
+        for binding in bindings:
+            ports_by_id[binding['port_id']][ext_sg.SECURITYGROUPS].append(
+                binding['security_group_id'])
+        return ports
+
     def _process_port_create_security_group(self, context, port_id,
                                             security_group_id):
         if not attr.is_attr_set(security_group_id):
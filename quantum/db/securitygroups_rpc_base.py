@@ -15,7 +15,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import time
+
 import netaddr
+from oslo.config import cfg
 
 from quantum.common import constants as q_const
 from quantum.common import utils
@@ -34,6 +37,63 @@ IP_MASK = {q_const.IPv4: 32,
 DIRECTION_IP_PREFIX = {'ingress': 'source_ip_prefix',
                        'egress': 'dest_ip_prefix'}
 
+# Kinds of SecurityGroupRpcCache entries
+RULES = 'rules'
+MEMBER_IPS = 'member_ips'
+DHCP_IPS = 'dhcp_ips'
+
+
+class SecurityGroupRpcCache(object):
+    """Data security_group_rules_for_devices computes from the database.
+
+    The rules by security group, the IP addresses of the members of a
+    group and the DHCP server addresses of a network are kept until the
+    notification of a change to them or security_group_cache_ttl seconds.
+    Only the changes made through this process are notified, so the cache
+    is disabled unless it is the only one serving the API.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        # Increased by every invalidation, to avoid caching what a request
+        # read from the database before a change was notified
+        self.generation = 0
+
+    def get(self, kind, keys):
+        now = time.time()
+        found = {}
+        for key in keys:
+            entry = self.entries.get((kind, key))
+            if entry and entry[0] > now:
+                found[key] = entry[1]
+        return found
+
+    def _ttl(self):
+        if cfg.CONF.api_workers > 0:
+            # The API workers make changes this process is not notified of
+            return 0
+        return cfg.CONF.security_group_cache_ttl
+
+    def set(self, kind, values, generation):
+        ttl = self._ttl()
+        if ttl <= 0 or generation != self.generation:
+            return
+        expiry = time.time() + ttl
+        for key, value in values.iteritems():
+            self.entries[(kind, key)] = (expiry, value)
+
+    def invalidate(self, kind, keys=None):
+        """Drop the entries of the given keys, or all the kind's entries."""
+        self.generation += 1
+        if keys is None:
+            keys = [key for kind_, key in self.entries if kind_ == kind]
+        for key in keys:
+            self.entries.pop((kind, key), None)
+
+
+# Shared by the plugin, which notifies the changes, and the RPC callbacks
+SG_CACHE = SecurityGroupRpcCache()
+
 
 class SecurityGroupServerRpcMixin(sg_db.SecurityGroupDbMixin):
 
@@ -42,6 +102,7 @@ class SecurityGroupServerRpcMixin(sg_db.SecurityGroupDbMixin):
         rule = self.create_security_group_rule_bulk_native(context,
                                                            bulk_rule)[0]
         sgids = [rule['security_group_id']]
+        SG_CACHE.invalidate(RULES, sgids)
         self.notifier.security_groups_rule_updated(context, sgids)
         return rule
 
@@ -51,6 +112,7 @@ class SecurityGroupServerRpcMixin(sg_db.SecurityGroupDbMixin):
                       self).create_security_group_rule_bulk_native(
                           context, security_group_rule)
         sgids = set([r['security_group_id'] for r in rules])
+        SG_CACHE.invalidate(RULES, sgids)
         self.notifier.security_groups_rule_updated(context, list(sgids))
         return rules
 
@@ -58,9 +120,17 @@ class SecurityGroupServerRpcMixin(sg_db.SecurityGroupDbMixin):
         rule = self.get_security_group_rule(context, sgrid)
         super(SecurityGroupServerRpcMixin,
               self).delete_security_group_rule(context, sgrid)
+        SG_CACHE.invalidate(RULES, [rule['security_group_id']])
         self.notifier.security_groups_rule_updated(context,
                                                    [rule['security_group_id']])
 
+    def delete_security_group(self, context, id):
+        super(SecurityGroupServerRpcMixin,
+              self).delete_security_group(context, id)
+        # The rules of other groups using it as remote group go with it
+        SG_CACHE.invalidate(RULES)
+        SG_CACHE.invalidate(MEMBER_IPS, [id])
+
     def update_security_group_on_port(self, context, id, port,
                                       original_port, updated_port):
         """ update security groups on port
@@ -71,6 +141,10 @@ class SecurityGroupServerRpcMixin(sg_db.SecurityGroupDbMixin):
         """
         need_notify = False
         if ext_sg.SECURITYGROUPS in port['port']:
+            if ext_sg.SECURITYGROUPS not in original_port:
+                # is_security_group_member_updated() needs the groups the
+                # port is leaving
+                self._extend_port_dict_security_group(context, original_port)
             # delete the port binding and read it with the new rules
             port['port'][ext_sg.SECURITYGROUPS] = (
                 self._get_security_groups_on_port(context, port))
@@ -96,6 +170,9 @@ class SecurityGroupServerRpcMixin(sg_db.SecurityGroupDbMixin):
             not utils.compare_elements(
                 original_port.get(ext_sg.SECURITYGROUPS),
                 updated_port.get(ext_sg.SECURITYGROUPS))):
+            # The groups the port left lost a member too
+            SG_CACHE.invalidate(MEMBER_IPS,
+                                original_port.get(ext_sg.SECURITYGROUPS) or [])
             self.notify_security_groups_member_updated(
                 context, updated_port)
             need_notify = True
@@ -112,12 +189,36 @@ class SecurityGroupServerRpcMixin(sg_db.SecurityGroupDbMixin):
         occurs and the plugin agent fetches the update provider
         rule in the other RPC call (security_group_rules_for_devices).
         """
+        SG_CACHE.invalidate(MEMBER_IPS, port.get(ext_sg.SECURITYGROUPS) or [])
         if port['device_owner'] == q_const.DEVICE_OWNER_DHCP:
+            SG_CACHE.invalidate(DHCP_IPS, [port['network_id']])
             self.notifier.security_groups_provider_updated(context)
         else:
             self.notifier.security_groups_member_updated(
                 context, port.get(ext_sg.SECURITYGROUPS))
 
+    def notify_security_groups_members_updated(self, context, ports):
+        """Notify the update of the members of the groups of many ports.
+
+        The agents are sent a single notification for all the ports.
+        """
+        sgids = set()
+        dhcp_network_ids = set()
+        members_updated = False
+        for port in ports:
+            sgids.update(port.get(ext_sg.SECURITYGROUPS) or [])
+            if port['device_owner'] == q_const.DEVICE_OWNER_DHCP:
+                dhcp_network_ids.add(port['network_id'])
+            else:
+                members_updated = True
+        SG_CACHE.invalidate(MEMBER_IPS, sgids)
+        if dhcp_network_ids:
+            SG_CACHE.invalidate(DHCP_IPS, dhcp_network_ids)
+            self.notifier.security_groups_provider_updated(context)
+        if members_updated:
+            self.notifier.security_groups_member_updated(context,
+                                                         list(sgids))
+
 
 class SecurityGroupServerRpcCallbackMixin(object):
     """A mix-in that enable SecurityGroup agent
@@ -134,8 +235,33 @@ class SecurityGroupServerRpcCallbackMixin(object):
         :params devices: list of devices
         :returns: port correspond to the devices with security group rules
         """
-        devices = kwargs.get('devices')
+        ports = self._get_ports_for_devices(kwargs.get('devices'))
+        return self._security_group_rules_for_ports(context, ports)
+
+    def security_group_info_for_devices(self, context, **kwargs):
+        """ return security group rules and remote group members
+
+        unlike security_group_rules_for_devices, remote_group_id rules
+        are not converted: the IPs of each remote group are returned
+        once, for the agent to match them with a single rule
+
+        :params devices: list of devices
+        :returns: dict with the ports corresponding to the devices with
+                  their security group rules in 'devices', and the IPs
+                  of the ports of each remote group in 'sg_member_ips'
+        """
+        ports = self._get_ports_for_devices(kwargs.get('devices'))
+        self._add_security_group_rules(context, ports)
+        for port in ports.values():
+            for rule in port['security_group_rules']:
+                remote_group_id = rule.get('remote_group_id')
+                if remote_group_id:
+                    port['security_group_source_groups'].append(
+                        remote_group_id)
+        return {'devices': ports,
+                'sg_member_ips': self._get_remote_group_ips(context, ports)}
 
+    def _get_ports_for_devices(self, devices):
         ports = {}
         for device in devices:
             port = self.get_port_from_device(device)
@@ -144,22 +270,41 @@ class SecurityGroupServerRpcCallbackMixin(object):
             if port['device_owner'].startswith('network:'):
                 continue
             ports[port['id']] = port
-        return self._security_group_rules_for_ports(context, ports)
-
-    def _select_rules_for_ports(self, context, ports):
-        if not ports:
-            return []
-        sg_binding_port = sg_db.SecurityGroupPortBinding.port_id
-        sg_binding_sgid = sg_db.SecurityGroupPortBinding.security_group_id
+        return ports
 
+    def _get_cached(self, kind, keys, select_func, context):
+        """Return select_func's values for keys, reading missing ones."""
+        generation = SG_CACHE.generation
+        values = SG_CACHE.get(kind, keys)
+        missing = [key for key in keys if key not in values]
+        if missing:
+            selected = select_func(context, missing)
+            SG_CACHE.set(kind, selected, generation)
+            values.update(selected)
+        return values
+
+    def _select_rules_for_security_groups(self, context, security_group_ids):
+        rules_by_group = dict((sgid, []) for sgid in security_group_ids)
         sgr_sgid = sg_db.SecurityGroupRule.security_group_id
-
-        query = context.session.query(sg_db.SecurityGroupPortBinding,
-                                      sg_db.SecurityGroupRule)
-        query = query.join(sg_db.SecurityGroupRule,
-                           sgr_sgid == sg_binding_sgid)
-        query = query.filter(sg_binding_port.in_(ports.keys()))
-        return query.all()
+        query = context.session.query(sg_db.SecurityGroupRule)
+        query = query.filter(sgr_sgid.in_(security_group_ids))
+        for rule_in_db in query:
+            direction = rule_in_db['direction']
+            rule_dict = {
+                'security_group_id': rule_in_db['security_group_id'],
+                'direction': direction,
+                'ethertype': rule_in_db['ethertype'],
+            }
+            for key in ('protocol', 'port_range_min', 'port_range_max',
+                        'remote_ip_prefix', 'remote_group_id'):
+                if rule_in_db.get(key):
+                    if key == 'remote_ip_prefix':
+                        direction_ip_prefix = DIRECTION_IP_PREFIX[direction]
+                        rule_dict[direction_ip_prefix] = rule_in_db[key]
+                        continue
+                    rule_dict[key] = rule_in_db[key]
+            rules_by_group[rule_in_db['security_group_id']].append(rule_dict)
+        return rules_by_group
 
     def _select_ips_for_remote_group(self, context, remote_group_ids):
         ips_by_group = {}
@@ -183,13 +328,13 @@ class SecurityGroupServerRpcCallbackMixin(object):
         return ips_by_group
 
     def _select_remote_group_ids(self, ports):
-        remote_group_ids = []
+        remote_group_ids = set()
         for port in ports.values():
             for rule in port.get('security_group_rules'):
                 remote_group_id = rule.get('remote_group_id')
                 if remote_group_id:
-                    remote_group_ids.append(remote_group_id)
-        return remote_group_ids
+                    remote_group_ids.add(remote_group_id)
+        return list(remote_group_ids)
 
     def _select_network_ids(self, ports):
         return set((port['network_id'] for port in ports.values()))
@@ -212,9 +357,13 @@ class SecurityGroupServerRpcCallbackMixin(object):
             ips[port['network_id']].append(ip)
         return ips
 
-    def _convert_remote_group_id_to_ip_prefix(self, context, ports):
+    def _get_remote_group_ips(self, context, ports):
         remote_group_ids = self._select_remote_group_ids(ports)
-        ips = self._select_ips_for_remote_group(context, remote_group_ids)
+        return self._get_cached(MEMBER_IPS, remote_group_ids,
+                                self._select_ips_for_remote_group, context)
+
+    def _convert_remote_group_id_to_ip_prefix(self, context, ports):
+        ips = self._get_remote_group_ips(context, ports)
         for port in ports.values():
             updated_rule = []
             for rule in port.get('security_group_rules'):
@@ -272,31 +421,27 @@ class SecurityGroupServerRpcCallbackMixin(object):
             port['security_group_rules'].append(ra_rule)
 
     def _apply_provider_rule(self, context, ports):
-        network_ids = self._select_network_ids(ports)
-        ips = self._select_dhcp_ips_for_network_ids(context, network_ids)
+        network_ids = list(self._select_network_ids(ports))
+        ips = self._get_cached(DHCP_IPS, network_ids,
+                               self._select_dhcp_ips_for_network_ids, context)
         for port in ports.values():
             self._add_ingress_ra_rule(port, ips)
             self._add_ingress_dhcp_rule(port, ips)
 
     def _security_group_rules_for_ports(self, context, ports):
-        rules_in_db = self._select_rules_for_ports(context, ports)
-        for (binding, rule_in_db) in rules_in_db:
-            port_id = binding['port_id']
-            port = ports[port_id]
-            direction = rule_in_db['direction']
-            rule_dict = {
-                'security_group_id': rule_in_db['security_group_id'],
-                'direction': direction,
-                'ethertype': rule_in_db['ethertype'],
-            }
-            for key in ('protocol', 'port_range_min', 'port_range_max',
-                        'remote_ip_prefix', 'remote_group_id'):
-                if rule_in_db.get(key):
-                    if key == 'remote_ip_prefix':
-                        direction_ip_prefix = DIRECTION_IP_PREFIX[direction]
-                        rule_dict[direction_ip_prefix] = rule_in_db[key]
-                        continue
-                    rule_dict[key] = rule_in_db[key]
-            port['security_group_rules'].append(rule_dict)
-        self._apply_provider_rule(context, ports)
+        self._add_security_group_rules(context, ports)
         return self._convert_remote_group_id_to_ip_prefix(context, ports)
+
+    def _add_security_group_rules(self, context, ports):
+        security_group_ids = set()
+        for port in ports.values():
+            security_group_ids.update(port.get(ext_sg.SECURITYGROUPS) or [])
+        rules = self._get_cached(RULES, list(security_group_ids),
+                                 self._select_rules_for_security_groups,
+                                 context)
+        for port in ports.values():
+            for security_group_id in port.get(ext_sg.SECURITYGROUPS) or []:
+                # The cached rules are shared, the port gets copies
+                port['security_group_rules'].extend(
+                    dict(rule) for rule in rules[security_group_id])
+        self._apply_provider_rule(context, ports)
@@ -363,7 +363,8 @@ class LoadBalancerPluginBase(ServicePluginBase):
         return 'LoadBalancer service plugin'
 
     @abc.abstractmethod
-    def get_vips(self, context, filters=None, fields=None):
+    def get_vips(self, context, filters=None, fields=None,
+                 sorts=None, limit=None, marker=None, page_reverse=False):
         pass
 
     @abc.abstractmethod
@@ -383,7 +384,8 @@ class LoadBalancerPluginBase(ServicePluginBase):
         pass
 
     @abc.abstractmethod
-    def get_pools(self, context, filters=None, fields=None):
+    def get_pools(self, context, filters=None, fields=None,
+                  sorts=None, limit=None, marker=None, page_reverse=False):
         pass
 
     @abc.abstractmethod
@@ -419,7 +421,8 @@ class LoadBalancerPluginBase(ServicePluginBase):
         pass
 
     @abc.abstractmethod
-    def get_members(self, context, filters=None, fields=None):
+    def get_members(self, context, filters=None, fields=None,
+                    sorts=None, limit=None, marker=None, page_reverse=False):
         pass
 
     @abc.abstractmethod
@@ -439,7 +442,9 @@ class LoadBalancerPluginBase(ServicePluginBase):
         pass
 
     @abc.abstractmethod
-    def get_health_monitors(self, context, filters=None, fields=None):
+    def get_health_monitors(self, context, filters=None, fields=None,
+                            sorts=None, limit=None, marker=None,
+                            page_reverse=False):
         pass
 
     @abc.abstractmethod
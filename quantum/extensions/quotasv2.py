@@ -33,6 +33,7 @@ RESOURCE_NAME = 'quota'
 RESOURCE_COLLECTION = RESOURCE_NAME + "s"
 QUOTAS = quota.QUOTAS
 DB_QUOTA_DRIVER = 'quantum.db.quota_db.DbQuotaDriver'
+USAGE_TRACKING_QUOTA_DRIVER = 'quantum.db.quota_db.UsageTrackingQuotaDriver'
 EXTENDED_ATTRIBUTES_2_0 = {
     RESOURCE_COLLECTION: {}
 }
@@ -117,7 +118,8 @@ class Quotasv2(extensions.ExtensionDescriptor):
     @classmethod
     def get_description(cls):
         description = 'Expose functions for quotas management'
-        if cfg.CONF.QUOTAS.quota_driver == DB_QUOTA_DRIVER:
+        if cfg.CONF.QUOTAS.quota_driver in (DB_QUOTA_DRIVER,
+                                            USAGE_TRACKING_QUOTA_DRIVER):
             description += ' per tenant'
         return description
 
@@ -46,10 +46,13 @@ on port-attach) on an additional PUT to do a bulk dump of all persistent data.
 
 import base64
 import copy
+import hashlib
 import httplib
 import json
+import re
 import socket
 
+import eventlet
 from oslo.config import cfg
 
 from quantum.api.rpc.agentnotifiers import dhcp_rpc_agent_api
@@ -63,11 +66,14 @@ from quantum.db import api as db
 from quantum.db import db_base_plugin_v2
 from quantum.db import dhcp_rpc_base
 from quantum.db import l3_db
+from quantum.db import models_v2
 from quantum.extensions import l3
 from quantum.extensions import portbindings
 from quantum.openstack.common import lockutils
 from quantum.openstack.common import log as logging
 from quantum.openstack.common import rpc
+from quantum.openstack.common import timeutils
+from quantum.plugins.bigswitch import restproxy_db
 from quantum.plugins.bigswitch.version import version_string_with_vcs
 from quantum import policy
 
@@ -93,6 +99,19 @@ restproxy_opts = [
     cfg.BoolOpt('add_meta_server_route', default=True,
                 help=_("Flag to decide if a route to the metadata server "
                        "should be injected into the VM")),
+    cfg.BoolOpt('async_mode', default=False,
+                help=_("Return from the API calls once the database is "
+                       "updated, queueing the calls to the network "
+                       "controllers in the database to be sent in the "
+                       "background")),
+    cfg.IntOpt('async_retry_interval', default=1,
+               help=_("Number of seconds to wait before retrying a queued "
+                      "call which failed, and before looking for calls "
+                      "queued by other API workers")),
+    cfg.IntOpt('async_max_retry_interval', default=60,
+               help=_("Maximum number of seconds to wait before retrying a "
+                      "queued call, the interval doubling after every "
+                      "failure")),
 ]
 
 
@@ -109,6 +128,10 @@ PORTS_PATH = "/tenants/%s/networks/%s/ports/%s"
 ATTACHMENT_PATH = "/tenants/%s/networks/%s/ports/%s/attachment"
 ROUTERS_PATH = "/tenants/%s/routers/%s"
 ROUTER_INTF_PATH = "/tenants/%s/routers/%s/interfaces/%s"
+TOPOLOGY_DIGESTS_PATH = "/topology/digests"
+TENANT_TOPOLOGY_PATH = "/tenants/%s/topology"
+TENANT_RESOURCE_PREFIX = "/tenants/%s/"
+TENANT_RESOURCE_RE = re.compile(r'^/tenants/([^/]+)/')
 SUCCESS_CODES = range(200, 207)
 FAILURE_CODES = [0, 301, 302, 303, 400, 401, 403, 404, 500, 501, 502, 503,
                  504, 505]
@@ -118,6 +141,10 @@ ORCHESTRATION_SERVICE_ID = 'Quantum v2.0'
 METADATA_SERVER_IP = '169.254.169.254'
 
 
+def _sorted_by_id(resources):
+    return sorted(resources, key=lambda resource: resource['id'])
+
+
 class RemoteRestError(exceptions.QuantumException):
     def __init__(self, message):
         if message is None:
@@ -143,6 +170,22 @@ class ServerProxy(object):
         self.quantum_id = quantum_id
         if auth:
             self.auth = 'Basic ' + base64.encodestring(auth).strip()
+        self.conn = None
+
+    def _get_connection(self):
+        if self.conn is None:
+            if self.ssl:
+                self.conn = httplib.HTTPSConnection(
+                    self.server, self.port, timeout=self.timeout)
+            else:
+                self.conn = httplib.HTTPConnection(
+                    self.server, self.port, timeout=self.timeout)
+        return self.conn
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
 
     @lockutils.synchronized('rest_call', 'bsn-', external=True)
     def rest_call(self, action, resource, data, headers):
@@ -165,38 +208,34 @@ class ServerProxy(object):
         LOG.debug(_("ServerProxy: resource=%(resource)s, data=%(data)r, "
                     "headers=%(headers)r"), locals())
 
-        conn = None
-        if self.ssl:
-            conn = httplib.HTTPSConnection(
-                self.server, self.port, timeout=self.timeout)
-            if conn is None:
-                LOG.error(_('ServerProxy: Could not establish HTTPS '
-                            'connection'))
-                return 0, None, None, None
-        else:
-            conn = httplib.HTTPConnection(
-                self.server, self.port, timeout=self.timeout)
-            if conn is None:
-                LOG.error(_('ServerProxy: Could not establish HTTP '
-                            'connection'))
-                return 0, None, None, None
-
-        try:
-            conn.request(action, uri, body, headers)
-            response = conn.getresponse()
-            respstr = response.read()
-            respdata = respstr
-            if response.status in self.success_codes:
-                try:
-                    respdata = json.loads(respstr)
-                except ValueError:
-                    # response was not JSON, ignore the exception
-                    pass
-            ret = (response.status, response.reason, respstr, respdata)
-        except (socket.timeout, socket.error) as e:
-            LOG.error(_('ServerProxy: %(action)s failure, %(e)r'), locals())
-            ret = 0, None, None, None
-        conn.close()
+        # The connection is kept open between calls; as it may have been
+        # closed by the controller while idle, the call is retried once on a
+        # new connection when a kept connection fails.
+        for attempt in range(2):
+            reused = self.conn is not None
+            conn = self._get_connection()
+            try:
+                conn.request(action, uri, body, headers)
+                response = conn.getresponse()
+                respstr = response.read()
+                respdata = respstr
+                if response.status in self.success_codes:
+                    try:
+                        respdata = json.loads(respstr)
+                    except ValueError:
+                        # response was not JSON, ignore the exception
+                        pass
+                ret = (response.status, response.reason, respstr, respdata)
+                break
+            except (socket.timeout, socket.error,
+                    httplib.HTTPException) as e:
+                self.close()
+                if reused and not isinstance(e, socket.timeout):
+                    continue
+                LOG.error(_('ServerProxy: %(action)s failure, %(e)r'),
+                          locals())
+                ret = 0, None, None, None
+                break
         LOG.debug(_("ServerProxy: status=%(status)d, reason=%(reason)r, "
                     "ret=%(ret)s, data=%(data)r"), {'status': ret[0],
                                                     'reason': ret[1],
@@ -235,8 +274,16 @@ class ServerPool(object):
         """
         return resp[0] in SUCCESS_CODES
 
-    def rest_call(self, action, resource, data, headers):
+    def rest_call(self, action, resource, data, headers, context=None):
+        """Send the call to the first server which does not fail.
+
+        :param context: the context of the API call, used by
+            AsyncServerPool to queue the call in its transaction
+        :returns: the response of that server, or of the last server tried
+            when all of them fail
+        """
         failed_servers = []
+        ret = (0, None, None, None)
         while self.servers:
             active_server = self.servers[0]
             ret = active_server.rest_call(action, resource, data, headers)
@@ -258,24 +305,203 @@ class ServerPool(object):
                    'server': tuple((s.server,
                                     s.port) for s in failed_servers)})
         self.servers.extend(failed_servers)
-        return (0, None, None, None)
+        return ret
 
-    def get(self, resource, data='', headers=None):
-        return self.rest_call('GET', resource, data, headers)
+    def get(self, resource, data='', headers=None, context=None):
+        return self.rest_call('GET', resource, data, headers, context)
+
+    def put(self, resource, data, headers=None, context=None):
+        return self.rest_call('PUT', resource, data, headers, context)
+
+    def post(self, resource, data, headers=None, context=None):
+        return self.rest_call('POST', resource, data, headers, context)
+
+    def delete(self, resource, data='', headers=None, context=None):
+        return self.rest_call('DELETE', resource, data, headers, context)
+
+
+class AsyncServerPool(ServerPool):
+    """Server pool queueing the calls which change the network ctrl.
+
+    The PUT, POST and DELETE calls are stored in the database and return at
+    once, while a green thread sends them in order. A queued PUT updates
+    the PUT of the same resource still pending, a queued DELETE replaces
+    them. A call which fails because no network ctrl answered, or with a
+    server error, is retried, the interval doubling after every failure,
+    holding back the calls queued after it. When the network ctrl rejects
+    a call, the topology of the tenant, as returned by get_tenant_topology,
+    is sent instead of the queued calls of the tenant; a call is only
+    dropped if it is not about a tenant or the topology is rejected too.
+    The API workers send the queued calls one at a time.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.get_tenant_topology = kwargs.pop('get_tenant_topology', None)
+        super(AsyncServerPool, self).__init__(*args, **kwargs)
+        self.sent = 0
+        self.replaced = 0
+        self.retries = 0
+        self.resyncs = 0
+        self.dropped = 0
+        self._wakeup = eventlet.queue.LightQueue(maxsize=1)
+        self._thread = None
+
+    def start(self):
+        if not self._thread:
+            self._thread = eventlet.spawn(self._run)
+
+    def stop(self):
+        if self._thread:
+            self._thread.kill()
+            self._thread = None
+
+    def rest_call(self, action, resource, data, headers, context=None):
+        if action == 'GET':
+            return super(AsyncServerPool, self).rest_call(action, resource,
+                                                          data, headers)
+        # The call is only queued if the transaction of the API call, if
+        # any, is committed
+        session = context.session if context else db.get_session()
+        self.replaced += restproxy_db.add_pending_call(session, action,
+                                                       resource, data)
+        try:
+            self._wakeup.put_nowait(None)
+        except eventlet.queue.Full:
+            pass
+        return (202, 'Accepted', None, None)
 
-    def put(self, resource, data, headers=None):
-        return self.rest_call('PUT', resource, data, headers)
+    def _send(self, action, resource, data):
+        """Send a call, counting the calls to retry.
 
-    def post(self, resource, data, headers=None):
-        return self.rest_call('POST', resource, data, headers)
+        :returns: the response, or None if the call must be retried
+        """
+        ret = super(AsyncServerPool, self).rest_call(action, resource, data,
+                                                     None)
+        # No network ctrl answered, or with a server error
+        if ret[0] == 0 or ret[0] >= 500:
+            self.retries += 1
+            return None
+        return ret
+
+    @lockutils.synchronized('pending_calls', 'bsn-', external=True)
+    def _send_next_call(self):
+        """Send the oldest queued call.
 
-    def delete(self, resource, data='', headers=None):
-        return self.rest_call('DELETE', resource, data, headers)
+        :returns: None if no call is queued, False if the call must be
+            retried, else True
+        """
+        session = db.get_session()
+        call = restproxy_db.get_next_pending_call(session)
+        if not call:
+            return None
+        call_id, updates, action, resource, data = call
+        ret = self._send(action, resource, data)
+        if not ret:
+            return False
+        if self.action_success(ret):
+            self.sent += 1
+            restproxy_db.delete_pending_call(session, call_id, updates)
+            return True
+        LOG.warning(_('QuantumRestProxy: Queued %(action)s of %(resource)s '
+                      'rejected by the network ctrl: %(status)d '
+                      '%(reason)s'),
+                    {'action': action, 'resource': resource,
+                     'status': ret[0], 'reason': ret[1]})
+        match = TENANT_RESOURCE_RE.match(resource)
+        if match and self.get_tenant_topology:
+            tenant_id = match.group(1)
+            resource = TENANT_TOPOLOGY_PATH % tenant_id
+            # The calls queued before the topology is read are all part of
+            # it, those queued since are sent afterwards
+            calls = restproxy_db.get_pending_calls(
+                session, TENANT_RESOURCE_PREFIX % tenant_id)
+            ret = self._send('PUT', resource,
+                             self.get_tenant_topology(tenant_id))
+            if not ret:
+                return False
+            if self.action_success(ret):
+                LOG.info(_('QuantumRestProxy: Topology of tenant '
+                           '%(tenant_id)s sent instead of its %(count)d '
+                           'queued calls'),
+                         {'tenant_id': tenant_id, 'count': len(calls)})
+                self.resyncs += 1
+                for call_id, updates in calls:
+                    restproxy_db.delete_pending_call(session, call_id,
+                                                     updates)
+                return True
+        LOG.error(_('QuantumRestProxy: Dropping queued call rejected by the '
+                    'network ctrl, the network ctrl is out of sync until '
+                    'the next full sync: %(status)d %(reason)s on '
+                    '%(resource)s'),
+                  {'status': ret[0], 'reason': ret[1],
+                   'resource': resource})
+        self.dropped += 1
+        restproxy_db.delete_pending_call(session, call_id, updates)
+        return True
+
+    def drain(self):
+        """Send the queued calls in order.
+
+        :returns: True once no call is queued, False if a call failed
+        """
+        while True:
+            sent = self._send_next_call()
+            if sent is None:
+                return True
+            if not sent:
+                return False
+
+    def get_stats(self):
+        """Return the metrics of the queue.
+
+        The depth and the lag, i.e.: the age in seconds of the oldest
+        queued call, are those of the queue shared by the API workers,
+        while the calls sent, replaced, retried and dropped and the tenants
+        re-synced are counted by this API worker.
+        """
+        depth, oldest = restproxy_db.get_pending_calls_stats(
+            db.get_session())
+        lag = oldest and timeutils.delta_seconds(oldest, timeutils.utcnow())
+        return {'depth': depth, 'lag': lag or 0, 'sent': self.sent,
+                'replaced': self.replaced, 'retries': self.retries,
+                'resyncs': self.resyncs, 'dropped': self.dropped}
+
+    def _run(self):
+        interval = cfg.CONF.RESTPROXY.async_retry_interval
+        while True:
+            sent = self.sent
+            # An error must not stop the green thread
+            try:
+                drained = self.drain()
+            except Exception:
+                LOG.exception(_('QuantumRestProxy: Unable to send the '
+                                'queued calls'))
+                drained = False
+            if drained:
+                if self.sent != sent:
+                    LOG.debug(_('QuantumRestProxy: Queued calls sent: '
+                                '%(stats)s'), {'stats': self.get_stats()})
+                interval = cfg.CONF.RESTPROXY.async_retry_interval
+                try:
+                    self._wakeup.get(timeout=interval)
+                except eventlet.queue.Empty:
+                    pass
+                continue
+            stats = self.get_stats()
+            LOG.warning(_('QuantumRestProxy: %(depth)d calls queued, the '
+                          'oldest for %(lag)d seconds, retrying in '
+                          '%(interval)d seconds: %(stats)s'),
+                        {'depth': stats['depth'], 'lag': stats['lag'],
+                         'interval': interval, 'stats': stats})
+            eventlet.sleep(interval)
+            interval = min(interval * 2,
+                           cfg.CONF.RESTPROXY.async_max_retry_interval)
 
 
 class RpcProxy(dhcp_rpc_base.DhcpRpcCallbackMixin):
 
-    RPC_API_VERSION = '1.0'
+    # DhcpPluginApi version supporting get_networks_info
+    RPC_API_VERSION = '1.2'
 
     def create_rpc_dispatcher(self):
         return q_rpc.PluginRpcDispatcher([self])
@@ -314,8 +540,13 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
         assert all(len(s) == 2 for s in servers), SYNTAX_ERROR_MESSAGE
 
         # init network ctrl connections
-        self.servers = ServerPool(servers, server_ssl, server_auth, quantum_id,
-                                  timeout, BASE_URI)
+        if cfg.CONF.RESTPROXY.async_mode:
+            self.servers = AsyncServerPool(
+                servers, server_ssl, server_auth, quantum_id, timeout,
+                BASE_URI, get_tenant_topology=self._get_tenant_topology)
+        else:
+            self.servers = ServerPool(servers, server_ssl, server_auth,
+                                      quantum_id, timeout, BASE_URI)
 
         # init dhcp support
         self.topic = topics.PLUGIN
@@ -327,7 +558,9 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
         # Consume from all consumers in a thread
         self.conn.consume_in_thread()
         if sync_data:
-            self._send_all_data()
+            self._sync_topology()
+        if cfg.CONF.RESTPROXY.async_mode:
+            self.servers.start()
 
         self._dhcp_agent_notifier = dhcp_rpc_agent_api.DhcpAgentNotifyAPI()
         LOG.debug(_("QuantumRestProxyV2: initialization done"))
@@ -376,7 +609,7 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
             data = {
                 "network": mapped_network
             }
-            ret = self.servers.post(resource, data)
+            ret = self.servers.post(resource, data, context=context)
             if not self.servers.action_success(ret):
                 raise RemoteRestError(ret[2])
         except RemoteRestError as e:
@@ -428,7 +661,7 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
 
         # update network on network controller
         try:
-            self._send_update_network(new_net)
+            self._send_update_network(new_net, context)
         except RemoteRestError as e:
             LOG.error(_("QuantumRestProxyV2: Unable to update remote "
                         "network: %s"), e.message)
@@ -471,7 +704,7 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
         # delete from network ctrl. Remote error on delete is ignored
         try:
             resource = NETWORKS_PATH % (tenant_id, net_id)
-            ret = self.servers.delete(resource)
+            ret = self.servers.delete(resource, context=context)
             if not self.servers.action_success(ret):
                 raise RemoteRestError(ret[2])
             ret_val = super(QuantumRestProxyV2, self).delete_network(context,
@@ -528,7 +761,7 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
             data = {
                 "port": mapped_port
             }
-            ret = self.servers.post(resource, data)
+            ret = self.servers.post(resource, data, context=context)
             if not self.servers.action_success(ret):
                 raise RemoteRestError(ret[2])
 
@@ -610,7 +843,7 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
                                      orig_port["network_id"], port_id)
             mapped_port = self._map_state_and_status(new_port)
             data = {"port": mapped_port}
-            ret = self.servers.put(resource, data)
+            ret = self.servers.put(resource, data, context=context)
             if not self.servers.action_success(ret):
                 raise RemoteRestError(ret[2])
 
@@ -633,6 +866,7 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
                                                         orig_port)
             raise
 
+        self.update_router_for_port(context, orig_port, new_port)
         # return new_port
         return self._extend_port_dict_binding(context, new_port)
 
@@ -665,7 +899,7 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
         try:
             resource = PORTS_PATH % (port["tenant_id"], port["network_id"],
                                      port_id)
-            ret = self.servers.delete(resource)
+            ret = self.servers.delete(resource, context=context)
             if not self.servers.action_success(ret):
                 raise RemoteRestError(ret[2])
 
@@ -705,7 +939,7 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
                          "mac": mac,
                          }
                         }
-                ret = self.servers.put(resource, data)
+                ret = self.servers.put(resource, data, context=context)
                 if not self.servers.action_success(ret):
                     raise RemoteRestError(ret[2])
         except RemoteRestError as e:
@@ -726,7 +960,7 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
         # delete from network ctrl. Remote error on delete is ignored
         try:
             resource = ATTACHMENT_PATH % (tenant_id, net_id, port_id)
-            ret = self.servers.delete(resource)
+            ret = self.servers.delete(resource, context=context)
             if not self.servers.action_success(ret):
                 raise RemoteRestError(ret[2])
         except RemoteRestError as e:
@@ -746,7 +980,7 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
                                                                net_id)
         # update network on network controller
         try:
-            self._send_update_network(orig_net)
+            self._send_update_network(orig_net, context)
         except RemoteRestError:
             # rollback creation of subnet
             super(QuantumRestProxyV2, self).delete_subnet(context,
@@ -760,6 +994,7 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
         self._warn_on_state_status(subnet['subnet'])
 
         orig_subnet = super(QuantumRestProxyV2, self)._get_subnet(context, id)
+        orig_gateway_ip = orig_subnet['gateway_ip']
 
         # update subnet in DB
         new_subnet = super(QuantumRestProxyV2, self).update_subnet(context, id,
@@ -769,12 +1004,14 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
                                                                net_id)
         # update network on network controller
         try:
-            self._send_update_network(orig_net)
+            self._send_update_network(orig_net, context)
         except RemoteRestError:
             # rollback updation of subnet
             super(QuantumRestProxyV2, self).update_subnet(context, id,
                                                           orig_subnet)
             raise
+        self.update_routers_for_subnet(
+            context, {'gateway_ip': orig_gateway_ip}, new_subnet)
         return new_subnet
 
     def delete_subnet(self, context, id):
@@ -787,7 +1024,7 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
                                                                net_id)
         # update network on network controller
         try:
-            self._send_update_network(orig_net)
+            self._send_update_network(orig_net, context)
         except RemoteRestError:
             # TODO (Sumit): rollback deletion of subnet
             raise
@@ -810,7 +1047,7 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
             data = {
                 "router": mapped_router
             }
-            ret = self.servers.post(resource, data)
+            ret = self.servers.post(resource, data, context=context)
             if not self.servers.action_success(ret):
                 raise RemoteRestError(ret[2])
         except RemoteRestError as e:
@@ -843,7 +1080,7 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
             data = {
                 "router": mapped_router
             }
-            ret = self.servers.put(resource, data)
+            ret = self.servers.put(resource, data, context=context)
             if not self.servers.action_success(ret):
                 raise RemoteRestError(ret[2])
         except RemoteRestError as e:
@@ -883,7 +1120,7 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
         # delete from network ctrl. Remote error on delete is ignored
         try:
             resource = ROUTERS_PATH % (tenant_id, router_id)
-            ret = self.servers.delete(resource)
+            ret = self.servers.delete(resource, context=context)
             if not self.servers.action_success(ret):
                 raise RemoteRestError(ret[2])
             ret_val = super(QuantumRestProxyV2, self).delete_router(context,
@@ -920,7 +1157,7 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
         try:
             resource = ROUTER_INTF_OP_PATH % (tenant_id, router_id)
             data = {"interface": intf_details}
-            ret = self.servers.post(resource, data)
+            ret = self.servers.post(resource, data, context=context)
             if not self.servers.action_success(ret):
                 raise RemoteRestError(ret[2])
         except RemoteRestError as e:
@@ -964,7 +1201,7 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
         # create router on the network controller
         try:
             resource = ROUTER_INTF_PATH % (tenant_id, router_id, interface_id)
-            ret = self.servers.delete(resource)
+            ret = self.servers.delete(resource, context=context)
             if not self.servers.action_success(ret):
                 raise RemoteRestError(ret[2])
         except RemoteRestError as e:
@@ -987,7 +1224,7 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
                                                                net_id)
         # create floatingip on the network controller
         try:
-            self._send_update_network(orig_net)
+            self._send_update_network(orig_net, context)
         except RemoteRestError as e:
             LOG.error(_("QuantumRestProxyV2: Unable to create remote "
                         "floatin IP: %s"), e.message)
@@ -1013,7 +1250,7 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
                                                                net_id)
         # update network on network controller
         try:
-            self._send_update_network(orig_net)
+            self._send_update_network(orig_net, context)
         except RemoteRestError:
             # rollback updation of subnet
             super(QuantumRestProxyV2, self).update_floatingip(context, id,
@@ -1034,32 +1271,35 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
                                                                net_id)
         # update network on network controller
         try:
-            self._send_update_network(orig_net)
+            self._send_update_network(orig_net, context)
         except RemoteRestError:
             # TODO(Sumit): rollback deletion of floating IP
             raise
 
-    def _send_all_data(self):
-        """Pushes all data to network ctrl (networks/ports, ports/attachments)
-        to give the controller an option to re-sync it's persistent store
-        with quantum's current view of that data.
+    def _get_all_data(self, admin_context, tenant_id=None):
+        """Return the networks and routers, of a tenant if specified, as
+        sent to the network ctrl, every list being sorted by id.
         """
-        admin_context = qcontext.get_admin_context()
+        filters = {'tenant_id': [tenant_id]} if tenant_id else None
         networks = []
         routers = []
 
         all_networks = super(QuantumRestProxyV2,
-                             self).get_networks(admin_context) or []
-        for net in all_networks:
+                             self).get_networks(admin_context,
+                                                filters=filters) or []
+        for net in _sorted_by_id(all_networks):
             mapped_network = self._get_mapped_network_with_subnets(net)
             net_fl_ips = self._get_network_with_floatingips(mapped_network)
+            net_fl_ips['subnets'] = _sorted_by_id(net_fl_ips['subnets'])
+            net_fl_ips['floatingips'] = _sorted_by_id(
+                net_fl_ips['floatingips'])
 
             ports = []
             net_filter = {'network_id': [net.get('id')]}
             net_ports = super(QuantumRestProxyV2,
                               self).get_ports(admin_context,
                                               filters=net_filter) or []
-            for port in net_ports:
+            for port in _sorted_by_id(net_ports):
                 mapped_port = self._map_state_and_status(port)
                 mapped_port['attachment'] = {
                     'id': port.get('device_id'),
@@ -1071,8 +1311,9 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
             networks.append(net_fl_ips)
 
         all_routers = super(QuantumRestProxyV2,
-                            self).get_routers(admin_context) or []
-        for router in all_routers:
+                            self).get_routers(admin_context,
+                                              filters=filters) or []
+        for router in _sorted_by_id(all_routers):
             interfaces = []
             mapped_router = self._map_state_and_status(router)
             router_filter = {
@@ -1082,7 +1323,7 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
             router_ports = super(QuantumRestProxyV2,
                                  self).get_ports(admin_context,
                                                  filters=router_filter) or []
-            for port in router_ports:
+            for port in _sorted_by_id(router_ports):
                 net_id = port.get('network_id')
                 subnet_id = port['fixed_ips'][0]['subnet_id']
                 intf_details = self._get_router_intf_details(admin_context,
@@ -1093,12 +1334,20 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
 
             routers.append(mapped_router)
 
+        return {
+            'networks': networks,
+            'routers': routers,
+        }
+
+    def _send_all_data(self):
+        """Pushes all data to network ctrl (networks/ports, ports/attachments)
+        to give the controller an option to re-sync it's persistent store
+        with quantum's current view of that data.
+        """
+        admin_context = qcontext.get_admin_context()
         try:
             resource = '/topology'
-            data = {
-                'networks': networks,
-                'routers': routers,
-            }
+            data = self._get_all_data(admin_context)
             ret = self.servers.put(resource, data)
             if not self.servers.action_success(ret):
                 raise RemoteRestError(ret[2])
@@ -1108,6 +1357,65 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
                         'topology: %s'), e.message)
             raise
 
+    def _get_tenant_topology(self, tenant_id, admin_context=None):
+        """Return the topology of a tenant along with its digest."""
+        admin_context = admin_context or qcontext.get_admin_context()
+        data = self._get_all_data(admin_context, tenant_id)
+        # Sorting the keys would be much slower; should their order differ,
+        # the tenant is only sent again
+        data['digest'] = hashlib.sha1(json.dumps(data)).hexdigest()
+        return data
+
+    def _sync_topology(self):
+        """Re-sync the network ctrl with quantum, one tenant at a time.
+
+        The network ctrl returns the digest of the topology it last
+        received for every tenant. The topology of the tenants whose digest
+        differs from the digest of their current topology is sent, along
+        with the digest, so that the tenants in sync are not sent, and only
+        the topology of a single tenant is built at once. The whole
+        topology is sent with _send_all_data if the network ctrl does not
+        support digests.
+
+        :returns: the number of tenants sent
+        """
+        ret = self.servers.get(TOPOLOGY_DIGESTS_PATH)
+        if (not self.servers.action_success(ret) or
+                not isinstance(ret[3], dict)):
+            LOG.info(_('QuantumRestProxy: Topology digests not supported '
+                       'by the network ctrl, sending all data'))
+            self._send_all_data()
+            return None
+
+        admin_context = qcontext.get_admin_context()
+        remote_digests = ret[3].get('tenants') or {}
+        tenant_ids = set(remote_digests)
+        for model in (models_v2.Network, l3_db.Router):
+            tenant_ids.update(
+                tenant_id for tenant_id, in
+                admin_context.session.query(model.tenant_id).distinct())
+
+        sent = 0
+        for tenant_id in sorted(tenant_ids):
+            data = self._get_tenant_topology(tenant_id, admin_context)
+            if remote_digests.get(tenant_id) == data['digest']:
+                continue
+            try:
+                ret = self.servers.put(TENANT_TOPOLOGY_PATH % tenant_id,
+                                       data)
+                if not self.servers.action_success(ret):
+                    raise RemoteRestError(ret[2])
+            except RemoteRestError as e:
+                LOG.error(_('QuantumRestProxy: Unable to update remote '
+                            'topology of tenant %(tenant_id)s: %(msg)s'),
+                          {'tenant_id': tenant_id, 'msg': e.message})
+                raise
+            sent += 1
+        LOG.info(_('QuantumRestProxy: Topology of %(sent)d out of '
+                   '%(total)d tenants sent to the network ctrl'),
+                 {'sent': sent, 'total': len(tenant_ids)})
+        return sent
+
     def _add_host_route(self, context, destination, port):
         subnet = {}
         for fixed_ip in port['fixed_ips']:
@@ -1168,7 +1476,7 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
 
         return network
 
-    def _send_update_network(self, network):
+    def _send_update_network(self, network, context=None):
         net_id = network['id']
         tenant_id = network['tenant_id']
         # update network on network controller
@@ -1179,7 +1487,7 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
             data = {
                 "network": net_fl_ips,
             }
-            ret = self.servers.put(resource, data)
+            ret = self.servers.put(resource, data, context=context)
             if not self.servers.action_success(ret):
                 raise RemoteRestError(ret[2])
         except RemoteRestError as e:
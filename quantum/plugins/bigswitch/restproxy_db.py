@@ -0,0 +1,118 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright 2013 Big Switch Networks, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+
+import sqlalchemy as sa
+from sqlalchemy import func
+
+from quantum.db import model_base
+from quantum.openstack.common import timeutils
+
+
+class RestProxyPendingCall(model_base.BASEV2):
+    """Represents a REST call not sent to the network controllers yet.
+
+    The calls are sent in the order of their id. created_at is the time of
+    the oldest call a call replaced, so that the age of the oldest pending
+    call is the lag of the network controllers. updates counts the times
+    the data of the call was replaced, a call being only removed once its
+    latest data was sent.
+    """
+
+    __tablename__ = 'restproxy_pending_calls'
+    id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    action = sa.Column(sa.String(16), nullable=False)
+    resource = sa.Column(sa.String(255), nullable=False, index=True)
+    # Large enough for a whole topology
+    data = sa.Column(sa.Text(2 ** 32 - 1))
+    created_at = sa.Column(sa.DateTime, nullable=False)
+    updates = sa.Column(sa.Integer, nullable=False, default=0)
+
+    def __init__(self, action, resource, data, created_at):
+        self.action = action
+        self.resource = resource
+        self.data = data
+        self.created_at = created_at
+        self.updates = 0
+
+
+def add_pending_call(session, action, resource, data):
+    """Queue a REST call after the pending calls.
+
+    A pending PUT of the resource is updated in place when the resource is
+    PUT again, keeping its place in the queue, so that the resource is only
+    sent once in its latest state. The pending PUTs are removed when the
+    resource is DELETEd, the DELETE being queued last as the calls queued
+    in between may refer to the resource.
+
+    :returns: the number of pending calls replaced
+    """
+    created_at = timeutils.utcnow()
+    with session.begin(subtransactions=True):
+        replaced = 0
+        if action in ('PUT', 'DELETE'):
+            query = (session.query(RestProxyPendingCall).
+                     filter_by(resource=resource, action='PUT').
+                     order_by(RestProxyPendingCall.id))
+            for call in query:
+                if action == 'PUT' and not replaced:
+                    call.data = json.dumps(data)
+                    call.updates += 1
+                    replaced += 1
+                    continue
+                created_at = min(created_at, call.created_at)
+                session.delete(call)
+                replaced += 1
+            if action == 'PUT' and replaced:
+                return replaced
+        session.add(RestProxyPendingCall(action, resource, json.dumps(data),
+                                         created_at))
+    return replaced
+
+
+def get_next_pending_call(session):
+    call = (session.query(RestProxyPendingCall).
+            order_by(RestProxyPendingCall.id).first())
+    if call:
+        return (call['id'], call['updates'], call['action'],
+                call['resource'], json.loads(call['data']))
+
+
+def get_pending_calls(session, resource_prefix):
+    """Return the id and updates of the calls on the resources under
+    resource_prefix.
+    """
+    query = (session.query(RestProxyPendingCall.id,
+                           RestProxyPendingCall.updates,
+                           RestProxyPendingCall.resource).
+             filter(RestProxyPendingCall.resource.startswith(resource_prefix)))
+    # startswith() treats the wildcards of LIKE as such
+    return [(call_id, updates) for call_id, updates, resource in query
+            if resource.startswith(resource_prefix)]
+
+
+def delete_pending_call(session, call_id, updates):
+    """Remove a call unless its data was replaced since it was read."""
+    with session.begin(subtransactions=True):
+        session.query(RestProxyPendingCall).filter_by(
+            id=call_id, updates=updates).delete()
+
+
+def get_pending_calls_stats(session):
+    """Return the number of pending calls and the time of the oldest."""
+    return session.query(func.count(RestProxyPendingCall.id),
+                         func.min(RestProxyPendingCall.created_at)).one()
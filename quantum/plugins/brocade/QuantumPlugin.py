@@ -419,8 +419,8 @@ class BrocadePluginV2(db_base_plugin_v2.QuantumDbPluginV2,
             ports = super(BrocadePluginV2, self).get_ports(context,
                                                            filters,
                                                            fields)
+            self._extend_ports_dict_security_group(context, ports)
             for port in ports:
-                self._extend_port_dict_security_group(context, port)
                 self._extend_port_dict_binding(context, port)
                 res_ports.append(self._fields(port, fields))
 
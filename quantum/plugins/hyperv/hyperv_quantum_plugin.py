@@ -333,6 +333,14 @@ class HyperVQuantumPlugin(db_base_plugin_v2.QuantumDbPluginV2,
         # the network record, so explicit removal is not necessary
         self.notifier.network_delete(context, id)
 
+    def update_subnet(self, context, id, subnet):
+        original_subnet = super(HyperVQuantumPlugin, self).get_subnet(
+            context, id)
+        subnet = super(HyperVQuantumPlugin, self).update_subnet(
+            context, id, subnet)
+        self.update_routers_for_subnet(context, original_subnet, subnet)
+        return subnet
+
     def get_network(self, context, id, fields=None):
         net = super(HyperVQuantumPlugin, self).get_network(context, id, None)
         self._extend_network_dict_provider(context, net)
@@ -344,7 +352,7 @@ class HyperVQuantumPlugin(db_base_plugin_v2.QuantumDbPluginV2,
             context, filters, None)
         for net in nets:
             self._extend_network_dict_provider(context, net)
-            self._extend_network_dict_l3(context, net)
+        self._extend_networks_dict_l3(context, nets)
 
         return [self._fields(net, fields) for net in nets]
 
@@ -372,6 +380,7 @@ class HyperVQuantumPlugin(db_base_plugin_v2.QuantumDbPluginV2,
         original_port = super(HyperVQuantumPlugin, self).get_port(
             context, id)
         port = super(HyperVQuantumPlugin, self).update_port(context, id, port)
+        self.update_router_for_port(context, original_port, port)
         if original_port['admin_state_up'] != port['admin_state_up']:
             binding = self._db.get_network_binding(
                 None, port['network_id'])
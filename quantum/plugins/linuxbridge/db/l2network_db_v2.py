@@ -13,7 +13,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-
+import sqlalchemy as sa
 from sqlalchemy.orm import exc
 
 from quantum.common import exceptions as q_exc
@@ -193,6 +193,16 @@ def get_network_binding(session, network_id):
         return
 
 
+def get_network_bindings(session, network_ids):
+    """Return the bindings of the networks, by network id."""
+    if not network_ids:
+        return {}
+    bindings = (session.query(l2network_models_v2.NetworkBinding).
+                filter(l2network_models_v2.NetworkBinding.network_id.in_(
+                    network_ids)))
+    return dict((binding.network_id, binding) for binding in bindings)
+
+
 def get_port_from_device(device):
     """Get port from database"""
     LOG.debug(_("get_port_from_device() called"))
@@ -221,6 +231,34 @@ def get_port_from_device(device):
     return port_dict
 
 
+def get_ports_and_bindings_from_devices(devices):
+    """Get the ports matching the given device names prefixes along with
+    their network bindings.
+
+    Returns (port, binding) tuples, binding being None for networks which
+    have none.
+    """
+    session = db.get_session()
+    query = session.query(models_v2.Port, l2network_models_v2.NetworkBinding)
+    query = query.outerjoin(
+        l2network_models_v2.NetworkBinding,
+        (l2network_models_v2.NetworkBinding.network_id ==
+         models_v2.Port.network_id))
+    query = query.filter(sa.or_(*[models_v2.Port.id.startswith(device)
+                                  for device in devices]))
+    return query.all()
+
+
+def set_ports_status(port_ids, status):
+    """Set the status of several ports in a single statement."""
+    LOG.debug(_("set_ports_status as %s called"), status)
+    session = db.get_session()
+    with session.begin():
+        query = session.query(models_v2.Port)
+        query.filter(models_v2.Port.id.in_(port_ids)).update(
+            {'status': status}, synchronize_session=False)
+
+
 def set_port_status(port_id, status):
     """Set the port status"""
     LOG.debug(_("set_port_status as %s called"), status)
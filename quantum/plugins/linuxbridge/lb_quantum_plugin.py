@@ -55,7 +55,9 @@ class LinuxBridgeRpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
 
     # history
     #   1.1 Support Security Group RPC
-    RPC_API_VERSION = '1.1'
+    #   1.2 Support get_devices_details_list, update_devices_down and
+    #       security_group_info_for_devices
+    RPC_API_VERSION = '1.2'
     # Device names start with "tap"
     TAP_PREFIX_LEN = 3
 
@@ -121,6 +123,75 @@ class LinuxBridgeRpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
             LOG.debug(_("%s can not be found in database"), device)
         return entry
 
+    @classmethod
+    def _get_ports_from_devices(cls, devices):
+        """Return the (port, binding) tuples of devices by device name."""
+        if not devices:
+            return {}
+        prefixes = dict((device[cls.TAP_PREFIX_LEN:], device)
+                        for device in devices)
+        prefix_lengths = set(len(prefix) for prefix in prefixes)
+        ports = {}
+        for port, binding in db.get_ports_and_bindings_from_devices(
+                prefixes.keys()):
+            for length in prefix_lengths:
+                device = prefixes.get(port['id'][:length])
+                if device:
+                    ports[device] = (port, binding)
+        return ports
+
+    def get_devices_details_list(self, rpc_context, **kwargs):
+        """Agent requests the details of several devices"""
+        agent_id = kwargs.get('agent_id')
+        devices = kwargs.get('devices') or []
+        LOG.debug(_("Details of %(count)s devices requested from "
+                    "%(agent_id)s"),
+                  {'count': len(devices), 'agent_id': agent_id})
+        ports = self._get_ports_from_devices(devices)
+        entries = []
+        new_statuses = {}
+        for device in devices:
+            port, binding = ports.get(device, (None, None))
+            if port and binding:
+                entries.append({'device': device,
+                                'physical_network': binding.physical_network,
+                                'network_type': binding.network_type,
+                                'vlan_id': binding.vlan_id,
+                                'network_id': port['network_id'],
+                                'port_id': port['id'],
+                                'admin_state_up': port['admin_state_up']})
+                new_status = (q_const.PORT_STATUS_ACTIVE
+                              if port['admin_state_up']
+                              else q_const.PORT_STATUS_DOWN)
+                if port['status'] != new_status:
+                    new_statuses.setdefault(new_status, []).append(port['id'])
+            else:
+                entries.append({'device': device})
+                LOG.debug(_("%s can not be found in database"), device)
+        for status, port_ids in new_statuses.iteritems():
+            db.set_ports_status(port_ids, status)
+        return entries
+
+    def update_devices_down(self, rpc_context, **kwargs):
+        """Several devices no longer exist on agent"""
+        agent_id = kwargs.get('agent_id')
+        devices = kwargs.get('devices') or []
+        LOG.debug(_("%(count)s devices no longer exist on %(agent_id)s"),
+                  {'count': len(devices), 'agent_id': agent_id})
+        ports = self._get_ports_from_devices(devices)
+        entries = []
+        port_ids = []
+        for device in devices:
+            port = ports.get(device, (None, None))[0]
+            entries.append({'device': device, 'exists': bool(port)})
+            if not port:
+                LOG.debug(_("%s can not be found in database"), device)
+            elif port['status'] != q_const.PORT_STATUS_DOWN:
+                port_ids.append(port['id'])
+        if port_ids:
+            db.set_ports_status(port_ids, q_const.PORT_STATUS_DOWN)
+        return entries
+
     def update_device_up(self, rpc_context, **kwargs):
         """Device is up on agent"""
         agent_id = kwargs.get('agent_id')
@@ -294,9 +365,11 @@ class LinuxBridgePluginV2(db_base_plugin_v2.QuantumDbPluginV2,
     # REVISIT(rkukura) Use core mechanism for attribute authorization
     # when available.
 
-    def _extend_network_dict_provider(self, context, network):
+    def _extend_network_dict_provider(self, context, network, binding=None):
         if self._check_view_auth(context, network, self.network_view):
-            binding = db.get_network_binding(context.session, network['id'])
+            if binding is None:
+                binding = db.get_network_binding(context.session,
+                                                 network['id'])
             if binding.vlan_id == constants.FLAT_VLAN_ID:
                 network[provider.NETWORK_TYPE] = binding.network_type
                 network[provider.PHYSICAL_NETWORK] = binding.physical_network
@@ -465,6 +538,14 @@ class LinuxBridgePluginV2(db_base_plugin_v2.QuantumDbPluginV2,
             # the network record, so explicit removal is not necessary
         self.notifier.network_delete(context, id)
 
+    def update_subnet(self, context, id, subnet):
+        original_subnet = super(LinuxBridgePluginV2, self).get_subnet(
+            context, id)
+        subnet = super(LinuxBridgePluginV2, self).update_subnet(
+            context, id, subnet)
+        self.update_routers_for_subnet(context, original_subnet, subnet)
+        return subnet
+
     def get_network(self, context, id, fields=None):
         session = context.session
         with session.begin(subtransactions=True):
@@ -481,9 +562,12 @@ class LinuxBridgePluginV2(db_base_plugin_v2.QuantumDbPluginV2,
             nets = super(LinuxBridgePluginV2,
                          self).get_networks(context, filters, None, sorts,
                                             limit, marker, page_reverse)
+            bindings = db.get_network_bindings(
+                session, [net['id'] for net in nets])
             for net in nets:
-                self._extend_network_dict_provider(context, net)
-                self._extend_network_dict_l3(context, net)
+                self._extend_network_dict_provider(context, net,
+                                                   bindings.get(net['id']))
+            self._extend_networks_dict_l3(context, nets)
 
         return [self._fields(net, fields) for net in nets]
 
@@ -512,8 +596,8 @@ class LinuxBridgePluginV2(db_base_plugin_v2.QuantumDbPluginV2,
                           self).get_ports(context, filters, fields, sorts,
                                           limit, marker, page_reverse)
             #TODO(nati) filter by security group
+            self._extend_ports_dict_security_group(context, ports)
             for port in ports:
-                self._extend_port_dict_security_group(context, port)
                 self._extend_port_dict_binding(context, port)
                 res_ports.append(self._fields(port, fields))
         return res_ports
@@ -534,6 +618,30 @@ class LinuxBridgePluginV2(db_base_plugin_v2.QuantumDbPluginV2,
         self.notify_security_groups_member_updated(context, port)
         return self._extend_port_dict_binding(context, port)
 
+    def _create_ports_bulk(self, context, ports):
+        """Create ports as create_port does, with the set-based creator."""
+        sgids = []
+        for port in ports:
+            # Set port status as 'DOWN'. This will be updated by agent
+            port['port']['status'] = q_const.PORT_STATUS_DOWN
+            self._ensure_default_security_group_on_port(context, port)
+            sgids.append(self._get_security_groups_on_port(context, port))
+        ports = super(LinuxBridgePluginV2, self)._create_ports_bulk(
+            context, ports)
+        # The bindings refer to the ports
+        context.session.flush()
+        for port, port_sgids in zip(ports, sgids):
+            self._process_port_create_security_group(
+                context, port['id'], port_sgids)
+        return self._extend_ports_dict_security_group(context, ports)
+
+    def create_port_bulk(self, context, ports):
+        ports = self._create_bulk('port', context, ports,
+                                  bulk_creator=self._create_ports_bulk)
+        self.notify_security_groups_members_updated(context, ports)
+        return [self._extend_port_dict_binding(context, port)
+                for port in ports]
+
     def update_port(self, context, id, port):
         original_port = self.get_port(context, id)
         session = context.session
@@ -544,6 +652,7 @@ class LinuxBridgePluginV2(db_base_plugin_v2.QuantumDbPluginV2,
                 context, id, port)
             need_port_update_notify = self.update_security_group_on_port(
                 context, id, port, original_port, updated_port)
+        self.update_router_for_port(context, original_port, updated_port)
 
         need_port_update_notify |= self.is_security_group_member_updated(
             context, original_port, updated_port)
@@ -356,6 +356,12 @@ class NECPluginV2(nec_plugin_base.NECPluginV2Base,
                 reason = _("delete_ofc_tenant() failed due to %s") % exc
                 LOG.warn(reason)
 
+    def update_subnet(self, context, id, subnet):
+        original_subnet = super(NECPluginV2, self).get_subnet(context, id)
+        subnet = super(NECPluginV2, self).update_subnet(context, id, subnet)
+        self.update_routers_for_subnet(context, original_subnet, subnet)
+        return subnet
+
     def get_network(self, context, id, fields=None):
         net = super(NECPluginV2, self).get_network(context, id, None)
         self._extend_network_dict_l3(context, net)
@@ -363,8 +369,7 @@ class NECPluginV2(nec_plugin_base.NECPluginV2Base,
 
     def get_networks(self, context, filters=None, fields=None):
         nets = super(NECPluginV2, self).get_networks(context, filters, None)
-        for net in nets:
-            self._extend_network_dict_l3(context, net)
+        self._extend_networks_dict_l3(context, nets)
         return [self._fields(net, fields) for net in nets]
 
     def _extend_port_dict_binding(self, context, port):
@@ -406,6 +411,7 @@ class NECPluginV2(nec_plugin_base.NECPluginV2Base,
             new_port = super(NECPluginV2, self).update_port(context, id, port)
             need_port_update_notify = self.update_security_group_on_port(
                 context, id, port, old_port, new_port)
+        self.update_router_for_port(context, old_port, new_port)
 
         need_port_update_notify |= self.is_security_group_member_updated(
             context, old_port, new_port)
@@ -464,8 +470,8 @@ class NECPluginV2(nec_plugin_base.NECPluginV2Base,
             ports = super(NECPluginV2, self).get_ports(context, filters,
                                                        fields)
             # TODO(amotoki) filter by security group
+            self._extend_ports_dict_security_group(context, ports)
             for port in ports:
-                self._extend_port_dict_security_group(context, port)
                 self._extend_port_dict_binding(context, port)
         return [self._fields(port, fields) for port in ports]
 
@@ -613,8 +619,8 @@ class NECPluginV2AgentNotifierApi(proxy.RpcProxy,
 
 
 class DhcpRpcCallback(dhcp_rpc_base.DhcpRpcCallbackMixin):
-    # DhcpPluginApi BASE_RPC_API_VERSION
-    RPC_API_VERSION = '1.0'
+    # DhcpPluginApi version supporting get_networks_info
+    RPC_API_VERSION = '1.2'
 
 
 class L3RpcCallback(l3_rpc_base.L3RpcCallbackMixin):
@@ -625,7 +631,7 @@ class L3RpcCallback(l3_rpc_base.L3RpcCallbackMixin):
 class SecurityGroupServerRpcCallback(
     sg_db_rpc.SecurityGroupServerRpcCallbackMixin):
 
-    RPC_API_VERSION = sg_rpc.SG_RPC_VERSION
+    RPC_API_VERSION = sg_rpc.SG_INFO_RPC_VERSION
 
     @staticmethod
     def get_port_from_device(device):
@@ -68,6 +68,7 @@ from quantum.plugins.nicira.nicira_nvp_plugin import (nicira_networkgw_db
                                                       as networkgw_db)
 from quantum.plugins.nicira.nicira_nvp_plugin import nicira_qos_db as qos_db
 from quantum.plugins.nicira.nicira_nvp_plugin import nvp_cluster
+from quantum.plugins.nicira.nicira_nvp_plugin import nvp_sync
 from quantum.plugins.nicira.nicira_nvp_plugin.nvp_plugin_version import (
     PLUGIN_VERSION)
 from quantum.plugins.nicira.nicira_nvp_plugin import NvpApiClient
@@ -195,8 +196,8 @@ def parse_clusters_opts(clusters_opts, concurrent_connections,
 
 class NVPRpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin):
 
-    # Set RPC API version to 1.0 by default.
-    RPC_API_VERSION = '1.0'
+    # DhcpPluginApi version supporting get_networks_info
+    RPC_API_VERSION = '1.2'
 
     def create_rpc_dispatcher(self):
         '''Get the rpc dispatcher for this manager.
@@ -284,6 +285,9 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
             self.nvp_opts.nvp_gen_timeout, self.nvp_opts.default_cluster_name)
 
         db.configure_db()
+        # Serve the status of the resources from the database
+        self._synchronizer = nvp_sync.NvpSynchronizer(self.clusters)
+        self._synchronizer.start()
         # Extend the fault map
         self._extend_fault_map()
         # Set up RPC interface for DHCP agent
@@ -476,7 +480,8 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
                                                  port_data,
                                                  True)
             nicira_db.add_quantum_nvp_port_mapping(
-                context.session, port_data['id'], lport['uuid'])
+                context.session, port_data['id'], lport['uuid'],
+                selected_lswitch['uuid'], cluster.name)
             if (not port_data['device_owner'] in
                 (l3_db.DEVICE_OWNER_ROUTER_GW,
                  l3_db.DEVICE_OWNER_ROUTER_INTF)):
@@ -502,18 +507,17 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
                         "external networks. Port %s will be down."),
                       port_data['network_id'])
             return
-        nvp_port_id = self._nvp_get_port_id(context, self.default_cluster,
-                                            port_data)
+        cluster, nvp_switch_id, nvp_port_id = self._nvp_get_port_mapping(
+            context, port_data)
         if not nvp_port_id:
-            LOG.debug(_("Port '%s' was already deleted on NVP platform"), id)
+            LOG.debug(_("Port '%s' was already deleted on NVP platform"),
+                      port_data['id'])
             return
         # TODO(bgh): if this is a bridged network and the lswitch we just got
         # back will have zero ports after the delete we should garbage collect
         # the lswitch.
         try:
-            nvplib.delete_port(self.default_cluster,
-                               port_data['network_id'],
-                               nvp_port_id)
+            nvplib.delete_port(cluster, nvp_switch_id, nvp_port_id)
             LOG.debug(_("_nvp_delete_port completed for port %(port_id)s "
                         "on network %(net_id)s"),
                       {'port_id': port_data['id'],
@@ -525,15 +529,15 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
     def _nvp_delete_router_port(self, context, port_data):
         # Delete logical router port
         lrouter_id = port_data['device_id']
-        nvp_port_id = self._nvp_get_port_id(context, self.default_cluster,
-                                            port_data)
+        cluster, nvp_switch_id, nvp_port_id = self._nvp_get_port_mapping(
+            context, port_data)
         if not nvp_port_id:
             raise q_exc.PortNotFound(port_id=port_data['id'])
 
         try:
-            nvplib.delete_peer_router_lport(self.default_cluster,
+            nvplib.delete_peer_router_lport(cluster,
                                             lrouter_id,
-                                            port_data['network_id'],
+                                            nvp_switch_id,
                                             nvp_port_id)
         except (NvpApiClient.NvpApiException, NvpApiClient.ResourceNotFound):
             # Do not raise because the issue might as well be that the
@@ -564,7 +568,8 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
                                                  port_data,
                                                  False)
             nicira_db.add_quantum_nvp_port_mapping(
-                context.session, port_data['id'], lport['uuid'])
+                context.session, port_data['id'], lport['uuid'],
+                selected_lswitch['uuid'], cluster.name)
             LOG.debug(_("_nvp_create_port completed for port %(name)s on "
                         "network %(network_id)s. The new port id is %(id)s."),
                       port_data)
@@ -705,10 +710,11 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
                                                  port_data,
                                                  True)
             nicira_db.add_quantum_nvp_port_mapping(
-                context.session, port_data['id'], lport['uuid'])
+                context.session, port_data['id'], lport['uuid'],
+                selected_lswitch['uuid'], cluster.name)
             nvplib.plug_l2_gw_service(
                 cluster,
-                port_data['network_id'],
+                selected_lswitch['uuid'],
                 lport['uuid'],
                 port_data['device_id'],
                 int(port_data.get('gw:segmentation_id') or 0))
@@ -733,30 +739,36 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
         # this is a no-op driver
         pass
 
-    def _nvp_get_port_id(self, context, cluster, quantum_port):
-        """ Return the NVP port uuid for a given quantum port.
-        First, look up the Quantum database. If not found, execute
-        a query on NVP platform as the mapping might be missing because
-        the port was created before upgrading to grizzly. """
-        nvp_port_id = nicira_db.get_nvp_port_id(context.session,
-                                                quantum_port['id'])
-        if nvp_port_id:
-            return nvp_port_id
+    def _nvp_get_port_mapping(self, context, quantum_port):
+        """ Return the NVP cluster, lswitch and lport of a quantum port.
+        They are read from the Quantum database. If the mapping is missing
+        or incomplete, because the port was created before they were all
+        recorded, the port is looked up on every NVP cluster with a single
+        query and the mapping is updated. (None, None, None) is returned
+        if the port is not found. """
+        mapping = nicira_db.get_nvp_port_mapping(context.session,
+                                                 quantum_port['id'])
+        if (mapping and mapping['nvp_switch_id'] and
+                mapping['nvp_cluster'] in self.clusters):
+            return (self.clusters[mapping['nvp_cluster']],
+                    mapping['nvp_switch_id'], mapping['nvp_id'])
         # Perform a query to NVP and then update the DB
         try:
-            nvp_port = nvplib.get_port_by_quantum_tag(
-                cluster,
-                quantum_port['network_id'],
-                quantum_port['id'])
+            nvp_port, cluster = nvplib.find_port_by_quantum_tag(
+                self.clusters.itervalues(), quantum_port['id'])
             if nvp_port:
+                nvp_switch_id = nvplib.get_port_lswitch_id(nvp_port)
                 nicira_db.add_quantum_nvp_port_mapping(
                     context.session,
                     quantum_port['id'],
-                    nvp_port['uuid'])
-                return nvp_port['uuid']
+                    nvp_port['uuid'],
+                    nvp_switch_id,
+                    cluster.name)
+                return cluster, nvp_switch_id, nvp_port['uuid']
         except:
             LOG.exception(_("Unable to find NVP uuid for Quantum port %s"),
                           quantum_port['id'])
+        return None, None, None
 
     def _extend_fault_map(self):
         """ Extends the Quantum Fault Map
@@ -989,10 +1001,10 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
                        'device_owner': ['network:router_interface']}
         router_iface_ports = self.get_ports(context, filters=port_filter)
         for port in router_iface_ports:
-            nvp_port_id = self._nvp_get_port_id(
-                context, self.default_cluster, port)
+            cluster, nvp_switch_id, nvp_port_id = self._nvp_get_port_mapping(
+                context, port)
             if nvp_port_id:
-                port['nvp_port_id'] = nvp_port_id
+                port['nvp_mapping'] = (cluster, nvp_switch_id, nvp_port_id)
             else:
                 LOG.warning(_("A nvp lport identifier was not found for "
                               "quantum port '%s'"), port['id'])
@@ -1001,11 +1013,12 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
         # clean up network owned ports
         for port in router_iface_ports:
             try:
-                if 'nvp_port_id' in port:
-                    nvplib.delete_peer_router_lport(self.default_cluster,
+                if 'nvp_mapping' in port:
+                    cluster, nvp_switch_id, nvp_port_id = port['nvp_mapping']
+                    nvplib.delete_peer_router_lport(cluster,
                                                     port['device_id'],
-                                                    port['network_id'],
-                                                    port['nvp_port_id'])
+                                                    nvp_switch_id,
+                                                    nvp_port_id)
             except (TypeError, KeyError,
                     NvpApiClient.NvpApiException,
                     NvpApiClient.ResourceNotFound):
@@ -1033,15 +1046,15 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
     def _get_lswitch_cluster_pairs(self, netw_id, tenant_id):
         """Figure out the set of lswitches on each cluster that maps to this
            network id"""
-        pairs = []
-        for c in self.clusters.itervalues():
-            lswitches = []
+        def _get_lswitches(c):
             try:
-                results = nvplib.get_lswitches(c, netw_id)
-                lswitches.extend([ls['uuid'] for ls in results])
+                return [ls['uuid'] for ls in nvplib.get_lswitches(c, netw_id)]
             except q_exc.NetworkNotFound:
-                continue
-            pairs.append((c, lswitches))
+                return None
+
+        pairs = [(c, lswitches) for c, lswitches in
+                 nvplib.fan_out(_get_lswitches, self.clusters.itervalues())
+                 if lswitches is not None]
         if not pairs:
             raise q_exc.NetworkNotFound(net_id=netw_id)
         LOG.debug(_("Returning pairs for network: %s"), pairs)
@@ -1051,8 +1064,10 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
         with context.session.begin(subtransactions=True):
             # goto to the plugin DB and fetch the network
             network = self._get_network(context, id)
-            # if the network is external, do not go to NVP
-            if not self._network_is_external(context, id):
+            # if the network is external, do not go to NVP, nor when
+            # the status was synchronized from NVP recently
+            if not (self._network_is_external(context, id) or
+                    self._synchronizer.is_fresh(context, nvp_sync.LSWITCH)):
                 # verify the fabric status of the corresponding
                 # logical switch(es) in nvp
                 try:
@@ -1109,6 +1124,8 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
                 self._extend_network_qos_queue(context, net)
 
             tenant_ids = filters and filters.get('tenant_id') or None
+        if self._synchronizer.is_fresh(context, nvp_sync.LSWITCH):
+            return [self._fields(net, fields) for net in quantum_lswitches]
         filter_fmt = "&tag=%s&tag_scope=os_tid"
         if context.is_admin and not tenant_ids:
             tenant_filter = ""
@@ -1124,19 +1141,20 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
             fields=lswitch_filters,
             relations='LogicalSwitchStatus',
             filters={'tag': 'true', 'tag_scope': 'shared'})
+        # Issue a second query for fetching shared networks.
+        # We cannot unfortunately use just a single query because tags
+        # cannot be or-ed. Both queries of every cluster are issued at once.
+        queries = [(c, path) for c in self.clusters.itervalues()
+                   for path in (lswitch_url_path_1, lswitch_url_path_2)]
+
+        def _get_lswitches(query):
+            c, path = query
+            return nvplib.get_all_query_pages(path, c)
+
         try:
-            for c in self.clusters.itervalues():
-                res = nvplib.get_all_query_pages(
-                    lswitch_url_path_1, c)
+            for query, res in nvplib.fan_out(_get_lswitches, queries):
                 nvp_lswitches.update(dict(
                     (ls['uuid'], ls) for ls in res))
-                # Issue a second query for fetching shared networks.
-                # We cannot unfortunately use just a single query because tags
-                # cannot be or-ed
-                res_shared = nvplib.get_all_query_pages(
-                    lswitch_url_path_2, c)
-                nvp_lswitches.update(dict(
-                    (ls['uuid'], ls) for ls in res_shared))
         except Exception:
             err_msg = _("Unable to get logical switches")
             LOG.exception(err_msg)
@@ -1207,6 +1225,12 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
             self._extend_network_qos_queue(context, net)
         return net
 
+    def update_subnet(self, context, id, subnet):
+        original_subnet = super(NvpPluginV2, self).get_subnet(context, id)
+        subnet = super(NvpPluginV2, self).update_subnet(context, id, subnet)
+        self.update_routers_for_subnet(context, original_subnet, subnet)
+        return subnet
+
     def get_ports(self, context, filters=None, fields=None):
         with context.session.begin(subtransactions=True):
             quantum_lports = super(NvpPluginV2, self).get_ports(
@@ -1218,6 +1242,8 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
             self._network_is_external(context, filters['network_id'][0])):
             # Do not perform check on NVP platform
             return quantum_lports
+        if self._synchronizer.is_fresh(context, nvp_sync.LPORT):
+            return [self._fields(lport, fields) for lport in quantum_lports]
 
         vm_filter = ""
         tenant_filter = ""
@@ -1245,19 +1271,21 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
 
         lport_fields_str = ("tags,admin_status_enabled,display_name,"
                             "fabric_status_up")
-        try:
-            for c in self.clusters.itervalues():
-                lport_query_path = (
-                    "/ws.v1/lswitch/%s/lport?fields=%s&%s%stag_scope=q_port_id"
-                    "&relations=LogicalPortStatus" %
-                    (lswitch, lport_fields_str, vm_filter, tenant_filter))
+        lport_query_path = (
+            "/ws.v1/lswitch/%s/lport?fields=%s&%s%stag_scope=q_port_id"
+            "&relations=LogicalPortStatus" %
+            (lswitch, lport_fields_str, vm_filter, tenant_filter))
 
-                try:
-                    ports = nvplib.get_all_query_pages(lport_query_path, c)
-                except q_exc.NotFound:
-                    LOG.warn(_("Lswitch %s not found in NVP"), lswitch)
-                    ports = None
+        def _get_lports(c):
+            try:
+                return nvplib.get_all_query_pages(lport_query_path, c)
+            except q_exc.NotFound:
+                LOG.warn(_("Lswitch %s not found in NVP"), lswitch)
+                return None
 
+        try:
+            for c, ports in nvplib.fan_out(_get_lports,
+                                           self.clusters.itervalues()):
                 if ports:
                     for port in ports:
                         for tag in port["tags"]:
@@ -1395,6 +1423,7 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
             port)
         has_security_groups = self._check_update_has_security_groups(port)
 
+        original_port = super(NvpPluginV2, self).get_port(context, id)
         with context.session.begin(subtransactions=True):
             ret_port = super(NvpPluginV2, self).update_port(
                 context, id, port)
@@ -1439,10 +1468,10 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
             self._extend_port_port_security_dict(context, ret_port)
             self._extend_port_dict_security_group(context, ret_port)
             LOG.debug(_("Update port request: %s"), port)
-            nvp_port_id = self._nvp_get_port_id(
-                context, self.default_cluster, ret_port)
-            nvplib.update_port(self.default_cluster,
-                               ret_port['network_id'],
+            cluster, nvp_switch_id, nvp_port_id = self._nvp_get_port_mapping(
+                context, ret_port)
+            nvplib.update_port(cluster,
+                               nvp_switch_id,
                                nvp_port_id, id, tenant_id,
                                ret_port['name'], ret_port['device_id'],
                                ret_port['admin_state_up'],
@@ -1460,9 +1489,10 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
         # the status.
         try:
             ret_port['status'] = nvplib.get_port_status(
-                self.default_cluster, ret_port['network_id'], nvp_port_id)
+                cluster, nvp_switch_id, nvp_port_id)
         except:
             LOG.warn(_("Unable to retrieve port status for:%s."), nvp_port_id)
+        self.update_router_for_port(context, original_port, ret_port)
         return ret_port
 
     def delete_port(self, context, id, l3_port_check=True,
@@ -1519,19 +1549,18 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
             self._extend_port_dict_security_group(context, quantum_db_port)
             self._extend_port_qos_queue(context, quantum_db_port)
 
-            if self._network_is_external(context,
-                                         quantum_db_port['network_id']):
+            if (self._network_is_external(context,
+                                          quantum_db_port['network_id']) or
+                    self._synchronizer.is_fresh(context, nvp_sync.LPORT)):
                 return quantum_db_port
-            nvp_id = self._nvp_get_port_id(context, self.default_cluster,
-                                           quantum_db_port)
+            cluster, nvp_switch_id, nvp_id = self._nvp_get_port_mapping(
+                context, quantum_db_port)
             # If there's no nvp IP do not bother going to NVP and put
             # the port in error state
             if nvp_id:
-                #TODO: pass the appropriate cluster here
                 try:
                     port = nvplib.get_logical_port_status(
-                        self.default_cluster, quantum_db_port['network_id'],
-                        nvp_id)
+                        cluster, nvp_switch_id, nvp_id)
                     quantum_db_port["admin_state_up"] = (
                         port["admin_status_enabled"])
                     if port["fabric_status_up"]:
@@ -1662,6 +1691,8 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
 
     def get_router(self, context, id, fields=None):
         router = self._get_router(context, id)
+        if self._synchronizer.is_fresh(context, nvp_sync.LROUTER):
+            return self._make_router_dict(router, fields)
         try:
             # FIXME(salvatore-orlando): We need to
             # find the appropriate cluster!
@@ -1699,6 +1730,9 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
             self._model_query(context, l3_db.Router),
             l3_db.Router, filters)
         routers = router_query.all()
+        if self._synchronizer.is_fresh(context, nvp_sync.LROUTER):
+            return [self._make_router_dict(router, fields)
+                    for router in routers]
         # Query routers on NVP for updating operational status
         if context.is_admin and not filters.get("tenant_id"):
             tenant_id = None
@@ -44,6 +44,14 @@ nvp_opts = [
                       "This option is only useful if running on a host that "
                       "does not support namespaces otherwise access_network "
                       "should be used.")),
+    cfg.IntOpt('state_sync_interval', default=120,
+               help=_("Seconds between the synchronizations of the status "
+                      "of the logical switches, ports and routers from NVP "
+                      "to the database, 0 to query NVP for every request "
+                      "instead")),
+    cfg.IntOpt('state_sync_chunk_size', default=500,
+               help=_("Number of resources fetched from NVP by every "
+                      "request of a status synchronization")),
 ]
 
 cluster_opts = [
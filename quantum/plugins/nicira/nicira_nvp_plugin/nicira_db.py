@@ -67,13 +67,27 @@ def add_network_binding(session, network_id, binding_type, phy_uuid, vlan_id):
     return binding
 
 
-def add_quantum_nvp_port_mapping(session, quantum_id, nvp_id):
+def add_quantum_nvp_port_mapping(session, quantum_id, nvp_id,
+                                 nvp_switch_id=None, nvp_cluster=None):
+    """Add the mapping of a quantum port, or complete an existing one."""
     with session.begin(subtransactions=True):
-        mapping = nicira_models.QuantumNvpPortMapping(quantum_id, nvp_id)
-        session.add(mapping)
+        mapping = get_nvp_port_mapping(session, quantum_id)
+        if mapping:
+            mapping.update({'nvp_id': nvp_id,
+                            'nvp_switch_id': nvp_switch_id,
+                            'nvp_cluster': nvp_cluster})
+        else:
+            mapping = nicira_models.QuantumNvpPortMapping(
+                quantum_id, nvp_id, nvp_switch_id, nvp_cluster)
+            session.add(mapping)
         return mapping
 
 
+def get_nvp_port_mapping(session, quantum_id):
+    return (session.query(nicira_models.QuantumNvpPortMapping).
+            filter_by(quantum_id=quantum_id).first())
+
+
 def get_nvp_port_id(session, quantum_id):
     try:
         mapping = (session.query(nicira_models.QuantumNvpPortMapping).
@@ -84,6 +98,22 @@ def get_nvp_port_id(session, quantum_id):
         return
 
 
+def get_status_sync_time(session, resource):
+    sync = (session.query(nicira_models.NvpStatusSync).
+            filter_by(resource=resource).first())
+    return sync and sync['synced_at']
+
+
+def set_status_sync_time(session, resource, synced_at):
+    with session.begin(subtransactions=True):
+        sync = (session.query(nicira_models.NvpStatusSync).
+                filter_by(resource=resource).first())
+        if sync:
+            sync['synced_at'] = synced_at
+        else:
+            session.add(nicira_models.NvpStatusSync(resource, synced_at))
+
+
 def unset_default_network_gateways(session):
     with session.begin(subtransactions=True):
         session.query(nicira_networkgw_db.NetworkGateway).update(
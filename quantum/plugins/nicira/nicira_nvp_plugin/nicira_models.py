@@ -16,7 +16,7 @@
 #    under the License.
 
 
-from sqlalchemy import Column, Enum, ForeignKey, Integer, String
+from sqlalchemy import Column, DateTime, Enum, ForeignKey, Integer, String
 
 from quantum.db.models_v2 import model_base
 
@@ -53,14 +53,41 @@ class NvpNetworkBinding(model_base.BASEV2):
 
 
 class QuantumNvpPortMapping(model_base.BASEV2):
-    """Represents the mapping between quantum and nvp port uuids."""
+    """Represents the mapping between quantum and nvp port uuids.
+
+    The uuid of the logical switch of the nvp port and the name of its
+    cluster are recorded too; they are missing from the mappings created
+    before they were added, until the plugin looks them up.
+    """
 
     __tablename__ = 'quantum_nvp_port_mapping'
     quantum_id = Column(String(36),
                         ForeignKey('ports.id', ondelete="CASCADE"),
                         primary_key=True)
     nvp_id = Column(String(36))
+    nvp_switch_id = Column(String(36))
+    nvp_cluster = Column(String(255))
 
-    def __init__(self, quantum_id, nvp_id):
+    def __init__(self, quantum_id, nvp_id, nvp_switch_id=None,
+                 nvp_cluster=None):
         self.quantum_id = quantum_id
         self.nvp_id = nvp_id
+        self.nvp_switch_id = nvp_switch_id
+        self.nvp_cluster = nvp_cluster
+
+
+class NvpStatusSync(model_base.BASEV2):
+    """Represents the last synchronization of the status of NVP resources.
+
+    There is one row for each kind of resource, i.e.: 'lswitch', 'lport'
+    and 'lrouter', recording when their status was last copied from NVP
+    to the Quantum database.
+    """
+
+    __tablename__ = 'nvp_status_sync'
+    resource = Column(String(36), primary_key=True)
+    synced_at = Column(DateTime, nullable=False)
+
+    def __init__(self, resource, synced_at):
+        self.resource = resource
+        self.synced_at = synced_at
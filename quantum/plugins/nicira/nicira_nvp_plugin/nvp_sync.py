@@ -0,0 +1,213 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Nicira, Inc.
+# All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from oslo.config import cfg
+
+from quantum.common import constants
+from quantum import context as q_context
+from quantum.db import l3_db
+from quantum.db import models_v2
+from quantum.openstack.common import log as logging
+from quantum.openstack.common import loopingcall
+from quantum.openstack.common import timeutils
+from quantum.plugins.nicira.nicira_nvp_plugin import nicira_db
+from quantum.plugins.nicira.nicira_nvp_plugin import nvplib
+
+LOG = logging.getLogger(__name__)
+
+# Kinds of NVP resources whose status is synchronized
+LSWITCH = 'lswitch'
+LPORT = 'lport'
+LROUTER = 'lrouter'
+# The status synchronized from NVP is served until it is older than this
+# number of synchronization intervals
+MAX_AGE_INTERVALS = 3
+# Quantum ports which have no logical switch port in NVP
+NO_LPORT_DEVICE_OWNERS = [l3_db.DEVICE_OWNER_FLOATINGIP,
+                          l3_db.DEVICE_OWNER_ROUTER_GW]
+
+
+def _get_tag(resource, scope):
+    for tag in resource['tags']:
+        if tag['scope'] == scope:
+            return tag['tag']
+
+
+class NvpSynchronizer(object):
+    """Periodically copy the status of the NVP resources to the database.
+
+    The logical switches, ports and routers of every cluster are fetched in
+    pages of state_sync_chunk_size resources, with only the fields needed to
+    compute the status of the networks, ports and routers. The status of
+    those whose status changed is then updated in the database, and the
+    time of the synchronization is recorded, so that requests read the
+    status from the database while it is fresh.
+    """
+
+    def __init__(self, clusters):
+        self._clusters = clusters
+        self._loop = None
+
+    def start(self):
+        interval = cfg.CONF.NVP.state_sync_interval
+        if interval <= 0 or self._loop:
+            return
+        self._loop = loopingcall.LoopingCall(self._synchronize)
+        self._loop.start(interval=interval, initial_delay=interval)
+
+    @staticmethod
+    def is_fresh(context, resource):
+        """Whether the status of resource in the database can be served."""
+        interval = cfg.CONF.NVP.state_sync_interval
+        if interval <= 0:
+            return False
+        synced_at = nicira_db.get_status_sync_time(context.session, resource)
+        return bool(synced_at) and not timeutils.is_older_than(
+            synced_at, MAX_AGE_INTERVALS * interval)
+
+    def _synchronize(self):
+        # An error must not stop the looping call
+        try:
+            self.synchronize(q_context.get_admin_context())
+        except Exception:
+            LOG.exception(_("Unable to synchronize the status from NVP"))
+
+    def synchronize(self, context):
+        """Copy the status of every kind of NVP resource to the database.
+
+        Kinds synchronized less than half an interval ago, by another API
+        worker for instance, are skipped.
+        """
+        interval = cfg.CONF.NVP.state_sync_interval
+        for resource, synchronize in ((LSWITCH, self._synchronize_lswitches),
+                                      (LPORT, self._synchronize_lports),
+                                      (LROUTER, self._synchronize_lrouters)):
+            synced_at = nicira_db.get_status_sync_time(context.session,
+                                                       resource)
+            if synced_at and not timeutils.is_older_than(synced_at,
+                                                         interval / 2.0):
+                continue
+            started_at = timeutils.utcnow()
+            try:
+                changed = synchronize(context)
+            except Exception:
+                LOG.exception(_("Unable to synchronize the status of the "
+                                "NVP %ss"), resource)
+                continue
+            nicira_db.set_status_sync_time(context.session, resource,
+                                           started_at)
+            LOG.debug(_("Synchronized the status of the NVP %(resource)ss, "
+                        "%(changed)d changed"),
+                      {'resource': resource, 'changed': changed})
+
+    def _query_pages(self, path):
+        chunk_size = cfg.CONF.NVP.state_sync_chunk_size
+        for cluster in self._clusters.itervalues():
+            for results in nvplib.get_query_pages(path, cluster, chunk_size):
+                yield results
+
+    def _update_statuses(self, context, model, current, statuses,
+                         missing_status):
+        """Update the status of the rows of model which changed.
+
+        :param current: the status in the database by id, read before
+            querying NVP so that rows created meanwhile are left alone
+        :param statuses: the status computed from NVP by id
+        :param missing_status: the status of rows not found in NVP
+        """
+        changes = {}
+        for obj_id, status in current.iteritems():
+            new_status = statuses.get(obj_id, missing_status)
+            if new_status != status:
+                changes.setdefault(new_status, []).append(obj_id)
+        chunk_size = cfg.CONF.NVP.state_sync_chunk_size
+        with context.session.begin(subtransactions=True):
+            for status, obj_ids in changes.iteritems():
+                for index in range(0, len(obj_ids), chunk_size):
+                    query = context.session.query(model).filter(
+                        model.id.in_(obj_ids[index:index + chunk_size]))
+                    query.update({'status': status},
+                                 synchronize_session=False)
+        return sum(len(obj_ids) for obj_ids in changes.itervalues())
+
+    def _synchronize_lswitches(self, context):
+        query = context.session.query(
+            models_v2.Network.id, models_v2.Network.status).outerjoin(
+                l3_db.ExternalNetwork).filter(
+                    l3_db.ExternalNetwork.network_id == None)  # noqa
+        current = dict(query)
+        statuses = {}
+        path = nvplib._build_uri_path(nvplib.LSWITCH_RESOURCE,
+                                      fields='uuid,tags',
+                                      relations='LogicalSwitchStatus')
+        for lswitches in self._query_pages(path):
+            for lswitch in lswitches:
+                # A network is down if any of its logical switches is
+                network_id = (_get_tag(lswitch, 'quantum_net_id') or
+                              lswitch['uuid'])
+                if (lswitch['_relations']['LogicalSwitchStatus']
+                        ['fabric_status']):
+                    statuses.setdefault(network_id,
+                                        constants.NET_STATUS_ACTIVE)
+                else:
+                    statuses[network_id] = constants.NET_STATUS_DOWN
+        return self._update_statuses(context, models_v2.Network, current,
+                                     statuses, constants.NET_STATUS_ERROR)
+
+    def _synchronize_lports(self, context):
+        query = context.session.query(
+            models_v2.Port.id, models_v2.Port.status).outerjoin(
+                l3_db.ExternalNetwork,
+                l3_db.ExternalNetwork.network_id ==
+                models_v2.Port.network_id).filter(
+                    l3_db.ExternalNetwork.network_id == None).filter(  # noqa
+                        ~models_v2.Port.device_owner.in_(
+                            NO_LPORT_DEVICE_OWNERS))
+        current = dict(query)
+        statuses = {}
+        path = nvplib._build_uri_path(nvplib.LSWITCHPORT_RESOURCE,
+                                      parent_resource_id='*',
+                                      fields='tags',
+                                      relations='LogicalPortStatus',
+                                      filters={'tag_scope': 'q_port_id'})
+        for lports in self._query_pages(path):
+            for lport in lports:
+                port_id = _get_tag(lport, 'q_port_id')
+                if (lport['_relations']['LogicalPortStatus']
+                        ['fabric_status_up']):
+                    statuses[port_id] = constants.PORT_STATUS_ACTIVE
+                else:
+                    statuses[port_id] = constants.PORT_STATUS_DOWN
+        return self._update_statuses(context, models_v2.Port, current,
+                                     statuses, constants.PORT_STATUS_ERROR)
+
+    def _synchronize_lrouters(self, context):
+        current = dict(context.session.query(l3_db.Router.id,
+                                             l3_db.Router.status))
+        statuses = {}
+        path = nvplib._build_uri_path(nvplib.LROUTER_RESOURCE,
+                                      fields='uuid',
+                                      relations='LogicalRouterStatus')
+        for lrouters in self._query_pages(path):
+            for lrouter in lrouters:
+                if (lrouter['_relations']['LogicalRouterStatus']
+                        ['fabric_status']):
+                    statuses[lrouter['uuid']] = constants.NET_STATUS_ACTIVE
+                else:
+                    statuses[lrouter['uuid']] = constants.NET_STATUS_DOWN
+        return self._update_statuses(context, l3_db.Router, current,
+                                     statuses, constants.NET_STATUS_ERROR)
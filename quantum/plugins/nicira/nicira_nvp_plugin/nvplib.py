@@ -25,6 +25,11 @@ import hashlib
 import inspect
 import json
 import logging
+import sys
+import time
+import urlparse
+
+import eventlet
 
 #FIXME(danwent): I'd like this file to get to the point where it has
 # no quantum-specific logic in it
@@ -89,6 +94,11 @@ _net_type_cache = {}  # cache of {net_id: network_type}
 # XXX Only cache default for now
 _lqueue_cache = {}
 
+# Upper bounds, in milliseconds, of the buckets of the latency histograms;
+# the last bucket counts the requests slower than all of them
+LATENCY_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+_latency_histograms = {}  # {(cluster name, operation): histogram}
+
 
 def version_dependent(func):
     func_name = func.__name__
@@ -178,11 +188,18 @@ def get_cluster_version(cluster):
     return version
 
 
-def get_all_query_pages(path, c):
+def get_query_pages(path, c, page_length=None):
+    """Yield the results of a query one page at a time.
+
+    :param page_length: number of results of every page, left to NVP when
+        not specified
+    """
     need_more_results = True
-    result_list = []
     page_cursor = None
     query_marker = "&" if (path.find("?") != -1) else "?"
+    if page_length:
+        path = "%s%s_page_length=%d" % (path, query_marker, page_length)
+        query_marker = "&"
     while need_more_results:
         page_cursor_str = (
             "_page_cursor=%s" % page_cursor if page_cursor else "")
@@ -193,58 +210,173 @@ def get_all_query_pages(path, c):
         page_cursor = body.get('page_cursor')
         if not page_cursor:
             need_more_results = False
-        result_list.extend(body['results'])
+        yield body['results']
+
+
+def get_all_query_pages(path, c):
+    result_list = []
+    for results in get_query_pages(path, c):
+        result_list.extend(results)
     return result_list
 
 
+def _get_operation(method, path):
+    # Keep the names of the resources but not their ids nor the query, so
+    # that '/ws.v1/lswitch/<uuid>/lport?fields=*' becomes 'lswitch/lport'
+    segments = urlparse.urlparse(path).path.split('/')[2:]
+    return "%s %s" % (method, '/'.join(segments[::2]))
+
+
+def _record_latency(cluster, method, path, seconds):
+    key = (cluster.name, _get_operation(method, path))
+    histogram = _latency_histograms.get(key)
+    if histogram is None:
+        histogram = _latency_histograms[key] = {
+            'count': 0, 'total_ms': 0.0,
+            'buckets': [0] * (len(LATENCY_BUCKETS) + 1)}
+    latency_ms = seconds * 1000
+    index = 0
+    while index < len(LATENCY_BUCKETS) and latency_ms > LATENCY_BUCKETS[index]:
+        index += 1
+    histogram['buckets'][index] += 1
+    histogram['count'] += 1
+    histogram['total_ms'] += latency_ms
+
+
+def get_latency_histograms():
+    """Return the latency histograms of the requests issued to NVP.
+
+    :returns: a dict mapping (cluster name, operation) pairs, where the
+        operation is the HTTP method followed by the resource names of the
+        path, e.g. 'GET lswitch/lport', to a dict with the 'count' of
+        requests, their 'total_ms' and the count of requests of every
+        bucket of LATENCY_BUCKETS in 'buckets'.
+    """
+    return dict((key, {'count': histogram['count'],
+                       'total_ms': histogram['total_ms'],
+                       'buckets': list(histogram['buckets'])})
+                for key, histogram in _latency_histograms.iteritems())
+
+
+def reset_latency_histograms():
+    _latency_histograms.clear()
+
+
+def _request(cluster, *args):
+    start = time.time()
+    try:
+        return cluster.api_client.request(*args)
+    finally:
+        _record_latency(cluster, args[0], args[1], time.time() - start)
+
+
+def fan_out(func, items):
+    """Call func on every item concurrently and yield the results.
+
+    The (item, result) pairs are yielded as soon as each call completes,
+    so callers merge the results as they arrive. The items are usually
+    clusters, whose API client bounds the concurrent requests to each of
+    them with its pool of concurrent_connections connections. An exception
+    raised by func is raised when its result would have been yielded.
+    """
+    items = list(items)
+    if len(items) == 1:
+        yield items[0], func(items[0])
+        return
+    results = eventlet.queue.LightQueue()
+
+    def _call(item):
+        try:
+            results.put((item, func(item), None))
+        except Exception:
+            results.put((item, None, sys.exc_info()))
+
+    pool = eventlet.GreenPool(len(items) or 1)
+    for item in items:
+        pool.spawn_n(_call, item)
+    for i in range(len(items)):
+        item, result, exc_info = results.get()
+        if exc_info:
+            raise exc_info[0], exc_info[1], exc_info[2]
+        yield item, result
+
+
 def do_single_request(*args, **kwargs):
     """Issue a request to a specified cluster if specified via kwargs
        (cluster=<cluster>)."""
     cluster = kwargs["cluster"]
     try:
-        req = cluster.api_client.request(*args)
+        req = _request(cluster, *args)
     except NvpApiClient.ResourceNotFound:
         raise exception.NotFound()
     return req
 
 
 def do_multi_request(*args, **kwargs):
-    """Issue a request to all clusters"""
-    results = []
-    clusters = kwargs["clusters"]
-    for x in clusters:
-        LOG.debug(_("Issuing request to cluster: %s"), x.name)
-        rv = x.api_client.request(*args)
-        results.append(rv)
-    return results
+    """Issue a request to all clusters concurrently.
+
+    The results are returned in the order of the clusters.
+    """
+    clusters = list(kwargs["clusters"])
+
+    def _request_cluster(cluster):
+        LOG.debug(_("Issuing request to cluster: %s"), cluster.name)
+        return _request(cluster, *args)
+
+    results = dict(fan_out(_request_cluster, clusters))
+    return [results[cluster] for cluster in clusters]
 
 
 # -------------------------------------------------------------------
 # Network functions
 # -------------------------------------------------------------------
-def find_port_and_cluster(clusters, port_id):
-    """Return (url, cluster_id) of port or (None, None) if port does not exist.
-    """
-    for c in clusters:
-        query = "/ws.v1/lswitch/*/lport?uuid=%s&fields=*" % port_id
-        LOG.debug(_("Looking for lswitch with port id "
-                    "'%(port_id)s' on: %(c)s"), locals())
+def _find_port(clusters, query):
+    # Query all the clusters at once, the first one returning a port wins
+    def _find_port_on_cluster(c):
+        LOG.debug(_("Looking for lswitch port with query "
+                    "'%(query)s' on: %(c)s"), {'query': query, 'c': c})
         try:
             res = do_single_request(HTTP_GET, query, cluster=c)
         except Exception as e:
             LOG.error(_("get_port_cluster_and_url, exception: %s"), str(e))
-            continue
+            return
         res = json.loads(res)
         if len(res["results"]) == 1:
-            return (res["results"][0], c)
+            return res["results"][0]
+
+    for c, port in fan_out(_find_port_on_cluster, clusters):
+        if port:
+            return (port, c)
     return (None, None)
 
 
+def find_port_and_cluster(clusters, port_id):
+    """Return (url, cluster_id) of port or (None, None) if port does not exist.
+    """
+    return _find_port(clusters,
+                      "/ws.v1/lswitch/*/lport?uuid=%s&fields=*" % port_id)
+
+
+def find_port_by_quantum_tag(clusters, quantum_port_id):
+    """Return (port, cluster) of the logical port tagged with quantum_port_id.
+
+    The port only has its uuid and _href; (None, None) is returned if the
+    port is not found on any cluster.
+    """
+    return _find_port(clusters, _build_uri_path(
+        LSWITCHPORT_RESOURCE, parent_resource_id='*', fields='uuid',
+        filters={'tag': quantum_port_id, 'tag_scope': 'q_port_id'}))
+
+
+def get_port_lswitch_id(port):
+    """Return the uuid of the logical switch of a port from its _href."""
+    return port["_href"].split('/')[3]
+
+
 def find_lswitch_by_portid(clusters, port_id):
     port, cluster = find_port_and_cluster(clusters, port_id)
     if port and cluster:
-        href = port["_href"].split('/')
-        return (href[3], cluster)
+        return (get_port_lswitch_id(port), cluster)
     return (None, None)
 
 
@@ -28,6 +28,7 @@ from oslo.config import cfg
 
 from quantum.agent.linux import ip_lib
 from quantum.agent.linux import ovs_lib
+from quantum.agent.linux import ovsdb_monitor
 from quantum.agent.linux import utils
 from quantum.agent import rpc as agent_rpc
 from quantum.agent import securitygroups_rpc as sg_rpc
@@ -152,7 +153,8 @@ class OVSQuantumAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin):
 
     def __init__(self, integ_br, tun_br, local_ip,
                  bridge_mappings, root_helper,
-                 polling_interval, enable_tunneling):
+                 polling_interval, enable_tunneling,
+                 use_ovsdb_monitor=False):
         '''Constructor.
 
         :param integ_br: name of the integration bridge.
@@ -162,6 +164,8 @@ class OVSQuantumAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin):
         :param root_helper: utility to use when running shell cmds.
         :param polling_interval: interval (secs) to poll DB.
         :param enable_tunneling: if True enable GRE networks.
+        :param use_ovsdb_monitor: if True learn about device changes from
+               ovsdb-client monitor instead of polling.
         '''
         self.root_helper = root_helper
         self.available_local_vlans = set(
@@ -172,6 +176,11 @@ class OVSQuantumAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin):
         self.local_vlan_map = {}
 
         self.polling_interval = polling_interval
+        self.ovsdb_monitor = None
+        if use_ovsdb_monitor:
+            monitor = ovsdb_monitor.OvsdbMonitor(root_helper)
+            if monitor.start():
+                self.ovsdb_monitor = monitor
 
         self.enable_tunneling = enable_tunneling
         self.local_ip = local_ip
@@ -195,7 +204,7 @@ class OVSQuantumAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin):
     def _report_state(self):
         try:
             # How many devices are likely used by a VM
-            ports = self.int_br.get_vif_port_set()
+            ports = self.get_vif_port_set()
             num_devices = len(ports)
             self.agent_state.get('configurations')['devices'] = num_devices
             self.state_rpc.report_state(self.context,
@@ -311,6 +320,7 @@ class OVSQuantumAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin):
 
         if network_type == constants.TYPE_GRE:
             if self.enable_tunneling:
+                self.tun_br.defer_apply_on()
                 # outbound
                 self.tun_br.add_flow(priority=4, in_port=self.patch_int_ofport,
                                      dl_vlan=lvid,
@@ -323,6 +333,7 @@ class OVSQuantumAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin):
                     dl_dst="01:00:00:00:00:00/01:00:00:00:00:00",
                     actions="mod_vlan_vid:%s,output:%s" %
                     (lvid, self.patch_int_ofport))
+                self.tun_br.defer_apply_off()
             else:
                 LOG.error(_("Cannot provision GRE network for net-id=%s "
                           "- tunneling disabled"), net_uuid)
@@ -384,8 +395,10 @@ class OVSQuantumAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin):
 
         if lvm.network_type == constants.TYPE_GRE:
             if self.enable_tunneling:
+                self.tun_br.defer_apply_on()
                 self.tun_br.delete_flows(tun_id=lvm.segmentation_id)
                 self.tun_br.delete_flows(dl_vlan=lvm.vlan)
+                self.tun_br.defer_apply_off()
         elif lvm.network_type == constants.TYPE_FLAT:
             if lvm.physical_network in self.phys_brs:
                 # outbound
@@ -431,24 +444,33 @@ class OVSQuantumAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin):
         :param physical_network: the physical network for 'vlan' or 'flat'
         :param segmentation_id: the VID for 'vlan' or tunnel ID for 'tunnel'
         '''
-        if net_uuid not in self.local_vlan_map:
-            self.provision_local_vlan(net_uuid, network_type,
-                                      physical_network, segmentation_id)
-        lvm = self.local_vlan_map[net_uuid]
-        lvm.vif_ports[port.vif_id] = port
-
-        if network_type == constants.TYPE_GRE:
-            if self.enable_tunneling:
-                # inbound unicast
-                self.tun_br.add_flow(priority=3, tun_id=segmentation_id,
-                                     dl_dst=port.vif_mac,
-                                     actions="mod_vlan_vid:%s,normal" %
-                                     lvm.vlan)
-
-        self.int_br.set_db_attribute("Port", port.port_name, "tag",
-                                     str(lvm.vlan))
-        if int(port.ofport) != -1:
-            self.int_br.delete_flows(in_port=port.ofport)
+        bridges = [self.int_br]
+        if network_type == constants.TYPE_GRE and self.enable_tunneling:
+            bridges.append(self.tun_br)
+        for bridge in bridges:
+            bridge.defer_apply_on()
+        try:
+            if net_uuid not in self.local_vlan_map:
+                self.provision_local_vlan(net_uuid, network_type,
+                                          physical_network, segmentation_id)
+            lvm = self.local_vlan_map[net_uuid]
+            lvm.vif_ports[port.vif_id] = port
+
+            if network_type == constants.TYPE_GRE:
+                if self.enable_tunneling:
+                    # inbound unicast
+                    self.tun_br.add_flow(priority=3, tun_id=segmentation_id,
+                                         dl_dst=port.vif_mac,
+                                         actions="mod_vlan_vid:%s,normal" %
+                                         lvm.vlan)
+
+            self.int_br.set_db_attribute("Port", port.port_name, "tag",
+                                         str(lvm.vlan))
+            if int(port.ofport) != -1:
+                self.int_br.delete_flows(in_port=port.ofport)
+        finally:
+            for bridge in bridges:
+                bridge.defer_apply_off()
 
     def port_unbound(self, vif_id, net_uuid=None):
         '''Unbind port.
@@ -577,8 +599,41 @@ class OVSQuantumAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin):
             int_veth.link.set_up()
             phys_veth.link.set_up()
 
+    def _ports_may_have_changed(self):
+        """Return whether the integration bridge ports need to be checked.
+
+        Without ovsdb-client monitor they are checked on every loop.
+        """
+        if self.ovsdb_monitor is None:
+            return True
+        if not self.ovsdb_monitor.is_active():
+            LOG.warn(_("ovsdb-client monitor stopped, polling for device "
+                       "changes instead"))
+            self.ovsdb_monitor = None
+            return True
+        return self.ovsdb_monitor.has_updates()
+
+    def _wait_for_changes(self, timeout):
+        if self.ovsdb_monitor is None:
+            time.sleep(timeout)
+        else:
+            self.ovsdb_monitor.wait_for_update(timeout)
+
+    def get_vif_port_set(self):
+        if self.ovsdb_monitor is None:
+            return self.int_br.get_vif_port_set()
+        port_names = set(self.int_br.get_port_name_list())
+        ports = set()
+        interfaces = self.ovsdb_monitor.get_interfaces()
+        for name, external_ids in interfaces.iteritems():
+            if name in port_names:
+                iface_id = self.int_br.get_iface_id(external_ids)
+                if iface_id:
+                    ports.add(iface_id)
+        return ports
+
     def update_ports(self, registered_ports):
-        ports = self.int_br.get_vif_port_set()
+        ports = self.get_vif_port_set()
         if ports == registered_ports:
             return
         added = ports - registered_ports
@@ -599,56 +654,63 @@ class OVSQuantumAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin):
             LOG.debug(_("No VIF port for port %s defined on agent."), port_id)
 
     def treat_devices_added(self, devices):
-        resync = False
         self.sg_agent.prepare_devices_filter(devices)
-        for device in devices:
-            LOG.info(_("Port %s added"), device)
-            try:
-                details = self.plugin_rpc.get_device_details(self.context,
-                                                             device,
-                                                             self.agent_id)
-            except Exception as e:
-                LOG.debug(_("Unable to get port details for "
-                            "%(device)s: %(e)s"), locals())
-                resync = True
-                continue
-            port = self.int_br.get_vif_port_by_id(details['device'])
-            if 'port_id' in details:
-                LOG.info(_("Port %(device)s updated. Details: %(details)s"),
-                         locals())
-                self.treat_vif_port(port, details['port_id'],
-                                    details['network_id'],
-                                    details['network_type'],
-                                    details['physical_network'],
-                                    details['segmentation_id'],
-                                    details['admin_state_up'])
-            else:
-                LOG.debug(_("Device %s not defined on plugin"), device)
-                if (port and int(port.ofport) != -1):
-                    self.port_dead(port)
-        return resync
+        try:
+            devices_details = self.plugin_rpc.get_devices_details_list(
+                self.context, list(devices), self.agent_id)
+        except Exception as e:
+            LOG.debug(_("Unable to get port details for "
+                        "%(devices)s: %(e)s"), locals())
+            return True
+        # The tags of all the ports are set by one ovs-vsctl run and their
+        # flows by one ovs-ofctl run per kind of change. Only the integration
+        # bridge is deferred, tunnel ports may be added meanwhile.
+        self.int_br.defer_apply_on()
+        try:
+            for details in devices_details:
+                self.treat_device_added(details)
+        finally:
+            self.int_br.defer_apply_off()
+        return False
+
+    def treat_device_added(self, details):
+        device = details['device']
+        LOG.info(_("Port %s added"), device)
+        port = self.int_br.get_vif_port_by_id(device)
+        if 'port_id' in details:
+            LOG.info(_("Port %(device)s updated. Details: %(details)s"),
+                     locals())
+            self.treat_vif_port(port, details['port_id'],
+                                details['network_id'],
+                                details['network_type'],
+                                details['physical_network'],
+                                details['segmentation_id'],
+                                details['admin_state_up'])
+        else:
+            LOG.debug(_("Device %s not defined on plugin"), device)
+            if (port and int(port.ofport) != -1):
+                self.port_dead(port)
 
     def treat_devices_removed(self, devices):
-        resync = False
         self.sg_agent.remove_devices_filter(devices)
         for device in devices:
             LOG.info(_("Attachment %s removed"), device)
-            try:
-                details = self.plugin_rpc.update_device_down(self.context,
-                                                             device,
-                                                             self.agent_id)
-            except Exception as e:
-                LOG.debug(_("port_removed failed for %(device)s: %(e)s"),
-                          locals())
-                resync = True
-                continue
+        try:
+            devices_details = self.plugin_rpc.update_devices_down(
+                self.context, list(devices), self.agent_id)
+        except Exception as e:
+            LOG.debug(_("port_removed failed for %(devices)s: %(e)s"),
+                      locals())
+            return True
+        for details in devices_details:
+            device = details['device']
             if details['exists']:
                 LOG.info(_("Port %s updated."), device)
                 # Nothing to do regarding local networking
             else:
                 LOG.debug(_("Device %s not defined on plugin"), device)
                 self.port_unbound(device)
-        return resync
+        return False
 
     def process_network_ports(self, port_info):
         resync_a = False
@@ -683,17 +745,19 @@ class OVSQuantumAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin):
         while True:
             try:
                 start = time.time()
+                check_ports = self._ports_may_have_changed()
                 if sync:
                     LOG.info(_("Agent out of sync with plugin!"))
                     ports.clear()
                     sync = False
+                    check_ports = True
 
                 # Notify the plugin of tunnel IP
                 if self.enable_tunneling and tunnel_sync:
                     LOG.info(_("Agent tunnel out of sync with plugin!"))
                     tunnel_sync = self.tunnel_sync()
 
-                port_info = self.update_ports(ports)
+                port_info = check_ports and self.update_ports(ports)
 
                 # notify plugin about port deltas
                 if port_info:
@@ -710,7 +774,7 @@ class OVSQuantumAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin):
             # sleep till end of polling interval
             elapsed = (time.time() - start)
             if (elapsed < self.polling_interval):
-                time.sleep(self.polling_interval - elapsed)
+                self._wait_for_changes(self.polling_interval - elapsed)
             else:
                 LOG.debug(_("Loop iteration exceeded interval "
                             "(%(polling_interval)s vs. %(elapsed)s)!"),
@@ -740,6 +804,7 @@ def create_agent_config_map(config):
         root_helper=config.AGENT.root_helper,
         polling_interval=config.AGENT.polling_interval,
         enable_tunneling=config.OVS.enable_tunneling,
+        use_ovsdb_monitor=config.AGENT.use_ovsdb_monitor,
     )
 
     if kwargs['enable_tunneling'] and not kwargs['local_ip']:
@@ -58,6 +58,10 @@ agent_opts = [
     cfg.IntOpt('polling_interval', default=2,
                help=_("The number of seconds the agent will wait between "
                       "polling for local device changes.")),
+    cfg.BoolOpt('use_ovsdb_monitor', default=False,
+                help=_("Learn about added and removed devices from "
+                       "ovsdb-client monitor instead of polling the "
+                       "integration bridge.")),
 ]
 
 
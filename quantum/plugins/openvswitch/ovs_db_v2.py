@@ -46,6 +46,17 @@ def get_network_binding(session, network_id):
         return
 
 
+def get_network_bindings(session, network_ids):
+    """Return the bindings of the networks, by network id."""
+    session = session or db.get_session()
+    if not network_ids:
+        return {}
+    bindings = (session.query(ovs_models_v2.NetworkBinding).
+                filter(ovs_models_v2.NetworkBinding.network_id.in_(
+                    network_ids)))
+    return dict((binding.network_id, binding) for binding in bindings)
+
+
 def add_network_binding(session, network_id, network_type,
                         physical_network, segmentation_id):
     with session.begin(subtransactions=True):
@@ -335,6 +346,29 @@ def get_port_from_device(port_id):
     return port_dict
 
 
+def get_ports_and_bindings(port_ids):
+    """Get the ports with the given ids along with their network bindings.
+
+    Returns (port, binding) tuples, binding being None for networks which
+    have none.
+    """
+    session = db.get_session()
+    query = session.query(models_v2.Port, ovs_models_v2.NetworkBinding)
+    query = query.outerjoin(
+        ovs_models_v2.NetworkBinding,
+        ovs_models_v2.NetworkBinding.network_id == models_v2.Port.network_id)
+    return query.filter(models_v2.Port.id.in_(port_ids)).all()
+
+
+def set_ports_status(port_ids, status):
+    """Set the status of several ports in a single statement."""
+    session = db.get_session()
+    with session.begin():
+        query = session.query(models_v2.Port)
+        query.filter(models_v2.Port.id.in_(port_ids)).update(
+            {'status': status}, synchronize_session=False)
+
+
 def set_port_status(port_id, status):
     session = db.get_session()
     try:
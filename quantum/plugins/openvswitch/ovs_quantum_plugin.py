@@ -62,8 +62,10 @@ class OVSRpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
     # history
     #   1.0 Initial version
     #   1.1 Support Security Group RPC
+    #   1.2 Support get_devices_details_list, update_devices_down and
+    #       security_group_info_for_devices
 
-    RPC_API_VERSION = '1.1'
+    RPC_API_VERSION = '1.2'
 
     def __init__(self, notifier):
         self.notifier = notifier
@@ -129,6 +131,64 @@ class OVSRpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
             LOG.debug(_("%s can not be found in database"), device)
         return entry
 
+    def get_devices_details_list(self, rpc_context, **kwargs):
+        """Agent requests the details of several devices"""
+        agent_id = kwargs.get('agent_id')
+        devices = kwargs.get('devices') or []
+        LOG.debug(_("Details of %(count)s devices requested from "
+                    "%(agent_id)s"),
+                  {'count': len(devices), 'agent_id': agent_id})
+        ports = {}
+        if devices:
+            for port, binding in ovs_db_v2.get_ports_and_bindings(devices):
+                ports[port['id']] = (port, binding)
+        entries = []
+        new_statuses = {}
+        for device in devices:
+            port, binding = ports.get(device, (None, None))
+            if port and binding:
+                entries.append({'device': device,
+                                'network_id': port['network_id'],
+                                'port_id': port['id'],
+                                'admin_state_up': port['admin_state_up'],
+                                'network_type': binding.network_type,
+                                'segmentation_id': binding.segmentation_id,
+                                'physical_network': binding.physical_network})
+                new_status = (q_const.PORT_STATUS_ACTIVE
+                              if port['admin_state_up']
+                              else q_const.PORT_STATUS_DOWN)
+                if port['status'] != new_status:
+                    new_statuses.setdefault(new_status, []).append(port['id'])
+            else:
+                entries.append({'device': device})
+                LOG.debug(_("%s can not be found in database"), device)
+        for status, port_ids in new_statuses.iteritems():
+            ovs_db_v2.set_ports_status(port_ids, status)
+        return entries
+
+    def update_devices_down(self, rpc_context, **kwargs):
+        """Several devices no longer exist on agent"""
+        agent_id = kwargs.get('agent_id')
+        devices = kwargs.get('devices') or []
+        LOG.debug(_("%(count)s devices no longer exist on %(agent_id)s"),
+                  {'count': len(devices), 'agent_id': agent_id})
+        ports = {}
+        if devices:
+            for port, binding in ovs_db_v2.get_ports_and_bindings(devices):
+                ports[port['id']] = port
+        entries = []
+        port_ids = []
+        for device in devices:
+            port = ports.get(device)
+            entries.append({'device': device, 'exists': bool(port)})
+            if not port:
+                LOG.debug(_("%s can not be found in database"), device)
+            elif port['status'] != q_const.PORT_STATUS_DOWN:
+                port_ids.append(port['id'])
+        if port_ids:
+            ovs_db_v2.set_ports_status(port_ids, q_const.PORT_STATUS_DOWN)
+        return entries
+
     def update_device_up(self, rpc_context, **kwargs):
         """Device is up on agent"""
         agent_id = kwargs.get('agent_id')
@@ -347,10 +407,11 @@ class OVSQuantumPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
     def _enforce_set_auth(self, context, resource, action):
         policy.enforce(context, action, resource)
 
-    def _extend_network_dict_provider(self, context, network):
+    def _extend_network_dict_provider(self, context, network, binding=None):
         if self._check_view_auth(context, network, self.network_view):
-            binding = ovs_db_v2.get_network_binding(context.session,
-                                                    network['id'])
+            if binding is None:
+                binding = ovs_db_v2.get_network_binding(context.session,
+                                                        network['id'])
             network[provider.NETWORK_TYPE] = binding.network_type
             if binding.network_type == constants.TYPE_GRE:
                 network[provider.PHYSICAL_NETWORK] = None
@@ -533,6 +594,14 @@ class OVSQuantumPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
             # the network record, so explicit removal is not necessary
         self.notifier.network_delete(context, id)
 
+    def update_subnet(self, context, id, subnet):
+        original_subnet = super(OVSQuantumPluginV2, self).get_subnet(
+            context, id)
+        subnet = super(OVSQuantumPluginV2, self).update_subnet(
+            context, id, subnet)
+        self.update_routers_for_subnet(context, original_subnet, subnet)
+        return subnet
+
     def get_network(self, context, id, fields=None):
         session = context.session
         with session.begin(subtransactions=True):
@@ -550,9 +619,12 @@ class OVSQuantumPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
             nets = super(OVSQuantumPluginV2,
                          self).get_networks(context, filters, None, sorts,
                                             limit, marker, page_reverse)
+            bindings = ovs_db_v2.get_network_bindings(
+                session, [net['id'] for net in nets])
             for net in nets:
-                self._extend_network_dict_provider(context, net)
-                self._extend_network_dict_l3(context, net)
+                self._extend_network_dict_provider(context, net,
+                                                   bindings.get(net['id']))
+            self._extend_networks_dict_l3(context, nets)
 
         return [self._fields(net, fields) for net in nets]
 
@@ -578,6 +650,30 @@ class OVSQuantumPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
         self.notify_security_groups_member_updated(context, port)
         return self._extend_port_dict_binding(context, port)
 
+    def _create_ports_bulk(self, context, ports):
+        """Create ports as create_port does, with the set-based creator."""
+        sgids = []
+        for port in ports:
+            # Set port status as 'DOWN'. This will be updated by agent
+            port['port']['status'] = q_const.PORT_STATUS_DOWN
+            self._ensure_default_security_group_on_port(context, port)
+            sgids.append(self._get_security_groups_on_port(context, port))
+        ports = super(OVSQuantumPluginV2, self)._create_ports_bulk(
+            context, ports)
+        # The bindings refer to the ports
+        context.session.flush()
+        for port, port_sgids in zip(ports, sgids):
+            self._process_port_create_security_group(
+                context, port['id'], port_sgids)
+        return self._extend_ports_dict_security_group(context, ports)
+
+    def create_port_bulk(self, context, ports):
+        ports = self._create_bulk('port', context, ports,
+                                  bulk_creator=self._create_ports_bulk)
+        self.notify_security_groups_members_updated(context, ports)
+        return [self._extend_port_dict_binding(context, port)
+                for port in ports]
+
     def get_port(self, context, id, fields=None):
         with context.session.begin(subtransactions=True):
             port = super(OVSQuantumPluginV2, self).get_port(context,
@@ -594,8 +690,8 @@ class OVSQuantumPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
                 context, filters, fields, sorts, limit, marker,
                 page_reverse)
             #TODO(nati) filter by security group
+            self._extend_ports_dict_security_group(context, ports)
             for port in ports:
-                self._extend_port_dict_security_group(context, port)
                 self._extend_port_dict_binding(context, port)
         return [self._fields(port, fields) for port in ports]
 
@@ -610,6 +706,7 @@ class OVSQuantumPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
                 context, id, port)
             need_port_update_notify = self.update_security_group_on_port(
                 context, id, port, original_port, updated_port)
+        self.update_router_for_port(context, original_port, updated_port)
 
         need_port_update_notify |= self.is_security_group_member_updated(
             context, original_port, updated_port)
@@ -183,6 +183,14 @@ class RyuQuantumPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
             self.tunnel_key.delete(session, id)
             super(RyuQuantumPluginV2, self).delete_network(context, id)
 
+    def update_subnet(self, context, id, subnet):
+        original_subnet = super(RyuQuantumPluginV2, self).get_subnet(
+            context, id)
+        subnet = super(RyuQuantumPluginV2, self).update_subnet(
+            context, id, subnet)
+        self.update_routers_for_subnet(context, original_subnet, subnet)
+        return subnet
+
     def get_network(self, context, id, fields=None):
         net = super(RyuQuantumPluginV2, self).get_network(context, id, None)
         self._extend_network_dict_l3(context, net)
@@ -191,8 +199,7 @@ class RyuQuantumPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
     def get_networks(self, context, filters=None, fields=None):
         nets = super(RyuQuantumPluginV2, self).get_networks(context, filters,
                                                             None)
-        for net in nets:
-            self._extend_network_dict_l3(context, net)
+        self._extend_networks_dict_l3(context, nets)
 
         return [self._fields(net, fields) for net in nets]
 
@@ -235,6 +242,7 @@ class RyuQuantumPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
                 context, id, port)
             need_port_update_notify = self.update_security_group_on_port(
                 context, id, port, original_port, updated_port)
+        self.update_router_for_port(context, original_port, updated_port)
 
         need_port_update_notify |= self.is_security_group_member_updated(
             context, original_port, updated_port)
@@ -260,6 +268,5 @@ class RyuQuantumPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
         with context.session.begin(subtransactions=True):
             ports = super(RyuQuantumPluginV2, self).get_ports(
                 context, filters, fields)
-            for port in ports:
-                self._extend_port_dict_security_group(context, port)
+            self._extend_ports_dict_security_group(context, ports)
         return [self._fields(port, fields) for port in ports]
@@ -31,14 +31,22 @@ from quantum.openstack.common import policy
 LOG = logging.getLogger(__name__)
 _POLICY_PATH = None
 _POLICY_CACHE = {}
+# Compiled match rules of the read actions, valid for the rules they were
+# compiled from
+_MATCH_RULES = {}
+_MATCH_RULES_SOURCE = None
 cfg.CONF.import_opt('policy_file', 'quantum.common.config')
 
 
 def reset():
     global _POLICY_PATH
     global _POLICY_CACHE
+    global _MATCH_RULES
+    global _MATCH_RULES_SOURCE
     _POLICY_PATH = None
     _POLICY_CACHE = {}
+    _MATCH_RULES = {}
+    _MATCH_RULES_SOURCE = None
     policy.reset()
 
 
@@ -75,11 +83,15 @@ def _is_attribute_explicitly_set(attribute_name, resource, target):
             target[attribute_name] != resource[attribute_name]['default'])
 
 
-def _build_target(action, original_target, plugin, context):
+def _build_target(action, original_target, plugin, context,
+                  parent_tenants=None):
     """Augment dictionary of target attributes for policy engine.
 
     This routine adds to the dictionary attributes belonging to the
     "parent" resource of the targeted one.
+
+    :param parent_tenants: tenant_id of the parent resources by id, as
+        returned by _get_parent_tenants, looked up before the plugin
     """
     target = original_target.copy()
     resource, _a = get_resource_and_action(action)
@@ -88,14 +100,34 @@ def _build_target(action, original_target, plugin, context):
         # use the 'singular' version of the resource name
         parent_resource = hierarchy_info['parent'][:-1]
         parent_id = hierarchy_info['identified_by']
-        f = getattr(plugin, 'get_%s' % parent_resource)
-        # f *must* exist, if not found it is better to let quantum explode
-        # Note: we do not use admin context
-        data = f(context, target[parent_id], fields=['tenant_id'])
-        target['%s_tenant_id' % parent_resource] = data['tenant_id']
+        if parent_tenants and target[parent_id] in parent_tenants:
+            tenant_id = parent_tenants[target[parent_id]]
+        else:
+            f = getattr(plugin, 'get_%s' % parent_resource)
+            # f *must* exist, if not found it is better to let quantum
+            # explode
+            # Note: we do not use admin context
+            data = f(context, target[parent_id], fields=['tenant_id'])
+            tenant_id = data['tenant_id']
+        target['%s_tenant_id' % parent_resource] = tenant_id
     return target
 
 
+def _get_parent_tenants(action, targets, plugin, context):
+    """Fetch the tenant_id of the parents of all targets in one call."""
+    resource, _a = get_resource_and_action(action)
+    hierarchy_info = attributes.RESOURCE_HIERARCHY_MAP.get(resource, None)
+    if not (hierarchy_info and plugin and targets):
+        return {}
+    parent_ids = set(target[hierarchy_info['identified_by']]
+                     for target in targets)
+    f = getattr(plugin, 'get_%s' % hierarchy_info['parent'])
+    # Parents not visible in this context are left to _build_target
+    parents = f(context, filters={'id': list(parent_ids)},
+                fields=['id', 'tenant_id'])
+    return dict((parent['id'], parent['tenant_id']) for parent in parents)
+
+
 def _build_match_rule(action, target):
     """Create the rule to match for a given action.
 
@@ -126,6 +158,50 @@ def _build_match_rule(action, target):
     return match_rule
 
 
+def _compile_rule(rule, rules, referenced=()):
+    """Return rule with the rules it references inlined.
+
+    The compiled rule evaluates like rule does with these rules, without
+    looking up the referenced rules on every call.
+    """
+    if isinstance(rule, policy.RuleCheck):
+        if rule.match in referenced:
+            # Recursive rule, leave it to be evaluated as it is
+            return rule
+        try:
+            referenced_rule = rules[rule.match]
+        except KeyError:
+            # RuleCheck fails closed on missing rules
+            return policy.FalseCheck()
+        return _compile_rule(referenced_rule, rules,
+                             referenced + (rule.match,))
+    if isinstance(rule, (policy.AndCheck, policy.OrCheck)):
+        return rule.__class__([_compile_rule(sub_rule, rules, referenced)
+                               for sub_rule in rule.rules])
+    if isinstance(rule, policy.NotCheck):
+        return policy.NotCheck(_compile_rule(rule.rule, rules, referenced))
+    return rule
+
+
+def _get_match_rule(action, target):
+    """Return the match rule for action, compiled once for read actions."""
+    global _MATCH_RULES
+    global _MATCH_RULES_SOURCE
+    _resource, is_write = get_resource_and_action(action)
+    rules = policy._rules
+    if is_write or not rules:
+        # The rule of write actions depends on the attributes in target
+        return _build_match_rule(action, target)
+    if rules is not _MATCH_RULES_SOURCE:
+        _MATCH_RULES = {}
+        _MATCH_RULES_SOURCE = rules
+    match_rule = _MATCH_RULES.get(action)
+    if match_rule is None:
+        match_rule = _compile_rule(_build_match_rule(action, target), rules)
+        _MATCH_RULES[action] = match_rule
+    return match_rule
+
+
 @policy.register('field')
 class FieldCheck(policy.Check):
     def __init__(self, kind, match):
@@ -178,7 +254,7 @@ def check(context, action, target, plugin=None):
     if target is None:
         target = {}
     real_target = _build_target(action, target, plugin, context)
-    match_rule = _build_match_rule(action, real_target)
+    match_rule = _get_match_rule(action, real_target)
     credentials = context.to_dict()
     return policy.check(match_rule, real_target, credentials)
 
@@ -203,7 +279,36 @@ def enforce(context, action, target, plugin=None):
     if target is None:
         target = {}
     real_target = _build_target(action, target, plugin, context)
-    match_rule = _build_match_rule(action, real_target)
+    match_rule = _get_match_rule(action, real_target)
     credentials = context.to_dict()
     return policy.check(match_rule, real_target, credentials,
                         exceptions.PolicyNotAuthorized, action=action)
+
+
+def filter_allowed(context, action, targets, plugin=None):
+    """Returns the targets on which the action is valid in this context.
+
+    This is equivalent to calling check for each target, but the policy
+    file, the credentials and the parent resources of the targets are only
+    looked up once for the whole list.
+
+    :param context: quantum context
+    :param action: string representing the action to be checked
+    :param targets: list of dictionaries representing the objects of the
+        action
+    :param plugin: quantum plugin used to retrieve information required
+        for augmenting the targets
+
+    :return: Returns the list of targets for which access is permitted.
+    """
+    init()
+    credentials = context.to_dict()
+    parent_tenants = _get_parent_tenants(action, targets, plugin, context)
+    allowed = []
+    for target in targets:
+        real_target = _build_target(action, target, plugin, context,
+                                    parent_tenants)
+        match_rule = _get_match_rule(action, real_target)
+        if policy.check(match_rule, real_target, credentials):
+            allowed.append(target)
+    return allowed
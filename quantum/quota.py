@@ -48,6 +48,10 @@ quota_opts = [
     cfg.StrOpt('quota_driver',
                default='quantum.quota.ConfDriver',
                help=_('Default driver to use for quota checks')),
+    cfg.IntOpt('quota_usage_resync_interval',
+               default=600,
+               help=_('Seconds between the recounts of the usages kept by '
+                      'the usage tracking quota driver, 0 to disable')),
 ]
 # Register the configuration options
 cfg.CONF.register_opts(quota_opts, 'QUOTAS')
@@ -253,8 +257,20 @@ class QuotaEngine(object):
         if not res or not hasattr(res, 'count'):
             raise exceptions.QuotaResourceUnknown(unknown=[resource])
 
+        # Drivers keeping track of the usages count the resources themselves
+        if hasattr(self._driver, 'count'):
+            return self._driver.count(context, res, *args, **kwargs)
         return res.count(context, *args, **kwargs)
 
+    @property
+    def tracks_usages(self):
+        """Whether the driver keeps usage counters needing recounts."""
+        return hasattr(self._driver, 'resync_usages')
+
+    def resync_usages(self, context):
+        """Recount the usage counters kept by the driver."""
+        self._driver.resync_usages(context)
+
     def limit_check(self, context, tenant_id, **values):
         """Check simple quota limits.
 
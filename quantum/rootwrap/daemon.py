@@ -0,0 +1,198 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Rootwrap daemon running filtered commands sent over a local socket.
+
+Every quantum-rootwrap call costs a sudo run, a Python interpreter start and
+the parsing of the filter files. quantum-rootwrap-daemon is started once by
+an agent, keeps the filters loaded and runs the commands the agent sends on
+a UNIX socket which only the user running the agent can open.
+
+The daemon writes the path of its socket on stdout and exits when its stdin
+is closed, i.e. when the agent which started it goes away. Requests and
+replies are JSON documents, one per line:
+
+    {"cmd": ["ip", "link", "show"], "stdin": null}
+    {"returncode": 0, "stdout": "...", "stderr": ""}
+"""
+
+import os
+import shlex
+import shutil
+import sys
+import tempfile
+
+import eventlet
+from eventlet.green import socket
+from eventlet.green import subprocess
+from eventlet import hubs
+from eventlet import semaphore
+
+from quantum.common import utils
+from quantum.openstack.common import jsonutils
+from quantum.rootwrap import wrapper
+
+
+RC_UNAUTHORIZED = 99
+RC_NOEXECFOUND = 96
+
+SOCKET_NAME = 'rootwrap.sock'
+
+
+def _encode(data):
+    # Command output is not necessarily valid UTF-8, latin-1 maps every
+    # byte to a code point and back
+    return (data or '').decode('latin-1')
+
+
+def _decode(data):
+    return data.encode('latin-1')
+
+
+class RootwrapDaemon(object):
+    """Runs the commands matching the loaded filters."""
+
+    def __init__(self, filters):
+        self.filters = filters
+
+    def run_command(self, userargs, process_input=None):
+        filtermatch = wrapper.match_filter(self.filters, userargs)
+        if not filtermatch:
+            return (RC_UNAUTHORIZED, '',
+                    'Unauthorized command: %s\n' % ' '.join(userargs))
+        try:
+            obj = utils.subprocess_popen(
+                filtermatch.get_command(userargs),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                env=filtermatch.get_environment(userargs))
+        except OSError, e:
+            return RC_NOEXECFOUND, '', 'Unable to execute %s: %s\n' % (
+                userargs[0], e)
+        stdout, stderr = obj.communicate(process_input)
+        return obj.returncode, stdout, stderr
+
+    def handle_connection(self, conn):
+        stream = conn.makefile('rw')
+        try:
+            for line in iter(stream.readline, ''):
+                request = jsonutils.loads(line)
+                process_input = request.get('stdin')
+                if process_input is not None:
+                    process_input = _decode(process_input)
+                returncode, stdout, stderr = self.run_command(
+                    request['cmd'], process_input)
+                stream.write(jsonutils.dumps({'returncode': returncode,
+                                              'stdout': _encode(stdout),
+                                              'stderr': _encode(stderr)}))
+                stream.write('\n')
+                stream.flush()
+        finally:
+            stream.close()
+            conn.close()
+
+    def serve(self, server):
+        pool = eventlet.GreenPool()
+        while True:
+            conn, _addr = server.accept()
+            pool.spawn_n(self.handle_connection, conn)
+
+
+def listen(socket_dir):
+    """Listen on a socket only the user who ran sudo can connect to."""
+    socket_path = os.path.join(socket_dir, SOCKET_NAME)
+    server = eventlet.listen(socket_path, family=socket.AF_UNIX)
+    if 'SUDO_UID' in os.environ:
+        os.chown(socket_dir, int(os.environ['SUDO_UID']),
+                 int(os.environ['SUDO_GID']))
+    return server, socket_path
+
+
+def main(filters_path):
+    socket_dir = tempfile.mkdtemp(prefix='quantum-rootwrap-')
+    try:
+        server, socket_path = listen(socket_dir)
+        daemon = RootwrapDaemon(wrapper.load_filters(filters_path))
+        eventlet.spawn_n(daemon.serve, server)
+        sys.stdout.write(socket_path + '\n')
+        sys.stdout.flush()
+        # Serve until the agent closes our stdin
+        stdin = sys.stdin.fileno()
+        while True:
+            hubs.trampoline(stdin, read=True)
+            if not os.read(stdin, 4096):
+                break
+    finally:
+        shutil.rmtree(socket_dir, ignore_errors=True)
+
+
+class RootwrapClient(object):
+    """Runs commands through a rootwrap daemon started on first use."""
+
+    def __init__(self, daemon_cmd, _popen=None):
+        self.daemon_cmd = daemon_cmd
+        if _popen:
+            self.popen = _popen
+        else:
+            self.popen = utils.subprocess_popen
+        self.socket_path = None
+        self._process = None
+        self._lock = semaphore.Semaphore()
+
+    def _ensure_daemon(self):
+        with self._lock:
+            if self._process and self._process.poll() is None:
+                return
+            self._process = self.popen(shlex.split(self.daemon_cmd),
+                                       stdin=subprocess.PIPE,
+                                       stdout=subprocess.PIPE)
+            self.socket_path = self._process.stdout.readline().strip()
+            if not self.socket_path:
+                self._process = None
+                raise RuntimeError(_("Unable to start rootwrap daemon: %s") %
+                                   self.daemon_cmd)
+
+    def stop(self):
+        """Let the daemon exit by closing its stdin."""
+        if self._process:
+            self._process.stdin.close()
+            self._process.wait()
+            self._process = None
+
+    def execute(self, cmd, process_input=None):
+        """Run cmd as root, returning its exit code, stdout and stderr."""
+        self._ensure_daemon()
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            conn.connect(self.socket_path)
+            stream = conn.makefile('rw')
+            if process_input is not None:
+                process_input = _encode(process_input)
+            stream.write(jsonutils.dumps({'cmd': cmd, 'stdin': process_input}))
+            stream.write('\n')
+            stream.flush()
+            reply = stream.readline()
+            stream.close()
+        finally:
+            conn.close()
+        if not reply:
+            raise RuntimeError(_("No reply from rootwrap daemon for %s") %
+                               cmd)
+        reply = jsonutils.loads(reply)
+        return (reply['returncode'], _decode(reply['stdout']),
+                _decode(reply['stderr']))
@@ -19,15 +19,20 @@ import inspect
 import logging as std_logging
 import os
 import random
+import time
 
 from oslo.config import cfg
 
 from quantum.common import config
 from quantum import context
+from quantum.db import api as db_api
+from quantum import manager
 from quantum.openstack.common import importutils
 from quantum.openstack.common import log as logging
 from quantum.openstack.common import loopingcall
+from quantum.openstack.common import rpc
 from quantum.openstack.common.rpc import service
+from quantum import quota
 from quantum import wsgi
 
 
@@ -88,6 +93,68 @@ class QuantumApiService(WsgiService):
         service = cls(app_name)
         return service
 
+    def start(self):
+        super(QuantumApiService, self).start()
+        self.ip_recycler = None
+        self.timers = []
+        if cfg.CONF.ip_recycle_interval > 0:
+            plugin = manager.QuantumManager.get_plugin()
+            if hasattr(plugin, 'recycle_expired_ip_allocations'):
+                self.ip_recycler = IpAllocationRecycler(plugin)
+                recycler = loopingcall.LoopingCall(self.ip_recycler)
+                recycler.start(interval=cfg.CONF.ip_recycle_interval)
+                self.timers.append(recycler)
+            else:
+                LOG.warning(_("The core plugin does not support recycling "
+                              "expired IP allocations, ip_recycle_interval "
+                              "is ignored"))
+        # The workers share the usage counters, only this process recounts
+        # them
+        interval = cfg.CONF.QUOTAS.quota_usage_resync_interval
+        if interval > 0 and quota.QUOTAS.tracks_usages:
+            resync = loopingcall.LoopingCall(self._resync_quota_usages)
+            resync.start(interval=interval, initial_delay=interval)
+            self.timers.append(resync)
+
+    @staticmethod
+    def _resync_quota_usages():
+        # An error must not stop the looping call
+        try:
+            quota.QUOTAS.resync_usages(context.get_admin_context())
+        except Exception:
+            LOG.exception(_("Unable to resync the quota usages"))
+
+
+class IpAllocationRecycler(object):
+    """Periodic task returning expired IP allocations to their pools.
+
+    The number of allocations reclaimed by the last run and since the
+    service started are kept in last_reclaimed and total_reclaimed.
+    """
+
+    def __init__(self, plugin):
+        self.plugin = plugin
+        self.runs = 0
+        self.last_reclaimed = 0
+        self.total_reclaimed = 0
+
+    def __call__(self):
+        start = time.time()
+        try:
+            reclaimed = self.plugin.recycle_expired_ip_allocations(
+                context.get_admin_context())
+        except Exception:
+            LOG.exception(_("Failed to recycle expired IP allocations"))
+            return
+        self.runs += 1
+        self.last_reclaimed = reclaimed
+        self.total_reclaimed += reclaimed
+        LOG.info(_("Reclaimed %(reclaimed)s expired IP allocations in "
+                   "%(duration).3f seconds (%(total)s since start)"),
+                 {'reclaimed': reclaimed,
+                  'duration': time.time() - start,
+                  'total': self.total_reclaimed})
+
 
 def serve_wsgi(cls):
     try:
@@ -106,8 +173,14 @@ def _run_wsgi(app_name):
     if not app:
         LOG.error(_('No known API applications configured.'))
         return
+    if cfg.CONF.api_workers > 0:
+        # Loading the plugin may have opened database and messaging
+        # connections, the workers must not share them with this process
+        db_api.dispose()
+        rpc.cleanup()
     server = wsgi.Server("Quantum")
-    server.start(app, cfg.CONF.bind_port, cfg.CONF.bind_host)
+    server.start(app, cfg.CONF.bind_port, cfg.CONF.bind_host,
+                 workers=cfg.CONF.api_workers)
     # Dump all option values here after all options are parsed
     cfg.CONF.log_opt_values(LOG, std_logging.DEBUG)
     LOG.info(_("Quantum service started, listening on %(host)s:%(port)s"),
@@ -0,0 +1,119 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright 2013 Big Switch Networks, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Local network ctrl serving the REST proxy over HTTP/1.1 persistent
+connections, keeping the topology and digest it receives for every tenant.
+"""
+
+import BaseHTTPServer
+import json
+import re
+import SocketServer
+import threading
+
+from quantum.plugins.bigswitch import plugin
+
+
+class FakeNetworkCtrl(object):
+
+    def __init__(self, support_digests=True):
+        self.support_digests = support_digests
+        self.requests = []
+        # The data last received for every path
+        self.data = {}
+        self.connections = 0
+        # Close the connections after every response without telling the
+        # client, as when idle connections time out
+        self.drop_connections = False
+        # Answer every request with this status when set, as a failing
+        # ctrl would
+        self.status = None
+        # Reject the requests on these paths
+        self.rejected_paths = set()
+        self.topology = None
+        self.tenant_topologies = {}
+        ctrl = self
+
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Send every response in a single segment
+            wbufsize = -1
+            # Do not keep idle connections forever
+            timeout = 5
+
+            def setup(self):
+                BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+                ctrl.connections += 1
+
+            def _handle(self):
+                length = int(self.headers.getheader('content-length') or 0)
+                body = self.rfile.read(length)
+                status, data = ctrl.handle(self.command, self.path,
+                                           json.loads(body) if body else None)
+                response = json.dumps(data)
+                self.send_response(status)
+                self.send_header('Content-type', 'application/json')
+                self.send_header('Content-length', len(response))
+                self.end_headers()
+                self.wfile.write(response)
+                if ctrl.drop_connections:
+                    self.close_connection = 1
+
+            do_GET = do_PUT = do_POST = do_DELETE = _handle
+
+            def log_message(self, *args):
+                pass
+
+        class Server(SocketServer.ThreadingMixIn,
+                     BaseHTTPServer.HTTPServer):
+            daemon_threads = True
+
+        self.server = Server(('127.0.0.1', 0), Handler)
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handle(self, method, path, data):
+        path = path[len(plugin.BASE_URI):]
+        self.requests.append((method, path))
+        self.data[path] = data
+        if self.status:
+            return self.status, None
+        if path in self.rejected_paths:
+            return 400, None
+        if path == plugin.TOPOLOGY_DIGESTS_PATH and method == 'GET':
+            if not self.support_digests:
+                return 404, None
+            return 200, {'tenants': dict(
+                (tenant_id, topology['digest']) for tenant_id, topology in
+                self.tenant_topologies.iteritems())}
+        if path == '/topology' and method == 'PUT':
+            self.topology = data
+            return 200, None
+        match = re.match(plugin.TENANT_TOPOLOGY_PATH % '([^/]+)' + '$', path)
+        if match and method == 'PUT':
+            self.tenant_topologies[match.group(1)] = data
+            return 200, None
+        return 200, None
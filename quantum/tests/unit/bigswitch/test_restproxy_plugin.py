@@ -15,18 +15,27 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from contextlib import nested
+import httplib
 import os
 
 from mock import patch
+from oslo.config import cfg
 
 import quantum.common.test_lib as test_lib
+from quantum import context
 from quantum.extensions import portbindings
 from quantum.manager import QuantumManager
+from quantum.openstack.common import timeutils
+from quantum.plugins.bigswitch import plugin
+from quantum.tests import base
 from quantum.tests.unit import _test_extension_portbindings as test_bindings
+from quantum.tests.unit.bigswitch import fake_server
 import quantum.tests.unit.test_db_plugin as test_plugin
 
 
 RESTPROXY_PKG_PATH = 'quantum.plugins.bigswitch.plugin'
+HTTPConnection = httplib.HTTPConnection
 
 
 class HTTPResponseMock():
@@ -111,3 +120,312 @@ class TestBigSwitchProxySync(BigSwitchProxyPluginV2TestCase):
         plugin_obj = QuantumManager.get_plugin()
         result = plugin_obj._send_all_data()
         self.assertEqual(result[0], 200)
+
+
+class TestBigSwitchServerProxy(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestBigSwitchServerProxy, self).setUp()
+        self.ctrl = fake_server.FakeNetworkCtrl()
+        self.ctrl.start()
+        self.addCleanup(self.ctrl.stop)
+        self.servers = plugin.ServerPool([('127.0.0.1', self.ctrl.port)],
+                                         False, None, 'quantum-test', 10,
+                                         plugin.BASE_URI)
+        self.addCleanup(self.servers.servers[0].close)
+
+    def test_connection_kept_open(self):
+        for i in range(3):
+            ret = self.servers.get('/networks')
+            self.assertTrue(self.servers.action_success(ret))
+        self.assertEqual(1, self.ctrl.connections)
+
+    def test_reconnect_when_connection_closed(self):
+        self.ctrl.drop_connections = True
+        for i in range(3):
+            ret = self.servers.put('/networks', {})
+            self.assertTrue(self.servers.action_success(ret))
+        self.assertEqual(3, self.ctrl.connections)
+        self.assertEqual([('PUT', '/networks')] * 3, self.ctrl.requests)
+
+    def test_failure_when_ctrl_down(self):
+        self.ctrl.stop()
+        self.assertEqual((0, None, None, None), self.servers.get('/networks'))
+
+
+class TestBigSwitchProxyTopologySync(BigSwitchProxyPluginV2TestCase):
+
+    def setUp(self):
+        super(TestBigSwitchProxyTopologySync, self).setUp()
+        self.plugin = QuantumManager.get_plugin()
+        self.ctx = context.get_admin_context()
+
+    def _start_ctrl(self, support_digests=True):
+        self.ctrl = fake_server.FakeNetworkCtrl(support_digests)
+        self.ctrl.start()
+        self.addCleanup(self.ctrl.stop)
+        self.ctrl_servers = plugin.ServerPool(
+            [('127.0.0.1', self.ctrl.port)], False, None, 'quantum-test', 10,
+            plugin.BASE_URI)
+        self.addCleanup(self.ctrl_servers.servers[0].close)
+
+    def _create_network(self, tenant_id, name='net'):
+        return self.plugin.create_network(
+            self.ctx, {'network': {'name': name, 'tenant_id': tenant_id,
+                                   'admin_state_up': True, 'shared': False}})
+
+    def _sync(self):
+        # Only the sync goes to the local network ctrl
+        del self.ctrl.requests[:]
+        servers = self.plugin.servers
+        self.plugin.servers = self.ctrl_servers
+        try:
+            with patch('httplib.HTTPConnection', new=HTTPConnection):
+                return self.plugin._sync_topology()
+        finally:
+            self.plugin.servers = servers
+
+    def _tenant_puts(self):
+        return sorted(path.split('/')[2] for method, path in
+                      self.ctrl.requests if method == 'PUT')
+
+    def test_sync_sends_tenants_out_of_sync(self):
+        self._start_ctrl()
+        net = self._create_network('tenant-1')
+        self._create_network('tenant-2')
+        self.assertEqual(2, self._sync())
+        self.assertEqual(['tenant-1', 'tenant-2'], self._tenant_puts())
+        self.assertEqual(
+            [net['id']],
+            [n['id'] for n in
+             self.ctrl.tenant_topologies['tenant-1']['networks']])
+        self.assertEqual(0, self._sync())
+        self.assertEqual([], self._tenant_puts())
+        self.plugin.update_network(self.ctx, net['id'],
+                                   {'network': {'name': 'renamed'}})
+        self.assertEqual(1, self._sync())
+        self.assertEqual(['tenant-1'], self._tenant_puts())
+        self.assertEqual(1, self.ctrl.connections)
+
+    def test_sync_empties_tenants_gone(self):
+        self._start_ctrl()
+        self._create_network('tenant-1')
+        self.ctrl.tenant_topologies['gone'] = {'digest': 'old',
+                                               'networks': [{'id': 'n'}],
+                                               'routers': []}
+        self.assertEqual(2, self._sync())
+        topology = self.ctrl.tenant_topologies['gone']
+        self.assertEqual(([], []), (topology['networks'],
+                                    topology['routers']))
+
+    def test_sync_without_digests_sends_all_data(self):
+        self._start_ctrl(support_digests=False)
+        self._create_network('tenant-1')
+        self._create_network('tenant-2')
+        self.assertEqual(None, self._sync())
+        self.assertEqual([('GET', plugin.TOPOLOGY_DIGESTS_PATH),
+                          ('PUT', '/topology')], self.ctrl.requests)
+        self.assertEqual(2, len(self.ctrl.topology['networks']))
+
+
+class StopWorker(Exception):
+    pass
+
+
+class TestBigSwitchAsyncServerPool(BigSwitchProxyPluginV2TestCase):
+
+    def setUp(self):
+        super(TestBigSwitchAsyncServerPool, self).setUp()
+        self.ctrl = fake_server.FakeNetworkCtrl()
+        self.ctrl.start()
+        self.addCleanup(self.ctrl.stop)
+        self.servers = plugin.AsyncServerPool(
+            [('127.0.0.1', self.ctrl.port)], False, None, 'quantum-test', 10,
+            plugin.BASE_URI)
+        self.addCleanup(self.servers.servers[0].close)
+
+    def _drain(self):
+        with patch('httplib.HTTPConnection', new=HTTPConnection):
+            return self.servers.drain()
+
+    def test_calls_queued_and_sent_in_order(self):
+        self.assertEqual(202, self.servers.post('/a', {'a': 1})[0])
+        self.assertTrue(self.servers.action_success(
+            self.servers.put('/b', {'b': 1})))
+        self.servers.delete('/c')
+        self.assertEqual([], self.ctrl.requests)
+        self.assertEqual(3, self.servers.get_stats()['depth'])
+        self.assertTrue(self._drain())
+        self.assertEqual([('POST', '/a'), ('PUT', '/b'), ('DELETE', '/c')],
+                         self.ctrl.requests)
+        self.assertEqual({'a': 1}, self.ctrl.data['/a'])
+        stats = self.servers.get_stats()
+        self.assertEqual((0, 0, 3), (stats['depth'], stats['lag'],
+                                     stats['sent']))
+
+    def test_get_not_queued(self):
+        with patch('httplib.HTTPConnection', new=HTTPConnection):
+            self.assertEqual(200, self.servers.get('/a')[0])
+        self.assertEqual([('GET', '/a')], self.ctrl.requests)
+        self.assertEqual(0, self.servers.get_stats()['depth'])
+
+    def test_updates_replaced(self):
+        self.servers.put('/a', {'name': 'first'})
+        self.servers.post('/b', {})
+        self.servers.put('/a', {'name': 'second'})
+        self.assertEqual(2, self.servers.get_stats()['depth'])
+        self.assertTrue(self._drain())
+        # The update keeps the place of the call it replaces
+        self.assertEqual([('PUT', '/a'), ('POST', '/b')], self.ctrl.requests)
+        self.assertEqual({'name': 'second'}, self.ctrl.data['/a'])
+
+    def test_update_while_sending_not_lost(self):
+        self.servers.put('/a', {'name': 'first'})
+        send = self.servers._send
+
+        def update_while_sending(action, resource, data):
+            self.servers.put('/a', {'name': 'second'})
+            return send(action, resource, data)
+
+        with nested(patch('httplib.HTTPConnection', new=HTTPConnection),
+                    patch.object(self.servers, '_send',
+                                 side_effect=update_while_sending)):
+            self.assertTrue(self.servers._send_next_call())
+        self.assertEqual(1, self.servers.get_stats()['depth'])
+        self.assertTrue(self._drain())
+        self.assertEqual([('PUT', '/a')] * 2, self.ctrl.requests)
+        self.assertEqual({'name': 'second'}, self.ctrl.data['/a'])
+
+    def test_delete_replaces_updates(self):
+        self.servers.post('/a', {})
+        self.servers.put('/a/1', {})
+        self.servers.put('/a/1', {})
+        self.servers.delete('/a/1')
+        self.assertEqual(2, self.servers.get_stats()['replaced'])
+        self.assertTrue(self._drain())
+        self.assertEqual([('POST', '/a'), ('DELETE', '/a/1')],
+                         self.ctrl.requests)
+
+    def test_call_queued_in_transaction(self):
+        ctx = context.get_admin_context()
+        try:
+            with ctx.session.begin():
+                self.servers.put('/a', {}, context=ctx)
+                self.servers.put('/b', {}, context=ctx)
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertEqual(0, self.servers.get_stats()['depth'])
+
+    def test_failed_call_retried_in_order(self):
+        self.ctrl.status = 503
+        self.servers.put('/a', {})
+        self.servers.put('/b', {})
+        self.assertFalse(self._drain())
+        self.assertEqual([('PUT', '/a')], self.ctrl.requests)
+        self.assertEqual(2, self.servers.get_stats()['depth'])
+        self.ctrl.status = None
+        self.assertTrue(self._drain())
+        self.assertEqual([('PUT', '/a'), ('PUT', '/a'), ('PUT', '/b')],
+                         self.ctrl.requests)
+        stats = self.servers.get_stats()
+        self.assertEqual((0, 2, 1), (stats['depth'], stats['sent'],
+                                     stats['retries']))
+
+    def test_call_retried_when_ctrl_down(self):
+        self.servers.put('/a', {})
+        self.ctrl.stop()
+        self.assertFalse(self._drain())
+        self.assertEqual(1, self.servers.get_stats()['depth'])
+
+    def test_rejected_call_without_tenant_dropped(self):
+        self.ctrl.status = 400
+        self.servers.put('/a', {})
+        self.servers.put('/b', {})
+        self.assertTrue(self._drain())
+        stats = self.servers.get_stats()
+        self.assertEqual((0, 2), (stats['depth'], stats['dropped']))
+
+    def test_rejected_call_resyncs_tenant(self):
+        self.servers.get_tenant_topology = lambda tenant_id: {'t': tenant_id}
+        rejected = plugin.NETWORKS_PATH % ('t1', 'n1')
+        self.ctrl.rejected_paths.add(rejected)
+        self.servers.put(rejected, {})
+        self.servers.post(plugin.NET_RESOURCE_PATH % 't2', {})
+        self.servers.post(plugin.NET_RESOURCE_PATH % 't1', {})
+        self.assertTrue(self._drain())
+        # The topology replaces the queued calls of the tenant
+        self.assertEqual([('PUT', rejected),
+                          ('PUT', plugin.TENANT_TOPOLOGY_PATH % 't1'),
+                          ('POST', plugin.NET_RESOURCE_PATH % 't2')],
+                         self.ctrl.requests)
+        self.assertEqual({'t': 't1'}, self.ctrl.tenant_topologies['t1'])
+        stats = self.servers.get_stats()
+        self.assertEqual((0, 1, 0), (stats['depth'], stats['resyncs'],
+                                     stats['dropped']))
+
+    def test_tenant_resync_retried(self):
+        self.servers.get_tenant_topology = lambda tenant_id: {}
+        rejected = plugin.NETWORKS_PATH % ('t1', 'n1')
+        self.ctrl.rejected_paths.add(rejected)
+        self.servers.put(rejected, {})
+        with patch.object(self.servers, '_send',
+                          side_effect=[(400, None, None, None), None]):
+            self.assertFalse(self.servers._send_next_call())
+        self.assertEqual(1, self.servers.get_stats()['depth'])
+        self.assertTrue(self._drain())
+        self.assertEqual(1, self.servers.get_stats()['resyncs'])
+
+    def test_rejected_tenant_topology_dropped(self):
+        self.servers.get_tenant_topology = lambda tenant_id: {}
+        self.ctrl.status = 400
+        self.servers.put(plugin.NETWORKS_PATH % ('t1', 'n1'), {})
+        self.assertTrue(self._drain())
+        self.assertEqual(['PUT', 'PUT'],
+                         [method for method, path in self.ctrl.requests])
+        stats = self.servers.get_stats()
+        self.assertEqual((0, 0, 1), (stats['depth'], stats['resyncs'],
+                                     stats['dropped']))
+
+    def test_lag_of_oldest_call(self):
+        self.addCleanup(timeutils.clear_time_override)
+        timeutils.set_time_override()
+        self.servers.put('/a', {})
+        timeutils.advance_time_seconds(10)
+        self.servers.post('/b', {})
+        timeutils.advance_time_seconds(20)
+        # The replacing call keeps the age of the call it replaces
+        self.servers.put('/a', {})
+        self.assertEqual(30, self.servers.get_stats()['lag'])
+
+    def test_worker_backoff(self):
+        cfg.CONF.set_override('async_retry_interval', 1, 'RESTPROXY')
+        cfg.CONF.set_override('async_max_retry_interval', 3, 'RESTPROXY')
+        # The interval is reset once the queue is drained
+        drained = [False, False, False, True, False]
+        # A queued call wakes the worker up at once
+        self.servers._wakeup.put(None)
+        with patch.object(self.servers, 'drain', side_effect=drained):
+            with patch('eventlet.sleep',
+                       side_effect=[None, None, None, StopWorker]) as sleep:
+                self.assertRaises(StopWorker, self.servers._run)
+        self.assertEqual([1, 2, 3, 1],
+                         [args[0] for args, kwargs in sleep.call_args_list])
+
+    def test_plugin_calls_queued(self):
+        quantum_plugin = QuantumManager.get_plugin()
+        quantum_plugin.servers = self.servers
+        ctx = context.get_admin_context()
+        net = quantum_plugin.create_network(
+            ctx, {'network': {'name': 'net', 'tenant_id': 'tenant',
+                              'admin_state_up': True, 'shared': False}})
+        for name in ('first', 'second'):
+            quantum_plugin.update_network(ctx, net['id'],
+                                          {'network': {'name': name}})
+        self.assertEqual([], self.ctrl.requests)
+        self.assertEqual(2, self.servers.get_stats()['depth'])
+        self.assertTrue(self._drain())
+        net_path = plugin.NETWORKS_PATH % ('tenant', net['id'])
+        self.assertEqual([('POST', plugin.NET_RESOURCE_PATH % 'tenant'),
+                          ('PUT', net_path)], self.ctrl.requests)
+        self.assertEqual('second', self.ctrl.data[net_path]['network']['name'])
@@ -529,6 +529,15 @@ class TestLoadBalancer(LoadBalancerPluginDbTestCase):
                                                         (vip1, vip2, vip3),
                                                         ('name', 'asc'), 2, 2)
 
+    def test_list_vips_with_fields(self):
+        with self.vip(name='vip1') as vip:
+            req = self.new_list_request('vips',
+                                        params='fields=name&fields=pool_id')
+            res = self.deserialize(self.fmt, req.get_response(self.ext_api))
+            self.assertEqual([{'name': 'vip1',
+                               'pool_id': vip['vip']['pool_id']}],
+                             res['vips'])
+
     def test_create_pool_with_invalid_values(self):
         name = 'pool3'
 
@@ -13,7 +13,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from quantum.common import constants as q_const
+from quantum import context
 from quantum.extensions import portbindings
+from quantum.plugins.linuxbridge import lb_quantum_plugin
 from quantum.tests.unit import _test_extension_portbindings as test_bindings
 from quantum.tests.unit import test_db_plugin as test_plugin
 from quantum.tests.unit import test_security_groups_rpc as test_sg_rpc
@@ -46,7 +49,8 @@ class TestLinuxBridgeNetworksV2(test_plugin.TestNetworksV2,
     pass
 
 
-class TestLinuxBridgePortsV2(test_plugin.TestPortsV2,
+class TestLinuxBridgePortsV2(test_plugin.SetBasedPortsBulkTestMixin,
+                             test_plugin.TestPortsV2,
                              LinuxBridgePluginV2TestCase):
 
     def test_update_port_status_build(self):
@@ -55,6 +59,11 @@ class TestLinuxBridgePortsV2(test_plugin.TestPortsV2,
             self.assertEqual(self.port_create_status, 'DOWN')
 
 
+class TestLinuxBridgeListStatementCount(test_plugin.TestListStatementCount,
+                                        LinuxBridgePluginV2TestCase):
+    pass
+
+
 class TestLinuxBridgePortBinding(LinuxBridgePluginV2TestCase,
                                  test_bindings.PortBindingsTestCase):
     VIF_TYPE = portbindings.VIF_TYPE_BRIDGE
@@ -69,3 +78,29 @@ class TestLinuxBridgePortBinding(LinuxBridgePluginV2TestCase,
 class TestLinuxBridgePortBindingNoSG(TestLinuxBridgePortBinding):
     HAS_PORT_FILTER = False
     FIREWALL_DRIVER = test_sg_rpc.FIREWALL_NOOP_DRIVER
+
+
+class TestLinuxBridgeRpcCallbacks(LinuxBridgePluginV2TestCase):
+
+    def test_devices_details_list_and_down(self):
+        callbacks = lb_quantum_plugin.LinuxBridgeRpcCallbacks()
+        ctx = context.get_admin_context()
+        with self.port() as port:
+            port_id = port['port']['id']
+            devices = ['tap' + port_id[:11], 'tapunknown']
+            details = callbacks.get_devices_details_list(
+                ctx, devices=devices, agent_id='fake_agent')
+            self.assertEqual([d['device'] for d in details], devices)
+            self.assertEqual(details[0]['port_id'], port_id)
+            self.assertEqual(details[0]['network_type'], 'local')
+            self.assertNotIn('port_id', details[1])
+            res = self._show('ports', port_id)
+            self.assertEqual(res['port']['status'],
+                             q_const.PORT_STATUS_ACTIVE)
+
+            details = callbacks.update_devices_down(
+                ctx, devices=devices, agent_id='fake_agent')
+            self.assertEqual([d['exists'] for d in details], [True, False])
+            res = self._show('ports', port_id)
+            self.assertEqual(res['port']['status'],
+                             q_const.PORT_STATUS_DOWN)
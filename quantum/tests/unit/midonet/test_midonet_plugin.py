@@ -124,6 +124,16 @@ class TestMidonetNetworksV2(test_plugin.TestNetworksV2,
         self._setup_bridge_mock()
         super(TestMidonetNetworksV2, self).test_show_network()
 
+    def test_get_networks_with_column_fields(self):
+        self._setup_bridge_mock()
+        super(TestMidonetNetworksV2,
+              self).test_get_networks_with_column_fields()
+
+    def test_get_networks_with_non_column_fields(self):
+        self._setup_bridge_mock()
+        super(TestMidonetNetworksV2,
+              self).test_get_networks_with_non_column_fields()
+
     def test_update_shared_network_noadmin_returns_403(self):
         self._setup_bridge_mock()
         super(TestMidonetNetworksV2,
@@ -731,6 +741,15 @@ class TestMidonetPortsV2(test_plugin.TestPortsV2,
     def test_recycle_expired_previously_run_within_context(self):
         pass
 
+    def test_recycle_expired_ip_allocations_in_batches(self):
+        pass
+
+    def test_periodic_recycling_skips_per_request_scan(self):
+        pass
+
+    def test_periodic_recycling_reclaims_when_exhausted(self):
+        pass
+
     def test_update_port_not_admin(self):
         self._setup_port_mocks()
         super(TestMidonetPortsV2, self).test_update_port_not_admin()
@@ -14,6 +14,7 @@
 # limitations under the License.
 
 import contextlib
+import datetime
 import os
 
 import mock
@@ -33,6 +34,9 @@ import quantum.plugins.nicira.nicira_nvp_plugin as nvp_plugin
 from quantum.plugins.nicira.nicira_nvp_plugin.extensions import nvp_networkgw
 from quantum.plugins.nicira.nicira_nvp_plugin.extensions import (nvp_qos
                                                                  as ext_qos)
+from quantum.plugins.nicira.nicira_nvp_plugin import nicira_db
+from quantum.plugins.nicira.nicira_nvp_plugin import nvp_sync
+from quantum.plugins.nicira.nicira_nvp_plugin import NvpApiClient
 from quantum.plugins.nicira.nicira_nvp_plugin import nvplib
 from quantum.plugins.nicira.nicira_nvp_plugin import QuantumPlugin
 from quantum.tests.unit.nicira import fake_nvpapiclient
@@ -543,6 +547,10 @@ class TestNiciraL3NatTestCase(test_l3_plugin.L3NatDBTestCase,
             # Test that route is deleted after dhcp port is removed
             self.assertEquals(len(subnets[0]['host_routes']), 0)
 
+    def test_gateway_port_fixed_ips_update_bumps_router_generation(self):
+        # Gateway ports are not switch ports in NVP
+        self.skipTest("Plugin does not support updating gateway ports")
+
 
 class NvpQoSTestExtensionManager(object):
 
@@ -879,6 +887,208 @@ class NiciraQuantumNVPOutOfSync(test_l3_plugin.L3NatTestCaseBase,
                          constants.NET_STATUS_ERROR)
 
 
+class TestNiciraStatusSync(test_l3_plugin.L3NatTestCaseBase,
+                           NiciraPluginV2TestCase):
+
+    def setUp(self):
+        super(TestNiciraStatusSync, self).setUp()
+        cfg.CONF.set_override('state_sync_interval', 120, 'NVP')
+        self.plugin = manager.QuantumManager.get_plugin()
+        self.ctx = context.get_admin_context()
+
+    def _synchronize(self):
+        self.plugin._synchronizer.synchronize(self.ctx)
+
+    def _list(self, resource, api=None):
+        req = self.new_list_request(resource)
+        return self.deserialize('json', req.get_response(api or self.api))
+
+    def test_list_served_from_db_after_sync(self):
+        with self.port():
+            with self.router():
+                self._synchronize()
+                with mock.patch.object(self.fc, 'handle_get') as get:
+                    ports = self._list('ports')['ports']
+                    networks = self._list('networks')['networks']
+                    routers = self._list('routers', self.ext_api)['routers']
+                    self.assertFalse(get.called)
+        # The fake NVP logical ports are never up
+        self.assertEqual(constants.PORT_STATUS_DOWN, ports[0]['status'])
+        self.assertEqual(constants.NET_STATUS_ACTIVE, networks[0]['status'])
+        self.assertEqual(constants.NET_STATUS_ACTIVE, routers[0]['status'])
+
+    def test_show_served_from_db_after_sync(self):
+        with self.port() as port:
+            with self.router() as router:
+                self._synchronize()
+                with mock.patch.object(self.fc, 'handle_get') as get:
+                    for resource, obj_id, api in (
+                            ('ports', port['port']['id'], self.api),
+                            ('networks', port['port']['network_id'],
+                             self.api),
+                            ('routers', router['router']['id'],
+                             self.ext_api)):
+                        req = self.new_show_request(resource, obj_id)
+                        self.assertEqual(200,
+                                         req.get_response(api).status_int)
+                    self.assertFalse(get.called)
+
+    def test_sync_resources_not_in_nvp(self):
+        with self.port():
+            with self.router():
+                self.fc._fake_lswitch_dict.clear()
+                self.fc._fake_lswitch_lport_dict.clear()
+                self.fc._fake_lrouter_dict.clear()
+                self._synchronize()
+                ports = self._list('ports')['ports']
+                networks = self._list('networks')['networks']
+                routers = self._list('routers', self.ext_api)['routers']
+        self.assertEqual(constants.PORT_STATUS_ERROR, ports[0]['status'])
+        self.assertEqual(constants.NET_STATUS_ERROR, networks[0]['status'])
+        self.assertEqual(constants.NET_STATUS_ERROR, routers[0]['status'])
+
+    def test_sync_in_chunks(self):
+        cfg.CONF.set_override('state_sync_chunk_size', 2, 'NVP')
+        with self.network(do_delete=False) as net:
+            for i in range(5):
+                self._create_port('json', net['network']['id'])
+            with mock.patch.object(self.fc, 'handle_get',
+                                   wraps=self.fc.handle_get) as get:
+                self._synchronize()
+            lport_gets = [call[0][0] for call in get.call_args_list
+                          if '/lport?' in call[0][0]]
+            self.assertEqual(3, len(lport_gets))
+            self.assertTrue(all('_page_length=2' in url
+                                for url in lport_gets))
+            ports = self._list('ports')['ports']
+            self.assertEqual([constants.PORT_STATUS_DOWN] * 5,
+                             [port['status'] for port in ports])
+
+    def test_stale_status_queries_nvp(self):
+        with self.port():
+            self._synchronize()
+            synced_at = nicira_db.get_status_sync_time(self.ctx.session,
+                                                       nvp_sync.LPORT)
+            nicira_db.set_status_sync_time(
+                self.ctx.session, nvp_sync.LPORT,
+                synced_at - datetime.timedelta(seconds=361))
+            with mock.patch.object(self.fc, 'handle_get',
+                                   wraps=self.fc.handle_get) as get:
+                self._list('ports')
+                self.assertTrue(get.called)
+
+    def test_recent_sync_not_repeated(self):
+        self._synchronize()
+        with mock.patch.object(self.fc, 'handle_get') as get:
+            self._synchronize()
+            self.assertFalse(get.called)
+
+    def test_sync_disabled_queries_nvp(self):
+        with self.port():
+            self._synchronize()
+            cfg.CONF.set_override('state_sync_interval', 0, 'NVP')
+            with mock.patch.object(self.fc, 'handle_get',
+                                   wraps=self.fc.handle_get) as get:
+                self._list('ports')
+                self.assertTrue(get.called)
+
+    def test_sync_error_leaves_status_stale(self):
+        with mock.patch.object(nvplib, 'get_query_pages',
+                               side_effect=NvpApiClient.NvpApiException):
+            self._synchronize()
+        for resource in (nvp_sync.LSWITCH, nvp_sync.LPORT, nvp_sync.LROUTER):
+            self.assertFalse(self.plugin._synchronizer.is_fresh(self.ctx,
+                                                                resource))
+
+
+class TestNiciraPortMapping(NiciraPluginV2TestCase):
+
+    def setUp(self):
+        super(TestNiciraPortMapping, self).setUp()
+        self.plugin = manager.QuantumManager.get_plugin()
+        self.ctx = context.get_admin_context()
+
+    def _get_lport(self, port_id):
+        return [lport for lport in self.fc._fake_lswitch_lport_dict.values()
+                if lport['quantum_port_id'] == port_id][0]
+
+    def _get_mapping(self, port_id):
+        return nicira_db.get_nvp_port_mapping(self.ctx.session, port_id)
+
+    def _show_and_update(self, port_id):
+        req = self.new_show_request('ports', port_id)
+        self.assertEqual(200, req.get_response(self.api).status_int)
+        req = self.new_update_request('ports', {'port': {'name': 'new'}},
+                                      port_id)
+        self.assertEqual(200, req.get_response(self.api).status_int)
+
+    def _get_urls(self, port_id):
+        with mock.patch.object(self.fc, 'handle_get',
+                               wraps=self.fc.handle_get) as get:
+            self._show_and_update(port_id)
+        return [call[0][0] for call in get.call_args_list]
+
+    def test_create_port_records_lswitch_and_cluster(self):
+        with self.port() as port:
+            port_id = port['port']['id']
+            lport = self._get_lport(port_id)
+            mapping = self._get_mapping(port_id)
+            self.assertEqual(lport['uuid'], mapping['nvp_id'])
+            self.assertEqual(lport['ls_uuid'], mapping['nvp_switch_id'])
+            self.assertEqual(self.plugin.default_cluster.name,
+                             mapping['nvp_cluster'])
+
+    def test_port_operations_use_mapping(self):
+        with self.port() as port:
+            port_id = port['port']['id']
+            lport = self._get_lport(port_id)
+            urls = [url for url in self._get_urls(port_id)
+                    if '/lport' in url]
+            self.assertTrue(urls)
+            for url in urls:
+                self.assertIn('lswitch/%s/lport/%s' % (lport['ls_uuid'],
+                                                       lport['uuid']), url)
+
+    def _test_mapping_backfilled(self, update):
+        with self.port() as port:
+            port_id = port['port']['id']
+            lport = self._get_lport(port_id)
+            with self.ctx.session.begin():
+                update(self._get_mapping(port_id))
+            urls = self._get_urls(port_id)
+            self.assertEqual(1, len([url for url in urls
+                                     if 'lswitch/*/lport' in url]))
+            mapping = self._get_mapping(port_id)
+            self.assertEqual(lport['uuid'], mapping['nvp_id'])
+            self.assertEqual(lport['ls_uuid'], mapping['nvp_switch_id'])
+            self.assertEqual(self.plugin.default_cluster.name,
+                             mapping['nvp_cluster'])
+            urls = self._get_urls(port_id)
+            self.assertFalse([url for url in urls
+                              if 'lswitch/*/lport' in url])
+
+    def test_incomplete_mapping_backfilled(self):
+        def _clear(mapping):
+            mapping.update({'nvp_switch_id': None, 'nvp_cluster': None})
+        self._test_mapping_backfilled(_clear)
+
+    def test_missing_mapping_backfilled(self):
+        self._test_mapping_backfilled(self.ctx.session.delete)
+
+    def test_delete_port_uses_mapping(self):
+        with self.port(no_delete=True) as port:
+            port_id = port['port']['id']
+            lport = self._get_lport(port_id)
+            with mock.patch.object(self.fc, 'handle_delete',
+                                   wraps=self.fc.handle_delete) as delete:
+                self._delete('ports', port_id)
+            self.assertEqual(
+                ['/ws.v1/lswitch/%s/lport/%s' % (lport['ls_uuid'],
+                                                 lport['uuid'])],
+                [call[0][0] for call in delete.call_args_list])
+            self.assertFalse(self.fc._fake_lswitch_lport_dict)
+
+
 class TestNiciraNetworkGateway(test_l2_gw.NetworkGatewayDbTestCase,
                                NiciraPluginV2TestCase):
 
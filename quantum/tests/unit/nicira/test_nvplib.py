@@ -15,8 +15,10 @@
 #
 # @author: Salvatore Orlando, VMware
 
+import eventlet
 import mock
 import os
+import time
 
 from quantum.openstack.common import jsonutils as json
 import quantum.plugins.nicira.nicira_nvp_plugin as nvp_plugin
@@ -204,3 +206,128 @@ class TestNvpLibLogicalPorts(NvplibTestCase):
                                                lswitch['uuid'],
                                                quantum_port_id)
         self.assertIsNone(lport)
+
+
+class TestNvplibQueryPages(NvplibTestCase):
+
+    def _create_lrouters(self, count):
+        return set(nvplib.create_lrouter(self.fake_cluster, 'pippo',
+                                         'fake_router_%d' % index,
+                                         '192.168.0.1')['uuid']
+                   for index in range(count))
+
+    def test_get_query_pages(self):
+        uuids = self._create_lrouters(5)
+        path = nvplib._build_uri_path(nvplib.LROUTER_RESOURCE,
+                                      fields='uuid')
+        pages = list(nvplib.get_query_pages(path, self.fake_cluster, 2))
+        self.assertEqual([2, 2, 1], [len(page) for page in pages])
+        self.assertEqual(uuids, set(lrouter['uuid'] for page in pages
+                                    for lrouter in page))
+
+    def test_get_all_query_pages(self):
+        uuids = self._create_lrouters(3)
+        path = nvplib._build_uri_path(nvplib.LROUTER_RESOURCE,
+                                      fields='uuid')
+        lrouters = nvplib.get_all_query_pages(path, self.fake_cluster)
+        self.assertEqual(uuids, set(lrouter['uuid'] for lrouter in lrouters))
+
+
+class TestNvplibMultiCluster(NvplibTestCase):
+
+    def setUp(self):
+        super(TestNvplibMultiCluster, self).setUp()
+        nvplib.reset_latency_histograms()
+        self.addCleanup(nvplib.reset_latency_histograms)
+
+    def _cluster(self, name, delay, response='{}'):
+        cluster = mock.Mock()
+        cluster.name = name
+
+        def _request(*args):
+            eventlet.sleep(delay)
+            return response
+
+        cluster.api_client.request.side_effect = _request
+        return cluster
+
+    def test_fan_out_yields_results_as_they_arrive(self):
+        def _sleep(delay):
+            eventlet.sleep(delay)
+            return delay * 2
+
+        results = list(nvplib.fan_out(_sleep, [0.03, 0.01, 0.02]))
+        self.assertEqual([(0.01, 0.02), (0.02, 0.04), (0.03, 0.06)],
+                         results)
+
+    def test_fan_out_runs_calls_concurrently(self):
+        start = time.time()
+        list(nvplib.fan_out(eventlet.sleep, [0.05] * 4))
+        self.assertTrue(time.time() - start < 0.15)
+
+    def test_fan_out_raises_errors(self):
+        def _fail(item):
+            if item == 2:
+                raise nvplib.exception.NotFound()
+            return item
+
+        self.assertRaises(nvplib.exception.NotFound, list,
+                          nvplib.fan_out(_fail, [1, 2, 3]))
+
+    def test_do_multi_request_keeps_cluster_order(self):
+        clusters = [self._cluster('slow', 0.02, 'slow'),
+                    self._cluster('fast', 0, 'fast')]
+        self.assertEqual(['slow', 'fast'],
+                         nvplib.do_multi_request('GET', '/ws.v1/lswitch',
+                                                 clusters=clusters))
+
+    def test_find_port_and_cluster(self):
+        lswitch = nvplib.create_lswitch(self.fake_cluster, 'pippo',
+                                        'fake-switch')
+        lport = nvplib.create_lport(self.fake_cluster, lswitch['uuid'],
+                                    'pippo', 'whatever', 'name',
+                                    'device_id', True)
+        other = self._cluster('other', 0, '{"results": []}')
+        port, cluster = nvplib.find_port_and_cluster(
+            [other, self.fake_cluster], lport['uuid'])
+        self.assertEqual(lport['uuid'], port['uuid'])
+        self.assertEqual(self.fake_cluster, cluster)
+        self.assertEqual((None, None),
+                         nvplib.find_port_and_cluster([other], _uuid()))
+
+    def test_find_port_by_quantum_tag(self):
+        lswitch = nvplib.create_lswitch(self.fake_cluster, 'pippo',
+                                        'fake-switch')
+        lport = nvplib.create_lport(self.fake_cluster, lswitch['uuid'],
+                                    'pippo', 'whatever', 'name',
+                                    'device_id', True)
+        other = self._cluster('other', 0, '{"results": []}')
+        port, cluster = nvplib.find_port_by_quantum_tag(
+            [other, self.fake_cluster], 'whatever')
+        self.assertEqual(lport['uuid'], port['uuid'])
+        self.assertEqual(lswitch['uuid'], nvplib.get_port_lswitch_id(port))
+        self.assertEqual(self.fake_cluster, cluster)
+        self.assertEqual((None, None), nvplib.find_port_by_quantum_tag(
+            [other, self.fake_cluster], 'nothing'))
+
+    def test_latency_histograms(self):
+        cluster = self._cluster('fake', 0)
+        nvplib.do_single_request('GET', '/ws.v1/lswitch/%s/lport?fields=*'
+                                 % _uuid(), cluster=cluster)
+        nvplib._record_latency(cluster, 'GET', '/ws.v1/lswitch/*/lport',
+                               0.03)
+        nvplib._record_latency(cluster, 'GET', '/ws.v1/lswitch/*/lport',
+                               20)
+        nvplib.do_single_request('DELETE', '/ws.v1/lrouter/%s' % _uuid(),
+                                 cluster=cluster)
+        histograms = nvplib.get_latency_histograms()
+        self.assertEqual(set([('fake', 'GET lswitch/lport'),
+                              ('fake', 'DELETE lrouter')]),
+                         set(histograms))
+        histogram = histograms[('fake', 'GET lswitch/lport')]
+        self.assertEqual(3, histogram['count'])
+        self.assertTrue(histogram['total_ms'] >= 20030)
+        buckets = histogram['buckets']
+        self.assertEqual(1, buckets[list(nvplib.LATENCY_BUCKETS).index(50)])
+        self.assertEqual(1, buckets[-1])
+        self.assertEqual(3, sum(buckets))
@@ -465,6 +465,26 @@ class OvsAgentSchedulerTestCase(test_l3_plugin.L3NatTestCaseMixin,
         self.assertEqual(1, len(l3_agents['agents']))
         self.assertEqual(L3_HOSTA, l3_agents['agents'][0]['host'])
 
+    def test_router_sync_with_router_ids_and_generations(self):
+        with contextlib.nested(self.router(),
+                               self.router()) as (router1, router2):
+            l3_rpc = l3_rpc_base.L3RpcCallbackMixin()
+            self._register_agent_states()
+            r1_id = router1['router']['id']
+            r2_id = router2['router']['id']
+            routers = l3_rpc.sync_routers(self.adminContext, host=L3_HOSTA,
+                                          router_ids=[r1_id])
+            self.assertEqual([r1_id], [r['id'] for r in routers])
+
+            generations = dict((r['id'], r['generation'])
+                               for r in l3_rpc.sync_routers(
+                                   self.adminContext, host=L3_HOSTA))
+            self.assertEqual(set([r1_id, r2_id]), set(generations))
+            routers = l3_rpc.sync_routers(self.adminContext, host=L3_HOSTA,
+                                          generations=generations)
+            self.assertTrue(all(r.get(constants.ROUTER_UNCHANGED_KEY)
+                                for r in routers))
+
     def test_router_auto_schedule_with_hosted_2(self):
         # one agent hosts one router
         l3_rpc = l3_rpc_base.L3RpcCallbackMixin()
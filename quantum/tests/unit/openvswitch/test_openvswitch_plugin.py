@@ -13,7 +13,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import contextlib
+
+from quantum.common import constants as q_const
+from quantum import context
 from quantum.extensions import portbindings
+from quantum.plugins.openvswitch import ovs_quantum_plugin
 from quantum.tests.unit import _test_extension_portbindings as test_bindings
 from quantum.tests.unit import test_db_plugin as test_plugin
 from quantum.tests.unit import test_security_groups_rpc as test_sg_rpc
@@ -39,7 +44,8 @@ class TestOpenvswitchV2HTTPResponse(test_plugin.TestV2HTTPResponse,
     pass
 
 
-class TestOpenvswitchPortsV2(test_plugin.TestPortsV2,
+class TestOpenvswitchPortsV2(test_plugin.SetBasedPortsBulkTestMixin,
+                             test_plugin.TestPortsV2,
                              OpenvswitchPluginV2TestCase):
 
     def test_update_port_status_build(self):
@@ -53,6 +59,11 @@ class TestOpenvswitchNetworksV2(test_plugin.TestNetworksV2,
     pass
 
 
+class TestOpenvswitchListStatementCount(test_plugin.TestListStatementCount,
+                                        OpenvswitchPluginV2TestCase):
+    pass
+
+
 class TestOpenvswitchPortBinding(OpenvswitchPluginV2TestCase,
                                  test_bindings.PortBindingsTestCase):
     VIF_TYPE = portbindings.VIF_TYPE_OVS
@@ -67,3 +78,41 @@ class TestOpenvswitchPortBinding(OpenvswitchPluginV2TestCase,
 class TestOpenvswitchPortBindingNoSG(TestOpenvswitchPortBinding):
     HAS_PORT_FILTER = False
     FIREWALL_DRIVER = test_sg_rpc.FIREWALL_NOOP_DRIVER
+
+
+class TestOpenvswitchRpcCallbacks(OpenvswitchPluginV2TestCase):
+
+    def setUp(self):
+        super(TestOpenvswitchRpcCallbacks, self).setUp()
+        self.callbacks = ovs_quantum_plugin.OVSRpcCallbacks(None)
+        self.ctx = context.get_admin_context()
+
+    def _port_status(self, port):
+        res = self._show('ports', port['port']['id'])
+        return res['port']['status']
+
+    def test_get_devices_details_list(self):
+        with self.subnet() as subnet:
+            with contextlib.nested(
+                self.port(subnet=subnet),
+                self.port(subnet=subnet, admin_state_up=False)) as (p1, p2):
+                devices = [p1['port']['id'], 'unknown', p2['port']['id']]
+                details = self.callbacks.get_devices_details_list(
+                    self.ctx, devices=devices, agent_id='fake_agent')
+                self.assertEqual([d['device'] for d in details], devices)
+                self.assertEqual(details[0]['port_id'], p1['port']['id'])
+                self.assertEqual(details[0]['network_type'], 'local')
+                self.assertTrue(details[0]['admin_state_up'])
+                self.assertNotIn('port_id', details[1])
+                self.assertFalse(details[2]['admin_state_up'])
+                self.assertEqual(self._port_status(p1),
+                                 q_const.PORT_STATUS_ACTIVE)
+                self.assertEqual(self._port_status(p2),
+                                 q_const.PORT_STATUS_DOWN)
+
+                details = self.callbacks.update_devices_down(
+                    self.ctx, devices=devices, agent_id='fake_agent')
+                self.assertEqual([d['exists'] for d in details],
+                                 [True, False, True])
+                self.assertEqual(self._port_status(p1),
+                                 q_const.PORT_STATUS_DOWN)
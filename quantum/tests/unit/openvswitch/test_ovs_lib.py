@@ -179,6 +179,49 @@ class OVS_Lib_Test(base.BaseTestCase):
         self.br.delete_flows(dl_vlan=vid)
         self.mox.VerifyAll()
 
+    def test_defer_apply_flows_and_attributes(self):
+        utils.execute(["ovs-vsctl", self.TO,
+                       "--", "set", "Port", "tap1", "tag=1",
+                       "--", "clear", "Port", "tap2", "tag"],
+                      root_helper=self.root_helper)
+        utils.execute(["ovs-ofctl", "add-flows", self.BR_NAME, "-"],
+                      root_helper=self.root_helper,
+                      process_input="hard_timeout=0,idle_timeout=0,"
+                      "priority=2,in_port=1,actions=drop\n"
+                      "hard_timeout=0,idle_timeout=0,"
+                      "priority=3,tun_id=5,actions=normal\n")
+        utils.execute(["ovs-ofctl", "del-flows", self.BR_NAME, "-"],
+                      root_helper=self.root_helper,
+                      process_input="in_port=2\n")
+        utils.execute(["ovs-ofctl", "add-flows", self.BR_NAME, "-"],
+                      root_helper=self.root_helper,
+                      process_input="hard_timeout=0,idle_timeout=0,"
+                      "priority=1,actions=normal\n")
+        self.mox.ReplayAll()
+
+        self.br.defer_apply_on()
+        self.br.set_db_attribute("Port", "tap1", "tag", "1")
+        self.br.add_flow(priority=2, in_port=1, actions="drop")
+        # nested calls are applied by the outermost defer_apply_off
+        self.br.defer_apply_on()
+        self.br.clear_db_attribute("Port", "tap2", "tag")
+        self.br.add_flow(priority=3, tun_id=5, actions="normal")
+        self.br.defer_apply_off()
+        self.br.delete_flows(in_port=2)
+        self.br.add_flow(priority=1, actions="normal")
+        self.br.defer_apply_off()
+        self.mox.VerifyAll()
+
+    def test_defer_apply_delete_all_flows(self):
+        utils.execute(["ovs-ofctl", "del-flows", self.BR_NAME, ""],
+                      root_helper=self.root_helper)
+        self.mox.ReplayAll()
+
+        self.br.defer_apply_on()
+        self.br.delete_flows()
+        self.br.defer_apply_off()
+        self.mox.VerifyAll()
+
     def test_add_tunnel_port(self):
         pname = "tap99"
         ip = "9.9.9.9"
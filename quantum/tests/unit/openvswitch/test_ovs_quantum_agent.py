@@ -14,10 +14,13 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
+
 import mock
 from oslo.config import cfg
 import testtools
 
+from quantum.agent.linux import ovs_lib
 from quantum.plugins.openvswitch.agent import ovs_quantum_agent
 from quantum.tests import base
 
@@ -98,8 +101,47 @@ class TestOvsQuantumAgent(base.BaseTestCase):
         actual = self.mock_update_ports(vif_port_set, registered_ports)
         self.assertEqual(expected, actual)
 
+    def _setup_monitor(self, interfaces, active=True, has_updates=True):
+        monitor = mock.Mock()
+        monitor.is_active.return_value = active
+        monitor.has_updates.return_value = has_updates
+        monitor.get_interfaces.return_value = interfaces
+        self.agent.ovsdb_monitor = monitor
+        return monitor
+
+    def test_get_vif_port_set_from_monitor(self):
+        self._setup_monitor({'tap1': {'iface-id': 'port-1',
+                                      'attached-mac': 'fa:16:3e:00:00:01'},
+                             'tap2': {'iface-id': 'port-2',
+                                      'attached-mac': 'fa:16:3e:00:00:02'},
+                             'patch-tun': {}})
+        self.agent.int_br = ovs_lib.OVSBridge('br-int', 'sudo')
+        with mock.patch.object(self.agent.int_br, 'get_port_name_list',
+                               return_value=['tap1', 'patch-tun']):
+            with mock.patch.object(self.agent.int_br,
+                                   'get_vif_port_set') as poll:
+                self.assertEqual(self.agent.get_vif_port_set(),
+                                 set(['port-1']))
+                self.assertFalse(poll.called)
+
+    def test_ports_may_have_changed_with_monitor(self):
+        self.assertTrue(self.agent._ports_may_have_changed())
+        monitor = self._setup_monitor({}, has_updates=False)
+        self.assertFalse(self.agent._ports_may_have_changed())
+        monitor.has_updates.return_value = True
+        self.assertTrue(self.agent._ports_may_have_changed())
+
+    def test_stopped_monitor_falls_back_to_polling(self):
+        self._setup_monitor({}, active=False, has_updates=False)
+        self.assertTrue(self.agent._ports_may_have_changed())
+        self.assertIsNone(self.agent.ovsdb_monitor)
+        self.assertEqual(self.mock_update_ports(set([1]), set()),
+                         dict(current=set([1]), added=set([1]),
+                              removed=set()))
+
     def test_treat_devices_added_returns_true_for_missing_device(self):
-        with mock.patch.object(self.agent.plugin_rpc, 'get_device_details',
+        with mock.patch.object(self.agent.plugin_rpc,
+                               'get_devices_details_list',
                                side_effect=Exception()):
             self.assertTrue(self.agent.treat_devices_added([{}]))
 
@@ -111,8 +153,9 @@ class TestOvsQuantumAgent(base.BaseTestCase):
         :param func_name: the function that should be called
         :returns: whether the named function was called
         """
-        with mock.patch.object(self.agent.plugin_rpc, 'get_device_details',
-                               return_value=details):
+        with mock.patch.object(self.agent.plugin_rpc,
+                               'get_devices_details_list',
+                               return_value=[details]):
             with mock.patch.object(self.agent.int_br, 'get_vif_port_by_id',
                                    return_value=port):
                 with mock.patch.object(self.agent, func_name) as func:
@@ -138,15 +181,42 @@ class TestOvsQuantumAgent(base.BaseTestCase):
                                                       mock.Mock(),
                                                       'treat_vif_port'))
 
+    def test_treat_devices_added_binds_ports_in_one_transaction(self):
+        details = [dict(device=device, port_id=device, network_id='net1',
+                        network_type='local', physical_network=None,
+                        segmentation_id=None, admin_state_up=True)
+                   for device in ('port1', 'port2')]
+        ports = dict((device, ovs_lib.VifPort('tap-' + device, 1, device,
+                                              'fa:16:3e:00:00:01', None))
+                     for device in ('port1', 'port2'))
+        self.agent.int_br = ovs_lib.OVSBridge('br-int', 'sudo')
+        self.agent.available_local_vlans = set([1])
+        with contextlib.nested(
+            mock.patch.object(self.agent.plugin_rpc,
+                              'get_devices_details_list',
+                              return_value=details),
+            mock.patch.object(self.agent.int_br, 'get_vif_port_by_id',
+                              side_effect=ports.get),
+            mock.patch.object(self.agent.int_br, 'run_vsctl'),
+            mock.patch.object(self.agent.int_br, 'run_ofctl_flows')
+        ) as (get_details, get_port, run_vsctl, run_ofctl_flows):
+            self.assertFalse(self.agent.treat_devices_added(['port1',
+                                                             'port2']))
+        run_vsctl.assert_called_once_with(
+            ['--', 'set', 'Port', 'tap-port1', 'tag=1',
+             '--', 'set', 'Port', 'tap-port2', 'tag=1'])
+        run_ofctl_flows.assert_called_once_with(
+            'del-flows', ['in_port=1', 'in_port=1'])
+
     def test_treat_devices_removed_returns_true_for_missing_device(self):
-        with mock.patch.object(self.agent.plugin_rpc, 'update_device_down',
+        with mock.patch.object(self.agent.plugin_rpc, 'update_devices_down',
                                side_effect=Exception()):
             self.assertTrue(self.agent.treat_devices_removed([{}]))
 
     def mock_treat_devices_removed(self, port_exists):
-        details = dict(exists=port_exists)
-        with mock.patch.object(self.agent.plugin_rpc, 'update_device_down',
-                               return_value=details):
+        details = dict(device='tap1', exists=port_exists)
+        with mock.patch.object(self.agent.plugin_rpc, 'update_devices_down',
+                               return_value=[details]):
             with mock.patch.object(self.agent, 'port_unbound') as port_unbound:
                 self.assertFalse(self.agent.treat_devices_removed([{}]))
         self.assertEqual(port_unbound.called, not port_exists)
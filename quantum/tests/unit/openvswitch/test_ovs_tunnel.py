@@ -135,6 +135,7 @@ class TunnelTest(base.BaseTestCase):
         self.mox.VerifyAll()
 
     def testProvisionLocalVlan(self):
+        self.mock_tun_bridge.defer_apply_on()
         action_string = 'set_tunnel:%s,normal' % LS_ID
         self.mock_tun_bridge.add_flow(priority=4, in_port=self.INT_OFPORT,
                                       dl_vlan=LV_ID, actions=action_string)
@@ -142,6 +143,7 @@ class TunnelTest(base.BaseTestCase):
         action_string = 'mod_vlan_vid:%s,output:%s' % (LV_ID, self.INT_OFPORT)
         self.mock_tun_bridge.add_flow(priority=3, tun_id=LS_ID,
                                       dl_dst=BCAST_MAC, actions=action_string)
+        self.mock_tun_bridge.defer_apply_off()
 
         self.mox.ReplayAll()
 
@@ -217,9 +219,11 @@ class TunnelTest(base.BaseTestCase):
         self.mox.VerifyAll()
 
     def testReclaimLocalVlan(self):
+        self.mock_tun_bridge.defer_apply_on()
         self.mock_tun_bridge.delete_flows(tun_id=LVM.segmentation_id)
 
         self.mock_tun_bridge.delete_flows(dl_vlan=LVM.vlan)
+        self.mock_tun_bridge.defer_apply_off()
 
         self.mox.ReplayAll()
         a = ovs_quantum_agent.OVSQuantumAgent(self.INT_BRIDGE,
@@ -277,14 +281,18 @@ class TunnelTest(base.BaseTestCase):
         self.mox.VerifyAll()
 
     def testPortBound(self):
+        self.mock_int_bridge.defer_apply_on()
         self.mock_int_bridge.set_db_attribute('Port', VIF_PORT.port_name,
                                               'tag', str(LVM.vlan))
         self.mock_int_bridge.delete_flows(in_port=VIF_PORT.ofport)
+        self.mock_int_bridge.defer_apply_off()
 
+        self.mock_tun_bridge.defer_apply_on()
         action_string = 'mod_vlan_vid:%s,normal' % LV_ID
         self.mock_tun_bridge.add_flow(priority=3, tun_id=LS_ID,
                                       dl_dst=VIF_PORT.vif_mac,
                                       actions=action_string)
+        self.mock_tun_bridge.defer_apply_off()
 
         self.mox.ReplayAll()
         a = ovs_quantum_agent.OVSQuantumAgent(self.INT_BRIDGE,
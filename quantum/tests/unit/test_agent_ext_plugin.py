@@ -62,6 +62,9 @@ class TestAgentPlugin(db_base_plugin_v2.QuantumDbPluginV2,
                       agents_db.AgentDbMixin):
     supported_extension_aliases = ["agent"]
 
+    __native_pagination_support = True
+    __native_sorting_support = True
+
 
 class AgentDBTestMixIn(object):
 
@@ -152,6 +155,27 @@ class AgentDBTestCase(AgentDBTestMixIn,
                 break
         self.assertEqual(len(agents), len(res['agents']))
 
+    def test_list_agents_with_sort(self):
+        self._register_agent_states()
+        res = self._list_agents(
+            query_string='sort_key=host&sort_dir=desc&sort_key=binary'
+                         '&sort_dir=asc&fields=host&fields=binary')
+        self.assertEqual([(DHCP_HOSTC, 'quantum-dhcp-agent'),
+                          (L3_HOSTB, 'quantum-l3-agent'),
+                          (DHCP_HOSTA, 'quantum-dhcp-agent'),
+                          (L3_HOSTA, 'quantum-l3-agent')],
+                         [(agent['host'], agent['binary'])
+                          for agent in res['agents']])
+
+    def test_list_agents_with_pagination(self):
+        self._register_agent_states()
+        agents = [{'agent': agent} for agent in self._list('agents')['agents']]
+        self._test_list_with_pagination('agent', agents, ('host', 'asc'),
+                                        3, 2)
+        self._test_list_with_pagination_reverse(
+            'agent', sorted(agents, key=lambda agent: agent['agent']['id']),
+            ('id', 'asc'), 3, 2)
+
     def test_show_agent(self):
         self._register_agent_states()
         agents = self._list_agents(
@@ -19,6 +19,7 @@ import mock
 
 from quantum.agent import rpc
 from quantum.openstack.common import context
+from quantum.openstack.common.rpc import common as rpc_common
 from quantum.tests import base
 
 
@@ -45,6 +46,55 @@ class AgentRPCPluginApi(base.BaseTestCase):
     def test_tunnel_sync(self):
         self._test_rpc_call('tunnel_sync')
 
+    def _test_batched_rpc_call(self, method, side_effect=None):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        with mock.patch('quantum.openstack.common.rpc.call') as rpc_call:
+            rpc_call.side_effect = side_effect or (lambda *args: ['foo'])
+            actual_val = getattr(agent, method)(ctxt, ['fake_device'],
+                                                'fake_agent_id')
+            actual_val = getattr(agent, method)(ctxt, ['fake_device'],
+                                                'fake_agent_id')
+        return agent, rpc_call, actual_val
+
+    def test_get_devices_details_list(self):
+        agent, rpc_call, actual_val = self._test_batched_rpc_call(
+            'get_devices_details_list')
+        self.assertEqual(actual_val, ['foo'])
+        self.assertEqual(rpc_call.call_count, 2)
+        msg = rpc_call.call_args[0][2]
+        self.assertEqual(msg['method'], 'get_devices_details_list')
+        self.assertEqual(msg['version'], '1.2')
+        self.assertEqual(msg['args']['devices'], ['fake_device'])
+        self.assertTrue(agent.batched_calls)
+
+    def test_update_devices_down_falls_back_for_old_plugins(self):
+        def old_plugin(ctxt, topic, msg, timeout=None):
+            if msg['method'] == 'update_devices_down':
+                raise rpc_common.RemoteError('UnsupportedRpcVersion')
+            return 'foo'
+
+        agent, rpc_call, actual_val = self._test_batched_rpc_call(
+            'update_devices_down', side_effect=old_plugin)
+        self.assertEqual(actual_val, ['foo'])
+        self.assertFalse(agent.batched_calls)
+        methods = [c[0][2]['method'] for c in rpc_call.call_args_list]
+        self.assertEqual(methods, ['update_devices_down',
+                                   'update_device_down',
+                                   'update_device_down'])
+
+    def test_get_devices_details_list_raises_local_errors(self):
+        self.assertRaises(AttributeError,
+                          self._test_batched_rpc_call,
+                          'get_devices_details_list',
+                          side_effect=AttributeError())
+
+    def test_get_devices_details_list_raises_remote_errors(self):
+        self.assertRaises(rpc_common.RemoteError,
+                          self._test_batched_rpc_call,
+                          'get_devices_details_list',
+                          side_effect=rpc_common.RemoteError('DBError'))
+
 
 class AgentPluginReportState(base.BaseTestCase):
     def test_plugin_report_state(self):
@@ -228,6 +228,22 @@ class ResourceTestCase(base.BaseTestCase):
         res = resource.get('', extra_environ=environ, expect_errors=True)
         self.assertEqual(res.status_int, 200)
 
+    def test_index_is_streamed(self):
+        controller = mock.MagicMock()
+        networks = {'networks': [{'id': 'a'}, {'id': 'b'}]}
+        controller.index = lambda request: networks
+        serializer = wsgi.JSONDictSerializer()
+
+        resource = webtest.TestApp(wsgi_resource.Resource(controller))
+
+        environ = {'wsgiorg.routing_args': (None, {'action': 'index'})}
+        with mock.patch.object(wsgi.JSONDictSerializer, 'serialize_iter',
+                               side_effect=serializer.serialize_iter) as it:
+            res = resource.get('', extra_environ=environ)
+        it.assert_called_once_with(networks)
+        self.assertEqual(res.status_int, 200)
+        self.assertEqual(networks, res.json)
+
     def test_status_204(self):
         controller = mock.MagicMock()
         controller.test = lambda request: {'foo': 'bar'}
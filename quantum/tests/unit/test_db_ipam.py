@@ -0,0 +1,243 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+from oslo.config import cfg
+
+from quantum.common import exceptions as q_exc
+from quantum import context
+from quantum.db import ipam_db
+from quantum.db import models_v2
+from quantum.manager import QuantumManager
+from quantum.tests import base
+from quantum.tests.unit import test_db_plugin
+
+
+INTERVAL_SET_DRIVER = 'quantum.db.ipam_db.IntervalSetIpamDriver'
+
+
+class IntervalSetTestCase(base.BaseTestCase):
+
+    def test_add_merges_adjacent_intervals(self):
+        ip_set = ipam_db.IntervalSet([(1, 3), (7, 9)])
+        ip_set.add(5)
+        self.assertEqual(list(ip_set), [(1, 3), (5, 5), (7, 9)])
+        ip_set.add(4)
+        ip_set.add(6)
+        self.assertEqual(list(ip_set), [(1, 9)])
+
+    def test_add_range_swallows_overlapping_intervals(self):
+        ip_set = ipam_db.IntervalSet([(1, 2), (4, 5), (8, 9)])
+        ip_set.add_range(3, 8)
+        self.assertEqual(list(ip_set), [(1, 9)])
+
+    def test_remove_splits_interval(self):
+        ip_set = ipam_db.IntervalSet([(1, 9)])
+        self.assertTrue(ip_set.remove(5))
+        self.assertEqual(list(ip_set), [(1, 4), (6, 9)])
+        self.assertTrue(ip_set.remove(1))
+        self.assertTrue(ip_set.remove(9))
+        self.assertEqual(list(ip_set), [(2, 4), (6, 8)])
+        self.assertFalse(ip_set.remove(5))
+        self.assertNotIn(5, ip_set)
+        self.assertIn(6, ip_set)
+
+    def test_pop_spans_intervals(self):
+        ip_set = ipam_db.IntervalSet([(1, 2), (5, 9)])
+        self.assertEqual(ip_set.pop(4), [1, 2, 5, 6])
+        self.assertEqual(list(ip_set), [(7, 9)])
+        self.assertEqual(ip_set.pop(10), [7, 8, 9])
+        self.assertFalse(ip_set)
+        self.assertEqual(ip_set.pop(), [])
+
+    def test_string_round_trip(self):
+        ip_set = ipam_db.IntervalSet([(1, 1), (3, 2 ** 64)])
+        value = ip_set.to_string()
+        self.assertEqual(value, '1,3-18446744073709551616')
+        self.assertEqual(list(ipam_db.IntervalSet.from_string(value)),
+                         list(ip_set))
+        self.assertEqual(ipam_db.IntervalSet.from_string('').size(), 0)
+
+
+class IntervalSetIpamDriverTestCase(test_db_plugin.QuantumDbPluginV2TestCase):
+
+    def setUp(self):
+        super(IntervalSetIpamDriverTestCase, self).setUp()
+        cfg.CONF.set_override('ipam_driver', INTERVAL_SET_DRIVER)
+
+    def _get_availability(self, subnet_id):
+        ctx = context.get_admin_context()
+        pool_qry = ctx.session.query(models_v2.IPAllocationPool)
+        pool = pool_qry.filter_by(subnet_id=subnet_id).one()
+        query = ctx.session.query(ipam_db.IPAvailabilitySet)
+        return query.filter_by(allocation_pool_id=pool['id']).one()
+
+    def test_port_create_updates_availability(self):
+        with self.subnet(cidr='10.0.0.0/29') as subnet:
+            subnet_id = subnet['subnet']['id']
+            availability = self._get_availability(subnet_id)
+            self.assertEqual(availability['ranges'], '167772162-167772166')
+            with self.port(subnet=subnet) as port:
+                ips = port['port']['fixed_ips']
+                self.assertEqual(ips[0]['ip_address'], '10.0.0.2')
+                availability = self._get_availability(subnet_id)
+                self.assertEqual(availability['ranges'],
+                                 '167772163-167772166')
+                self.assertEqual(availability['version'], 1)
+
+    def test_generate_ips_bulk(self):
+        ctx = context.get_admin_context()
+        plugin = QuantumManager.get_plugin()
+        with self.subnet(cidr='10.0.0.0/29') as subnet:
+            ips = plugin._generate_ips(ctx, [subnet['subnet']], 3)
+            self.assertEqual([ip['ip_address'] for ip in ips],
+                             ['10.0.0.2', '10.0.0.3', '10.0.0.4'])
+            availability = self._get_availability(subnet['subnet']['id'])
+            self.assertEqual(availability['version'], 1)
+            self.assertRaises(q_exc.IpAddressGenerationFailure,
+                              plugin._generate_ips,
+                              ctx, [subnet['subnet']], 3)
+
+    def test_specific_ip_and_recycle(self):
+        ctx = context.get_admin_context()
+        plugin = QuantumManager.get_plugin()
+        with self.subnet(cidr='10.0.0.0/29') as subnet:
+            subnet_id = subnet['subnet']['id']
+            network_id = subnet['subnet']['network_id']
+            plugin._allocate_specific_ip(ctx, subnet_id, '10.0.0.4')
+            availability = self._get_availability(subnet_id)
+            self.assertEqual(availability['ranges'],
+                             '167772162-167772163,167772165-167772166')
+            plugin._recycle_ip(ctx, network_id, subnet_id, '10.0.0.4')
+            availability = self._get_availability(subnet_id)
+            self.assertEqual(availability['ranges'], '167772162-167772166')
+
+    def test_availability_ranges_are_converted(self):
+        ctx = context.get_admin_context()
+        cfg.CONF.set_override('ipam_driver',
+                              'quantum.db.ipam_db.AvailabilityRangeIpamDriver')
+        with self.subnet(cidr='10.0.0.0/29') as subnet:
+            subnet_id = subnet['subnet']['id']
+            with self.port(subnet=subnet):
+                cfg.CONF.set_override('ipam_driver', INTERVAL_SET_DRIVER)
+                with self.port(subnet=subnet) as port:
+                    ips = port['port']['fixed_ips']
+                    self.assertEqual(ips[0]['ip_address'], '10.0.0.3')
+                range_qry = ctx.session.query(models_v2.IPAvailabilityRange)
+                self.assertEqual(range_qry.count(), 0)
+                availability = self._get_availability(subnet_id)
+                self.assertEqual(availability['ranges'],
+                                 '167772164-167772166')
+
+    def test_concurrent_conversion_reads_converted_row(self):
+        ctx = context.get_admin_context()
+        plugin = QuantumManager.get_plugin()
+        driver = ipam_db.get_driver()
+        cfg.CONF.set_override('ipam_driver',
+                              'quantum.db.ipam_db.AvailabilityRangeIpamDriver')
+        with self.subnet(cidr='10.0.0.0/29') as subnet:
+            cfg.CONF.set_override('ipam_driver', INTERVAL_SET_DRIVER)
+            pool_qry = ctx.session.query(models_v2.IPAllocationPool)
+            pool = pool_qry.filter_by(subnet_id=subnet['subnet']['id']).one()
+            # Another request converted the pool while this one was waiting
+            # for the lock of the pool
+            with ctx.session.begin():
+                ctx.session.add(ipam_db.IPAvailabilitySet(
+                    allocation_pool_id=pool['id'],
+                    ranges='167772164-167772166', version=3))
+            orig_query = driver._query_availability
+            missing = mock.Mock()
+            missing.first.return_value = None
+
+            def racing_query(context, pool_id, current_read=False):
+                if not current_read:
+                    return missing
+                return orig_query(context, pool_id, current_read)
+
+            with mock.patch.object(driver, '_query_availability',
+                                   side_effect=racing_query):
+                ips = plugin._generate_ips(ctx, [subnet['subnet']], 1)
+            self.assertEqual(ips[0]['ip_address'], '10.0.0.4')
+            availability = self._get_availability(subnet['subnet']['id'])
+            self.assertEqual((availability['ranges'], availability['version']),
+                             ('167772165-167772166', 4))
+
+    def test_retry_reads_row_for_update(self):
+        ctx = context.get_admin_context()
+        driver = ipam_db.get_driver()
+        with self.subnet(cidr='10.0.0.0/29') as subnet:
+            pool_qry = ctx.session.query(models_v2.IPAllocationPool)
+            pool = pool_qry.filter_by(subnet_id=subnet['subnet']['id']).one()
+            with mock.patch.object(ipam_db.orm.Query, 'with_lockmode',
+                                   autospec=True,
+                                   side_effect=lambda q, mode: q) as lock:
+                driver._load(ctx, pool['id'])
+                self.assertFalse(lock.called)
+                driver._load(ctx, pool['id'], current_read=True)
+            self.assertEqual(lock.call_args[0][1], 'update')
+
+    def test_concurrent_update_is_retried(self):
+        ctx = context.get_admin_context()
+        plugin = QuantumManager.get_plugin()
+        driver = ipam_db.get_driver()
+        orig_load = driver._load
+
+        def racing_load(context, pool_id, current_read=False):
+            availability = orig_load(context, pool_id,
+                                     current_read=current_read)
+            if not current_read:
+                # Simulate another writer bumping the version
+                query = context.session.query(ipam_db.IPAvailabilitySet)
+                query.filter_by(allocation_pool_id=pool_id).update(
+                    {'version': availability['version'] + 1},
+                    synchronize_session=False)
+            return availability
+
+        with self.subnet(cidr='10.0.0.0/29') as subnet:
+            with mock.patch.object(driver, '_load',
+                                   side_effect=racing_load) as load:
+                ips = plugin._generate_ips(ctx, [subnet['subnet']], 1)
+                self.assertEqual(load.call_count, 2)
+            self.assertEqual(ips[0]['ip_address'], '10.0.0.2')
+            availability = self._get_availability(subnet['subnet']['id'])
+            self.assertEqual(availability['version'], 2)
+
+    def test_concurrent_update_conflict(self):
+        cfg.CONF.set_override('ipam_update_retries', 2)
+        ctx = context.get_admin_context()
+        plugin = QuantumManager.get_plugin()
+        driver = ipam_db.get_driver()
+        with self.subnet(cidr='10.0.0.0/29') as subnet:
+            stale = ipam_db.IPAvailabilitySet(ranges='', version=-1)
+            with mock.patch.object(driver, '_load', return_value=stale):
+                self.assertRaises(q_exc.IpAvailabilityUpdateConflict,
+                                  plugin._generate_ips,
+                                  ctx, [subnet['subnet']], 1)
+
+
+class TestIntervalSetIpamPortsV2(test_db_plugin.TestPortsV2):
+
+    def setUp(self):
+        super(TestIntervalSetIpamPortsV2, self).setUp()
+        cfg.CONF.set_override('ipam_driver', INTERVAL_SET_DRIVER)
+
+
+class TestIntervalSetIpamSubnetsV2(test_db_plugin.TestSubnetsV2):
+
+    def setUp(self):
+        super(TestIntervalSetIpamSubnetsV2, self).setUp()
+        cfg.CONF.set_override('ipam_driver', INTERVAL_SET_DRIVER)
@@ -39,9 +39,11 @@ from quantum.common.test_lib import test_config
 from quantum import context
 from quantum.db import api as db
 from quantum.db import db_base_plugin_v2
+from quantum.db import ipam_db
 from quantum.db import models_v2
 from quantum.manager import QuantumManager
 from quantum.openstack.common import timeutils
+from quantum import service
 from quantum.tests import base
 from quantum.tests.unit import test_extensions
 from quantum.tests.unit import testlib_api
@@ -438,6 +440,16 @@ class QuantumDbPluginV2TestCase(testlib_api.WebTestCase):
             raise webob.exc.HTTPClientError(code=res.status_int)
         return self.deserialize(fmt, res)
 
+    def _list_statement_count(self, resource, quantum_context=None):
+        """Return the number of SQL statements a list request runs."""
+        req = self.new_list_request(resource)
+        if quantum_context:
+            req.environ['quantum.context'] = quantum_context
+        with testlib_api.SqlStatementCounter() as counter:
+            res = req.get_response(self._api_for_resource(resource))
+        self.assertEqual(res.status_int, webob.exc.HTTPOk.code)
+        return counter.count
+
     def _api_for_resource(self, resource):
         if resource in ['networks', 'subnets', 'ports']:
             return self.api
@@ -916,6 +928,67 @@ class TestPortsV2(QuantumDbPluginV2TestCase):
                 # We expect a 500 as we injected a fault in the plugin
                 self._validate_behavior_on_bulk_failure(res, 'ports', 500)
 
+    def test_create_ports_bulk_native_set_based(self):
+        if self._skip_native_bulk:
+            self.skipTest("Plugin does not support native bulk port create")
+        base_class = db_base_plugin_v2.QuantumDbPluginV2
+        with self.subnet(cidr='10.0.0.0/24') as subnet:
+            net_id = subnet['subnet']['network_id']
+            overrides = {0: {'fixed_ips': [{'ip_address': '10.0.0.5'}]},
+                         1: {'mac_address': '12:34:56:78:90:ff'}}
+            with mock.patch.object(base_class, '_generate_ips',
+                                   wraps=base_class._generate_ips) as gen_ips:
+                res = self._create_port_bulk(self.fmt, 4, net_id, 'test',
+                                             True, override=overrides)
+                plugin = QuantumManager.get_plugin()
+                if plugin._get_set_based_bulk_creator('port'):
+                    self.assertEqual(gen_ips.call_count, 1)
+            self.assertEqual(res.status_int, 201)
+            ports = self.deserialize(self.fmt, res)['ports']
+            self.assertEqual([p['name'] for p in ports],
+                             ['test_0', 'test_1', 'test_2', 'test_3'])
+            ips = [p['fixed_ips'][0]['ip_address'] for p in ports]
+            self.assertEqual(ips,
+                             ['10.0.0.5', '10.0.0.2', '10.0.0.3', '10.0.0.4'])
+            self.assertEqual(ports[1]['mac_address'], '12:34:56:78:90:ff')
+            self.assertEqual(len(set(p['mac_address'] for p in ports)), 4)
+            for p in ports:
+                port = self._show('ports', p['id'])['port']
+                self.assertEqual(port['fixed_ips'], p['fixed_ips'])
+                self._delete('ports', p['id'])
+
+    def test_create_ports_bulk_native_duplicate_mac(self):
+        if self._skip_native_bulk:
+            self.skipTest("Plugin does not support native bulk port create")
+        with self.network() as net:
+            overrides = {0: {'mac_address': '12:34:56:78:90:ff'},
+                         1: {'mac_address': '12:34:56:78:90:ff'}}
+            res = self._create_port_bulk(self.fmt, 2, net['network']['id'],
+                                         'test', True, override=overrides)
+            self._validate_behavior_on_bulk_failure(res, 'ports', 409)
+
+    def test_create_ports_bulk_native_duplicate_ip(self):
+        if self._skip_native_bulk:
+            self.skipTest("Plugin does not support native bulk port create")
+        with self.subnet() as subnet:
+            fixed_ips = [{'subnet_id': subnet['subnet']['id'],
+                          'ip_address': '10.0.0.5'}]
+            overrides = {0: {'fixed_ips': fixed_ips},
+                         1: {'fixed_ips': fixed_ips}}
+            res = self._create_port_bulk(self.fmt, 2,
+                                         subnet['subnet']['network_id'],
+                                         'test', True, override=overrides)
+            self._validate_behavior_on_bulk_failure(res, 'ports', 409)
+
+    def test_create_ports_bulk_native_ips_exhausted(self):
+        if self._skip_native_bulk:
+            self.skipTest("Plugin does not support native bulk port create")
+        with self.subnet(cidr='10.0.0.0/30') as subnet:
+            res = self._create_port_bulk(self.fmt, 2,
+                                         subnet['subnet']['network_id'],
+                                         'test', True)
+            self._validate_behavior_on_bulk_failure(res, 'ports', 409)
+
     def test_list_ports(self):
         # for this test we need to enable overlapping ips
         cfg.CONF.set_default('allow_overlapping_ips', True)
@@ -1752,6 +1825,60 @@ fixed_ips=ip_address%%3D%s&fixed_ips=ip_address%%3D%s&fixed_ips=subnet_id%%3D%s
                     self.assertEqual(update_context._recycled_networks,
                                      set([subnet['subnet']['network_id']]))
 
+    def _hold_expired_ips(self, network_id, count):
+        for i in range(count):
+            res = self._create_port(self.fmt, net_id=network_id)
+            port = self.deserialize(self.fmt, res)
+            self._delete('ports', port['port']['id'])
+        ctx = context.get_admin_context()
+        held_qry = ctx.session.query(models_v2.IPAllocation)
+        held_qry.filter_by(port_id=None).update(
+            {'expiration': timeutils.utcnow() - datetime.timedelta(0, 1)},
+            synchronize_session=False)
+
+    def test_recycle_expired_ip_allocations_in_batches(self):
+        cfg.CONF.set_override('ip_recycle_batch_size', 2)
+        ctx = context.get_admin_context()
+        plugin = QuantumManager.get_plugin()
+        driver = ipam_db.get_driver()
+        with self.subnet(cidr='10.0.0.0/29') as subnet:
+            self._hold_expired_ips(subnet['subnet']['network_id'], 3)
+            recycler = service.IpAllocationRecycler(plugin)
+            with mock.patch.object(driver, 'release_ips',
+                                   wraps=driver.release_ips) as release:
+                recycler()
+                self.assertEqual(release.call_count, 2)
+            self.assertEqual(recycler.last_reclaimed, 3)
+            self.assertEqual(recycler.total_reclaimed, 3)
+            held_qry = ctx.session.query(models_v2.IPAllocation)
+            self.assertEqual(held_qry.count(), 0)
+            ips = plugin._generate_ips(ctx, [subnet['subnet']], 5)
+            self.assertEqual(len(ips), 5)
+            recycler()
+            self.assertEqual(recycler.last_reclaimed, 0)
+            self.assertEqual(recycler.total_reclaimed, 3)
+
+    def test_periodic_recycling_skips_per_request_scan(self):
+        cfg.CONF.set_override('ip_recycle_interval', 60)
+        ctx = context.get_admin_context()
+        plugin = QuantumManager.get_plugin()
+        with self.subnet() as subnet:
+            self._hold_expired_ips(subnet['subnet']['network_id'], 1)
+            with mock.patch.object(plugin, '_recycle_ip') as rc:
+                plugin._recycle_expired_ip_allocations(
+                    ctx, subnet['subnet']['network_id'])
+                self.assertFalse(rc.called)
+
+    def test_periodic_recycling_reclaims_when_exhausted(self):
+        cfg.CONF.set_override('ip_recycle_interval', 60)
+        with self.subnet(cidr='10.0.0.0/29') as subnet:
+            network_id = subnet['subnet']['network_id']
+            self._hold_expired_ips(network_id, 5)
+            res = self._create_port(self.fmt, net_id=network_id)
+            self.assertEqual(res.status_int, 201)
+            port = self.deserialize(self.fmt, res)
+            self._delete('ports', port['port']['id'])
+
     def test_max_fixed_ips_exceeded(self):
         with self.subnet(gateway_ip='10.0.0.3',
                          cidr='10.0.0.0/24') as subnet:
@@ -1785,6 +1912,69 @@ fixed_ips=ip_address%%3D%s&fixed_ips=ip_address%%3D%s&fixed_ips=subnet_id%%3D%s
                 self.assertEqual(res.status_int, 400)
 
 
+class SetBasedPortsBulkTestMixin(object):
+    """Tests of plugins extending the set-based creation of bulk ports.
+
+    The failures are injected in the set-based creator, create_port not
+    being called for bulk requests.
+    """
+
+    def _inject_ports_bulk_failure(self):
+        plugin = QuantumManager.get_plugin()
+        orig = plugin._create_ports_bulk
+
+        def side_effect(*args, **kwargs):
+            orig(*args, **kwargs)
+            raise q_exc.QuantumException()
+
+        return mock.patch.object(plugin, '_create_ports_bulk',
+                                 side_effect=side_effect)
+
+    def test_create_ports_bulk_emulated_plugin_failure(self):
+        with self.network() as net:
+            with self._inject_ports_bulk_failure():
+                res = self._create_port_bulk(self.fmt, 2,
+                                             net['network']['id'],
+                                             'test', True)
+            self._validate_behavior_on_bulk_failure(res, 'ports', 500)
+
+    def test_create_ports_bulk_native_plugin_failure(self):
+        ctx = context.get_admin_context()
+        with self.network() as net:
+            with self._inject_ports_bulk_failure():
+                res = self._create_port_bulk(self.fmt, 2,
+                                             net['network']['id'],
+                                             'test', True, context=ctx)
+            self._validate_behavior_on_bulk_failure(res, 'ports', 500)
+
+    def test_create_ports_bulk_uses_set_based_creator(self):
+        plugin = QuantumManager.get_plugin()
+        base_class = db_base_plugin_v2.QuantumDbPluginV2
+        with self.subnet() as subnet:
+            net_id = subnet['subnet']['network_id']
+            with contextlib.nested(
+                mock.patch.object(plugin, 'create_port'),
+                mock.patch.object(base_class, '_generate_ips',
+                                  wraps=base_class._generate_ips),
+                mock.patch.object(plugin.notifier,
+                                  'security_groups_member_updated')
+            ) as (create_port, gen_ips, member_updated):
+                res = self._create_port_bulk(self.fmt, 3, net_id, 'test',
+                                             True)
+            self.assertEqual(res.status_int, 201)
+            self.assertFalse(create_port.called)
+            self.assertEqual(gen_ips.call_count, 1)
+            self.assertEqual(member_updated.call_count, 1)
+            ports = self.deserialize(self.fmt, res)['ports']
+            ctx = context.get_admin_context()
+            for p in ports:
+                self.assertEqual(p['status'], self.port_create_status)
+                # Bound to the default security group
+                port = plugin.get_port(ctx, p['id'])
+                self.assertEqual(len(port['security_groups']), 1)
+                self._delete('ports', p['id'])
+
+
 class TestNetworksV2(QuantumDbPluginV2TestCase):
     # NOTE(cerberus): successful network update and delete are
     #                 effectively tested above
@@ -2051,6 +2241,17 @@ class TestNetworksV2(QuantumDbPluginV2TestCase):
             # We expect a 500 as we injected a fault in the plugin
             self._validate_behavior_on_bulk_failure(res, 'networks', 500)
 
+    def test_create_networks_bulk_native_set_based(self):
+        if self._skip_native_bulk:
+            self.skipTest("Plugin does not support native bulk network create")
+        res = self._create_network_bulk(self.fmt, 3, 'test', True)
+        self.assertEqual(res.status_int, 201)
+        networks = self.deserialize(self.fmt, res)['networks']
+        self.assertEqual([n['name'] for n in networks],
+                         ['test_0', 'test_1', 'test_2'])
+        for n in networks:
+            self._delete('networks', n['id'])
+
     def test_list_networks(self):
         with contextlib.nested(self.network(),
                                self.network(),
@@ -2231,6 +2432,29 @@ class TestNetworksV2(QuantumDbPluginV2TestCase):
             self.assertEqual(None,
                              res['networks'][0].get('id'))
 
+    def test_get_networks_with_column_fields(self):
+        plugin = QuantumManager.get_plugin()
+        ctx = context.get_admin_context()
+        with self.network(name='net1') as net1:
+            with mock.patch.object(plugin, '_make_network_dict',
+                                   wraps=plugin._make_network_dict) as make:
+                make.column_fields = plugin._make_network_dict.column_fields
+                # Plugins extending the networks ask for all the fields
+                res = db_base_plugin_v2.QuantumDbPluginV2.get_networks(
+                    plugin, ctx, fields=['id', 'name'])
+                self.assertFalse(make.called)
+        self.assertEqual([{'id': net1['network']['id'], 'name': 'net1'}],
+                         res)
+
+    def test_get_networks_with_non_column_fields(self):
+        plugin = QuantumManager.get_plugin()
+        ctx = context.get_admin_context()
+        with self.network(name='net1') as net1:
+            res = db_base_plugin_v2.QuantumDbPluginV2.get_networks(
+                plugin, ctx, fields=['id', 'subnets'])
+        self.assertEqual([{'id': net1['network']['id'], 'subnets': []}],
+                         res)
+
     def test_list_networks_with_parameters_invalid_values(self):
         with contextlib.nested(self.network(name='net1',
                                             admin_state_up=False),
@@ -2388,6 +2612,19 @@ class TestSubnetsV2(QuantumDbPluginV2TestCase):
                                            'test')
             self._validate_behavior_on_bulk_success(res, 'subnets')
 
+    def test_create_subnets_bulk_native_overlapping(self):
+        if self._skip_native_bulk:
+            self.skipTest("Plugin does not support native bulk subnet create")
+        with self.network() as net:
+            overrides = {0: {'cidr': '10.0.0.0/24'},
+                         1: {'cidr': '10.0.0.0/16'}}
+            base_data = {'subnet': {'network_id': net['network']['id'],
+                                    'ip_version': 4,
+                                    'tenant_id': self._tenant_id}}
+            res = self._create_bulk(self.fmt, 2, 'subnet', base_data,
+                                    override=overrides)
+            self._validate_behavior_on_bulk_failure(res, 'subnets')
+
     def test_create_subnets_bulk_emulated(self):
         real_has_attr = hasattr
 
@@ -3409,6 +3646,47 @@ class TestSubnetsV2(QuantumDbPluginV2TestCase):
         self.assertEqual(res.status_int, 204)
 
 
+class TestListStatementCount(QuantumDbPluginV2TestCase):
+    """Listing more resources must not run more SQL statements."""
+
+    def _subnet_kwargs(self, index):
+        return {'cidr': '10.0.%d.0/24' % index,
+                'dns_nameservers': ['10.0.%d.2' % index],
+                'host_routes': [{'destination': '10.1.%d.0/24' % index,
+                                 'nexthop': '10.0.%d.3' % index}]}
+
+    def test_list_networks_statement_count(self):
+        with self.network() as net1:
+            with self.subnet(network=net1, **self._subnet_kwargs(1)):
+                count = self._list_statement_count('networks')
+                with contextlib.nested(self.network(),
+                                       self.network()) as (net2, net3):
+                    with contextlib.nested(
+                        self.subnet(network=net2, **self._subnet_kwargs(2)),
+                        self.subnet(network=net3, **self._subnet_kwargs(3))):
+                        self.assertEqual(
+                            count, self._list_statement_count('networks'))
+
+    def test_list_subnets_statement_count(self):
+        with self.network() as net:
+            with self.subnet(network=net, **self._subnet_kwargs(1)):
+                count = self._list_statement_count('subnets')
+                with contextlib.nested(
+                    self.subnet(network=net, **self._subnet_kwargs(2)),
+                    self.subnet(network=net, **self._subnet_kwargs(3))):
+                    self.assertEqual(count,
+                                     self._list_statement_count('subnets'))
+
+    def test_list_ports_statement_count(self):
+        with self.subnet() as subnet:
+            with self.port(subnet=subnet):
+                count = self._list_statement_count('ports')
+                with contextlib.nested(self.port(subnet=subnet),
+                                       self.port(subnet=subnet)):
+                    self.assertEqual(count,
+                                     self._list_statement_count('ports'))
+
+
 class DbModelTestCase(base.BaseTestCase):
     """ DB model tests """
     def test_repr(self):
@@ -33,6 +33,7 @@ from quantum.agent.linux import interface
 from quantum.common import constants
 from quantum.common import exceptions
 from quantum.openstack.common import jsonutils
+from quantum.openstack.common.rpc import common as rpc_common
 from quantum.tests import base
 
 
@@ -261,6 +262,9 @@ class TestDhcpAgent(base.BaseTestCase):
         with mock.patch('quantum.agent.dhcp_agent.DhcpPluginApi') as plug:
             mock_plugin = mock.Mock()
             mock_plugin.get_active_networks.return_value = active_networks
+            networks = [dhcp_agent.DictModel(dict(id=net_id))
+                        for net_id in active_networks]
+            mock_plugin.get_networks_info.return_value = networks
             plug.return_value = mock_plugin
 
             dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
@@ -273,15 +277,22 @@ class TestDhcpAgent(base.BaseTestCase):
                 mocks['cache'].get_network_ids.return_value = known_networks
                 dhcp.sync_state()
 
-                exp_refresh = [
-                    mock.call(net_id) for net_id in active_networks]
+                exp_refresh = [mock.call(network.id, network)
+                               for network in networks]
 
                 diff = set(known_networks) - set(active_networks)
                 exp_disable = [mock.call(net_id) for net_id in diff]
 
                 mocks['cache'].assert_has_calls([mock.call.get_network_ids()])
-                mocks['refresh_dhcp_helper'].assert_has_called(exp_refresh)
-                mocks['disable_dhcp_helper'].assert_has_called(exp_disable)
+                mock_plugin.get_networks_info.assert_called_once_with(
+                    active_networks)
+                self.assertEqual(
+                    exp_refresh,
+                    mocks['refresh_dhcp_helper'].call_args_list)
+                self.assertEqual(
+                    exp_disable,
+                    mocks['disable_dhcp_helper'].call_args_list)
+                self.assertFalse(dhcp.needs_resync)
 
     def test_sync_state_initial(self):
         self._test_sync_state_helper([], ['a'])
@@ -292,6 +303,52 @@ class TestDhcpAgent(base.BaseTestCase):
     def test_sync_state_disabled_net(self):
         self._test_sync_state_helper(['b'], ['a'])
 
+    def test_sync_state_network_deleted_meanwhile(self):
+        with mock.patch('quantum.agent.dhcp_agent.DhcpPluginApi') as plug:
+            mock_plugin = mock.Mock()
+            mock_plugin.get_active_networks.return_value = ['a', 'b']
+            mock_plugin.get_networks_info.return_value = [
+                dhcp_agent.DictModel(dict(id='a'))]
+            plug.return_value = mock_plugin
+
+            dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+            with mock.patch.multiple(
+                dhcp, refresh_dhcp_helper=mock.DEFAULT,
+                disable_dhcp_helper=mock.DEFAULT) as mocks:
+                dhcp.sync_state()
+                mocks['disable_dhcp_helper'].assert_called_once_with('b')
+                self.assertEqual(
+                    ['a'],
+                    [c[0][0] for c in
+                     mocks['refresh_dhcp_helper'].call_args_list])
+
+    def test_sync_state_runs_networks_in_pool(self):
+        cfg.CONF.set_override('num_sync_threads', 2)
+        with mock.patch('quantum.agent.dhcp_agent.DhcpPluginApi') as plug:
+            mock_plugin = mock.Mock()
+            mock_plugin.get_active_networks.return_value = ['a', 'b', 'c']
+            mock_plugin.get_networks_info.return_value = [
+                dhcp_agent.DictModel(dict(id=net_id))
+                for net_id in ['a', 'b', 'c']]
+            plug.return_value = mock_plugin
+
+            dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+            running = []
+            concurrency = []
+
+            def refresh(network_id, network):
+                running.append(network_id)
+                concurrency.append(len(running))
+                eventlet.sleep(0.01)
+                running.remove(network_id)
+
+            with mock.patch.object(dhcp, 'refresh_dhcp_helper',
+                                   side_effect=refresh):
+                dhcp.sync_state()
+            self.assertEqual(3, len(concurrency))
+            self.assertEqual(2, max(concurrency))
+            self.assertEqual([], running)
+
     def test_sync_state_plugin_error(self):
         with mock.patch('quantum.agent.dhcp_agent.DhcpPluginApi') as plug:
             mock_plugin = mock.Mock()
@@ -455,6 +512,12 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
             mock.call().enable(mock.ANY)
         ])
 
+    def test_enable_dhcp_helper_given_network(self):
+        self.dhcp.enable_dhcp_helper(fake_network.id, fake_network)
+        self.assertFalse(self.plugin.get_network_info.called)
+        self.call_driver.assert_called_once_with('enable', fake_network)
+        self.cache.assert_has_calls([mock.call.put(fake_network)])
+
     def test_enable_dhcp_helper_down_network(self):
         self.plugin.get_network_info.return_value = fake_down_network
         self.dhcp.enable_dhcp_helper(fake_down_network.id)
@@ -622,6 +685,14 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
             self.cache.assert_has_calls(
                 [mock.call.get_network_by_id('net-id')])
 
+    def test_refresh_dhcp_helper_given_network(self):
+        self.cache.get_network_by_id.return_value = fake_network
+        self.dhcp.refresh_dhcp_helper(fake_network.id, fake_network)
+        self.assertFalse(self.plugin.get_network_info.called)
+        self.call_driver.assert_called_once_with('reload_allocations',
+                                                 fake_network)
+        self.cache.assert_has_calls([mock.call.put(fake_network)])
+
     def test_refresh_dhcp_helper_exception_during_rpc(self):
         network = FakeModel('net-id',
                             tenant_id='aaaaaaaa-aaaa-aaaa-aaaaaaaaaaaa',
@@ -692,27 +763,62 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
     def test_port_update_end(self):
         payload = dict(port=vars(fake_port2))
         self.cache.get_network_by_id.return_value = fake_network
-        self.dhcp.port_update_end(None, payload)
+        with mock.patch.object(self.dhcp,
+                               'schedule_reload_allocations') as reload:
+            self.dhcp.port_update_end(None, payload)
+            reload.assert_called_once_with(fake_network)
         self.cache.assert_has_calls(
             [mock.call.get_network_by_id(fake_port2.network_id),
              mock.call.put_port(mock.ANY)])
-        self.call_driver.assert_called_once_with('reload_allocations',
-                                                 fake_network)
 
     def test_port_delete_end(self):
         payload = dict(port_id=fake_port2.id)
         self.cache.get_network_by_id.return_value = fake_network
         self.cache.get_port_by_id.return_value = fake_port2
 
-        self.dhcp.port_delete_end(None, payload)
+        with mock.patch.object(self.dhcp,
+                               'schedule_reload_allocations') as reload:
+            self.dhcp.port_delete_end(None, payload)
+            reload.assert_called_once_with(fake_network)
 
         self.cache.assert_has_calls(
             [mock.call.get_port_by_id(fake_port2.id),
              mock.call.get_network_by_id(fake_network.id),
              mock.call.remove_port(fake_port2)])
+
+    def test_schedule_reload_allocations_coalesces(self):
+        with mock.patch.object(dhcp_agent.eventlet,
+                               'spawn_after') as spawn_after:
+            self.dhcp.schedule_reload_allocations(fake_network)
+            self.dhcp.schedule_reload_allocations(fake_network)
+            spawn_after.assert_called_once_with(
+                cfg.CONF.reload_allocations_delay,
+                self.dhcp._reload_allocations, fake_network.id)
+            self.assertFalse(self.call_driver.called)
+
+            self.cache.get_network_by_id.return_value = fake_network
+            self.dhcp._reload_allocations(fake_network.id)
+            self.call_driver.assert_called_once_with('reload_allocations',
+                                                     fake_network)
+
+            # Changes made after the reload schedule another one
+            self.dhcp.schedule_reload_allocations(fake_network)
+            self.assertEqual(2, spawn_after.call_count)
+
+    def test_schedule_reload_allocations_without_delay(self):
+        cfg.CONF.set_override('reload_allocations_delay', 0)
+        with mock.patch.object(dhcp_agent.eventlet,
+                               'spawn_after') as spawn_after:
+            self.dhcp.schedule_reload_allocations(fake_network)
+            self.assertFalse(spawn_after.called)
         self.call_driver.assert_called_once_with('reload_allocations',
                                                  fake_network)
 
+    def test_reload_allocations_of_removed_network(self):
+        self.cache.get_network_by_id.return_value = None
+        self.dhcp._reload_allocations(fake_network.id)
+        self.assertFalse(self.call_driver.called)
+
     def test_port_delete_end_unknown_port(self):
         payload = dict(port_id='unknown')
         self.cache.get_port_by_id.return_value = None
@@ -754,6 +860,40 @@ class TestDhcpPluginApiProxy(base.BaseTestCase):
                                               network_id='netid',
                                               host='foo')
 
+    def test_get_networks_info(self):
+        self.call.return_value = [dict(a=1), dict(a=2)]
+        retval = self.proxy.get_networks_info(['netid1', 'netid2'])
+        self.assertEqual([1, 2], [network.a for network in retval])
+        self.assertTrue(self.call.called)
+        self.make_msg.assert_called_once_with('get_networks_info',
+                                              network_ids=['netid1',
+                                                           'netid2'],
+                                              host='foo')
+        self.assertEqual('1.2', self.call.call_args[1]['version'])
+
+    def test_get_networks_info_falls_back_for_old_plugins(self):
+        def old_plugin(context, msg, topic, version=None):
+            if version == '1.2':
+                raise rpc_common.RemoteError('UnsupportedRpcVersion')
+            return dict(a=msg)
+
+        self.call.side_effect = old_plugin
+        self.make_msg.side_effect = lambda method, **kwargs: kwargs.get(
+            'network_id')
+        for i in range(2):
+            retval = self.proxy.get_networks_info(['netid1', 'netid2'])
+            self.assertEqual(['netid1', 'netid2'],
+                             [network.a for network in retval])
+        self.assertFalse(self.proxy.networks_info_call)
+        # The batched call is only tried once
+        self.assertEqual(5, self.call.call_count)
+
+    def test_get_networks_info_raises_remote_errors(self):
+        self.call.side_effect = rpc_common.RemoteError('DBError')
+        self.assertRaises(rpc_common.RemoteError,
+                          self.proxy.get_networks_info, ['netid1'])
+        self.assertTrue(self.proxy.networks_info_call)
+
     def test_get_dhcp_port(self):
         self.call.return_value = dict(a=1)
         retval = self.proxy.get_dhcp_port('netid', 'devid')
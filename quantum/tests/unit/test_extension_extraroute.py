@@ -103,6 +103,36 @@ class ExtraRouteDBTestCase(test_l3.L3NatDBTestCase):
                                                   None,
                                                   p['port']['id'])
 
+    def test_routes_listed_per_router(self):
+        with contextlib.nested(self.router(name='router1'),
+                               self.router(name='router2')) as (r1, r2):
+            with contextlib.nested(
+                self.subnet(cidr='10.0.1.0/24'),
+                self.subnet(cidr='10.0.2.0/24')) as (s1, s2):
+                routes = {}
+                for r, s, nexthop in ((r1, s1, '10.0.1.3'),
+                                      (r2, s2, '10.0.2.3')):
+                    self._router_interface_action('add', r['router']['id'],
+                                                  s['subnet']['id'], None)
+                    routes[r['router']['id']] = [
+                        {'destination': '135.207.0.0/16',
+                         'nexthop': nexthop}]
+                    self._update('routers', r['router']['id'],
+                                 {'router': {'routes':
+                                             routes[r['router']['id']]}})
+
+                body = self._list('routers')
+                for router in body['routers']:
+                    self.assertEqual(routes[router['id']], router['routes'])
+
+                # clean-up
+                for r, s in ((r1, s1), (r2, s2)):
+                    self._update('routers', r['router']['id'],
+                                 {'router': {'routes': []}})
+                    self._router_interface_action('remove',
+                                                  r['router']['id'],
+                                                  s['subnet']['id'], None)
+
     def test_router_interface_in_use_by_route(self):
         with self.router() as r:
             with self.subnet(cidr='10.0.1.0/24') as s:
@@ -0,0 +1,75 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from quantum.agent.linux import ipset_manager
+from quantum.tests import base
+
+
+class IpsetManagerTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(IpsetManagerTestCase, self).setUp()
+        self.execute = mock.Mock()
+        self.ipset = ipset_manager.IpsetManager(_execute=self.execute,
+                                                root_helper='sudo')
+
+    def _restored(self):
+        args, kwargs = self.execute.call_args
+        self.assertEqual(args[0], ['ipset', '-exist', 'restore'])
+        self.assertEqual(kwargs['root_helper'], 'sudo')
+        return kwargs['process_input'].splitlines()
+
+    def test_get_set_name(self):
+        name = ipset_manager.get_set_name('IPv4', 'a' * 36)
+        self.assertEqual(name, 'IPv4' + 'a' * 27)
+
+    def test_set_members_creates_set(self):
+        self.ipset.set_members('IPv4sg', 'IPv4', ['10.0.0.2', '10.0.0.1'])
+        self.assertEqual(self._restored(),
+                         ['create IPv4sg hash:ip family inet',
+                          'flush IPv4sg',
+                          'add IPv4sg 10.0.0.1',
+                          'add IPv4sg 10.0.0.2'])
+
+    def test_set_members_ipv6(self):
+        self.ipset.set_members('IPv6sg', 'IPv6', [])
+        self.assertEqual(self._restored(),
+                         ['create IPv6sg hash:ip family inet6',
+                          'flush IPv6sg'])
+
+    def test_set_members_updates_changed_members(self):
+        self.ipset.set_members('IPv4sg', 'IPv4', ['10.0.0.1', '10.0.0.2'])
+        self.ipset.set_members('IPv4sg', 'IPv4', ['10.0.0.2', '10.0.0.3'])
+        self.assertEqual(self._restored(),
+                         ['add IPv4sg 10.0.0.3',
+                          'del IPv4sg 10.0.0.1'])
+
+    def test_set_members_unchanged(self):
+        self.ipset.set_members('IPv4sg', 'IPv4', ['10.0.0.1'])
+        self.ipset.set_members('IPv4sg', 'IPv4', ['10.0.0.1'])
+        self.assertEqual(self.execute.call_count, 1)
+
+    def test_destroy(self):
+        self.ipset.set_members('IPv4sg', 'IPv4', [])
+        self.ipset.destroy('IPv4sg')
+        self.ipset.destroy('IPv4sg')
+        self.execute.assert_called_with(['ipset', 'destroy', 'IPv4sg'],
+                                        root_helper='sudo')
+        self.assertEqual(self.execute.call_count, 2)
+        self.assertEqual(self.ipset.sets, {})
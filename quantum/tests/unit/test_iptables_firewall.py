@@ -913,3 +913,77 @@ class IptablesFirewallTestCase(base.BaseTestCase):
             pass
         self.iptables_inst.assert_has_calls([call.defer_apply_on(),
                                              call.defer_apply_off()])
+
+    def _enable_ipset(self):
+        self.firewall.handles_remote_groups = True
+        self.firewall.ipset = mock.Mock()
+
+    def test_filter_ipv4_ingress_remote_group_ipset(self):
+        self._enable_ipset()
+        self.firewall.update_security_group_members('fake_sgid',
+                                                    [FAKE_IP['IPv4']])
+        rule = {'ethertype': 'IPv4',
+                'direction': 'ingress',
+                'remote_group_id': 'fake_sgid'}
+        ingress = call.add_rule(
+            'ifake_dev', '-j RETURN -m set --match-set IPv4fake_sgid src')
+        egress = None
+        self._test_prepare_port_filter(rule, ingress, egress)
+
+    def test_filter_ipv6_egress_remote_group_ipset(self):
+        self._enable_ipset()
+        self.firewall.update_security_group_members('fake_sgid',
+                                                    [FAKE_IP['IPv6']])
+        rule = {'ethertype': 'IPv6',
+                'direction': 'egress',
+                'protocol': 'tcp',
+                'remote_group_id': 'fake_sgid'}
+        ingress = None
+        egress = call.add_rule(
+            'ofake_dev',
+            '-j RETURN -m set --match-set IPv6fake_sgid dst -p tcp')
+        self._test_prepare_port_filter(rule, ingress, egress)
+
+    def test_filter_remote_group_ipset_unknown_group(self):
+        self._enable_ipset()
+        rule = {'ethertype': 'IPv4',
+                'direction': 'ingress',
+                'remote_group_id': 'fake_sgid'}
+        self._test_prepare_port_filter(rule, None, None)
+
+    def test_filter_remote_group_ipset_converted_rule(self):
+        # plugins without security_group_info_for_devices convert the
+        # remote group rules to ip prefixes
+        self._enable_ipset()
+        prefix = FAKE_PREFIX['IPv4']
+        rule = {'ethertype': 'IPv4',
+                'direction': 'ingress',
+                'remote_group_id': 'fake_sgid',
+                'source_ip_prefix': prefix}
+        ingress = call.add_rule('ifake_dev', '-j RETURN -s %s' % prefix)
+        self._test_prepare_port_filter(rule, ingress, None)
+
+    def test_update_security_group_members(self):
+        self._enable_ipset()
+        self.firewall.update_security_group_members(
+            'fake_sgid', [FAKE_IP['IPv4'], FAKE_IP['IPv6']])
+        self.firewall.ipset.assert_has_calls(
+            [call.set_members('IPv4fake_sgid', 'IPv4', [FAKE_IP['IPv4']]),
+             call.set_members('IPv6fake_sgid', 'IPv6', [FAKE_IP['IPv6']])],
+            any_order=True)
+
+    def test_defer_apply_off_destroys_unused_sets(self):
+        self._enable_ipset()
+        port = self._fake_port()
+        port['security_group_rules'] = [{'ethertype': 'IPv4',
+                                         'direction': 'ingress',
+                                         'remote_group_id': 'fake_sgid'}]
+        with self.firewall.defer_apply():
+            self.firewall.update_security_group_members('fake_sgid', [])
+            self.firewall.prepare_port_filter(port)
+        self.assertFalse(self.firewall.ipset.destroy.called)
+        with self.firewall.defer_apply():
+            self.firewall.remove_port_filter(port)
+        self.firewall.ipset.destroy.assert_has_calls(
+            [call('IPv4fake_sgid'), call('IPv6fake_sgid')])
+        self.assertEqual(self.firewall.sg_members, {})
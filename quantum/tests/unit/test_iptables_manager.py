@@ -20,6 +20,7 @@
 import inspect
 import os
 
+import mock
 import mox
 
 from quantum.agent.linux import iptables_manager
@@ -302,3 +303,93 @@ class IptablesManagerStateLessTestCase(base.BaseTestCase):
 
     def test_nat_not_found(self):
         self.assertFalse('nat' in self.iptables.ipv4)
+
+
+class IptablesManagerIncrementalTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(IptablesManagerIncrementalTestCase, self).setUp()
+        self.execute = mock.Mock(return_value='')
+        self.iptables = iptables_manager.IptablesManager(
+            _execute=self.execute, root_helper='sudo', state_less=True,
+            incremental=True)
+        self.filter = self.iptables.ipv4['filter']
+        self.filter.add_chain('ifake')
+        self.filter.add_rule('ifake', '-j DROP')
+        self.iptables.apply()
+        self.execute.reset_mock()
+
+    def _restored(self):
+        restores = [c for c in self.execute.call_args_list
+                    if c[0][0][0] == 'iptables-restore']
+        return [(c[0][0], c[1]['process_input']) for c in restores]
+
+    def test_apply_without_changes(self):
+        self.iptables.apply()
+        self.assertFalse(self.execute.called)
+
+    def test_apply_changed_chain_only(self):
+        bn = iptables_manager.binary_name
+        self.filter.add_chain('ofake')
+        self.filter.add_rule('ofake', '-j ACCEPT')
+        self.filter.add_rule('ifake', '-s 10.0.0.2 -j RETURN', top=True)
+        self.iptables.apply()
+        self.assertEqual(
+            self._restored(),
+            [(['iptables-restore', '--noflush'],
+              '*filter\n'
+              ':%(bn)s-ifake - [0:0]\n'
+              ':%(bn)s-ofake - [0:0]\n'
+              '-A %(bn)s-ifake -j DROP\n'
+              '-A %(bn)s-ifake -s 10.0.0.2 -j RETURN\n'
+              '-A %(bn)s-ofake -j ACCEPT\n'
+              'COMMIT\n' % {'bn': bn})])
+        self.assertEqual(self.execute.call_count, 1)
+
+    def test_apply_unchanged_chain_content(self):
+        self.filter.remove_rule('ifake', '-j DROP')
+        self.filter.add_rule('ifake', '-j DROP')
+        self.iptables.apply()
+        self.assertFalse(self.execute.called)
+
+    def test_apply_removed_chain(self):
+        bn = iptables_manager.binary_name
+        self.filter.add_chain('sg-chain')
+        self.filter.add_rule('sg-chain', '-j $ifake')
+        self.iptables.apply()
+        self.execute.reset_mock()
+        self.filter.remove_chain('ifake')
+        self.iptables.apply()
+        self.assertEqual(
+            self._restored(),
+            [(['iptables-restore', '--noflush'],
+              '*filter\n'
+              ':%(bn)s-sg-chain - [0:0]\n'
+              ':%(bn)s-ifake - [0:0]\n'
+              '-X %(bn)s-ifake\n'
+              'COMMIT\n' % {'bn': bn})])
+
+    def test_unwrapped_change_applies_full_table(self):
+        self.filter.add_rule('FORWARD', '-j $ifake', wrap=False)
+        self.iptables.apply()
+        self.execute.assert_any_call(['iptables-save', '-t', 'filter'],
+                                     root_helper='sudo')
+        self.assertEqual(self._restored()[0][0], ['iptables-restore'])
+        self.execute.reset_mock()
+        self.filter.add_rule('ifake', '-j ACCEPT')
+        self.iptables.apply()
+        self.assertEqual(self._restored()[0][0],
+                         ['iptables-restore', '--noflush'])
+
+    def test_failed_incremental_apply_falls_back_to_full(self):
+        def execute(args, **kwargs):
+            if '--noflush' in args:
+                raise RuntimeError()
+            return ''
+
+        self.execute.side_effect = execute
+        self.filter.add_rule('ifake', '-j ACCEPT')
+        self.iptables.apply()
+        self.assertEqual([args for args, _input in self._restored()],
+                         [['iptables-restore', '--noflush'],
+                          ['iptables-restore']])
@@ -33,6 +33,76 @@ _uuid = uuidutils.generate_uuid
 HOSTNAME = 'myhost'
 
 
+def _process_queue(agent):
+    while len(agent._queue):
+        agent._process_router_update(agent._queue.get())
+
+
+def _router(admin_state_up=True):
+    return {'id': _uuid(),
+            'admin_state_up': admin_state_up,
+            'routes': [],
+            'external_gateway_info': {}}
+
+
+class TestRouterProcessingQueue(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestRouterProcessingQueue, self).setUp()
+        self.queue = l3_agent.RouterProcessingQueue()
+
+    def _add(self, router_id, priority, router=None, timestamp=None):
+        self.queue.add(l3_agent.RouterUpdate(router_id, priority,
+                                             router=router,
+                                             timestamp=timestamp))
+
+    def test_rpc_updates_before_sync_backlog(self):
+        self._add('sync1', l3_agent.PRIORITY_SYNC)
+        self._add('sync2', l3_agent.PRIORITY_SYNC)
+        self._add('rpc', l3_agent.PRIORITY_RPC)
+
+        self.assertEqual(['rpc', 'sync1', 'sync2'],
+                         [self.queue.get().router_id for i in range(3)])
+        self.assertEqual(0, len(self.queue))
+
+    def test_updates_are_coalesced(self):
+        self._add('r1', l3_agent.PRIORITY_SYNC, {'name': 'old'}, 1)
+        self._add('r2', l3_agent.PRIORITY_SYNC, {'name': 'other'}, 1)
+        self._add('r1', l3_agent.PRIORITY_RPC, {'name': 'new'}, 2)
+        self.assertEqual(2, len(self.queue))
+
+        update = self.queue.get()
+        self.assertEqual('r1', update.router_id)
+        self.assertEqual({'name': 'new'}, update.router)
+        self.queue.done('r1')
+        self.assertEqual('r2', self.queue.get().router_id)
+        self.assertEqual(0, len(self.queue))
+
+    def test_older_data_does_not_replace_newer(self):
+        self._add('r1', l3_agent.PRIORITY_RPC, None, 2)
+        self._add('r1', l3_agent.PRIORITY_SYNC, {'name': 'stale'}, 1)
+
+        update = self.queue.get()
+        self.assertIsNone(update.router)
+        self.assertEqual(l3_agent.PRIORITY_RPC, update.priority)
+
+    def test_busy_router_is_not_handed_out_twice(self):
+        self._add('r1', l3_agent.PRIORITY_RPC, {'name': 'first'})
+        self.assertEqual('r1', self.queue.get().router_id)
+        self._add('r1', l3_agent.PRIORITY_RPC, {'name': 'second'})
+        self._add('r2', l3_agent.PRIORITY_SYNC)
+        self.assertIn('r1', self.queue)
+
+        # r1 is still being processed, its second update has to wait
+        self.assertEqual('r2', self.queue.get().router_id)
+        self.queue.done('r1')
+        update = self.queue.get()
+        self.assertEqual('r1', update.router_id)
+        self.assertEqual({'name': 'second'}, update.router)
+        self.queue.done('r1')
+        self.assertNotIn('r1', self.queue)
+
+
 class TestBasicRouterOperations(base.BaseTestCase):
 
     def setUp(self):
@@ -382,14 +452,160 @@ class TestBasicRouterOperations(base.BaseTestCase):
              'routes': [],
              'external_gateway_info': {}}]
         agent._process_routers(routers)
+        _process_queue(agent)
 
         agent.router_deleted(None, routers[0]['id'])
+        _process_queue(agent)
         # verify that remove is called
         self.assertEqual(self.mock_ip.get_devices.call_count, 1)
 
         self.device_exists.assert_has_calls(
             [mock.call(self.conf.external_network_bridge)])
 
+    def testRoutersUpdatedAreQueued(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        self.plugin_api.get_external_network_id.return_value = None
+        routers = [_router(), _router()]
+
+        agent.routers_updated(None, routers)
+        self.assertEqual({}, agent.router_info)
+        self.assertEqual(2, len(agent._queue))
+
+        _process_queue(agent)
+        self.assertEqual(set(r['id'] for r in routers),
+                         set(agent.router_info))
+
+    def testRoutersUpdatedBeforeSyncBacklog(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        self.plugin_api.get_external_network_id.return_value = None
+        synced = [_router() for i in range(3)]
+        updated = _router()
+        self.plugin_api.get_routers.return_value = synced
+
+        agent._sync_routers_task(agent.context)
+        self.assertFalse(agent.fullsync)
+        agent.routers_updated(None, [updated])
+
+        processed = []
+        with mock.patch.object(agent, 'process_router',
+                               side_effect=lambda ri:
+                               processed.append(ri.router_id)):
+            _process_queue(agent)
+        self.assertEqual(updated['id'], processed[0])
+        self.assertEqual(set(r['id'] for r in synced), set(processed[1:]))
+
+    def testSyncRemovesMissingRouters(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        self.plugin_api.get_external_network_id.return_value = None
+        kept, removed = _router(), _router()
+        agent._process_routers([kept, removed])
+        _process_queue(agent)
+
+        self.plugin_api.get_routers.return_value = [kept]
+        agent._sync_routers_task(agent.context)
+        _process_queue(agent)
+        self.assertEqual([kept['id']], agent.router_info.keys())
+
+    def testAdminStateDownCancelsQueuedRouter(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        self.plugin_api.get_external_network_id.return_value = None
+        router = _router()
+        agent._process_routers([router])
+        down = dict(router, admin_state_up=False)
+        agent._process_routers([down])
+
+        _process_queue(agent)
+        self.assertNotIn(router['id'], agent.router_info)
+
+    def testProcessingFailureTriggersFullSync(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        self.plugin_api.get_external_network_id.return_value = None
+        agent.fullsync = False
+        router = _router()
+        agent._process_routers([router])
+        with mock.patch.object(agent, 'process_router',
+                               side_effect=RuntimeError):
+            _process_queue(agent)
+        self.assertTrue(agent.fullsync)
+        self.assertNotIn(router['id'], agent._queue)
+
+    def testSyncSendsProcessedGenerations(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        self.plugin_api.get_external_network_id.return_value = None
+        processed, failed = (dict(_router(), generation=3),
+                             dict(_router(), generation=5))
+        agent._process_routers([processed])
+        _process_queue(agent)
+        agent._process_routers([failed])
+        with mock.patch.object(agent, 'process_router',
+                               side_effect=RuntimeError):
+            _process_queue(agent)
+
+        self.plugin_api.get_routers.return_value = []
+        agent._sync_routers_task(agent.context)
+        self.plugin_api.get_routers.assert_called_once_with(
+            agent.context, router_id=None,
+            generations={processed['id']: 3})
+
+    def testSyncKeepsUnchangedRouters(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        self.plugin_api.get_external_network_id.return_value = None
+        router = dict(_router(), generation=3)
+        agent._process_routers([router])
+        _process_queue(agent)
+
+        self.plugin_api.get_routers.return_value = [
+            {'id': router['id'], 'generation': 3,
+             l3_constants.ROUTER_UNCHANGED_KEY: True}]
+        agent._sync_routers_task(agent.context)
+        self.assertEqual(0, len(agent._queue))
+        self.assertEqual([router['id']], agent.router_info.keys())
+
+    def testSameGenerationIsNotProcessedAgain(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        self.plugin_api.get_external_network_id.return_value = None
+        router = dict(_router(), generation=3)
+        with mock.patch.object(agent, 'process_router') as process_router:
+            agent._process_routers([router])
+            _process_queue(agent)
+            agent._process_routers([router])
+            _process_queue(agent)
+            agent._process_routers([dict(router, generation=4)])
+            _process_queue(agent)
+        self.assertEqual(2, process_router.call_count)
+
+    def testSyncDoesNotRevertNewerRouter(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        self.plugin_api.get_external_network_id.return_value = None
+        router = dict(_router(), generation=3)
+        newer = dict(router, generation=4, routes=[{}])
+
+        def get_routers(*args, **kwargs):
+            # The newer router is notified and processed while the sync
+            # is reading the older one
+            agent._process_routers([newer])
+            _process_queue(agent)
+            return [router]
+
+        self.plugin_api.get_routers.side_effect = get_routers
+        with mock.patch.object(agent, 'process_router') as process_router:
+            agent._sync_routers_task(agent.context)
+            _process_queue(agent)
+        ri = agent.router_info[router['id']]
+        process_router.assert_called_once_with(ri)
+        self.assertEqual(newer, ri.router)
+        self.assertEqual(4, ri.generation)
+
+    def testAfterStartSpawnsWorkers(self):
+        self.conf.set_override('router_workers', 3)
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        with mock.patch.object(l3_agent.eventlet, 'GreenPool') as pool:
+            agent.after_start()
+        pool.assert_called_once_with(3)
+        self.assertEqual(
+            [mock.call(agent._process_routers_loop)] * 3,
+            pool.return_value.spawn_n.call_args_list)
+
     def testDestroyNamespace(self):
 
         class FakeDev(object):
@@ -297,6 +297,19 @@ class TestL3NatPlugin(db_base_plugin_v2.QuantumDbPluginV2,
             self._extend_network_dict_l3(context, net)
         return [self._fields(net, fields) for net in nets]
 
+    def update_subnet(self, context, id, subnet):
+        original_subnet = super(TestL3NatPlugin, self).get_subnet(context, id)
+        subnet = super(TestL3NatPlugin, self).update_subnet(context, id,
+                                                            subnet)
+        self.update_routers_for_subnet(context, original_subnet, subnet)
+        return subnet
+
+    def update_port(self, context, id, port):
+        original_port = super(TestL3NatPlugin, self).get_port(context, id)
+        port = super(TestL3NatPlugin, self).update_port(context, id, port)
+        self.update_router_for_port(context, original_port, port)
+        return port
+
     def delete_port(self, context, id, l3_port_check=True):
         if l3_port_check:
             self.prevent_l3_port_deletion(context, id)
@@ -1628,6 +1641,123 @@ class L3NatDBTestCase(L3NatTestCaseBase):
             self.assertTrue(floatingips[0]['fixed_ip_address'] is not None)
             self.assertTrue(floatingips[0]['router_id'] is not None)
 
+    def test_router_interface_add_bumps_generation(self):
+        with self.router() as r:
+            with self.subnet() as s:
+                router_id = r['router']['id']
+                plugin = TestL3NatPlugin()
+                ctx = context.get_admin_context()
+                generation = plugin.get_router(ctx, router_id)['generation']
+                self._router_interface_action('add', router_id,
+                                              s['subnet']['id'], None)
+                self.assertEqual(
+                    generation + 1,
+                    plugin.get_router(ctx, router_id)['generation'])
+                self._router_interface_action('remove', router_id,
+                                              s['subnet']['id'], None)
+
+    def test_subnet_gateway_update_bumps_router_generation(self):
+        allocation_pools = [{'start': '10.0.0.2', 'end': '10.0.0.200'}]
+        with self.router() as r:
+            with self.subnet(cidr='10.0.0.0/24',
+                             allocation_pools=allocation_pools) as s:
+                router_id = r['router']['id']
+                subnet_id = s['subnet']['id']
+                self._router_interface_action('add', router_id, subnet_id,
+                                              None)
+                plugin = QuantumManager.get_plugin()
+                ctx = context.get_admin_context()
+                generation = plugin.get_router(ctx, router_id)['generation']
+                self._update('subnets', subnet_id,
+                             {'subnet': {'gateway_ip': '10.0.0.254'}})
+                routers = plugin.get_sync_data(
+                    ctx, [router_id], generations={router_id: generation})
+                self.assertEqual(generation + 1, routers[0]['generation'])
+                self.assertNotIn(l3_constants.ROUTER_UNCHANGED_KEY,
+                                 routers[0])
+                self.assertEqual(
+                    '10.0.0.254',
+                    routers[0][l3_constants.INTERFACE_KEY][0]['subnet'][
+                        'gateway_ip'])
+                self._router_interface_action('remove', router_id,
+                                              subnet_id, None)
+
+    def test_gateway_port_fixed_ips_update_bumps_router_generation(self):
+        with self.router() as r:
+            with self.subnet(cidr='10.0.0.0/24') as s:
+                self._set_net_external(s['subnet']['network_id'])
+                router_id = r['router']['id']
+                self._add_external_gateway_to_router(
+                    router_id, s['subnet']['network_id'])
+                plugin = QuantumManager.get_plugin()
+                ctx = context.get_admin_context()
+                router = plugin.get_router(ctx, router_id)
+                gw_port_id = plugin._get_router(ctx, router_id).gw_port_id
+                self._update('ports', gw_port_id,
+                             {'port': {'fixed_ips': [
+                                 {'subnet_id': s['subnet']['id'],
+                                  'ip_address': '10.0.0.100'}]}},
+                             quantum_context=ctx)
+                self.assertEqual(
+                    router['generation'] + 1,
+                    plugin.get_router(ctx, router_id)['generation'])
+                self._remove_external_gateway_from_router(
+                    router_id, s['subnet']['network_id'])
+
+    def test_l3_agent_routers_query_unchanged_generations(self):
+        with contextlib.nested(self.router(),
+                               self.router()) as (r1, r2):
+            plugin = TestL3NatPlugin()
+            ctx = context.get_admin_context()
+            r1_id, r2_id = r1['router']['id'], r2['router']['id']
+            generation = plugin.get_router(ctx, r1_id)['generation']
+            generations = {r1_id: generation, r2_id: generation - 1}
+            routers = dict((router['id'], router) for router in
+                           plugin.get_sync_data(ctx, None,
+                                                generations=generations))
+            self.assertEqual({'id': r1_id,
+                              'generation': generation,
+                              l3_constants.ROUTER_UNCHANGED_KEY: True},
+                             routers[r1_id])
+            self.assertEqual(r2['router']['name'], routers[r2_id]['name'])
+            self.assertNotIn(l3_constants.ROUTER_UNCHANGED_KEY,
+                             routers[r2_id])
+
+    def test_l3_agent_routers_query_statement_count(self):
+        def statement_count():
+            plugin = TestL3NatPlugin()
+            with testlib_api.SqlStatementCounter() as counter:
+                plugin.get_sync_data(context.get_admin_context(), None)
+            return counter.count
+
+        with self.subnet() as ext:
+            self._set_net_external(ext['subnet']['network_id'])
+            with self.router() as r1:
+                self._add_external_gateway_to_router(
+                    r1['router']['id'], ext['subnet']['network_id'])
+                with self.subnet(cidr='10.0.1.0/24') as s1:
+                    self._router_interface_action('add', r1['router']['id'],
+                                                  s1['subnet']['id'], None)
+                    count = statement_count()
+                    with self.router() as r2:
+                        self._add_external_gateway_to_router(
+                            r2['router']['id'], ext['subnet']['network_id'])
+                        with self.subnet(cidr='10.0.2.0/24') as s2:
+                            self._router_interface_action(
+                                'add', r2['router']['id'],
+                                s2['subnet']['id'], None)
+                            self.assertEqual(count, statement_count())
+                            self._router_interface_action(
+                                'remove', r2['router']['id'],
+                                s2['subnet']['id'], None)
+                        self._remove_external_gateway_from_router(
+                            r2['router']['id'], ext['subnet']['network_id'])
+                    self._router_interface_action('remove',
+                                                  r1['router']['id'],
+                                                  s1['subnet']['id'], None)
+                self._remove_external_gateway_from_router(
+                    r1['router']['id'], ext['subnet']['network_id'])
+
     def test_router_delete_subnet_inuse_returns_409(self):
         with self.router() as r:
             with self.subnet() as s:
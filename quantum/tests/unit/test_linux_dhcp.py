@@ -18,6 +18,7 @@
 import os
 import socket
 
+import fixtures
 import mock
 from oslo.config import cfg
 
@@ -555,6 +556,48 @@ tag:tag1,option:classless-static-route,%s,%s""".lstrip() % (fake_v6,
                                     mock.call(exp_opt_name, exp_opt_data)])
         self.execute.assert_called_once_with(exp_args, 'sudo')
 
+    def test_reload_allocations_unchanged(self):
+        dm = dhcp.Dnsmasq(self.conf, FakeDualNetwork(), namespace='qdhcp-ns')
+        attrs_to_mock = dict(
+            [(a, mock.DEFAULT) for a in
+             ['_replace_conf_file', '_make_subnet_interface_ip_map']])
+        with mock.patch.multiple(dm, **attrs_to_mock) as mocks:
+            mocks['_replace_conf_file'].return_value = False
+            mocks['_make_subnet_interface_ip_map'].return_value = {}
+            dm.reload_allocations()
+            self.assertEqual(2, mocks['_replace_conf_file'].call_count)
+        self.assertFalse(self.execute.called)
+
+    def test_replace_conf_file(self):
+        conf_dir = self.useFixture(fixtures.TempDir()).path
+        dm = dhcp.Dnsmasq(self.conf, FakeDualNetwork())
+        name = os.path.join(conf_dir, 'host')
+        with mock.patch.object(dm, 'get_conf_file_name') as conf_fn:
+            conf_fn.return_value = name
+            self.assertTrue(dm._replace_conf_file('host', 'data'))
+            self.safe.assert_called_once_with(name, 'data')
+
+            with open(name, 'w') as f:
+                f.write('data')
+            self.assertFalse(dm._replace_conf_file('host', 'data'))
+            self.assertTrue(dm._replace_conf_file('host', 'other data'))
+            self.assertEqual(2, self.safe.call_count)
+
+    def test_host_entries_rendered_once_per_port(self):
+        port = FakePort3()
+        dm = dhcp.Dnsmasq(self.conf, FakeDualNetwork())
+        entries = dm._host_entries(port)
+        self.assertEqual(
+            '00:00:0f:aa:bb:cc,192-168-0-3.openstacklocal,192.168.0.3\n'
+            '00:00:0f:aa:bb:cc,fdca-3ba5-a17a-4ba3--3.openstacklocal,'
+            'fdca:3ba5:a17a:4ba3::3\n', entries)
+        with mock.patch.object(dhcp, '_HOSTNAME_SEPARATORS') as separators:
+            self.assertEqual(entries, dm._host_entries(port))
+            self.assertFalse(separators.sub.called)
+
+        self.conf.set_override('dhcp_domain', 'example.org')
+        self.assertIn('192-168-0-3.example.org', dm._host_entries(port))
+
     def test_make_subnet_interface_ip_map(self):
         with mock.patch('quantum.agent.linux.ip_lib.IPDevice') as ip_dev:
             ip_dev.return_value.addr.list.return_value = [
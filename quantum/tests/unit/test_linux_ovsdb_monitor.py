@@ -0,0 +1,87 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import StringIO
+
+import eventlet
+import mock
+
+from quantum.agent.linux import ovsdb_monitor
+from quantum.tests import base
+
+
+HEADINGS = '"headings":["row","action","name","external_ids","ofport"]'
+INITIAL = ('{"data":[["uuid-1","initial","tap1",["map",[["attached-mac",'
+           '"fa:16:3e:00:00:01"],["iface-id","port-1"]]],1],["uuid-2",'
+           '"initial","br-int",["map",[]],65534]],%s}' % HEADINGS)
+INSERT = ('{"data":[["uuid-3","insert","tap3",["map",[]],["set",[]]]],'
+          '%s}' % HEADINGS)
+MODIFY = ('{"data":[["uuid-3","old",null,["map",[]],["set",[]]],["uuid-3",'
+          '"new","tap3",["map",[["attached-mac","fa:16:3e:00:00:03"],'
+          '["iface-id","port-3"]]],3]],%s}' % HEADINGS)
+DELETE = ('{"data":[["uuid-1","delete","tap1",["map",[["attached-mac",'
+          '"fa:16:3e:00:00:01"],["iface-id","port-1"]]],1]],%s}' % HEADINGS)
+
+
+class TestOvsdbMonitor(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestOvsdbMonitor, self).setUp()
+        self.popen = mock.Mock()
+        self.monitor = ovsdb_monitor.OvsdbMonitor('sudo', _popen=self.popen)
+
+    def test_process_updates(self):
+        self.monitor.process_update(INITIAL)
+        self.assertEqual(self.monitor.get_interfaces(),
+                         {'tap1': {'attached-mac': 'fa:16:3e:00:00:01',
+                                   'iface-id': 'port-1'},
+                          'br-int': {}})
+        self.monitor.process_update(INSERT)
+        self.assertEqual(self.monitor.interfaces['uuid-3']['ofport'], [])
+        self.monitor.process_update(MODIFY)
+        self.assertEqual(self.monitor.interfaces['uuid-3'],
+                         {'name': 'tap3', 'ofport': 3,
+                          'external_ids': {'attached-mac': 'fa:16:3e:00:00:03',
+                                           'iface-id': 'port-3'}})
+        self.monitor.process_update(DELETE)
+        self.assertEqual(sorted(self.monitor.get_interfaces()),
+                         ['br-int', 'tap3'])
+
+    def test_has_updates(self):
+        self.assertFalse(self.monitor.has_updates())
+        self.monitor.process_update(INSERT)
+        self.assertTrue(self.monitor.has_updates())
+        self.assertFalse(self.monitor.has_updates())
+
+    def test_start_reads_updates_until_exit(self):
+        self.popen.return_value.stdout = StringIO.StringIO(
+            '\n'.join([INITIAL, 'garbage', INSERT, '']))
+        self.assertTrue(self.monitor.start())
+        self.popen.assert_called_once_with(
+            ['sudo', 'ovsdb-client', 'monitor', 'Interface',
+             'name,external_ids,ofport', '--format=json'],
+            shell=False, stdout=mock.ANY)
+        self.monitor.wait_for_update(1)
+        eventlet.sleep(0)
+        self.assertTrue(self.monitor.has_updates())
+        self.assertEqual(sorted(self.monitor.get_interfaces()),
+                         ['br-int', 'tap1', 'tap3'])
+        self.assertFalse(self.monitor.is_active())
+
+    def test_start_fails(self):
+        self.popen.side_effect = OSError()
+        self.assertFalse(self.monitor.start())
+        self.assertFalse(self.monitor.is_active())
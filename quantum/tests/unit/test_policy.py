@@ -15,6 +15,7 @@
 
 """Test of Policy Engine For Quantum"""
 
+from contextlib import nested
 import StringIO
 import urllib2
 
@@ -300,3 +301,65 @@ class QuantumPolicyTestCase(base.BaseTestCase):
             target = {'network_id': 'whatever'}
             result = policy.enforce(self.context, action, target, self.plugin)
             self.assertTrue(result)
+
+    def test_filter_allowed(self):
+        targets = [{'tenant_id': 'fake', 'shared': False},
+                   {'tenant_id': 'somebody_else', 'shared': False},
+                   {'tenant_id': 'somebody_else', 'shared': True}]
+        result = policy.filter_allowed(self.context, 'get_network', targets)
+        self.assertEqual(result, [targets[0], targets[2]])
+
+    def test_filter_allowed_fetches_parents_once(self):
+        self.rules['get_port'] = common_policy.parse_rule(
+            "rule:admin_or_network_owner")
+        targets = [{'network_id': 'net1'},
+                   {'network_id': 'net1'},
+                   {'network_id': 'net2'}]
+        with nested(
+            mock.patch.object(self.plugin, 'get_networks',
+                              return_value=[{'id': 'net1',
+                                             'tenant_id': 'fake'}]),
+            mock.patch.object(self.plugin, 'get_network',
+                              return_value={'tenant_id': 'somebody_else'})
+        ) as (get_networks, get_network):
+            result = policy.filter_allowed(self.context, 'get_port',
+                                           targets, self.plugin)
+        self.assertEqual(result, targets[:2])
+        get_networks.assert_called_once_with(
+            self.context, filters={'id': mock.ANY},
+            fields=['id', 'tenant_id'])
+        self.assertEqual(sorted(get_networks.call_args[1]['filters']['id']),
+                         ['net1', 'net2'])
+        # net2 was not returned, e.g. because it is not visible
+        get_network.assert_called_once_with(self.context, 'net2',
+                                            fields=['tenant_id'])
+
+    def test_match_rule_compiled_once(self):
+        policy.init()
+        match_rule = policy._get_match_rule('get_network', {})
+        self.assertFalse(isinstance(match_rule, common_policy.RuleCheck))
+        self.assertIs(policy._get_match_rule('get_network', {}), match_rule)
+        # the compiled rules are dropped once other rules are loaded
+        policy.init()
+        self.assertIsNot(policy._get_match_rule('get_network', {}),
+                         match_rule)
+
+    def test_compile_rule(self):
+        rules = common_policy.Rules(self.rules, 'default')
+        compiled = policy._compile_rule(
+            common_policy.parse_rule("rule:admin_only or rule:noexist"),
+            rules)
+        self.assertEqual(str(compiled), "(role:admin or @)")
+        rules = common_policy.Rules(self.rules)
+        compiled = policy._compile_rule(
+            common_policy.parse_rule("rule:admin_only or rule:noexist"),
+            rules)
+        self.assertEqual(str(compiled), "(role:admin or !)")
+
+    def test_compile_recursive_rule(self):
+        self.rules['recursive'] = common_policy.parse_rule(
+            "role:admin or rule:recursive")
+        rules = common_policy.Rules(self.rules)
+        compiled = policy._compile_rule(
+            common_policy.RuleCheck('rule', 'recursive'), rules)
+        self.assertEqual(str(compiled), "(role:admin or rule:recursive)")
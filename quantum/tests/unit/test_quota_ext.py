@@ -9,10 +9,14 @@ from quantum.common import config
 from quantum.common import exceptions
 from quantum import context
 from quantum.db import api as db
+from quantum.db import models_v2
+from quantum.db import quota_db
 from quantum import manager
 from quantum.plugins.linuxbridge.db import l2network_db_v2
 from quantum import quota
+from quantum import service
 from quantum.tests.unit import test_api_v2
+from quantum.tests.unit import test_db_plugin
 from quantum.tests.unit import test_extensions
 from quantum.tests.unit import testlib_api
 
@@ -341,3 +345,119 @@ class QuotaExtensionCfgTestCase(QuotaExtensionTestCase):
 
 class QuotaExtensionCfgTestCaseXML(QuotaExtensionCfgTestCase):
     fmt = 'xml'
+
+
+class UsageTrackingQuotaDriverTestCase(
+        test_db_plugin.QuantumDbPluginV2TestCase):
+
+    def setUp(self):
+        super(UsageTrackingQuotaDriverTestCase, self).setUp()
+        cfg.CONF.set_override(
+            'quota_driver',
+            'quantum.db.quota_db.UsageTrackingQuotaDriver',
+            group='QUOTAS')
+        cfg.CONF.set_override('quota_usage_resync_interval', 0,
+                              group='QUOTAS')
+        saved_quotas = quota.QUOTAS
+        self.addCleanup(setattr, quota, 'QUOTAS', saved_quotas)
+        quota.QUOTAS = quota.QuotaEngine()
+        quota.register_resources_from_config()
+        self.context = context.get_admin_context()
+        self.plugin = manager.QuantumManager.get_plugin()
+
+    def _usage(self, resource):
+        usage = self.context.session.query(quota_db.QuotaUsage).filter_by(
+            tenant_id=self._tenant_id, resource=resource).first()
+        return usage and usage.in_use
+
+    def _count(self, resource):
+        return quota.QUOTAS.count(self.context, resource, self.plugin,
+                                  resource + 's', self._tenant_id)
+
+    def test_usage_counted_once(self):
+        self.assertIsNone(self._usage('network'))
+        with self.network():
+            self.assertEqual(1, self._usage('network'))
+            with mock.patch.object(self.plugin, 'get_networks_count') as get:
+                self.assertEqual(1, self._count('network'))
+                self.assertFalse(get.called)
+
+    def test_usage_follows_creates_and_deletes(self):
+        self.assertEqual(0, self._count('network'))
+        self.assertEqual(0, self._count('subnet'))
+        self.assertEqual(0, self._count('port'))
+        with self.subnet() as subnet:
+            with self.port(subnet=subnet):
+                self.assertEqual(1, self._usage('network'))
+                self.assertEqual(1, self._usage('subnet'))
+                self.assertEqual(1, self._usage('port'))
+            self.assertEqual(0, self._usage('port'))
+        self.assertEqual(0, self._usage('network'))
+        self.assertEqual(0, self._usage('subnet'))
+
+    def test_usage_follows_subnets_deleted_with_network(self):
+        with self.network(do_delete=False) as network:
+            with self.subnet(network=network, do_delete=False):
+                self.assertEqual(1, self._count('subnet'))
+        self._delete('networks', network['network']['id'])
+        self.assertEqual(0, self._usage('network'))
+        self.assertEqual(0, self._usage('subnet'))
+
+    def test_usage_unchanged_by_rolled_back_create(self):
+        self.assertEqual(0, self._count('network'))
+        session = self.context.session
+        try:
+            with session.begin():
+                session.add(models_v2.Network(tenant_id=self._tenant_id,
+                                              name='net1'))
+                session.flush()
+                self.assertEqual(1, self._usage('network'))
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertEqual(0, self._usage('network'))
+
+    def test_create_over_quota_with_usage(self):
+        cfg.CONF.set_override('quota_network', 2, group='QUOTAS')
+        with self.network():
+            res = self._create_network_bulk(self.fmt, 2, 'test', True)
+            self.assertEqual(409, res.status_int)
+            res = self._create_network(self.fmt, 'net2', True)
+            self.assertEqual(201, res.status_int)
+            res = self._create_network(self.fmt, 'net3', True)
+            self.assertEqual(409, res.status_int)
+
+    def test_resync_usages(self):
+        with self.network():
+            self.assertEqual(1, self._count('network'))
+            self.context.session.query(quota_db.QuotaUsage).update(
+                {'in_use': 5})
+            quota_db.UsageTrackingQuotaDriver.resync_usages(self.context)
+            self.assertEqual(1, self._usage('network'))
+
+    def test_resync_loop_started_by_api_service(self):
+        cfg.CONF.set_override('quota_usage_resync_interval', 60,
+                              group='QUOTAS')
+        api_service = service.QuantumApiService('quantum')
+        with mock.patch.object(service.WsgiService, 'start'):
+            with mock.patch.object(service.loopingcall,
+                                   'LoopingCall') as looping_call:
+                api_service.start()
+                self._count('network')
+                self._count('port')
+        looping_call.assert_called_once_with(
+            api_service._resync_quota_usages)
+        looping_call.return_value.start.assert_called_once_with(
+            interval=60, initial_delay=60)
+        self.assertEqual([looping_call.return_value], api_service.timers)
+
+    def test_resync_loop_survives_errors(self):
+        with mock.patch.object(quota.QUOTAS._driver, 'resync_usages',
+                               side_effect=ValueError) as resync:
+            service.QuantumApiService._resync_quota_usages()
+        self.assertTrue(resync.called)
+
+    def test_untracked_resource_counted_by_plugin(self):
+        quota.QUOTAS.register_resource_by_name('extra1')
+        self.plugin.get_extra1s_count = mock.Mock(return_value=3)
+        self.assertEqual(3, self._count('extra1'))
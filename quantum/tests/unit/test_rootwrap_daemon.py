@@ -0,0 +1,104 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import eventlet
+import fixtures
+import mock
+from oslo.config import cfg
+
+from quantum.agent.common import config
+from quantum.agent.linux import utils
+from quantum.rootwrap import daemon
+from quantum.rootwrap import filters
+from quantum.tests import base
+
+
+class RootwrapDaemonTestCase(base.BaseTestCase):
+    def setUp(self):
+        super(RootwrapDaemonTestCase, self).setUp()
+        self.daemon = daemon.RootwrapDaemon([
+            filters.CommandFilter("/bin/cat", "root"),
+            filters.CommandFilter("/nonexistent/foo", "root")])
+
+    def test_run_command(self):
+        self.assertEqual(self.daemon.run_command(['cat'], 'hello\n'),
+                         (0, 'hello\n', ''))
+
+    def test_run_command_unauthorized(self):
+        returncode, stdout, stderr = self.daemon.run_command(['ls', '/'])
+        self.assertEqual(returncode, daemon.RC_UNAUTHORIZED)
+        self.assertEqual(stdout, '')
+
+    def test_run_command_missing_executable(self):
+        returncode, stdout, stderr = self.daemon.run_command(['foo'])
+        self.assertEqual(returncode, daemon.RC_NOEXECFOUND)
+
+    def test_client_round_trip(self):
+        socket_dir = self.useFixture(fixtures.TempDir()).path
+        server, socket_path = daemon.listen(socket_dir)
+        self.addCleanup(server.close)
+        server_thread = eventlet.spawn(self.daemon.serve, server)
+        self.addCleanup(server_thread.kill)
+
+        process = mock.Mock()
+        process.poll.return_value = None
+        process.stdout.readline.return_value = socket_path + '\n'
+        popen = mock.Mock(return_value=process)
+        client = daemon.RootwrapClient('sudo daemon conf', _popen=popen)
+
+        self.assertEqual(client.execute(['cat'], '\xff\x00data'),
+                         (0, '\xff\x00data', ''))
+        self.assertEqual(client.execute(['ls', '/'])[0],
+                         daemon.RC_UNAUTHORIZED)
+        # the daemon is only started once
+        popen.assert_called_once_with(['sudo', 'daemon', 'conf'],
+                                      stdin=mock.ANY, stdout=mock.ANY)
+
+    def test_client_fails_when_daemon_does_not_start(self):
+        process = mock.Mock()
+        process.stdout.readline.return_value = ''
+        client = daemon.RootwrapClient('sudo daemon conf',
+                                       _popen=mock.Mock(return_value=process))
+        self.assertRaises(RuntimeError, client.execute, ['cat'])
+
+
+class ExecuteWithRootwrapDaemonTestCase(base.BaseTestCase):
+    def setUp(self):
+        super(ExecuteWithRootwrapDaemonTestCase, self).setUp()
+        config.register_root_helper(cfg.CONF)
+        self.addCleanup(cfg.CONF.reset)
+        cfg.CONF.set_override('root_helper_daemon', 'sudo daemon conf',
+                              group='AGENT')
+        client_p = mock.patch.object(daemon, 'RootwrapClient')
+        self.client = client_p.start().return_value
+        self.addCleanup(client_p.stop)
+        self.addCleanup(utils._rootwrap_clients.clear)
+
+    def test_execute_uses_daemon(self):
+        self.client.execute.return_value = (0, 'out', '')
+        self.assertEqual(utils.execute(['ip', 'link'], 'sudo', 'input'),
+                         'out')
+        self.client.execute.assert_called_once_with(['ip', 'link'], 'input')
+
+    def test_execute_raises_on_daemon_failure(self):
+        self.client.execute.return_value = (1, '', 'error')
+        self.assertRaises(RuntimeError, utils.execute, ['ip', 'link'],
+                          'sudo')
+
+    def test_execute_without_root_helper_forks(self):
+        self.assertEqual(utils.execute(['echo', 'hello']), 'hello\n')
+        self.assertFalse(self.client.execute.called)
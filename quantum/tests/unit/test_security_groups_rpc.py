@@ -29,6 +29,7 @@ from quantum.agent import securitygroups_rpc as sg_rpc
 from quantum import context
 from quantum.db import securitygroups_rpc_base as sg_db_rpc
 from quantum.extensions import securitygroup as ext_sg
+from quantum.openstack.common.rpc import common as rpc_common
 from quantum.openstack.common.rpc import proxy
 from quantum.tests import base
 from quantum.tests.unit import test_extension_security_group as test_sg
@@ -103,6 +104,42 @@ class SGServerRpcCallBackMixinTestCase(test_sg.SecurityGroupDBTestCase):
                                  expected)
                 self._delete('ports', port_id1)
 
+    def test_security_group_rules_for_devices_cached(self):
+        cfg.CONF.set_override('security_group_cache_ttl', 60)
+        with self.network() as n:
+            with nested(self.subnet(n),
+                        self.security_group()) as (subnet_v4, sg1):
+                sg1_id = sg1['security_group']['id']
+                res1 = self._create_port(
+                    self.fmt, n['network']['id'],
+                    security_groups=[sg1_id])
+                port = self.deserialize(self.fmt, res1)['port']
+                port_id1 = port['id']
+                ctx = context.get_admin_context()
+                self.rpc.devices = {port_id1: dict(port)}
+                ports_rpc = self.rpc.security_group_rules_for_devices(
+                    ctx, devices=[port_id1])
+                expected = ports_rpc[port_id1]['security_group_rules']
+
+                self.rpc.devices = {port_id1: dict(port)}
+                with mock.patch.object(
+                        self.rpc, '_select_rules_for_security_groups') as sel:
+                    ports_rpc = self.rpc.security_group_rules_for_devices(
+                        ctx, devices=[port_id1])
+                self.assertFalse(sel.called)
+                self.assertEqual(ports_rpc[port_id1]['security_group_rules'],
+                                 expected)
+
+                sg_db_rpc.SG_CACHE.invalidate(sg_db_rpc.RULES, [sg1_id])
+                self.rpc.devices = {port_id1: dict(port)}
+                with mock.patch.object(
+                        self.rpc, '_select_rules_for_security_groups',
+                        return_value={sg1_id: []}) as sel:
+                    self.rpc.security_group_rules_for_devices(
+                        ctx, devices=[port_id1])
+                sel.assert_called_once_with(ctx, [sg1_id])
+                self._delete('ports', port_id1)
+
     def test_security_group_rules_for_devices_ipv4_egress(self):
         fake_prefix = test_fw.FAKE_PREFIX['IPv4']
         with self.network() as n:
@@ -208,8 +245,63 @@ class SGServerRpcCallBackMixinTestCase(test_sg.SecurityGroupDBTestCase):
                              'remote_group_id': sg2_id,
                              'security_group_id': sg1_id},
                             ]
+                # rules follow the undefined order of the port's groups
+                self.assertEqual(sorted(port_rpc['security_group_rules']),
+                                 sorted(expected))
+                self._delete('ports', port_id1)
+                self._delete('ports', port_id2)
+
+    def test_security_group_info_for_devices_source_group(self):
+        with self.network() as n:
+            with nested(self.subnet(n),
+                        self.security_group(),
+                        self.security_group()) as (subnet_v4,
+                                                   sg1,
+                                                   sg2):
+                sg1_id = sg1['security_group']['id']
+                sg2_id = sg2['security_group']['id']
+                rule1 = self._build_security_group_rule(
+                    sg1_id,
+                    'ingress', 'tcp', '24',
+                    '25', remote_group_id=sg2_id)
+                rules = {
+                    'security_group_rules': [rule1['security_group_rule']]}
+                res = self._create_security_group_rule(self.fmt, rules)
+                self.deserialize(self.fmt, res)
+                self.assertEqual(res.status_int, 201)
+
+                res1 = self._create_port(
+                    self.fmt, n['network']['id'],
+                    security_groups=[sg1_id])
+                ports_rest1 = self.deserialize(self.fmt, res1)
+                port_id1 = ports_rest1['port']['id']
+                self.rpc.devices = {port_id1: ports_rest1['port']}
+
+                res2 = self._create_port(
+                    self.fmt, n['network']['id'],
+                    security_groups=[sg2_id])
+                ports_rest2 = self.deserialize(self.fmt, res2)
+                port_id2 = ports_rest2['port']['id']
+                port_ip2 = ports_rest2['port']['fixed_ips'][0]['ip_address']
+                ctx = context.get_admin_context()
+                info = self.rpc.security_group_info_for_devices(
+                    ctx, devices=[port_id1])
+                port_rpc = info['devices'][port_id1]
+                expected = [{'direction': 'egress', 'ethertype': 'IPv4',
+                             'security_group_id': sg1_id},
+                            {'direction': 'egress', 'ethertype': 'IPv6',
+                             'security_group_id': sg1_id},
+                            {'direction': u'ingress',
+                             'protocol': u'tcp', 'ethertype': u'IPv4',
+                             'port_range_max': 25, 'port_range_min': 24,
+                             'remote_group_id': sg2_id,
+                             'security_group_id': sg1_id},
+                            ]
                 self.assertEqual(port_rpc['security_group_rules'],
                                  expected)
+                self.assertEqual(port_rpc['security_group_source_groups'],
+                                 [sg2_id])
+                self.assertEqual(info['sg_member_ips'], {sg2_id: [port_ip2]})
                 self._delete('ports', port_id1)
                 self._delete('ports', port_id2)
 
@@ -388,8 +480,9 @@ class SGServerRpcCallBackMixinTestCase(test_sg.SecurityGroupDBTestCase):
                              'remote_group_id': sg2_id,
                              'security_group_id': sg1_id},
                             ]
-                self.assertEqual(port_rpc['security_group_rules'],
-                                 expected)
+                # rules follow the undefined order of the port's groups
+                self.assertEqual(sorted(port_rpc['security_group_rules']),
+                                 sorted(expected))
                 self._delete('ports', port_id1)
                 self._delete('ports', port_id2)
 
@@ -398,6 +491,62 @@ class SGServerRpcCallBackMixinTestCaseXML(SGServerRpcCallBackMixinTestCase):
     fmt = 'xml'
 
 
+class SecurityGroupRpcCacheTestCase(base.BaseTestCase):
+    def setUp(self):
+        super(SecurityGroupRpcCacheTestCase, self).setUp()
+        self.addCleanup(cfg.CONF.reset)
+        cfg.CONF.set_override('security_group_cache_ttl', 60)
+        self.cache = sg_db_rpc.SecurityGroupRpcCache()
+
+    def _set(self, kind, values):
+        self.cache.set(kind, values, self.cache.generation)
+
+    def test_get_returns_cached_keys(self):
+        self._set(sg_db_rpc.RULES, {'sg1': [], 'sg2': [{}]})
+        self.assertEqual(self.cache.get(sg_db_rpc.RULES, ['sg1', 'sg3']),
+                         {'sg1': []})
+        self.assertEqual(self.cache.get(sg_db_rpc.MEMBER_IPS, ['sg1']), {})
+
+    def test_entries_expire(self):
+        with mock.patch('time.time', return_value=1000):
+            self._set(sg_db_rpc.RULES, {'sg1': []})
+        with mock.patch('time.time', return_value=1059):
+            self.assertTrue(self.cache.get(sg_db_rpc.RULES, ['sg1']))
+        with mock.patch('time.time', return_value=1060):
+            self.assertFalse(self.cache.get(sg_db_rpc.RULES, ['sg1']))
+
+    def test_zero_ttl_disables_cache(self):
+        cfg.CONF.set_override('security_group_cache_ttl', 0)
+        self._set(sg_db_rpc.RULES, {'sg1': []})
+        self.assertFalse(self.cache.get(sg_db_rpc.RULES, ['sg1']))
+
+    def test_api_workers_disable_cache(self):
+        cfg.CONF.set_override('api_workers', 2)
+        self._set(sg_db_rpc.RULES, {'sg1': []})
+        self.assertFalse(self.cache.get(sg_db_rpc.RULES, ['sg1']))
+
+    def test_invalidate_keys(self):
+        self._set(sg_db_rpc.RULES, {'sg1': [], 'sg2': []})
+        self._set(sg_db_rpc.MEMBER_IPS, {'sg1': []})
+        self.cache.invalidate(sg_db_rpc.RULES, ['sg1'])
+        self.assertEqual(self.cache.get(sg_db_rpc.RULES, ['sg1', 'sg2']),
+                         {'sg2': []})
+        self.assertTrue(self.cache.get(sg_db_rpc.MEMBER_IPS, ['sg1']))
+
+    def test_invalidate_kind(self):
+        self._set(sg_db_rpc.RULES, {'sg1': [], 'sg2': []})
+        self._set(sg_db_rpc.MEMBER_IPS, {'sg1': []})
+        self.cache.invalidate(sg_db_rpc.RULES)
+        self.assertFalse(self.cache.get(sg_db_rpc.RULES, ['sg1', 'sg2']))
+        self.assertTrue(self.cache.get(sg_db_rpc.MEMBER_IPS, ['sg1']))
+
+    def test_values_read_before_invalidation_are_not_cached(self):
+        generation = self.cache.generation
+        self.cache.invalidate(sg_db_rpc.RULES, ['sg1'])
+        self.cache.set(sg_db_rpc.RULES, {'sg1': []}, generation)
+        self.assertFalse(self.cache.get(sg_db_rpc.RULES, ['sg1']))
+
+
 class SGAgentRpcCallBackMixinTestCase(base.BaseTestCase):
     def setUp(self):
         super(SGAgentRpcCallBackMixinTestCase, self).setUp()
@@ -502,6 +651,71 @@ class SecurityGroupAgentRpcTestCase(base.BaseTestCase):
         self.firewall.assert_has_calls(calls)
 
 
+class SecurityGroupAgentRpcIpsetTestCase(SecurityGroupAgentRpcTestCase):
+    def setUp(self):
+        super(SecurityGroupAgentRpcIpsetTestCase, self).setUp()
+        self.agent.sg_info_rpc = True
+        rpc = self.agent.plugin_rpc
+        rpc.security_group_info_for_devices.return_value = {
+            'devices': rpc.security_group_rules_for_devices.return_value,
+            'sg_member_ips': {'fake_sgid2': ['10.0.0.2']}}
+
+    def test_prepare_and_remove_devices_filter(self):
+        self.agent.prepare_devices_filter(['fake_device'])
+        self.agent.remove_devices_filter(['fake_device'])
+        members = call.update_security_group_members('fake_sgid2',
+                                                     ['10.0.0.2'])
+        self.firewall.assert_has_calls([members,
+                                        call.defer_apply(),
+                                        call.prepare_port_filter(
+                                            self.fake_device),
+                                        call.defer_apply(),
+                                        call.remove_port_filter(
+                                            self.fake_device),
+                                        ])
+        self.assertFalse(
+            self.agent.plugin_rpc.security_group_rules_for_devices.called)
+
+    def test_security_groups_member_updated(self):
+        self.agent.refresh_firewall = mock.Mock()
+        self.agent.prepare_devices_filter(['fake_port_id'])
+        self.firewall.reset_mock()
+        self.agent.security_groups_member_updated(['fake_sgid2'])
+        self.assertFalse(self.agent.refresh_firewall.called)
+        self.assertEqual(self.firewall.mock_calls,
+                         [call.update_security_group_members(
+                             'fake_sgid2', ['10.0.0.2'])])
+
+    def test_refresh_firewall(self):
+        self.agent.prepare_devices_filter(['fake_port_id'])
+        self.agent.refresh_firewall()
+        calls = [call.update_security_group_members('fake_sgid2',
+                                                    ['10.0.0.2']),
+                 call.defer_apply(),
+                 call.prepare_port_filter(self.fake_device),
+                 call.update_security_group_members('fake_sgid2',
+                                                    ['10.0.0.2']),
+                 call.defer_apply(),
+                 call.update_port_filter(self.fake_device)]
+        self.firewall.assert_has_calls(calls)
+
+    def test_prepare_devices_filter_unsupported_rpc(self):
+        rpc = self.agent.plugin_rpc
+        rpc.security_group_info_for_devices.side_effect = (
+            rpc_common.RemoteError('UnsupportedRpcVersion'))
+        self.agent.prepare_devices_filter(['fake_device'])
+        self.agent.security_groups_member_updated(['fake_sgid2'])
+        self.assertFalse(self.agent.sg_info_rpc)
+        self.assertEqual(rpc.security_group_info_for_devices.call_count, 1)
+        self.firewall.assert_has_calls([call.defer_apply(),
+                                        call.prepare_port_filter(
+                                            self.fake_device),
+                                        call.defer_apply(),
+                                        call.update_port_filter(
+                                            self.fake_device)])
+        self.assertFalse(self.firewall.update_security_group_members.called)
+
+
 class FakeSGRpcApi(agent_rpc.PluginApi,
                    sg_rpc.SecurityGroupServerRpcApiMixin):
     pass
@@ -524,6 +738,17 @@ class SecurityGroupServerRpcApiTestCase(base.BaseTestCase):
              version=sg_rpc.SG_RPC_VERSION,
              topic='fake_topic')])
 
+    def test_security_group_info_for_devices(self):
+        self.rpc.security_group_info_for_devices(None, ['fake_device'])
+        self.rpc.call.assert_has_calls(
+            [call(None,
+             {'args':
+                 {'devices': ['fake_device']},
+             'method':
+                 'security_group_info_for_devices'},
+             version=sg_rpc.SG_INFO_RPC_VERSION,
+             topic='fake_topic')])
+
 
 class FakeSGNotifierAPI(proxy.RpcProxy,
                         sg_rpc.SecurityGroupAgentRpcApiMixin):
@@ -1205,6 +1430,51 @@ class SGNotificationTestMixin():
                          call.security_groups_member_updated(
                              mock.ANY, [security_group_id])])
 
+    def _cache_entry(self, kind, key):
+        cfg.CONF.set_override('security_group_cache_ttl', 60)
+        sg_db_rpc.SG_CACHE.set(kind, {key: []}, sg_db_rpc.SG_CACHE.generation)
+
+    def _is_cached(self, kind, key):
+        return key in sg_db_rpc.SG_CACHE.get(kind, [key])
+
+    def test_security_group_rule_updated_invalidates_cache(self):
+        with self.security_group() as sg:
+            security_group_id = sg['security_group']['id']
+            self._cache_entry(sg_db_rpc.RULES, security_group_id)
+            with self.security_group_rule(security_group_id):
+                self.assertFalse(self._is_cached(sg_db_rpc.RULES,
+                                                 security_group_id))
+                self._cache_entry(sg_db_rpc.RULES, security_group_id)
+            self.assertFalse(self._is_cached(sg_db_rpc.RULES,
+                                             security_group_id))
+
+    def test_security_group_member_updated_invalidates_cache(self):
+        with self.network() as n:
+            with self.subnet(n):
+                with nested(self.security_group(),
+                            self.security_group()) as (sg1, sg2):
+                    sg1_id = sg1['security_group']['id']
+                    sg2_id = sg2['security_group']['id']
+                    self._cache_entry(sg_db_rpc.MEMBER_IPS, sg1_id)
+                    res = self._create_port(self.fmt, n['network']['id'],
+                                            security_groups=[sg1_id])
+                    port = self.deserialize(self.fmt, res)
+                    self.assertFalse(self._is_cached(sg_db_rpc.MEMBER_IPS,
+                                                     sg1_id))
+
+                    # both the group left and the group joined change
+                    self._cache_entry(sg_db_rpc.MEMBER_IPS, sg1_id)
+                    self._cache_entry(sg_db_rpc.MEMBER_IPS, sg2_id)
+                    data = {'port': {ext_sg.SECURITYGROUPS: [sg2_id]}}
+                    req = self.new_update_request('ports', data,
+                                                  port['port']['id'])
+                    req.get_response(self.api)
+                    self.assertFalse(self._is_cached(sg_db_rpc.MEMBER_IPS,
+                                                     sg1_id))
+                    self.assertFalse(self._is_cached(sg_db_rpc.MEMBER_IPS,
+                                                     sg2_id))
+                    self._delete('ports', port['port']['id'])
+
 
 class TestSecurityGroupAgentWithOVSIptables(
         TestSecurityGroupAgentWithIptables):
@@ -28,6 +28,7 @@ import webob.exc
 from quantum.api.v2 import attributes
 from quantum.common import constants
 from quantum.common import exceptions as exception
+from quantum.openstack.common import jsonutils
 from quantum.tests import base
 from quantum import wsgi
 
@@ -112,6 +113,78 @@ class TestWSGIServer(base.BaseTestCase):
         server.stop()
 
 
+class TestWSGIServerWorkers(base.BaseTestCase):
+    """API workers tests."""
+
+    @staticmethod
+    def _hello(env, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return ['Hello']
+
+    def _start(self, workers):
+        server = wsgi.Server("test_workers")
+        with mock.patch.object(wsgi, 'WorkerLauncher') as launcher_cls:
+            server.start(self._hello, 0, host="127.0.0.1", workers=workers)
+        return server, launcher_cls
+
+    def test_start_without_workers_serves_in_process(self):
+        server, launcher_cls = self._start(0)
+        self.assertFalse(launcher_cls.called)
+        self.assertIsNotNone(server._server)
+        server.stop()
+
+    def test_start_with_workers_launches_them(self):
+        server, launcher_cls = self._start(3)
+        launcher = launcher_cls.return_value
+        self.assertIsNone(server._server)
+        self.assertEqual(1, launcher.launch_service.call_count)
+        args, kwargs = launcher.launch_service.call_args
+        self.assertIsInstance(args[0], wsgi.WorkerService)
+        self.assertEqual(3, kwargs['workers'])
+
+        server.wait()
+        launcher.wait.assert_called_once_with()
+        server.stop()
+        launcher.stop.assert_called_once_with()
+
+    def test_worker_service_serves_on_shared_socket(self):
+        server, launcher_cls = self._start(2)
+        service = launcher_cls.return_value.launch_service.call_args[0][0]
+        service.start()
+
+        response = urllib2.urlopen('http://127.0.0.1:%d/' % server.port)
+        self.assertEqual('Hello', response.read())
+
+        service.stop()
+        self.assertIsNone(server._server)
+        self.assertEqual(0, server.pool.running())
+
+    def test_worker_launcher_restarts_children_on_sighup(self):
+        with mock.patch.object(wsgi.signal, 'signal') as signal_mock:
+            launcher = wsgi.WorkerLauncher()
+        signal_mock.assert_any_call(wsgi.signal.SIGHUP,
+                                    launcher._handle_sighup)
+        launcher.children = {100: mock.Mock(), 101: mock.Mock()}
+        with mock.patch.object(wsgi.os, 'kill') as kill:
+            launcher._handle_sighup(wsgi.signal.SIGHUP, None)
+        self.assertEqual(
+            sorted([mock.call(100, wsgi.signal.SIGTERM),
+                    mock.call(101, wsgi.signal.SIGTERM)]),
+            sorted(kill.call_args_list))
+        # Children are still respawned by wait()
+        self.assertTrue(launcher.running)
+
+    def test_worker_launcher_stop(self):
+        with mock.patch.object(wsgi.signal, 'signal'):
+            launcher = wsgi.WorkerLauncher()
+        launcher.children = {100: mock.Mock()}
+        with mock.patch.object(wsgi.os, 'kill') as kill:
+            kill.side_effect = OSError(wsgi.errno.ESRCH, 'No such process')
+            launcher.stop()
+        kill.assert_called_once_with(100, wsgi.signal.SIGTERM)
+        self.assertFalse(launcher.running)
+
+
 class SerializerTest(base.BaseTestCase):
     def test_serialize_unknown_content_type(self):
         """
@@ -632,6 +705,39 @@ class JSONDictSerializerTest(base.BaseTestCase):
 
         self.assertEqual(result, expected_json)
 
+    def test_serialize_iter_yields_items(self):
+        input_dict = {'ports': [{'id': 'a'}, {'id': u'\u7f51'}]}
+        serializer = wsgi.JSONDictSerializer()
+        serializer.chunk_size = 1
+        chunks = list(serializer.serialize_iter(input_dict))
+
+        self.assertEqual(['{"ports": [{"id": "a"}', ', {"id": "\\u7f51"}',
+                          ']}'], chunks)
+
+    def test_serialize_iter_matches_serialize(self):
+        input_dict = {'ports': [{'id': 'a'}, {'id': 'b'}],
+                      'ports_links': [],
+                      'count': 2}
+        serializer = wsgi.JSONDictSerializer()
+        serializer.chunk_size = 1
+        body = ''.join(serializer.serialize_iter(input_dict))
+
+        self.assertEqual(input_dict, jsonutils.loads(body))
+        self.assertEqual(serializer.serialize(input_dict), body)
+
+    def test_serialize_iter_empty_dict(self):
+        serializer = wsgi.JSONDictSerializer()
+        self.assertEqual(['{}'], list(serializer.serialize_iter({})))
+
+    def test_serialize_iter_small_collection_in_one_chunk(self):
+        serializer = wsgi.JSONDictSerializer()
+        chunks = list(serializer.serialize_iter({'ports': [{'id': 'a'}]}))
+        self.assertEqual(['{"ports": [{"id": "a"}]}'], chunks)
+
+    def test_serialize_iter_not_a_dict(self):
+        serializer = wsgi.JSONDictSerializer()
+        self.assertEqual(['[1, 2]'], serializer.serialize_iter([1, 2]))
+
 
 class TextDeserializerTest(base.BaseTestCase):
 
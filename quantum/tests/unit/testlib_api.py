@@ -13,11 +13,24 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import sqlalchemy as sql
+
 from quantum.api.v2 import attributes
 from quantum.tests import base
 from quantum import wsgi
 
 
+# Counters collecting the statements currently run, see SqlStatementCounter
+_statement_counters = []
+_statement_listener_installed = False
+
+
+def _count_statement(conn, cursor, statement, parameters, context,
+                     executemany):
+    for counter in _statement_counters:
+        counter.statements.append(statement)
+
+
 def create_request(path, body, content_type, method='GET',
                    query_string=None, context=None):
     if query_string:
@@ -57,3 +70,31 @@ class WebTestCase(base.BaseTestCase):
         result = wsgi.Serializer(
             attributes.get_attr_metadata()).serialize(data, ctype)
         return result
+
+
+class SqlStatementCounter(object):
+    """Collect the SQL statements run by any engine, e.g.
+
+        with testlib_api.SqlStatementCounter() as counter:
+            req.get_response(self.api)
+        self.assertEqual(3, counter.count)
+    """
+
+    def __enter__(self):
+        global _statement_listener_installed
+        # Listeners can not be removed, install a single one for all
+        # the counters
+        if not _statement_listener_installed:
+            sql.event.listen(sql.engine.Engine, 'before_cursor_execute',
+                             _count_statement)
+            _statement_listener_installed = True
+        self.statements = []
+        _statement_counters.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _statement_counters.remove(self)
+
+    @property
+    def count(self):
+        return len(self.statements)
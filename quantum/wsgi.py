@@ -19,7 +19,9 @@
 Utility methods for working with WSGI servers
 """
 import errno
+import json
 import os
+import signal
 import socket
 import ssl
 import sys
@@ -39,6 +41,7 @@ from quantum.common import exceptions as exception
 from quantum import context
 from quantum.openstack.common import jsonutils
 from quantum.openstack.common import log as logging
+from quantum.openstack.common import service as common_service
 
 socket_opts = [
     cfg.IntOpt('backlog',
@@ -74,6 +77,9 @@ CONF.register_opts(socket_opts)
 
 LOG = logging.getLogger(__name__)
 
+# Seconds a stopping API worker waits for the requests it is serving
+WORKER_STOP_TIMEOUT = 30
+
 
 def run_server(application, port):
     """Run a WSGI server with the given application."""
@@ -81,12 +87,72 @@ def run_server(application, port):
     eventlet.wsgi.server(sock, application)
 
 
+class WorkerService(object):
+    """Serves the application of a Server in an API worker process."""
+
+    def __init__(self, service, application):
+        self._service = service
+        self._application = application
+
+    def start(self):
+        self._service._server = self._service.pool.spawn(
+            self._service._run, self._application, self._service._socket)
+
+    def wait(self):
+        self._service.pool.waitall()
+
+    def stop(self):
+        """Stop accepting connections and finish the requests in progress."""
+        if self._service._server:
+            self._service._server.kill()
+            self._service._server = None
+        with eventlet.Timeout(WORKER_STOP_TIMEOUT, False):
+            self._service.pool.waitall()
+
+
+class WorkerLauncher(common_service.ProcessLauncher):
+    """Forks the API workers and restarts them on SIGHUP.
+
+    The workers are sent SIGTERM on SIGHUP, they finish the requests they
+    are serving and are replaced by new ones while the listen socket keeps
+    queuing connections.
+    """
+
+    def __init__(self):
+        super(WorkerLauncher, self).__init__()
+        signal.signal(signal.SIGHUP, self._handle_sighup)
+
+    def _handle_sighup(self, signo, frame):
+        LOG.info(_('Caught SIGHUP, restarting %d workers'),
+                 len(self.children))
+        self._kill_children()
+
+    def _kill_children(self):
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError as exc:
+                if exc.errno != errno.ESRCH:
+                    raise
+
+    def _child_process(self, service):
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        super(WorkerLauncher, self)._child_process(service)
+
+    def stop(self):
+        """Stop respawning the workers and terminate them."""
+        self.running = False
+        self._kill_children()
+
+
 class Server(object):
     """Server class to manage multiple WSGI sockets and applications."""
 
     def __init__(self, name, threads=1000):
         self.pool = eventlet.GreenPool(threads)
         self.name = name
+        self._server = None
+        self._launcher = None
 
     def _get_socket(self, host, port, backlog):
         bind_addr = (host, port)
@@ -165,8 +231,12 @@ class Server(object):
 
         return sock
 
-    def start(self, application, port, host='0.0.0.0'):
-        """Run a WSGI server with the given application."""
+    def start(self, application, port, host='0.0.0.0', workers=0):
+        """Run a WSGI server with the given application.
+
+        When workers is not 0 the socket is bound here and that many
+        processes are forked to serve the application on it.
+        """
         self._host = host
         self._port = port
         backlog = CONF.backlog
@@ -174,7 +244,13 @@ class Server(object):
         self._socket = self._get_socket(self._host,
                                         self._port,
                                         backlog=backlog)
-        self._server = self.pool.spawn(self._run, application, self._socket)
+        if workers < 1:
+            self._server = self.pool.spawn(self._run, application,
+                                           self._socket)
+        else:
+            self._launcher = WorkerLauncher()
+            self._launcher.launch_service(WorkerService(self, application),
+                                          workers=workers)
 
     @property
     def host(self):
@@ -185,12 +261,18 @@ class Server(object):
         return self._socket.getsockname()[1] if self._socket else self._port
 
     def stop(self):
-        self._server.kill()
+        if self._launcher:
+            self._launcher.stop()
+        else:
+            self._server.kill()
 
     def wait(self):
         """Wait until all servers have completed running."""
         try:
-            self.pool.waitall()
+            if self._launcher:
+                self._launcher.wait()
+            else:
+                self.pool.waitall()
         except KeyboardInterrupt:
             pass
 
@@ -326,6 +408,10 @@ class DictSerializer(ActionDispatcher):
     def serialize(self, data, action='default'):
         return self.dispatch(data, action=action)
 
+    def serialize_iter(self, data, action='default'):
+        """Serialize data as an iterable of strings to send in turn."""
+        return [self.serialize(data, action)]
+
     def default(self, data):
         return ""
 
@@ -333,10 +419,53 @@ class DictSerializer(ActionDispatcher):
 class JSONDictSerializer(DictSerializer):
     """Default JSON request body serialization"""
 
+    # Size above which serialize_iter sends the items serialized so far
+    chunk_size = 65536
+
+    @staticmethod
+    def _sanitizer(obj):
+        return unicode(obj)
+
     def default(self, data):
-        def sanitizer(obj):
-            return unicode(obj)
-        return jsonutils.dumps(data, default=sanitizer)
+        return jsonutils.dumps(data, default=self._sanitizer)
+
+    def serialize_iter(self, data, action='default'):
+        """Serialize a dict of lists in chunks of a few list items.
+
+        Collections are sent as they are serialized instead of being
+        joined into one string first, which would be the largest object
+        held while answering a list request.
+        """
+        if action != 'default' or not isinstance(data, dict):
+            return super(JSONDictSerializer, self).serialize_iter(data,
+                                                                  action)
+        return self._iter_dict(data)
+
+    def _iter_dict(self, data):
+        # One encoder for all the items, json.dumps makes one per call
+        encode = json.JSONEncoder(default=self._sanitizer).encode
+        chunk = []
+        size = 0
+        separator = '{'
+        for key, value in data.iteritems():
+            chunk.append('%s%s: ' % (separator, encode(key)))
+            separator = ', '
+            if not isinstance(value, list):
+                chunk.append(encode(value))
+                continue
+            item_separator = '['
+            for item in value:
+                item = item_separator + encode(item)
+                item_separator = ', '
+                chunk.append(item)
+                size += len(item)
+                if size >= self.chunk_size:
+                    yield ''.join(chunk)
+                    chunk = []
+                    size = 0
+            chunk.append(']' if value else '[]')
+        chunk.append('}' if data else '{}')
+        yield ''.join(chunk)
 
 
 class XMLDictSerializer(DictSerializer):
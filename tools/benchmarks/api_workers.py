@@ -0,0 +1,137 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the requests per second served with a growing api_workers.
+
+A WSGI server answers every request with the JSON list of 200 ports, the
+CPU bound part of listing them through the API, and is loaded by CLIENTS
+processes sending requests over keep-alive connections for DURATION
+seconds. The workers counts to measure can be given on the command line:
+
+    python tools/benchmarks/api_workers.py 0 1 2 4
+"""
+
+import httplib
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.getcwd())
+
+
+CLIENTS = 16
+DURATION = 10
+PORTS = 200
+
+
+def _free_port():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def _serve(port, workers):
+    # The server modules monkey patch socket, keep them out of the clients
+    from oslo.config import cfg
+
+    from quantum.openstack.common import jsonutils
+    from quantum import wsgi
+
+    cfg.CONF([], project='quantum')
+
+    ports = [{'id': 'port-%d' % index,
+              'name': '',
+              'network_id': 'net-%d' % (index % 10),
+              'tenant_id': 'tenant',
+              'admin_state_up': True,
+              'status': 'ACTIVE',
+              'mac_address': 'fa:16:3e:00:%02x:%02x' % divmod(index, 256),
+              'fixed_ips': [{'subnet_id': 'subnet-%d' % (index % 10),
+                             'ip_address': '10.0.%d.%d' % divmod(index, 256)}],
+              'device_id': 'device-%d' % index,
+              'device_owner': 'compute:nova'}
+             for index in range(PORTS)]
+
+    def application(env, start_response):
+        body = jsonutils.dumps({'ports': [dict(port) for port in ports]})
+        start_response('200 OK', [('Content-Type', 'application/json'),
+                                  ('Content-Length', str(len(body)))])
+        return [body]
+
+    server = wsgi.Server('benchmark')
+    server.start(application, port, host='127.0.0.1', workers=workers)
+    server.wait()
+
+
+def _load(port, deadline, results):
+    conn = httplib.HTTPConnection('127.0.0.1', port)
+    count = 0
+    while time.time() < deadline:
+        conn.request('GET', '/v2.0/ports')
+        conn.getresponse().read()
+        count += 1
+    conn.close()
+    results.put(count)
+
+
+def _wait_listening(port):
+    for _i in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port)).close()
+            return
+        except socket.error:
+            time.sleep(0.1)
+    raise RuntimeError('Server did not start')
+
+
+def _measure(workers):
+    port = _free_port()
+    server = multiprocessing.Process(target=_serve, args=(port, workers))
+    server.start()
+    try:
+        _wait_listening(port)
+        # Let the workers fork
+        time.sleep(1)
+        results = multiprocessing.Queue()
+        deadline = time.time() + DURATION
+        clients = [multiprocessing.Process(target=_load,
+                                           args=(port, deadline, results))
+                   for _i in range(CLIENTS)]
+        for client in clients:
+            client.start()
+        total = sum(results.get() for _client in clients)
+        for client in clients:
+            client.join()
+    finally:
+        os.kill(server.pid, signal.SIGTERM)
+        server.join()
+    return total / float(DURATION)
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [0, 1, 2, 4]
+    print '%-12s %14s' % ('api_workers', 'requests/s')
+    for workers in counts:
+        print '%-12d %14.1f' % (workers, _measure(workers))
+
+
+if __name__ == '__main__':
+    main()
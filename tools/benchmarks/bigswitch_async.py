@@ -0,0 +1,124 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the API calls of the BigSwitch plugin with a slow network ctrl.
+
+The REST proxy plugin talks to the local network ctrl of the unit tests,
+which waits CTRL_TIME before answering every request. NETWORKS networks
+with a port each are created, then every network is renamed UPDATES times.
+The time spent in the API calls, the time taken to send the queued calls
+afterwards and the number of requests received by the network ctrl are
+printed for the synchronous calls and for async_mode:
+
+    python tools/benchmarks/bigswitch_async.py [ctrl_ms]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.getcwd())
+
+from oslo.config import cfg
+
+from quantum.api.v2 import attributes
+from quantum.common import config  # noqa
+from quantum import context
+from quantum.plugins.bigswitch import plugin
+from quantum.tests.unit.bigswitch import fake_server
+
+
+NETWORKS = 20
+UPDATES = 10
+CTRL_TIME = 0.02
+
+
+def _slow_ctrl(ctrl, ctrl_time):
+    handle = ctrl.handle
+
+    def _handle(method, path, data):
+        time.sleep(ctrl_time)
+        return handle(method, path, data)
+
+    ctrl.handle = _handle
+
+
+def _api_calls(proxy, admin_context, mode):
+    for n in range(NETWORKS):
+        net = proxy.create_network(
+            admin_context, {'network': {'name': 'net-%d' % n,
+                                        'tenant_id': mode,
+                                        'admin_state_up': True,
+                                        'shared': False}})
+        proxy.create_port(
+            admin_context, {'port': {'name': '', 'tenant_id': mode,
+                                     'network_id': net['id'],
+                                     'admin_state_up': True,
+                                     'mac_address':
+                                     attributes.ATTR_NOT_SPECIFIED,
+                                     'fixed_ips':
+                                     attributes.ATTR_NOT_SPECIFIED,
+                                     'device_id': '', 'device_owner': ''}})
+        for u in range(UPDATES):
+            proxy.update_network(admin_context, net['id'],
+                                 {'network': {'name': 'net-%d-%d' % (n, u)}})
+
+
+def main():
+    ctrl_time = (float(sys.argv[1]) / 1000 if len(sys.argv) > 1
+                 else CTRL_TIME)
+    ctrl = fake_server.FakeNetworkCtrl()
+    _slow_ctrl(ctrl, ctrl_time)
+    ctrl.start()
+    try:
+        cfg.CONF([], project='quantum')
+        cfg.CONF.set_override('rpc_backend',
+                              'quantum.openstack.common.rpc.impl_fake')
+        cfg.CONF.set_override('lock_path', '')
+        cfg.CONF.set_override('servers', '127.0.0.1:%d' % ctrl.port,
+                              'RESTPROXY')
+        proxy = plugin.QuantumRestProxyV2()
+        admin_context = context.get_admin_context()
+        async_servers = plugin.AsyncServerPool(
+            [('127.0.0.1', ctrl.port)], False, None, 'bench', 10,
+            plugin.BASE_URI)
+
+        print '%-8s %10s %10s %10s %10s' % ('mode', 'api ms', 'queued',
+                                            'drain ms', 'ctrl calls')
+        for mode, servers in (('sync', proxy.servers),
+                              ('async', async_servers)):
+            proxy.servers = servers
+            del ctrl.requests[:]
+            start = time.time()
+            _api_calls(proxy, admin_context, mode)
+            api_time = time.time() - start
+            queued = 0
+            drain_time = 0
+            if servers is async_servers:
+                queued = servers.get_stats()['depth']
+                start = time.time()
+                servers.drain()
+                drain_time = time.time() - start
+            print '%-8s %10.1f %10d %10.1f %10d' % (mode, api_time * 1000,
+                                                    queued,
+                                                    drain_time * 1000,
+                                                    len(ctrl.requests))
+    finally:
+        ctrl.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the re-sync of a BigSwitch network ctrl with quantum.
+
+TENANTS tenants with NETWORKS networks of PORTS ports each are written to
+an in-memory sqlite database, and the REST proxy plugin talks to the local
+network ctrl of the unit tests. The time, bytes sent and connections
+opened are printed for the whole topology sent by _send_all_data, for a
+first digest sync, and for a digest sync after one tenant changed. The
+last line compares 500 REST calls on one connection to the same calls on
+a new connection each:
+
+    python tools/benchmarks/bigswitch_sync.py [tenants]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.getcwd())
+
+from oslo.config import cfg
+
+from quantum.common import config  # noqa
+from quantum import context
+from quantum.db import models_v2
+from quantum.plugins.bigswitch import plugin
+from quantum.tests.unit.bigswitch import fake_server
+
+
+TENANTS = 50
+NETWORKS = 4
+PORTS = 50
+CALLS = 500
+
+
+class BytesCounter(object):
+
+    def __init__(self, ctrl):
+        self.sent = 0
+        handle = ctrl.handle
+
+        def _handle(method, path, data):
+            self.sent += len(plugin.json.dumps(data)) if data else 0
+            return handle(method, path, data)
+
+        ctrl.handle = _handle
+
+
+def _populate(session, tenants):
+    networks, ports = [], []
+    for t in range(tenants):
+        for n in range(NETWORKS):
+            network_id = 'net-%d-%d' % (t, n)
+            networks.append({'id': network_id, 'tenant_id': 'tenant-%d' % t,
+                             'name': '', 'status': 'ACTIVE',
+                             'admin_state_up': True, 'shared': False})
+            for p in range(PORTS):
+                index = len(ports)
+                ports.append({'id': 'port-%d' % index,
+                              'tenant_id': 'tenant-%d' % t, 'name': '',
+                              'network_id': network_id,
+                              'mac_address': 'fa:16:3e:%02x:%02x:%02x' % (
+                                  index / 65536, index / 256 % 256,
+                                  index % 256),
+                              'admin_state_up': True, 'status': 'ACTIVE',
+                              'device_id': 'vm-%d' % index,
+                              'device_owner': 'compute:nova'})
+    with session.begin():
+        session.execute(models_v2.Network.__table__.insert(), networks)
+        session.execute(models_v2.Port.__table__.insert(), ports)
+
+
+def _measure(ctrl, counter, func, *args):
+    counter.sent = 0
+    connections = ctrl.connections
+    start = time.time()
+    func(*args)
+    return (time.time() - start, counter.sent,
+            ctrl.connections - connections)
+
+
+def _new_connection_calls(servers):
+    for i in range(CALLS):
+        servers.get('/health')
+        servers.servers[0].close()
+
+
+def _kept_connection_calls(servers):
+    for i in range(CALLS):
+        servers.get('/health')
+
+
+def main():
+    tenants = int(sys.argv[1]) if len(sys.argv) > 1 else TENANTS
+    ctrl = fake_server.FakeNetworkCtrl()
+    ctrl.start()
+    counter = BytesCounter(ctrl)
+    try:
+        cfg.CONF([], project='quantum')
+        cfg.CONF.set_override('rpc_backend',
+                              'quantum.openstack.common.rpc.impl_fake')
+        cfg.CONF.set_override('lock_path', '')
+        cfg.CONF.set_override('servers', '127.0.0.1:%d' % ctrl.port,
+                              'RESTPROXY')
+        proxy = plugin.QuantumRestProxyV2()
+        admin_context = context.get_admin_context()
+        _populate(admin_context.session, tenants)
+
+        print '%-26s %10s %12s %12s' % ('sync', 'ms', 'bytes sent',
+                                        'connections')
+        for name, func in (('all data', proxy._send_all_data),
+                           ('digests, first', proxy._sync_topology),
+                           ('digests, unchanged', proxy._sync_topology)):
+            elapsed, sent, connections = _measure(ctrl, counter, func)
+            print '%-26s %10.1f %12d %12d' % (name, elapsed * 1000, sent,
+                                              connections)
+        with admin_context.session.begin():
+            admin_context.session.query(models_v2.Network).filter_by(
+                id='net-0-0').update({'name': 'renamed'})
+        elapsed, sent, connections = _measure(ctrl, counter,
+                                              proxy._sync_topology)
+        print '%-26s %10.1f %12d %12d' % ('digests, 1 tenant changed',
+                                          elapsed * 1000, sent, connections)
+
+        print
+        print '%-26s %10s %12s' % ('%d calls' % CALLS, 'ms', 'connections')
+        for name, func in (('new connection each', _new_connection_calls),
+                           ('kept connection', _kept_connection_calls)):
+            elapsed, sent, connections = _measure(ctrl, counter, func,
+                                                  proxy.servers)
+            print '%-26s %10.1f %12d' % (name, elapsed * 1000, connections)
+    finally:
+        ctrl.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure bulk port creation throughput of QuantumDbPluginV2.
+
+Compares the set-based create_port_bulk path with creating the same ports
+one at a time, against an in-memory sqlite database by default:
+
+    python tools/benchmarks/bulk_port_create.py [sql_connection]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.getcwd())
+
+from oslo.config import cfg
+
+from quantum.api.v2 import attributes
+from quantum.common import config
+from quantum import context
+from quantum.db import api as db
+from quantum.db import db_base_plugin_v2
+
+
+SIZES = (10, 100, 1000)
+
+
+def _port(network_id, index):
+    return {'port': {'network_id': network_id,
+                     'tenant_id': 'bench',
+                     'name': 'port_%d' % index,
+                     'admin_state_up': True,
+                     'device_id': 'device_%d' % index,
+                     'device_owner': '',
+                     'mac_address': attributes.ATTR_NOT_SPECIFIED,
+                     'fixed_ips': attributes.ATTR_NOT_SPECIFIED}}
+
+
+def _setup_network(plugin, ctx, size):
+    network = plugin.create_network(ctx, {'network': {
+        'tenant_id': 'bench', 'name': 'bench', 'admin_state_up': True,
+        'shared': False}})
+    plugin.create_subnet(ctx, {'subnet': {
+        'tenant_id': 'bench', 'name': 'bench',
+        'network_id': network['id'], 'ip_version': 4,
+        'cidr': '10.0.0.0/%d' % (32 - len(bin(size * 2)) + 2),
+        'gateway_ip': attributes.ATTR_NOT_SPECIFIED,
+        'allocation_pools': attributes.ATTR_NOT_SPECIFIED,
+        'dns_nameservers': attributes.ATTR_NOT_SPECIFIED,
+        'host_routes': attributes.ATTR_NOT_SPECIFIED,
+        'enable_dhcp': True}})
+    return network['id']
+
+
+def _one_by_one(plugin, ctx, ports):
+    with ctx.session.begin(subtransactions=True):
+        return [plugin.create_port(ctx, port) for port in ports]
+
+
+def _bulk(plugin, ctx, ports):
+    return plugin.create_port_bulk(ctx, {'ports': ports})
+
+
+def main():
+    config.parse([])
+    if len(sys.argv) > 1:
+        cfg.CONF.set_override('sql_connection', sys.argv[1], 'DATABASE')
+    print '%-12s %8s %14s' % ('mode', 'ports', 'ports/second')
+    for size in SIZES:
+        for name, create in (('one-by-one', _one_by_one), ('bulk', _bulk)):
+            plugin = db_base_plugin_v2.QuantumDbPluginV2()
+            ctx = context.get_admin_context()
+            network_id = _setup_network(plugin, ctx, size)
+            ports = [_port(network_id, i) for i in range(size)]
+            start = time.time()
+            create(plugin, ctx, ports)
+            elapsed = time.time() - start
+            db.clear_db()
+            print '%-12s %8d %14.1f' % (name, size, size / elapsed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure a DHCP agent resync of networks it already serves.
+
+500 networks with a subnet and 5 ports each are written to an in-memory
+sqlite database. The agent calls the server RPC callbacks in-process and
+its DHCP driver waits DRIVER_TIME per action, as for signalling dnsmasq.
+The resync refreshing the networks one by one with one get_network_info
+call each, as the agent used to do, is compared to the bulk
+get_networks_info call followed by num_sync_threads driver calls at once:
+
+    python tools/benchmarks/dhcp_resync.py [num_sync_threads ...]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.getcwd())
+
+import eventlet
+from oslo.config import cfg
+import sqlalchemy as sql
+
+from quantum.agent import dhcp_agent
+from quantum import context
+from quantum.db import api as db
+from quantum.db import dhcp_rpc_base
+from quantum.db import models_v2
+from quantum import manager
+
+
+NETWORKS = 500
+PORTS = 5
+DRIVER_TIME = 0.01
+
+
+class SlowDriver(object):
+    """DHCP driver waiting DRIVER_TIME for every action."""
+
+    def __init__(self, conf, network, root_helper, device_manager,
+                 namespace=None):
+        pass
+
+    @classmethod
+    def existing_dhcp_networks(cls, conf, root_helper):
+        return []
+
+    def _act(self):
+        eventlet.sleep(DRIVER_TIME)
+
+    enable = disable = restart = reload_allocations = _act
+
+
+class InProcessPluginApi(object):
+    """Agent side RPC API calling the server callbacks directly."""
+
+    def __init__(self):
+        self.callbacks = dhcp_rpc_base.DhcpRpcCallbackMixin()
+        self.context = context.get_admin_context()
+        self.calls = 0
+
+    def get_active_networks(self):
+        self.calls += 1
+        return self.callbacks.get_active_networks(self.context)
+
+    def get_network_info(self, network_id):
+        self.calls += 1
+        return dhcp_agent.DictModel(self.callbacks.get_network_info(
+            self.context, network_id=network_id))
+
+    def get_networks_info(self, network_ids):
+        self.calls += 1
+        return [dhcp_agent.DictModel(network) for network in
+                self.callbacks.get_networks_info(self.context,
+                                                 network_ids=network_ids)]
+
+
+def _populate(session):
+    networks, subnets, ports, ips = [], [], [], []
+    for n in range(NETWORKS):
+        network_id = 'net-%d' % n
+        subnet_id = 'subnet-%d' % n
+        networks.append({'id': network_id, 'tenant_id': 'bench',
+                         'name': '', 'status': 'ACTIVE',
+                         'admin_state_up': True, 'shared': False})
+        subnets.append({'id': subnet_id, 'tenant_id': 'bench', 'name': '',
+                        'network_id': network_id, 'ip_version': 4,
+                        'cidr': '10.0.0.0/24', 'gateway_ip': '10.0.0.1',
+                        'enable_dhcp': True, 'shared': False})
+        for p in range(PORTS):
+            port_id = 'port-%d-%d' % (n, p)
+            index = n * PORTS + p
+            ports.append({'id': port_id, 'tenant_id': 'bench', 'name': '',
+                          'network_id': network_id,
+                          'mac_address': 'fa:16:3e:%02x:%02x:%02x' % (
+                              index / 65536, index / 256 % 256, index % 256),
+                          'admin_state_up': True, 'status': 'ACTIVE',
+                          'device_id': 'vm-%d' % index,
+                          'device_owner': 'compute:nova'})
+            ips.append({'port_id': port_id, 'subnet_id': subnet_id,
+                        'network_id': network_id,
+                        'ip_address': '10.0.0.%d' % (p + 2)})
+    with session.begin():
+        for model, rows in ((models_v2.Network, networks),
+                            (models_v2.Subnet, subnets),
+                            (models_v2.Port, ports),
+                            (models_v2.IPAllocation, ips)):
+            session.execute(model.__table__.insert(), rows)
+
+
+class StatementCounter(object):
+
+    def __init__(self):
+        self.count = 0
+        sql.event.listen(db._ENGINE, 'before_cursor_execute', self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+def _sync_per_network(agent):
+    for network_id in agent.plugin_rpc.get_active_networks():
+        agent.refresh_dhcp_helper(network_id)
+
+
+def _sync_bulk(agent, num_sync_threads):
+    cfg.CONF.set_override('num_sync_threads', num_sync_threads)
+    agent.sync_state()
+
+
+def _measure(counter, sync, agent, *args):
+    agent.plugin_rpc.calls = 0
+    counter.count = 0
+    start = time.time()
+    sync(agent, *args)
+    return time.time() - start, agent.plugin_rpc.calls, counter.count
+
+
+def main():
+    threads = [int(arg) for arg in sys.argv[1:]] or [1, 4, 16]
+    state_path = tempfile.mkdtemp()
+    try:
+        dhcp_agent.register_options()
+        cfg.CONF([], project='quantum')
+        cfg.CONF.set_override('core_plugin',
+                              'quantum.db.db_base_plugin_v2.'
+                              'QuantumDbPluginV2')
+        cfg.CONF.set_override('dhcp_driver', '__main__.SlowDriver')
+        cfg.CONF.set_override('interface_driver',
+                              'quantum.agent.linux.interface.NullDriver')
+        cfg.CONF.set_override('state_path', state_path)
+        # Keep the metadata proxies out of the measurements
+        cfg.CONF.set_override('use_namespaces', False)
+        manager.QuantumManager.get_plugin()
+        _populate(context.get_admin_context().session)
+        counter = StatementCounter()
+
+        agent = dhcp_agent.DhcpAgent('bench')
+        agent.plugin_rpc = InProcessPluginApi()
+        # Serve every network before measuring resyncs
+        agent.sync_state()
+
+        print '%-22s %10s %10s %12s' % ('resync', 'ms', 'rpc calls',
+                                        'statements')
+        cases = [('per network', _sync_per_network, ())]
+        cases.extend(('bulk, %d threads' % count, _sync_bulk, (count,))
+                     for count in threads)
+        for name, sync, args in cases:
+            elapsed, calls, statements = _measure(counter, sync, agent,
+                                                  *args)
+            print '%-22s %10.1f %10d %12d' % (name, elapsed * 1000, calls,
+                                              statements)
+    finally:
+        db.clear_db()
+        shutil.rmtree(state_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the dnsmasq reloads made by the DHCP agent for a port storm.
+
+A network with 4,000 ports is served by the Dnsmasq driver, writing its
+files to a temporary directory. 200 port.create.end notifications arrive
+every 5 ms, followed by 200 port.update.end notifications which do not
+change the DHCP entries. The time spent in the driver, the number of host
+file writes and of HUPs, which are counted instead of being sent, are
+printed for some values of reload_allocations_delay:
+
+    python tools/benchmarks/dnsmasq_reload.py [delay ...]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.getcwd())
+
+import eventlet
+from oslo.config import cfg
+
+from quantum.agent import dhcp_agent
+from quantum.agent.linux import dhcp
+from quantum.agent.linux import utils
+
+
+PORTS = 4000
+EVENTS = 200
+INTERVAL = 0.005
+NETWORK_ID = '12345678-1234-5678-1234-567812345678'
+
+
+class Counters(object):
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.hups = 0
+        self.writes = 0
+        self.driver_time = 0.0
+
+    def execute(self, cmd, *args, **kwargs):
+        if cmd[:2] == ['kill', '-HUP']:
+            self.hups += 1
+        return ''
+
+    def replace_file(self, name, data, _replace_file=utils.replace_file):
+        if name.endswith('host'):
+            self.writes += 1
+        _replace_file(name, data)
+
+
+def _port(index, device_owner='compute:nova'):
+    return {'id': 'port-%d' % index,
+            'network_id': NETWORK_ID,
+            'mac_address': 'fa:16:3e:%02x:%02x:%02x' % (
+                index / 65536, index / 256 % 256, index % 256),
+            'fixed_ips': [{'subnet_id': 'subnet',
+                           'ip_address': '10.%d.%d.%d' % (
+                               index / 65536, index / 256 % 256,
+                               index % 256)}],
+            'device_id': 'vm-%d' % index,
+            'device_owner': device_owner,
+            'admin_state_up': True}
+
+
+def _network():
+    return dhcp_agent.DictModel(
+        {'id': NETWORK_ID, 'admin_state_up': True,
+         'subnets': [{'id': 'subnet', 'cidr': '10.0.0.0/8',
+                      'gateway_ip': '10.0.0.1', 'enable_dhcp': True,
+                      'ip_version': 4, 'dns_nameservers': [],
+                      'host_routes': []}],
+         'ports': [_port(index) for index in range(PORTS)]})
+
+
+def _storm(agent, delay, counters):
+    cfg.CONF.set_override('reload_allocations_delay', delay)
+    counters.reset()
+    for index in range(PORTS, PORTS + EVENTS):
+        agent.port_create_end(None, {'port': _port(index)})
+        eventlet.sleep(INTERVAL)
+    for index in range(EVENTS):
+        agent.port_update_end(None, {'port': _port(index, 'compute:az')})
+        eventlet.sleep(INTERVAL)
+    # Let the pending reload run
+    eventlet.sleep(delay + 0.1)
+    for index in range(PORTS, PORTS + EVENTS):
+        agent.port_delete_end(None, {'port_id': 'port-%d' % index})
+    eventlet.sleep(delay + 0.1)
+
+
+def main():
+    delays = [float(arg) for arg in sys.argv[1:]] or [0, 0.5]
+    state_path = tempfile.mkdtemp()
+    counters = Counters()
+    try:
+        dhcp_agent.register_options()
+        cfg.CONF([], project='quantum')
+        cfg.CONF.set_override('interface_driver',
+                              'quantum.agent.linux.interface.NullDriver')
+        cfg.CONF.set_override('state_path', state_path)
+        cfg.CONF.set_override('use_namespaces', False)
+        dhcp.utils.execute = counters.execute
+        dhcp.utils.replace_file = counters.replace_file
+
+        agent = dhcp_agent.DhcpAgent('bench')
+        network = _network()
+        driver = dhcp.Dnsmasq(cfg.CONF, network)
+        utils.replace_file(driver.get_conf_file_name('pid',
+                                                     ensure_conf_dir=True),
+                           '1')
+        driver._output_hosts_file()
+        agent.cache.put(network)
+
+        call_driver = agent.call_driver
+
+        def timed_call_driver(action, network):
+            start = time.time()
+            try:
+                return call_driver(action, network)
+            finally:
+                counters.driver_time += time.time() - start
+
+        agent.call_driver = timed_call_driver
+
+        print '%-8s %12s %12s %8s' % ('delay', 'driver ms', 'host writes',
+                                      'HUPs')
+        for delay in delays:
+            _storm(agent, delay, counters)
+            print '%-8.2f %12.1f %12d %8d' % (delay,
+                                              counters.driver_time * 1000,
+                                              counters.writes,
+                                              counters.hups)
+    finally:
+        shutil.rmtree(state_path)
+
+
+if __name__ == '__main__':
+    main()
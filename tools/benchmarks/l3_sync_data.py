@@ -0,0 +1,167 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure get_sync_data, which builds the routers sent to the L3 agents.
+
+1,000 routers with a gateway, 10 interfaces and a floating IP each are
+written to an in-memory sqlite database by default. The time and number
+of SQL statements needed to build all of them, one of them, and the
+routers changed since the generations an agent already has are printed:
+
+    python tools/benchmarks/l3_sync_data.py [sql_connection]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.getcwd())
+
+from oslo.config import cfg
+import sqlalchemy as sql
+
+from quantum.common import config
+from quantum.common import constants
+from quantum import context
+from quantum.db import api as db
+from quantum.db import db_base_plugin_v2
+from quantum.db import l3_db
+from quantum.db import models_v2
+
+
+ROUTERS = 1000
+INTERFACES = 10
+
+
+class L3Plugin(db_base_plugin_v2.QuantumDbPluginV2,
+               l3_db.L3_NAT_db_mixin):
+    pass
+
+
+def _id(kind, *indexes):
+    return '%s-%s' % (kind, '-'.join(str(index) for index in indexes))
+
+
+def _port(port_id, network_id, device_id, device_owner, index):
+    return {'id': port_id, 'tenant_id': 'bench', 'name': '',
+            'network_id': network_id,
+            'mac_address': 'fa:16:3e:%02x:%02x:%02x' % (
+                index / 65536, index / 256 % 256, index % 256),
+            'admin_state_up': True, 'status': 'ACTIVE',
+            'device_id': device_id, 'device_owner': device_owner}
+
+
+def _populate(session):
+    networks = [{'id': 'ext', 'tenant_id': 'bench', 'name': 'ext',
+                 'status': 'ACTIVE', 'admin_state_up': True, 'shared': False}]
+    subnets = [{'id': 'ext-subnet', 'tenant_id': 'bench', 'name': '',
+                'network_id': 'ext', 'ip_version': 4, 'cidr': '172.16.0.0/16',
+                'gateway_ip': '172.16.0.1', 'enable_dhcp': False,
+                'shared': False}]
+    routers, ports, ips, floatingips = [], [], [], []
+    for r in range(ROUTERS):
+        router_id = _id('router', r)
+        gw_port_id = _id('gw', r)
+        ports.append(_port(gw_port_id, 'ext', router_id,
+                           constants.DEVICE_OWNER_ROUTER_GW, r))
+        ips.append({'port_id': gw_port_id, 'subnet_id': 'ext-subnet',
+                    'network_id': 'ext',
+                    'ip_address': '172.16.%d.%d' % divmod(r + 2, 256)})
+        routers.append({'id': router_id, 'tenant_id': 'bench',
+                        'name': '', 'status': 'ACTIVE',
+                        'admin_state_up': True, 'gw_port_id': gw_port_id})
+        for i in range(INTERFACES):
+            network_id = _id('net', r, i)
+            subnet_id = _id('subnet', r, i)
+            port_id = _id('port', r, i)
+            networks.append({'id': network_id, 'tenant_id': 'bench',
+                             'name': '', 'status': 'ACTIVE',
+                             'admin_state_up': True, 'shared': False})
+            subnets.append({'id': subnet_id, 'tenant_id': 'bench',
+                            'name': '', 'network_id': network_id,
+                            'ip_version': 4, 'cidr': '10.0.%d.0/24' % i,
+                            'gateway_ip': '10.0.%d.1' % i,
+                            'enable_dhcp': True, 'shared': False})
+            ports.append(_port(port_id, network_id, router_id,
+                               constants.DEVICE_OWNER_ROUTER_INTF,
+                               ROUTERS + r * INTERFACES + i))
+            ips.append({'port_id': port_id, 'subnet_id': subnet_id,
+                        'network_id': network_id,
+                        'ip_address': '10.0.%d.1' % i})
+        floatingips.append({'id': _id('fip', r), 'tenant_id': 'bench',
+                            'floating_ip_address':
+                            '172.16.%d.%d' % divmod(r + 2, 256),
+                            'floating_network_id': 'ext',
+                            'floating_port_id': gw_port_id,
+                            'fixed_port_id': _id('port', r, 0),
+                            'fixed_ip_address': '10.0.0.1',
+                            'router_id': _id('router', r)})
+    with session.begin():
+        for model, rows in ((models_v2.Network, networks),
+                            (l3_db.ExternalNetwork, [{'network_id': 'ext'}]),
+                            (models_v2.Subnet, subnets),
+                            (models_v2.Port, ports),
+                            (models_v2.IPAllocation, ips),
+                            (l3_db.Router, routers),
+                            (l3_db.FloatingIP, floatingips)):
+            session.execute(model.__table__.insert(), rows)
+
+
+class StatementCounter(object):
+
+    def __init__(self):
+        self.count = 0
+        sql.event.listen(db._ENGINE, 'before_cursor_execute', self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+def _measure(counter, function, *args, **kwargs):
+    counter.count = 0
+    start = time.time()
+    routers = function(*args, **kwargs)
+    return time.time() - start, counter.count, len(routers)
+
+
+def main():
+    config.parse([])
+    if len(sys.argv) > 1:
+        cfg.CONF.set_override('sql_connection', sys.argv[1], 'DATABASE')
+    plugin = L3Plugin()
+    ctx = context.get_admin_context()
+    _populate(ctx.session)
+    counter = StatementCounter()
+    generations = dict((r['id'], r['generation'])
+                       for r in plugin.get_routers(
+                           ctx, fields=['id', 'generation']))
+    for router_id in (_id('router', 1), _id('router', 2)):
+        generations[router_id] -= 1
+    cases = (('all routers', plugin.get_sync_data, ctx, None),
+             ('one router', plugin.get_sync_data, ctx, [_id('router', 7)]),
+             ('2 changed', plugin.get_sync_data, ctx, None, None,
+              generations))
+    print '%-12s %10s %12s %10s' % ('routers', 'ms', 'statements',
+                                    'returned')
+    for case in cases:
+        elapsed, statements, returned = _measure(counter, *case[1:])
+        print '%-12s %10.1f %12d %10d' % (case[0], elapsed * 1000,
+                                          statements, returned)
+    db.clear_db()
+
+
+if __name__ == '__main__':
+    main()
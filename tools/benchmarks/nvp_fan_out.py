@@ -0,0 +1,137 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure requests made by nvplib to several NVP clusters.
+
+Each fake cluster answers every request after its own latency, and its
+queries return PAGES pages of results. Issuing a request to every cluster,
+looking for a port found on the last cluster only and fetching every page
+of a query from every cluster are timed one cluster after the other, as
+nvplib used to do, and with nvplib.fan_out. The latency histograms recorded
+by nvplib are printed at the end:
+
+    python tools/benchmarks/nvp_fan_out.py [latency_ms ...]
+"""
+
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.getcwd())
+
+import eventlet
+
+from quantum.plugins.nicira.nicira_nvp_plugin import nvplib
+
+
+PAGES = 3
+PORT_ID = 'port-on-last-cluster'
+
+
+class FakeApiClient(object):
+
+    def __init__(self, latency, has_port):
+        self.latency = latency
+        self.has_port = has_port
+
+    def request(self, method, url, body="", content_type="application/json"):
+        eventlet.sleep(self.latency)
+        if 'uuid=' in url:
+            results = [{'uuid': PORT_ID}] if self.has_port else []
+            return json.dumps({'results': results})
+        page = int(url.split('_page_cursor=')[1]) if '_page_cursor=' in url \
+            else 0
+        body = {'results': [{'uuid': '%d' % page}]}
+        if page + 1 < PAGES:
+            body['page_cursor'] = '%d' % (page + 1)
+        return json.dumps(body)
+
+
+class FakeCluster(object):
+
+    def __init__(self, name, latency, has_port):
+        self.name = name
+        self.api_client = FakeApiClient(latency, has_port)
+
+
+def _multi_request_sequential(clusters):
+    return [nvplib.do_single_request('GET', '/ws.v1/log', cluster=c)
+            for c in clusters]
+
+
+def _multi_request_fan_out(clusters):
+    return nvplib.do_multi_request('GET', '/ws.v1/log', clusters=clusters)
+
+
+def _find_port_sequential(clusters):
+    query = '/ws.v1/lswitch/*/lport?uuid=%s&fields=*' % PORT_ID
+    for c in clusters:
+        res = json.loads(nvplib.do_single_request('GET', query, cluster=c))
+        if res['results']:
+            return res['results'][0], c
+
+
+def _find_port_fan_out(clusters):
+    return nvplib.find_port_and_cluster(clusters, PORT_ID)
+
+
+def _query_sequential(clusters):
+    return [nvplib.get_all_query_pages('/ws.v1/lswitch', c)
+            for c in clusters]
+
+
+def _query_fan_out(clusters):
+    return [res for c, res in nvplib.fan_out(
+        lambda c: nvplib.get_all_query_pages('/ws.v1/lswitch', c),
+        clusters)]
+
+
+def main():
+    latencies = [float(arg) / 1000 for arg in sys.argv[1:]] or [
+        0.02, 0.04, 0.06]
+    clusters = [FakeCluster('cluster-%d' % index, latency,
+                            index == len(latencies) - 1)
+                for index, latency in enumerate(latencies)]
+    # nvplib logs every request at the debug level
+    nvplib.LOG.setLevel(logging.INFO)
+
+    print '%-16s %16s %16s' % ('operation', 'sequential ms', 'fan-out ms')
+    for name, sequential, fan_out in (
+            ('multi request', _multi_request_sequential,
+             _multi_request_fan_out),
+            ('find port', _find_port_sequential, _find_port_fan_out),
+            ('query pages', _query_sequential, _query_fan_out)):
+        times = []
+        for func in (sequential, fan_out):
+            start = time.time()
+            func(clusters)
+            times.append((time.time() - start) * 1000)
+        print '%-16s %16.1f %16.1f' % (name, times[0], times[1])
+
+    print
+    print '%-12s %-22s %8s %10s' % ('cluster', 'operation', 'count',
+                                    'mean ms')
+    histograms = nvplib.get_latency_histograms()
+    for (cluster, operation), histogram in sorted(histograms.iteritems()):
+        print '%-12s %-22s %8d %10.1f' % (
+            cluster, operation, histogram['count'],
+            histogram['total_ms'] / histogram['count'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the network and port lists of the NVP plugin.
+
+50 networks with 20 ports each are created through the plugin, backed by
+the fake NVP API client of the unit tests, which waits LATENCY for every
+request as for a round trip to a controller, plus RESULT_TIME for every
+resource returned as for the controller to compute its status. The time
+and number of NVP requests of the lists querying NVP, of a status
+synchronization in pages of state_sync_chunk_size resources, and of the
+lists served from the database afterwards are printed:
+
+    python tools/benchmarks/nvp_status_sync.py [state_sync_chunk_size]
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.getcwd())
+
+from oslo.config import cfg
+
+from quantum.api.v2 import attributes
+from quantum.common import config
+from quantum import context
+from quantum.db import api as db
+from quantum.extensions import l3
+from quantum.extensions import portsecurity as psec
+from quantum.extensions import providernet as pnet
+from quantum.extensions import securitygroup as ext_sg
+from quantum.plugins.nicira.nicira_nvp_plugin.extensions import (nvp_qos
+                                                                 as ext_qos)
+from quantum.plugins.nicira.nicira_nvp_plugin import NvpApiClient
+from quantum.plugins.nicira.nicira_nvp_plugin import QuantumPlugin
+from quantum.tests.unit.nicira import fake_nvpapiclient
+
+
+NETWORKS = 50
+PORTS = 20
+LATENCY = 0.005
+RESULT_TIME = 0.0005
+ETC_PATH = os.path.join('quantum', 'tests', 'unit', 'nicira', 'etc')
+
+
+class FakeApiHelper(object):
+    """NVP API client answering from the fake client of the unit tests."""
+
+    client = fake_nvpapiclient.FakeClient(ETC_PATH)
+    latency = 0
+    requests = 0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def get_nvp_version(self):
+        return '2.999'
+
+    def request(self, *args, **kwargs):
+        FakeApiHelper.requests += 1
+        response = self.client.fake_request(*args, **kwargs)
+        if FakeApiHelper.latency:
+            results = response and json.loads(response).get('results')
+            time.sleep(FakeApiHelper.latency +
+                       RESULT_TIME * len(results or []))
+        return response
+
+
+def _populate(plugin, ctx):
+    # The attributes the API would fill in with their default value
+    unspecified = dict.fromkeys(
+        [pnet.NETWORK_TYPE, pnet.PHYSICAL_NETWORK, pnet.SEGMENTATION_ID,
+         l3.EXTERNAL, ext_qos.QUEUE, ext_sg.SECURITYGROUPS],
+        attributes.ATTR_NOT_SPECIFIED)
+    for n in range(NETWORKS):
+        network = dict(unspecified, name='net-%d' % n, admin_state_up=True,
+                       shared=False, tenant_id='bench')
+        network[psec.PORTSECURITY] = True
+        network = plugin.create_network(ctx, {'network': network})
+        for p in range(PORTS):
+            port = dict(unspecified, name='', network_id=network['id'],
+                        tenant_id='bench', admin_state_up=True,
+                        device_id='vm-%d-%d' % (n, p),
+                        device_owner='compute:nova',
+                        mac_address='fa:16:3e:00:%02x:%02x' % (n, p),
+                        fixed_ips=[])
+            port[psec.PORTSECURITY] = attributes.ATTR_NOT_SPECIFIED
+            plugin.create_port(ctx, {'port': port})
+
+
+def _measure(function, *args):
+    FakeApiHelper.requests = 0
+    start = time.time()
+    function(*args)
+    return time.time() - start, FakeApiHelper.requests
+
+
+def main():
+    config.parse(['--config-file', os.path.join(ETC_PATH, 'nvp.ini.test')])
+    if len(sys.argv) > 1:
+        cfg.CONF.set_override('state_sync_chunk_size', int(sys.argv[1]),
+                              'NVP')
+    cfg.CONF.set_override('metadata_mode', None, 'NVP')
+    cfg.CONF.set_override('rpc_backend',
+                          'quantum.openstack.common.rpc.impl_fake')
+    NvpApiClient.NVPApiHelper = FakeApiHelper
+    plugin = QuantumPlugin.NvpPluginV2()
+    ctx = context.get_admin_context()
+    _populate(plugin, ctx)
+    FakeApiHelper.latency = LATENCY
+    cases = [('list ports, NVP', plugin.get_ports, ctx, {}),
+             ('list networks, NVP', plugin.get_networks, ctx, {}),
+             ('synchronize', plugin._synchronizer.synchronize, ctx),
+             ('list ports, db', plugin.get_ports, ctx, {}),
+             ('list networks, db', plugin.get_networks, ctx, {})]
+    print '%-20s %10s %14s' % ('operation', 'ms', 'NVP requests')
+    for case in cases:
+        if case[0] == 'synchronize':
+            cfg.CONF.set_override('state_sync_interval', 120, 'NVP')
+        elapsed, requests = _measure(*case[1:])
+        print '%-20s %10.1f %14d' % (case[0], elapsed * 1000, requests)
+    FakeApiHelper.client.reset_all()
+    db.clear_db()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the quota checks of port creates for a tenant with many ports.
+
+A tenant owning 20,000 ports is written to an in-memory sqlite database by
+default. The time and number of SQL statements needed by the quota checks
+of 200 single port creates and of a bulk create of 200 ports are printed
+for the DbQuotaDriver, which counts the ports of the tenant, and for the
+UsageTrackingQuotaDriver, which reads them from the usage counter:
+
+    python tools/benchmarks/quota_usage.py [sql_connection]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.getcwd())
+
+from oslo.config import cfg
+import sqlalchemy as sql
+
+from quantum.common import config
+from quantum import context
+from quantum.db import api as db
+from quantum.db import db_base_plugin_v2
+from quantum.db import models_v2
+from quantum.db import quota_db  # noqa
+from quantum import quota
+
+
+PORTS = 20000
+CREATES = 200
+TENANT_ID = 'bench'
+
+
+def _populate(session):
+    ports = [{'id': 'port-%d' % index, 'tenant_id': TENANT_ID, 'name': '',
+              'network_id': 'net',
+              'mac_address': 'fa:16:3e:%02x:%02x:%02x' % (
+                  index / 65536, index / 256 % 256, index % 256),
+              'admin_state_up': True, 'status': 'ACTIVE',
+              'device_id': 'vm-%d' % index, 'device_owner': 'compute:nova'}
+             for index in range(PORTS)]
+    with session.begin():
+        session.execute(models_v2.Network.__table__.insert(),
+                        [{'id': 'net', 'tenant_id': TENANT_ID, 'name': '',
+                          'status': 'ACTIVE', 'admin_state_up': True,
+                          'shared': False}])
+        session.execute(models_v2.Port.__table__.insert(), ports)
+
+
+class StatementCounter(object):
+
+    def __init__(self):
+        self.count = 0
+        sql.event.listen(db._ENGINE, 'before_cursor_execute', self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+def _check(engine, plugin, ctx, delta):
+    # As the API does before creating delta ports of the tenant
+    count = engine.count(ctx, 'port', plugin, 'ports', TENANT_ID)
+    engine.limit_check(ctx, TENANT_ID, port=count + delta)
+
+
+def _single_creates(engine, plugin, ctx):
+    for index in range(CREATES):
+        _check(engine, plugin, ctx, 1)
+
+
+def _bulk_create_per_item(engine, plugin, ctx):
+    # The API used to count the ports again for every item
+    for index in range(CREATES):
+        _check(engine, plugin, ctx, index + 1)
+
+
+def _bulk_create(engine, plugin, ctx):
+    _check(engine, plugin, ctx, CREATES)
+
+
+def main():
+    config.parse([])
+    if len(sys.argv) > 1:
+        cfg.CONF.set_override('sql_connection', sys.argv[1], 'DATABASE')
+    cfg.CONF.set_override('quota_port', -1, 'QUOTAS')
+    cfg.CONF.set_override('quota_usage_resync_interval', 0, 'QUOTAS')
+    plugin = db_base_plugin_v2.QuantumDbPluginV2()
+    ctx = context.get_admin_context()
+    _populate(ctx.session)
+    counter = StatementCounter()
+    print '%-28s %-22s %10s %12s' % ('driver', 'checks', 'ms', 'statements')
+    for driver in ('DbQuotaDriver', 'UsageTrackingQuotaDriver'):
+        engine = quota.QuotaEngine('quantum.db.quota_db.' + driver)
+        engine.register_resource_by_name('port')
+        # Create the usage counter before measuring
+        _check(engine, plugin, ctx, 1)
+        cases = [('%d single creates' % CREATES, _single_creates)]
+        if driver == 'DbQuotaDriver':
+            cases.append(('bulk of %d, per item' % CREATES,
+                          _bulk_create_per_item))
+        cases.append(('bulk of %d' % CREATES, _bulk_create))
+        for name, checks in cases:
+            counter.count = 0
+            start = time.time()
+            checks(engine, plugin, ctx)
+            print '%-28s %-22s %10.1f %12d' % (driver, name,
+                                               (time.time() - start) * 1000,
+                                               counter.count)
+    db.clear_db()
+
+
+if __name__ == '__main__':
+    main()
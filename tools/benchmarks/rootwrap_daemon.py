@@ -0,0 +1,92 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Compare running commands through quantum-rootwrap and its daemon.
+
+The same command is run through a new quantum-rootwrap process each time,
+like root_helper does, then through a single quantum-rootwrap-daemon, like
+root_helper_daemon does. Both are started without sudo and load the filter
+files given by the rootwrap configuration, so the figures leave out the
+cost of sudo which only the first path pays for every command:
+
+    python tools/benchmarks/rootwrap_daemon.py [rootwrap.conf]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.getcwd())
+
+from quantum.agent.linux import utils
+from quantum.rootwrap import daemon
+
+
+COMMANDS = 200
+# Run by the DHCP agent to check dnsmasq is still alive
+COMMAND = ['cat', '/proc/%d/cmdline' % os.getpid()]
+
+
+def _make_config(tmpdir):
+    filters_dir = os.path.join(tmpdir, 'rootwrap.d')
+    os.mkdir(filters_dir)
+    for name in os.listdir('etc/quantum/rootwrap.d'):
+        shutil.copy(os.path.join('etc/quantum/rootwrap.d', name), filters_dir)
+    conf_file = os.path.join(tmpdir, 'rootwrap.conf')
+    with open(conf_file, 'w') as f:
+        f.write('[DEFAULT]\nfilters_path=%s\n' % filters_dir)
+    return conf_file
+
+
+def _measure(run):
+    start = time.time()
+    for i in range(COMMANDS):
+        run()
+    return COMMANDS / (time.time() - start)
+
+
+def main():
+    tmpdir = tempfile.mkdtemp()
+    try:
+        if len(sys.argv) > 1:
+            conf_file = sys.argv[1]
+        else:
+            conf_file = _make_config(tmpdir)
+        root_helper = '%s bin/quantum-rootwrap %s' % (sys.executable,
+                                                      conf_file)
+        # quantum-rootwrap imports quantum before looking for a branch
+        os.environ['PYTHONPATH'] = os.getcwd()
+        forked = _measure(lambda: utils.execute(COMMAND, root_helper))
+
+        client = daemon.RootwrapClient('%s bin/quantum-rootwrap-daemon %s' %
+                                       (sys.executable, conf_file))
+        client.execute(COMMAND)
+        try:
+            served = _measure(lambda: client.execute(COMMAND))
+        finally:
+            client.stop()
+    finally:
+        shutil.rmtree(tmpdir)
+
+    print '%-24s %12s' % ('path', 'commands/s')
+    print '%-24s %12.1f' % ('quantum-rootwrap', forked)
+    print '%-24s %12.1f' % ('quantum-rootwrap-daemon', served)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the memory used to serialize port lists of growing sizes.
+
+Each measurement runs in its own process, which builds the list response
+and reports how much its peak RSS grows while the response is serialized
+into one string, as the API used to do, and while it is serialized one
+port at a time and written to /dev/null, as list responses now are:
+
+    python tools/benchmarks/streaming_json.py
+"""
+
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.getcwd())
+
+from quantum import wsgi
+
+
+SIZES = (1000, 10000, 50000)
+
+
+def _ports(count):
+    return {'ports': [{'id': 'port-%d' % index,
+                       'name': '',
+                       'network_id': 'net-%d' % (index % 10),
+                       'tenant_id': 'tenant',
+                       'admin_state_up': True,
+                       'status': 'ACTIVE',
+                       'mac_address': 'fa:16:3e:00:%02x:%02x' % divmod(index,
+                                                                       256),
+                       'fixed_ips': [{'subnet_id': 'subnet-%d' % (index % 10),
+                                      'ip_address': '10.%d.%d.%d' % (
+                                          index / 65536,
+                                          index / 256 % 256,
+                                          index % 256)}],
+                       'device_id': 'device-%d' % index,
+                       'device_owner': 'compute:nova'}
+                      for index in range(count)]}
+
+
+def _max_rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _measure(count, streamed, results):
+    data = _ports(count)
+    serializer = wsgi.JSONDictSerializer()
+    before = _max_rss()
+    start = time.time()
+    with open(os.devnull, 'w') as out:
+        if streamed:
+            for chunk in serializer.serialize_iter(data):
+                out.write(chunk)
+        else:
+            out.write(serializer.serialize(data))
+    results.put((time.time() - start, _max_rss() - before))
+
+
+def main():
+    print '%-8s %-10s %10s %16s' % ('ports', 'mode', 'ms', 'peak growth KB')
+    for count in SIZES:
+        for mode, streamed in (('string', False), ('streamed', True)):
+            results = multiprocessing.Queue()
+            process = multiprocessing.Process(target=_measure,
+                                              args=(count, streamed, results))
+            process.start()
+            elapsed, growth = results.get()
+            process.join()
+            print '%-8d %-10s %10.1f %16d' % (count, mode, elapsed * 1000,
+                                              growth)
+
+
+if __name__ == '__main__':
+    main()